@@ -174,6 +174,10 @@ class EstiaApp:
         
         start_time = time.time()
         
+        # 同一轮的增强和存储共用一个context（携带会话ID、查询向量等）
+        if context is None:
+            context = {}
+        
         try:
             # 使用记忆系统增强查询
             self.logger.debug(f"开始处理查询: {query[:50]}...")
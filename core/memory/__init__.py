@@ -46,7 +46,8 @@ def safe_db_execute(db_manager: "DatabaseManager", query: str, params=None,
         db_manager: 数据库管理器实例
         query: SQL查询语句
         params: 查询参数
-        auto_commit: 是否自动提交事务
+        auto_commit: 保留参数，已不再使用（execute_query在事务外自动提交，
+                     在db_manager.transaction()内由事务统一提交）
         operation_name: 操作名称，用于日志
         
     Returns:
@@ -57,10 +58,9 @@ def safe_db_execute(db_manager: "DatabaseManager", query: str, params=None,
         return False
     
     try:
-        db_manager.execute_query(query, params)
-        
-        if auto_commit and db_manager.conn:
-            db_manager.conn.commit()
+        if db_manager.execute_query(query, params) is None:
+            logger.error(f"{operation_name}失败")
+            return False
         
         logger.debug(f"{operation_name}成功")
         return True
@@ -6,5 +6,10 @@
 """
 
 from .network import AssociationNetwork
+from .graph import AssociationGraph
+from .activation import SpreadingActivation
+from .tracker import ActivationTracker
+from .builder import AssociationBuilder
 
-__all__ = ['AssociationNetwork']
+__all__ = ['AssociationNetwork', 'AssociationGraph', 'SpreadingActivation', 'ActivationTracker',
+           'AssociationBuilder']
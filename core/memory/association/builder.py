@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关联构建
+新记忆的候选邻居从向量索引中取（ANN），相似度、时间接近度和主题加成对全部候选一次矩阵运算算出，
+只有通过阈值的前k个候选才在Python中确定关联类型，最后在一个事务中批量写入或更新关联。
+"""
+
+import json
+import time
+import uuid
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.memory.init.vector_codec import decode_rows
+from core.memory.ranking.scorer import text_units
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 3600
+
+# 时间接近度加成：(天数上限, 加成)
+TIME_BONUS_STEPS = ((1, 0.2), (7, 0.1), (30, 0.05))
+
+# 同类别加成；不同类别但内容命中同一组主题关键词时的加成
+CATEGORY_BONUS = 0.15
+KEYWORD_TOPIC_BONUS = 0.1
+TOPIC_KEYWORDS = (
+    ("python", "编程", "ai", "机器学习", "深度学习", "算法"),
+    ("天气", "散步", "电影", "朋友", "周末"),
+    ("项目", "团队", "公司", "会议", "工作"),
+)
+
+SEQUENCE_WORDS = ("然后", "接着", "后来", "之后")
+CAUSE_WORDS = ("因为", "由于", "导致", "造成", "结果")
+CONTRADICTION_WORDS = ("但是", "然而", "不过", "相反", "矛盾")
+
+DEFAULT_ASSOCIATION_WEIGHTS = {
+    "same_topic": 1.2,
+    "temporal_sequence": 1.1,
+    "is_related_to": 1.0,
+    "cause_effect": 1.15,
+    "contradiction": 0.8
+}
+
+
+def _created_at(memory: Dict[str, Any]) -> float:
+    return memory.get("created_at") or memory.get("timestamp") or 0.0
+
+
+def _category(memory: Dict[str, Any]) -> str:
+    metadata = memory.get("metadata") or {}
+    return metadata.get("category", "") if isinstance(metadata, dict) else ""
+
+
+def _importance(memory: Dict[str, Any]) -> float:
+    """重要性（0-1）：优先取importance字段，否则由0-10的权重换算"""
+    if "importance" in memory:
+        return memory["importance"]
+    weight = memory.get("weight")
+    return min(1.0, max(0.0, weight / 10.0)) if weight is not None else 0.5
+
+
+def _topic_mask(content: str) -> int:
+    """内容命中的主题关键词组的位掩码"""
+    mask = 0
+    for bit, keywords in enumerate(TOPIC_KEYWORDS):
+        if any(keyword in content for keyword in keywords):
+            mask |= 1 << bit
+    return mask
+
+
+def determine_association_type(memory1: Dict[str, Any], memory2: Dict[str, Any], strength: float) -> str:
+    """
+    确定关联类型
+
+    参数:
+        memory1: 第一个记忆
+        memory2: 第二个记忆
+        strength: 两者的关联强度
+
+    返回:
+        str: 关联类型
+    """
+    content1 = memory1.get("content", "").lower()
+    content2 = memory2.get("content", "").lower()
+
+    # 2天内且都带有顺序词
+    time1, time2 = _created_at(memory1), _created_at(memory2)
+    if time1 and time2 and abs(time1 - time2) <= 2 * DAY:
+        if any(word in content1 and word in content2 for word in SEQUENCE_WORDS):
+            return "temporal_sequence"
+
+    if strength > 0.8 and _category(memory1) and _category(memory1) == _category(memory2):
+        return "same_topic"
+
+    if any(word in content1 or word in content2 for word in CAUSE_WORDS):
+        return "cause_effect"
+
+    if any(word in content1 or word in content2 for word in CONTRADICTION_WORDS):
+        return "contradiction"
+
+    return "is_related_to"
+
+
+class AssociationBuilder:
+    """基于向量的批量关联构建"""
+
+    def __init__(self, db_manager=None, vector_index=None, top_k: int = 10, candidate_k: int = 50,
+                 strength_threshold: float = 0.2, association_weights: Optional[Dict[str, float]] = None):
+        """
+        初始化关联构建器
+
+        参数:
+            db_manager: 数据库管理器
+            vector_index: 向量索引（VectorIndexManager），用于查找候选邻居
+            top_k: 每个新记忆最多创建的关联数
+            candidate_k: 从向量索引中取的候选数
+            strength_threshold: 最小关联强度
+            association_weights: 关联类型权重
+        """
+        self.db_manager = db_manager
+        self.vector_index = vector_index
+        self.top_k = top_k
+        self.candidate_k = candidate_k
+        self.strength_threshold = strength_threshold
+        self.association_weights = association_weights if association_weights is not None \
+            else dict(DEFAULT_ASSOCIATION_WEIGHTS)
+
+    def score(self, memory: Dict[str, Any], candidates: Sequence[Dict[str, Any]],
+              vector: Optional[np.ndarray] = None,
+              candidate_vectors: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        计算新记忆与所有候选的关联强度（未乘类型权重）
+
+        有向量时基础强度为余弦相似度（一次矩阵乘法），否则为中文双字/英文单词的重叠度；
+        加上时间接近度和主题加成后按两者的平均重要性调节。
+
+        参数:
+            memory: 新记忆
+            candidates: 候选记忆
+            vector: 新记忆的向量，None时取memory中的vector字段
+            candidate_vectors: 候选向量矩阵（与candidates逐行对应），None时取各候选的vector字段
+
+        返回:
+            np.ndarray: 0-1的关联强度
+        """
+        count = len(candidates)
+        if count == 0:
+            return np.empty(0, dtype=np.float32)
+
+        base = self._base_similarity(memory, candidates, vector, candidate_vectors)
+
+        # 时间接近度
+        created = np.array([_created_at(candidate) for candidate in candidates], dtype=np.float64)
+        created_at = _created_at(memory)
+        days = np.abs(created - created_at) / DAY
+        time_bonus = np.select([days <= limit for limit, _ in TIME_BONUS_STEPS],
+                               [bonus for _, bonus in TIME_BONUS_STEPS], 0.0)
+        time_bonus[(created == 0) | (created_at == 0)] = 0.0
+
+        # 主题：同类别，否则命中同一组主题关键词
+        category = _category(memory)
+        same_category = np.array([bool(category) and _category(candidate) == category
+                                  for candidate in candidates])
+        masks = np.array([_topic_mask(candidate.get("content", "").lower()) for candidate in candidates])
+        same_topic = (masks & _topic_mask(memory.get("content", "").lower())) != 0
+        topic_bonus = np.where(same_category, CATEGORY_BONUS, np.where(same_topic, KEYWORD_TOPIC_BONUS, 0.0))
+
+        importance = (np.array([_importance(candidate) for candidate in candidates]) + _importance(memory)) / 2
+        strengths = np.minimum(1.0, base + time_bonus + topic_bonus) * (0.5 + importance * 0.5)
+        return np.maximum(0.0, strengths).astype(np.float32)
+
+    def _base_similarity(self, memory, candidates, vector, candidate_vectors) -> np.ndarray:
+        """余弦相似度，缺少向量的候选改用文本单元重叠度"""
+        count = len(candidates)
+        similarity = np.zeros(count, dtype=np.float32)
+        has_vector = np.zeros(count, dtype=bool)
+
+        vector = memory.get("vector") if vector is None else vector
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+            if candidate_vectors is None:
+                rows = [i for i, candidate in enumerate(candidates)
+                        if candidate.get("vector") is not None and np.size(candidate["vector"]) == vector.size]
+                if rows:
+                    has_vector[rows] = True
+                    candidate_vectors = np.stack([np.asarray(candidates[i]["vector"], dtype=np.float32).reshape(-1)
+                                                  for i in rows])
+            elif candidate_vectors.shape[1] == vector.size:
+                has_vector[:] = True
+
+            if has_vector.any():
+                norms = np.linalg.norm(candidate_vectors, axis=1) * (np.linalg.norm(vector) or 1.0)
+                cosine = candidate_vectors @ vector / np.where(norms > 0, norms, 1.0)
+                similarity[has_vector] = np.clip(cosine, 0.0, 1.0)
+
+        if not has_vector.all():
+            units = text_units(memory.get("content", ""))
+            for i in np.flatnonzero(~has_vector).tolist():
+                other = text_units(candidates[i].get("content", ""))
+                union = len(units | other)
+                similarity[i] = len(units & other) / union if union else 0.0
+        return similarity
+
+    def build(self, memory_id: str, memory: Optional[Dict[str, Any]] = None,
+              vector: Optional[np.ndarray] = None,
+              candidates: Optional[Sequence[Dict[str, Any]]] = None,
+              strength_threshold: Optional[float] = None,
+              top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        为新记忆创建关联并写入数据库
+
+        参数:
+            memory_id: 新记忆ID
+            memory: 新记忆内容，None时从数据库读取
+            vector: 新记忆的向量，None时从memory_vectors读取
+            candidates: 候选记忆，None时从向量索引中取最近邻
+            strength_threshold: 最小关联强度，None使用构建器的设置
+            top_k: 最多创建的关联数，None使用构建器的设置
+
+        返回:
+            List[Dict[str, Any]]: 创建（或更新）的关联，按强度降序
+        """
+        threshold = self.strength_threshold if strength_threshold is None else strength_threshold
+        top_k = self.top_k if top_k is None else top_k
+
+        if memory is None or (vector is None and candidates is None):
+            stored = self._load_memories([memory_id])
+            if memory is None:
+                if not stored:
+                    logger.warning(f"记忆不存在，无法创建关联: {memory_id}")
+                    return []
+                memory = stored[0]
+            elif stored:
+                vector = stored[0].get("vector")
+
+        if candidates is None:
+            candidates = self._find_candidates(memory_id, memory.get("vector") if vector is None else vector)
+        candidates = [candidate for candidate in candidates if candidate.get("memory_id") != memory_id]
+        if not candidates:
+            return []
+
+        strengths = self.score(memory, candidates, vector)
+
+        # 只对通过阈值的候选确定类型（最多候选数个，与记忆总数无关）
+        order = [i for i in np.argsort(-strengths, kind="stable").tolist() if strengths[i] >= threshold]
+        now = time.time()
+        associations = []
+        for i in order[:max(top_k, self.candidate_k)]:
+            association_type = determine_association_type(memory, candidates[i], float(strengths[i]))
+            associations.append({
+                "source_id": memory_id,
+                "target_id": candidates[i].get("memory_id"),
+                "association_type": association_type,
+                "strength": min(1.0, float(strengths[i]) * self.association_weights.get(association_type, 1.0)),
+                "created_at": now
+            })
+        associations.sort(key=lambda association: association["strength"], reverse=True)
+        return self.save(associations[:top_k])
+
+    def _load_memories(self, memory_ids: List[str]) -> List[Dict[str, Any]]:
+        """按ID顺序读取记忆，存有向量的记忆带上vector字段（向量一次批量解码）"""
+        if not self.db_manager or not memory_ids:
+            return []
+
+        rows = self.db_manager.execute_named("association.memories", in_values=memory_ids) or []
+        memories = {}
+        for memory_id, content, role, timestamp, weight, metadata in rows:
+            try:
+                metadata = json.loads(metadata) if metadata else {}
+            except (TypeError, ValueError):
+                metadata = {}
+            memories[memory_id] = {"memory_id": memory_id, "content": content, "role": role,
+                                   "created_at": timestamp, "weight": weight, "metadata": metadata}
+
+        vector_rows = self.db_manager.execute_named("association.candidate_vectors", in_values=memory_ids) or []
+        vector_ids, vectors = decode_rows(vector_rows)
+        for memory_id, vector in zip(vector_ids, vectors):
+            if memory_id in memories:
+                memories[memory_id]["vector"] = vector
+        return [memories[memory_id] for memory_id in memory_ids if memory_id in memories]
+
+    def _find_candidates(self, memory_id: str, vector: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """从向量索引中取候选邻居"""
+        if vector is None or self.vector_index is None:
+            return []
+        ids, _ = self.vector_index.search(np.asarray(vector, dtype=np.float32), k=self.candidate_k + 1)
+        ids = [candidate_id for candidate_id in ids if candidate_id != memory_id][:self.candidate_k]
+        return self._load_memories(ids)
+
+    def save(self, associations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        在一个事务中批量写入关联：已存在的（任一方向）更新强度和类型，其余插入
+
+        参数:
+            associations: 同一个源记忆的关联
+
+        返回:
+            List[Dict[str, Any]]: 写入成功的关联，失败时为空列表
+        """
+        if not associations:
+            return []
+        if not self.db_manager:
+            return associations
+
+        source_id = associations[0]["source_id"]
+        target_ids = [association["target_id"] for association in associations]
+        try:
+            with self.db_manager.transaction():
+                existing = {}
+                for target_id, association_id in self.db_manager.execute_named(
+                        "association.pairs_from", (source_id,), target_ids) or []:
+                    existing[target_id] = association_id
+                for target_id, association_id in self.db_manager.execute_named(
+                        "association.pairs_to", (source_id,), target_ids) or []:
+                    existing.setdefault(target_id, association_id)
+
+                now = time.time()
+                updates = [(association["strength"], association["association_type"], now,
+                            existing[association["target_id"]])
+                           for association in associations if association["target_id"] in existing]
+                inserts = [(f"assoc_{int(now * 1000000)}_{uuid.uuid4().hex[:8]}", source_id,
+                            association["target_id"], association["association_type"], association["strength"],
+                            association["created_at"], association["created_at"])
+                           for association in associations if association["target_id"] not in existing]
+                if updates:
+                    self.db_manager.executemany_named("association.update", updates)
+                if inserts:
+                    self.db_manager.bulk_insert("memory_association", inserts)
+        except Exception as e:
+            logger.error(f"批量保存关联失败: {e}")
+            return []
+
+        logger.debug(f"记忆 {source_id}: 新建 {len(inserts)} 个关联，更新 {len(updates)} 个")
+        return associations
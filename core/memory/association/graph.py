@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关联图
+把memory_association加载为内存中的CSR邻接结构（无向，每条关联在两端各出现一次），
+多种子、多跳、按强度剪枝的扩展在一次批量调用中完成，不再逐个邻居查询数据库。
+新增关联先放在增量表中，积累到一定数量后再合并进CSR数组。
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 增量关联数超过此值（或超过已合并关联数的5%）时合并进CSR
+DEFAULT_COMPACT_THRESHOLD = 1024
+
+# 已删除关联的强度标记，扩展时自然被强度阈值过滤
+_DELETED = -1.0
+
+
+class AssociationGraph:
+    """记忆关联的内存CSR图"""
+
+    def __init__(self, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        """
+        初始化关联图（调用load后才可使用）
+
+        参数:
+            compact_threshold: 增量关联数超过此值时合并进CSR数组
+        """
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        # 节点
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        # 关联类型
+        self.type_names: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        # 关联属性（按无向关联编号）
+        self.edge_pairs = np.empty((0, 2), dtype=np.int32)
+        self.edge_strength = np.empty(0, dtype=np.float32)
+        self.edge_type = np.empty(0, dtype=np.int16)
+        self.edge_time = np.empty(0, dtype=np.float64)
+        # CSR：节点i的邻居为 indices[indptr[i]:indptr[i+1]]（升序），edge_ref指向关联编号
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.edge_ref = np.empty(0, dtype=np.int32)
+        self._csr_rows = np.empty(0, dtype=np.int32)
+        # 增量关联：编号从len(edge_strength)开始
+        self._pending: List[List[Any]] = []
+        self._pending_adj: Dict[int, List[Tuple[int, int]]] = {}
+
+    # ---------- 加载与合并 ----------
+
+    def load(self, db_manager) -> bool:
+        """
+        从memory_association加载全部关联
+
+        参数:
+            db_manager: 数据库管理器
+
+        返回:
+            bool: 是否加载成功
+        """
+        try:
+            rows = db_manager.query(
+                "SELECT source_key, target_key, strength, association_type, last_activated "
+                "FROM memory_association"
+            ) or []
+        except Exception as e:
+            logger.error(f"加载关联图失败: {e}")
+            return False
+
+        with self._lock:
+            self._reset()
+            pairs = np.empty((len(rows), 2), dtype=np.int32)
+            types = np.empty(len(rows), dtype=np.int16)
+            for i, row in enumerate(rows):
+                pairs[i, 0] = self._node(row[0])
+                pairs[i, 1] = self._node(row[1])
+                types[i] = self._type_code(row[3])
+            strengths = np.array([row[2] or 0.0 for row in rows], dtype=np.float32)
+            times = np.array([row[4] or 0.0 for row in rows], dtype=np.float64)
+
+            # 同一对记忆只保留强度最高的一条，去掉自环
+            pairs.sort(axis=1)
+            keep = pairs[:, 0] != pairs[:, 1]
+            pairs, strengths, types, times = pairs[keep], strengths[keep], types[keep], times[keep]
+            order = np.lexsort((-strengths, pairs[:, 1], pairs[:, 0]))
+            pairs, strengths, types, times = pairs[order], strengths[order], types[order], times[order]
+            first = np.ones(len(pairs), dtype=bool)
+            first[1:] = np.any(pairs[1:] != pairs[:-1], axis=1)
+
+            self.edge_pairs = pairs[first]
+            self.edge_strength = strengths[first]
+            self.edge_type = types[first]
+            self.edge_time = times[first]
+            self._build_csr()
+            self.loaded = True
+
+        logger.info(f"关联图加载完成: {self.num_nodes} 个节点, {self.num_edges} 条关联")
+        return True
+
+    def _build_csr(self):
+        n = len(self.ids)
+        edges = len(self.edge_pairs)
+        src = np.concatenate([self.edge_pairs[:, 0], self.edge_pairs[:, 1]])
+        dst = np.concatenate([self.edge_pairs[:, 1], self.edge_pairs[:, 0]])
+        ref = np.tile(np.arange(edges, dtype=np.int32), 2)
+        order = np.lexsort((dst, src))
+        self.indices = dst[order].astype(np.int32)
+        self.edge_ref = ref[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self._csr_rows = src[order].astype(np.int32)
+
+    def compact(self):
+        """把增量关联合并进CSR数组，并去掉已删除的关联"""
+        with self._lock:
+            if self._pending:
+                pending = self._pending
+                self.edge_pairs = np.vstack([self.edge_pairs,
+                                             np.array([p[:2] for p in pending], dtype=np.int32)])
+                self.edge_strength = np.concatenate([self.edge_strength,
+                                                     np.array([p[2] for p in pending], dtype=np.float32)])
+                self.edge_type = np.concatenate([self.edge_type,
+                                                 np.array([p[3] for p in pending], dtype=np.int16)])
+                self.edge_time = np.concatenate([self.edge_time,
+                                                 np.array([p[4] for p in pending], dtype=np.float64)])
+                self._pending = []
+                self._pending_adj = {}
+
+            alive = self.edge_strength >= 0
+            if not alive.all():
+                self.edge_pairs = self.edge_pairs[alive]
+                self.edge_strength = self.edge_strength[alive]
+                self.edge_type = self.edge_type[alive]
+                self.edge_time = self.edge_time[alive]
+            self._build_csr()
+
+    def _maybe_compact(self):
+        if len(self._pending) > max(self.compact_threshold, len(self.edge_strength) // 20):
+            self.compact()
+
+    # ---------- 增量更新 ----------
+
+    def _node(self, memory_id: str) -> int:
+        node = self.index.get(memory_id)
+        if node is None:
+            node = self.index[memory_id] = len(self.ids)
+            self.ids.append(memory_id)
+        return node
+
+    def _type_code(self, association_type: Optional[str]) -> int:
+        association_type = association_type or "is_related_to"
+        code = self._type_codes.get(association_type)
+        if code is None:
+            code = self._type_codes[association_type] = len(self.type_names)
+            self.type_names.append(association_type)
+        return code
+
+    def _find_edge(self, a: int, b: int) -> Optional[int]:
+        """查找两个节点之间的关联编号"""
+        if a + 1 < len(self.indptr):
+            start, end = self.indptr[a], self.indptr[a + 1]
+            pos = start + np.searchsorted(self.indices[start:end], b)
+            if pos < end and self.indices[pos] == b:
+                return int(self.edge_ref[pos])
+        for neighbor, ref in self._pending_adj.get(a, ()):
+            if neighbor == b:
+                return ref
+        return None
+
+    def upsert_edge(self, source_id: str, target_id: str, strength: float,
+                    association_type: str = "is_related_to", timestamp: Optional[float] = None):
+        """
+        新增或更新一条关联（与数据库写入保持一致）
+
+        参数:
+            source_id: 源记忆ID
+            target_id: 目标记忆ID
+            strength: 关联强度
+            association_type: 关联类型
+            timestamp: 最近激活时间，None则使用当前时间
+        """
+        if source_id == target_id:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            a, b = self._node(source_id), self._node(target_id)
+            type_code = self._type_code(association_type)
+            ref = self._find_edge(a, b)
+            if ref is None:
+                ref = len(self.edge_strength) + len(self._pending)
+                self._pending.append([min(a, b), max(a, b), strength, type_code, timestamp])
+                self._pending_adj.setdefault(a, []).append((b, ref))
+                self._pending_adj.setdefault(b, []).append((a, ref))
+                self._maybe_compact()
+            else:
+                self._set_edge(ref, strength=strength, type_code=type_code, timestamp=timestamp)
+
+    def _set_edge(self, ref: int, strength=None, type_code=None, timestamp=None):
+        compacted = len(self.edge_strength)
+        if ref < compacted:
+            if strength is not None:
+                self.edge_strength[ref] = strength
+            if type_code is not None:
+                self.edge_type[ref] = type_code
+            if timestamp is not None:
+                self.edge_time[ref] = timestamp
+        else:
+            entry = self._pending[ref - compacted]
+            if strength is not None:
+                entry[2] = strength
+            if type_code is not None:
+                entry[3] = type_code
+            if timestamp is not None:
+                entry[4] = timestamp
+
+    def adjust_strength(self, source_id: str, target_id: str, delta: float, max_strength: float = 1.0):
+        """按增量调整一条已有关联的强度"""
+        with self._lock:
+            a, b = self.index.get(source_id), self.index.get(target_id)
+            if a is None or b is None:
+                return
+            ref = self._find_edge(a, b)
+            if ref is not None:
+                current = self._edge_strengths(np.array([ref]))[0]
+                self._set_edge(ref, strength=min(max_strength, current + delta))
+
+    def set_strengths(self, updates: Sequence[Tuple[str, str, Optional[float]]]) -> int:
+        """
+        批量设置已有关联的强度（与数据库中的分块维护保持一致），删除的关联在下次合并时去掉
+
+        参数:
+            updates: (源记忆ID, 目标记忆ID, 新强度)，新强度为None表示删除
+
+        返回:
+            int: 找到并修改的关联数
+        """
+        changed = 0
+        with self._lock:
+            for source_id, target_id, strength in updates:
+                a, b = self.index.get(source_id), self.index.get(target_id)
+                ref = self._find_edge(a, b) if a is not None and b is not None else None
+                if ref is None:
+                    continue
+                self._set_edge(ref, strength=_DELETED if strength is None else strength)
+                changed += 1
+        return changed
+
+    def degrees(self) -> Dict[str, int]:
+        """每个记忆的关联数（不含已删除的关联）"""
+        src, _, _ = self.directed_edges()
+        counts = np.bincount(src, minlength=self.num_nodes)
+        return {self.ids[node]: int(counts[node]) for node in np.flatnonzero(counts).tolist()}
+
+    def touch(self, memory_ids: Sequence[str], timestamp: Optional[float] = None):
+        """更新涉及这些记忆的所有关联的最近激活时间"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            nodes = np.array([self.index[m] for m in memory_ids if m in self.index], dtype=np.int64)
+            if len(nodes) == 0:
+                return
+            positions, _ = self._gather(nodes[nodes + 1 < len(self.indptr)])
+            self.edge_time[self.edge_ref[positions]] = timestamp
+            for node in nodes.tolist():
+                for _, ref in self._pending_adj.get(node, ()):
+                    self._set_edge(ref, timestamp=timestamp)
+
+    # ---------- 查询 ----------
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.ids)
+
+    @property
+    def num_edges(self) -> int:
+        return int(np.count_nonzero(self.edge_strength >= 0)) + len(self._pending)
+
+    def _gather(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        取出一组节点在CSR中的全部邻接位置
+
+        返回:
+            (邻接位置, 每个节点的邻居数)
+        """
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), counts
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets, counts
+
+    def directed_edges(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        全部有向邻接（每条关联两个方向各一条，含增量关联，不含已删除的关联），供矩阵运算使用
+
+        返回:
+            (起点, 终点, 强度)
+        """
+        with self._lock:
+            src, dst = self._csr_rows, self.indices
+            strengths = self.edge_strength[self.edge_ref]
+            if self._pending:
+                compacted = len(self.edge_strength)
+                extra = np.array([(node, neighbor, self._pending[ref - compacted][2])
+                                  for node, edges in self._pending_adj.items()
+                                  for neighbor, ref in edges], dtype=np.float64)
+                src = np.concatenate([src, extra[:, 0].astype(np.int32)])
+                dst = np.concatenate([dst, extra[:, 1].astype(np.int32)])
+                strengths = np.concatenate([strengths, extra[:, 2].astype(np.float32)])
+            alive = strengths > 0
+            return src[alive], dst[alive], strengths[alive]
+
+    def _edge_strengths(self, refs: np.ndarray) -> np.ndarray:
+        compacted = len(self.edge_strength)
+        strengths = np.empty(len(refs), dtype=np.float32)
+        in_csr = refs < compacted
+        strengths[in_csr] = self.edge_strength[refs[in_csr]]
+        for i in np.flatnonzero(~in_csr):
+            strengths[i] = self._pending[refs[i] - compacted][2]
+        return strengths
+
+    def _edge_types(self, refs: np.ndarray) -> List[str]:
+        compacted = len(self.edge_strength)
+        return [self.type_names[self.edge_type[ref] if ref < compacted else self._pending[ref - compacted][3]]
+                for ref in refs.tolist()]
+
+    def neighbors(self, memory_id: str, min_strength: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        直接关联的记忆
+
+        返回:
+            List[Dict[str, Any]]: 与expand的结果格式相同，按强度降序
+        """
+        return self.expand([memory_id], depth=1, min_strength=min_strength)
+
+    def expand(self, seed_ids: Sequence[str], depth: int = 2, min_strength: float = 0.5,
+               max_results: Optional[int] = None, edge_decay: float = 0.8,
+               path_decay: float = 0.6) -> List[Dict[str, Any]]:
+        """
+        从多个种子记忆出发按层扩展
+
+        第d跳（从1开始）只沿强度不低于 min_strength * edge_decay^(d-1) 的关联前进，
+        路径强度（沿途强度的乘积）低于 min_strength * path_decay^(d-1) 的节点被剪掉。
+        每个节点只在最先到达的一层出现，取该层的最强路径。
+
+        参数:
+            seed_ids: 种子记忆ID
+            depth: 最大跳数
+            min_strength: 第一跳的最小关联强度
+            max_results: 最多返回的记忆数，None则不限
+            edge_decay: 每多一跳，关联强度阈值的衰减系数
+            path_decay: 每多一跳，路径强度阈值的衰减系数
+
+        返回:
+            List[Dict[str, Any]]: memory_id、strength（路径强度）、depth、association_type（最后一跳的类型）、
+            association_path（从种子到该记忆的ID路径），按路径强度降序，不含种子
+        """
+        with self._lock:
+            seeds = np.unique(np.array([self.index[m] for m in seed_ids if m in self.index], dtype=np.int64))
+            if len(seeds) == 0 or depth < 1:
+                return []
+
+            n = len(self.ids)
+            visited = np.zeros(n, dtype=bool)
+            visited[seeds] = True
+            parent = np.full(n, -1, dtype=np.int64)
+            parent_edge = np.full(n, -1, dtype=np.int64)
+
+            frontier, frontier_score = seeds, np.ones(len(seeds), dtype=np.float32)
+            reached: List[Tuple[np.ndarray, np.ndarray, int]] = []
+            for hop in range(1, depth + 1):
+                neighbors, refs, parents, scores = self._frontier_edges(frontier, frontier_score)
+                if len(neighbors) == 0:
+                    break
+                strengths = self._edge_strengths(refs)
+                path = strengths * scores
+                keep = ((strengths >= min_strength * edge_decay ** (hop - 1))
+                        & (path >= min_strength * path_decay ** (hop - 1))
+                        & ~visited[neighbors])
+                neighbors, refs, parents, path = neighbors[keep], refs[keep], parents[keep], path[keep]
+                if len(neighbors) == 0:
+                    break
+
+                # 同一节点被多条路径到达时保留最强的一条
+                order = np.argsort(-path, kind="stable")
+                unique, first = np.unique(neighbors[order], return_index=True)
+                first = order[first]
+                visited[unique] = True
+                parent[unique] = parents[first]
+                parent_edge[unique] = refs[first]
+                reached.append((unique, path[first], hop))
+                frontier, frontier_score = unique, path[first]
+
+            if not reached:
+                return []
+            nodes = np.concatenate([r[0] for r in reached])
+            scores = np.concatenate([r[1] for r in reached])
+            hops = np.concatenate([np.full(len(r[0]), r[2]) for r in reached])
+            order = np.argsort(-scores, kind="stable")[:max_results]
+            nodes, scores, hops = nodes[order], scores[order], hops[order]
+            types = self._edge_types(parent_edge[nodes])
+
+            results = []
+            for node, score, hop, association_type in zip(nodes.tolist(), scores.tolist(), hops.tolist(), types):
+                path_nodes = [node]
+                while parent[path_nodes[-1]] >= 0:
+                    path_nodes.append(int(parent[path_nodes[-1]]))
+                results.append({
+                    "memory_id": self.ids[node],
+                    "strength": score,
+                    "depth": hop,
+                    "association_type": association_type,
+                    "association_path": [self.ids[i] for i in reversed(path_nodes)],
+                })
+            return results
+
+    def _frontier_edges(self, frontier: np.ndarray, scores: np.ndarray):
+        """一层扩展的全部候选边：(邻居, 关联编号, 来源节点, 来源路径强度)"""
+        in_csr = frontier + 1 < len(self.indptr)
+        csr_nodes = frontier[in_csr]
+        positions, counts = self._gather(csr_nodes)
+        neighbors = self.indices[positions].astype(np.int64)
+        refs = self.edge_ref[positions].astype(np.int64)
+        parents = np.repeat(csr_nodes, counts)
+        parent_scores = np.repeat(scores[in_csr], counts)
+
+        if self._pending_adj:
+            extra = [(neighbor, ref, node, score)
+                     for node, score in zip(frontier.tolist(), scores.tolist())
+                     for neighbor, ref in self._pending_adj.get(node, ())]
+            if extra:
+                extra = np.array(extra, dtype=np.float64)
+                neighbors = np.concatenate([neighbors, extra[:, 0].astype(np.int64)])
+                refs = np.concatenate([refs, extra[:, 1].astype(np.int64)])
+                parents = np.concatenate([parents, extra[:, 2].astype(np.int64)])
+                parent_scores = np.concatenate([parent_scores, extra[:, 3].astype(np.float32)])
+        return neighbors, refs, parents, parent_scores
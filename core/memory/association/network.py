@@ -10,8 +10,12 @@ import time
 import json
 import logging
 import numpy as np
-from typing import List, Dict, Any, Optional, Set, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Any, Callable, Iterator, Optional, Set, Tuple
+
+from .graph import AssociationGraph
+from .activation import SpreadingActivation
+from .tracker import ActivationTracker
+from .builder import AssociationBuilder, DEFAULT_ASSOCIATION_WEIGHTS, determine_association_type
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -22,33 +26,36 @@ class AssociationNetwork:
     负责建立、维护和查询记忆之间的关联关系
     """
     
-    def __init__(self, db_manager=None):
+    def __init__(self, db_manager=None, activation_flush_interval: float = 30.0, vector_index=None):
         """
         初始化关联网络
         
         参数:
             db_manager: 数据库管理器
+            activation_flush_interval: 关联激活时间批量写回数据库的间隔（秒）
+            vector_index: 向量索引，为新记忆构建关联时从中取候选邻居
         """
         self.db_manager = db_manager
         self.association_cache = {}  # 缓存关联关系
+        self.graph = AssociationGraph()  # 内存中的关联图，首次遍历时从数据库加载
+        self.activation = SpreadingActivation(self.graph)  # 关联图上的扩散激活
+        self.activation_tracker = None  # 关联激活时间的写后缓冲，查询路径上不写数据库
+        if db_manager:
+            self.activation_tracker = ActivationTracker(db_manager, flush_interval=activation_flush_interval)
+            self.activation_tracker.start()
         self.strength_threshold = 0.2  # 最小关联强度阈值
         self.max_associations_per_memory = 10  # 每个记忆的最大关联数
         
         # 关联类型权重
-        self.association_weights = {
-            "same_topic": 1.2,
-            "temporal_sequence": 1.1,
-            "is_related_to": 1.0,
-            "cause_effect": 1.15,
-            "contradiction": 0.8
-        }
+        self.association_weights = dict(DEFAULT_ASSOCIATION_WEIGHTS)
+        self.builder = AssociationBuilder(db_manager, vector_index, association_weights=self.association_weights)
         
         logger.info("关联网络初始化完成")
     
     def calculate_association_strength(self, memory1: Dict[str, Any], 
                                      memory2: Dict[str, Any]) -> float:
         """
-        计算两个记忆之间的关联强度
+        计算两个记忆之间的关联强度（两者都带vector时基于向量相似度）
         
         参数:
             memory1: 第一个记忆
@@ -58,106 +65,16 @@ class AssociationNetwork:
             float: 关联强度 (0-1)
         """
         try:
-            # 基础语义相似度（需要向量化器支持）
-            base_strength = 0.0
-            
-            # 简化版：基于内容的文本相似度
-            content1 = memory1.get("content", "").lower()
-            content2 = memory2.get("content", "").lower()
-            
-            # 关键词重叠度
-            words1 = set(content1.split())
-            words2 = set(content2.split())
-            
-            if len(words1) > 0 and len(words2) > 0:
-                overlap = len(words1.intersection(words2))
-                union = len(words1.union(words2))
-                base_strength = overlap / union if union > 0 else 0
-            
-            # 时间接近度加成
-            time_bonus = self._calculate_time_bonus(memory1, memory2)
-            
-            # 主题一致性加成  
-            topic_bonus = self._calculate_topic_bonus(memory1, memory2)
-            
-            # 重要性影响
-            importance_factor = (memory1.get("importance", 0.5) + 
-                               memory2.get("importance", 0.5)) / 2
-            
-            # 综合计算
-            final_strength = min(1.0, base_strength + time_bonus + topic_bonus)
-            final_strength *= (0.5 + importance_factor * 0.5)  # 重要性调节
-            
-            return max(0.0, final_strength)
+            return float(self.builder.score(memory1, [memory2])[0])
             
         except Exception as e:
             logger.error(f"计算关联强度失败: {e}")
             return 0.0
     
-    def _calculate_time_bonus(self, memory1: Dict[str, Any], 
-                            memory2: Dict[str, Any]) -> float:
-        """计算时间接近度加成"""
-        try:
-            timestamp1 = memory1.get("created_at", 0)
-            timestamp2 = memory2.get("created_at", 0)
-            
-            if timestamp1 == 0 or timestamp2 == 0:
-                return 0.0
-            
-            time_diff = abs(timestamp1 - timestamp2)
-            days_diff = time_diff / (24 * 3600)
-            
-            if days_diff <= 1:
-                return 0.2      # 同一天
-            elif days_diff <= 7:
-                return 0.1      # 同一周
-            elif days_diff <= 30:
-                return 0.05     # 同一月
-            else:
-                return 0.0      # 时间太远
-                
-        except Exception:
-            return 0.0
-    
-    def _calculate_topic_bonus(self, memory1: Dict[str, Any], 
-                             memory2: Dict[str, Any]) -> float:
-        """计算主题一致性加成"""
-        try:
-            # 检查元数据中的分类
-            meta1 = memory1.get("metadata", {})
-            meta2 = memory2.get("metadata", {})
-            
-            category1 = meta1.get("category", "")
-            category2 = meta2.get("category", "")
-            
-            if category1 and category2 and category1 == category2:
-                return 0.15  # 同类别加成
-            
-            # 检查内容中的关键概念
-            content1 = memory1.get("content", "").lower()
-            content2 = memory2.get("content", "").lower()
-            
-            # 简单的关键词检查
-            tech_keywords = ["python", "编程", "ai", "机器学习", "深度学习", "算法"]
-            life_keywords = ["天气", "散步", "电影", "朋友", "周末"]
-            work_keywords = ["项目", "团队", "公司", "会议", "工作"]
-            
-            for keywords in [tech_keywords, life_keywords, work_keywords]:
-                count1 = sum(1 for kw in keywords if kw in content1)
-                count2 = sum(1 for kw in keywords if kw in content2)
-                
-                if count1 > 0 and count2 > 0:
-                    return 0.1  # 同主题关键词加成
-            
-            return 0.0
-            
-        except Exception:
-            return 0.0
-    
     def auto_create_associations(self, memory_id: str, memory_content: Dict[str, Any],
                                existing_memories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        为新记忆自动创建关联
+        为新记忆自动创建关联（候选由调用方给出）
         
         参数:
             memory_id: 新记忆的ID
@@ -168,44 +85,11 @@ class AssociationNetwork:
             List[Dict[str, Any]]: 创建的关联列表
         """
         try:
-            associations = []
-            
-            for existing_memory in existing_memories:
-                # 跳过自己
-                if existing_memory.get("memory_id") == memory_id:
-                    continue
-                
-                # 计算关联强度
-                strength = self.calculate_association_strength(memory_content, existing_memory)
-                
-                # 只为高强度关联创建关联关系
-                if strength >= self.strength_threshold:
-                    
-                    # 确定关联类型
-                    association_type = self._determine_association_type(
-                        memory_content, existing_memory, strength
-                    )
-                    
-                    # 应用关联类型权重
-                    final_strength = min(1.0, strength * self.association_weights.get(association_type, 1.0))
-                    
-                    association = {
-                        "source_id": memory_id,
-                        "target_id": existing_memory.get("memory_id"),
-                        "association_type": association_type,
-                        "strength": final_strength,
-                        "created_at": time.time()
-                    }
-                    
-                    associations.append(association)
-            
-            # 限制关联数量，保留强度最高的
-            associations.sort(key=lambda x: x["strength"], reverse=True)
-            associations = associations[:self.max_associations_per_memory]
-            
-            # 保存到数据库
-            for assoc in associations:
-                self._save_association_to_db(assoc)
+            associations = self.builder.build(
+                memory_id, memory_content, candidates=existing_memories,
+                strength_threshold=self.strength_threshold, top_k=self.max_associations_per_memory
+            )
+            self._sync_graph(associations)
             
             logger.info(f"为记忆 {memory_id} 创建了 {len(associations)} 个关联")
             return associations
@@ -214,100 +98,108 @@ class AssociationNetwork:
             logger.error(f"自动创建关联失败: {e}")
             return []
     
+    def build_associations(self, memory_id: str, memory: Optional[Dict[str, Any]] = None,
+                           vector: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        为新记忆创建关联：候选邻居取自向量索引，一次矩阵运算打分，一个事务写入前k个
+        
+        参数:
+            memory_id: 记忆ID
+            memory: 记忆内容，None时从数据库读取
+            vector: 记忆的向量，None时从数据库读取
+            
+        返回:
+            List[Dict[str, Any]]: 创建的关联列表
+        """
+        try:
+            associations = self.builder.build(
+                memory_id, memory, vector=vector,
+                strength_threshold=self.strength_threshold, top_k=self.max_associations_per_memory
+            )
+            self._sync_graph(associations)
+            
+            logger.debug(f"为记忆 {memory_id} 创建了 {len(associations)} 个关联")
+            return associations
+            
+        except Exception as e:
+            logger.error(f"创建关联失败: {e}")
+            return []
+    
+    def _sync_graph(self, associations: List[Dict[str, Any]]):
+        """把写入成功的关联同步到已加载的关联图"""
+        if self.db_manager and self.graph.loaded:
+            for assoc in associations:
+                self.graph.upsert_edge(assoc["source_id"], assoc["target_id"], assoc["strength"],
+                                       assoc["association_type"], assoc["created_at"])
+    
     def _determine_association_type(self, memory1: Dict[str, Any], 
                                   memory2: Dict[str, Any], 
                                   strength: float) -> str:
         """确定关联类型"""
         try:
-            content1 = memory1.get("content", "").lower()
-            content2 = memory2.get("content", "").lower()
-            
-            # 检查时间序列关系
-            time1 = memory1.get("created_at", 0)
-            time2 = memory2.get("created_at", 0)
-            time_diff = abs(time1 - time2) / (24 * 3600) if time1 and time2 else 999
-            
-            if time_diff <= 2:  # 2天内
-                if any(word in content1 and word in content2 for word in ["然后", "接着", "后来", "之后"]):
-                    return "temporal_sequence"
-            
-            # 检查主题一致性
-            if strength > 0.8:
-                # 检查是否同主题
-                meta1 = memory1.get("metadata", {})
-                meta2 = memory2.get("metadata", {})
-                
-                if meta1.get("category") == meta2.get("category") and meta1.get("category"):
-                    return "same_topic"
-            
-            # 检查因果关系
-            cause_words = ["因为", "由于", "导致", "造成", "结果"]
-            if any(word in content1 or word in content2 for word in cause_words):
-                return "cause_effect"
-            
-            # 检查矛盾关系
-            contradiction_words = ["但是", "然而", "不过", "相反", "矛盾"]
-            if any(word in content1 or word in content2 for word in contradiction_words):
-                return "contradiction"
-            
-            # 默认为一般相关
-            return "is_related_to"
-            
+            return determine_association_type(memory1, memory2, strength)
         except Exception:
             return "is_related_to"
     
-    def _save_association_to_db(self, association: Dict[str, Any]) -> bool:
-        """保存关联到数据库"""
+    def _ensure_graph(self) -> bool:
+        """首次使用时从数据库加载关联图"""
+        if self.graph.loaded:
+            return True
+        if not self.db_manager:
+            return False
+        return self.graph.load(self.db_manager)
+    
+    def find_associated_memories(self, memory_ids: List[str], depth: int = 2,
+                                 max_results: int = 10, min_strength: Optional[float] = None) -> List[str]:
+        """
+        从多个记忆出发批量拓展关联记忆（一次图遍历，不逐个查询数据库）
+        
+        参数:
+            memory_ids: 种子记忆ID列表
+            depth: 拓展深度
+            max_results: 最多返回的记忆数
+            min_strength: 最小关联强度，None则使用strength_threshold
+            
+        返回:
+            List[str]: 关联记忆ID列表（不含种子），按路径强度降序
+        """
         try:
-            if not self.db_manager:
-                return False
+            if not memory_ids or not self._ensure_graph():
+                return []
             
-            # 检查关联是否已存在
-            existing = self.db_manager.query(
-                """
-                SELECT id FROM memory_association 
-                WHERE (source_key = ? AND target_key = ?) 
-                   OR (source_key = ? AND target_key = ?)
-                """,
-                (association["source_id"], association["target_id"],
-                 association["target_id"], association["source_id"])
-            )
+            min_strength = self.strength_threshold if min_strength is None else min_strength
+            results = self.graph.expand(memory_ids, depth=depth, min_strength=min_strength,
+                                        max_results=max_results)
+            self._update_association_access(memory_ids)
+            return [result["memory_id"] for result in results]
             
-            if existing:
-                # 更新现有关联
-                self.db_manager.execute_query(
-                    """
-                    UPDATE memory_association 
-                    SET strength = ?, association_type = ?, last_activated = ?
-                    WHERE id = ?
-                    """,
-                    (association["strength"], association["association_type"], 
-                     time.time(), existing[0][0])
-                )
-            else:
-                # 创建新关联
-                assoc_id = f"assoc_{int(time.time() * 1000000)}"
-                self.db_manager.execute_query(
-                    """
-                    INSERT INTO memory_association 
-                    (id, source_key, target_key, association_type, 
-                     strength, created_at, last_activated)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (assoc_id, association["source_id"], association["target_id"],
-                     association["association_type"], association["strength"],
-                     association["created_at"], association["created_at"])
-                )
-            
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+        except Exception as e:
+            logger.error(f"批量拓展关联记忆失败: {e}")
+            return []
+    
+    def activate_memories(self, seed_scores: Dict[str, float],
+                          max_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        从检索命中的记忆出发扩散激活，给所有可达记忆打分（多条路径的贡献累加）
+        
+        参数:
+            seed_scores: 种子记忆ID到检索相似度的映射
+            max_results: 最多返回的记忆数
             
-            return True
+        返回:
+            List[Tuple[str, float]]: (记忆ID, 0-1的激活值)，不含种子，按激活值降序
+        """
+        try:
+            if not seed_scores or not self._ensure_graph():
+                return []
+            
+            results = self.activation.activate(seed_scores, max_results=max_results)
+            self._update_association_access(list(seed_scores))
+            return results
             
         except Exception as e:
-            logger.error(f"保存关联到数据库失败: {e}")
-            return False
+            logger.error(f"扩散激活失败: {e}")
+            return []
     
     def get_related_memories(self, memory_id: str, depth: int = 1, 
                            min_strength: float = 0.5) -> List[Dict[str, Any]]:
@@ -323,145 +215,78 @@ class AssociationNetwork:
             List[Dict[str, Any]]: 关联记忆列表
         """
         try:
-            if depth == 1:
-                return self._get_direct_associations(memory_id, min_strength)
-            elif depth == 2:
-                return self._get_two_hop_associations(memory_id, min_strength)
-            else:
+            if depth not in (1, 2):
                 logger.warning(f"不支持的检索深度: {depth}")
                 return []
-                
-        except Exception as e:
-            logger.error(f"获取关联记忆失败: {e}")
-            return []
-    
-    def _get_direct_associations(self, memory_id: str, min_strength: float) -> List[Dict[str, Any]]:
-        """获取直接关联的记忆"""
-        try:
-            if not self.db_manager:
+            if not self._ensure_graph():
                 return []
             
-            # 查询关联关系
-            associations = self.db_manager.query(
-                """
-                SELECT ma.target_key, ma.association_type, ma.strength,
-                       m.content, m.role, m.timestamp, m.weight, m.metadata
-                FROM memory_association ma
-                JOIN memories m ON ma.target_key = m.id
-                WHERE ma.source_key = ? AND ma.strength >= ?
-                
-                UNION
-                
-                SELECT ma.source_key, ma.association_type, ma.strength,
-                       m.content, m.role, m.timestamp, m.weight, m.metadata
-                FROM memory_association ma
-                JOIN memories m ON ma.source_key = m.id
-                WHERE ma.target_key = ? AND ma.strength >= ?
-                
-                ORDER BY strength DESC
-                """,
-                (memory_id, min_strength, memory_id, min_strength)
-            )
+            results = self.graph.expand([memory_id], depth=depth, min_strength=min_strength)
+            self._update_association_access([memory_id])
+            if not results:
+                return []
             
-            # 更新访问统计
-            self._update_association_access(memory_id)
+            # 一次查询取出所有关联记忆的内容（已删除或归档的记忆不返回）
+            rows = self.db_manager.execute_named(
+                "association.memories", in_values=[result["memory_id"] for result in results]
+            ) or []
+            details = {row[0]: row for row in rows}
             
-            # 构建结果
             related_memories = []
-            for row in associations:
+            for result in results:
+                row = details.get(result["memory_id"])
+                if row is None:
+                    continue
                 try:
-                    metadata = json.loads(row[7]) if row[7] else {}
+                    metadata = json.loads(row[5]) if row[5] else {}
                 except:
                     metadata = {}
                 
-                related_memories.append({
-                    "memory_id": row[0],
-                    "association_type": row[1],
-                    "strength": row[2],
-                    "content": row[3],
-                    "source": row[4],
-                    "created_at": row[5],
-                    "importance": row[6],
+                memory = {
+                    "memory_id": result["memory_id"],
+                    "association_type": result["association_type"],
+                    "strength": result["strength"],
+                    "content": row[1],
+                    "source": row[2],
+                    "created_at": row[3],
+                    "importance": row[4],
                     "metadata": metadata,
-                    "association_path": [memory_id, row[0]]  # 记录关联路径
-                })
+                    "association_path": result["association_path"]  # 记录关联路径
+                }
+                if result["depth"] == 2:
+                    memory["is_two_hop"] = True
+                related_memories.append(memory)
             
             return related_memories
-            
-        except Exception as e:
-            logger.error(f"获取直接关联失败: {e}")
-            return []
-    
-    def _get_two_hop_associations(self, memory_id: str, min_strength: float) -> List[Dict[str, Any]]:
-        """获取二度关联的记忆"""
-        try:
-            # 先获取直接关联
-            direct_associations = self._get_direct_associations(memory_id, min_strength)
-            
-            # 获取二度关联
-            visited_ids = {memory_id}  # 避免循环
-            two_hop_memories = []
-            
-            for direct_memory in direct_associations:
-                direct_id = direct_memory["memory_id"]
-                visited_ids.add(direct_id)
                 
-                # 获取这个记忆的关联
-                indirect_associations = self._get_direct_associations(direct_id, min_strength * 0.8)
-                
-                for indirect_memory in indirect_associations:
-                    indirect_id = indirect_memory["memory_id"]
-                    
-                    # 避免重复和循环
-                    if indirect_id not in visited_ids:
-                        # 计算综合强度
-                        combined_strength = (direct_memory["strength"] * 
-                                           indirect_memory["strength"])
-                        
-                        if combined_strength >= min_strength * 0.6:  # 二度关联阈值稍低
-                            indirect_memory["strength"] = combined_strength
-                            indirect_memory["association_path"] = [
-                                memory_id, direct_id, indirect_id
-                            ]
-                            indirect_memory["is_two_hop"] = True
-                            
-                            two_hop_memories.append(indirect_memory)
-                            visited_ids.add(indirect_id)
-            
-            # 合并直接和间接关联，按强度排序
-            all_associations = direct_associations + two_hop_memories
-            all_associations.sort(key=lambda x: x["strength"], reverse=True)
-            
-            return all_associations
-            
         except Exception as e:
-            logger.error(f"获取二度关联失败: {e}")
+            logger.error(f"获取关联记忆失败: {e}")
             return []
     
-    def _update_association_access(self, memory_id: str):
-        """更新关联访问统计"""
+    def _update_association_access(self, memory_ids: List[str]):
+        """更新关联访问统计：内存中的图立即更新，数据库由激活记录定期批量写入"""
         try:
             if not self.db_manager:
                 return
             
             current_time = time.time()
-            
-            # 更新所有涉及此记忆的关联
-            self.db_manager.execute_query(
-                """
-                UPDATE memory_association 
-                SET last_activated = ?
-                WHERE source_key = ? OR target_key = ?
-                """,
-                (current_time, memory_id, memory_id)
-            )
-            
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+            self.graph.touch(memory_ids, current_time)
+            self.activation_tracker.record(memory_ids, current_time)
                 
         except Exception as e:
             logger.error(f"更新关联访问统计失败: {e}")
     
+    def flush_activations(self) -> int:
+        """立即把累积的关联激活时间写入数据库，返回写入的记忆数"""
+        if not self.activation_tracker:
+            return 0
+        return self.activation_tracker.flush()
+    
+    def close(self):
+        """写入剩余的关联激活并停止后台线程"""
+        if self.activation_tracker:
+            self.activation_tracker.shutdown()
+    
     def update_association_strength(self, source_id: str, target_id: str, 
                                   strength_delta: float = 0.01):
         """
@@ -485,9 +310,7 @@ class AssociationNetwork:
                 """,
                 (strength_delta, source_id, target_id, target_id, source_id)
             )
-            
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+            self.graph.adjust_strength(source_id, target_id, strength_delta)
                 
         except Exception as e:
             logger.error(f"更新关联强度失败: {e}")
@@ -495,7 +318,7 @@ class AssociationNetwork:
     def decay_unused_associations(self, days_threshold: int = 30, 
                                 decay_factor: float = 0.95):
         """
-        衰减长时间未使用的关联
+        衰减长时间未使用的关联，并删除强度过低的关联（分块执行到底）
         
         参数:
             days_threshold: 天数阈值
@@ -505,34 +328,140 @@ class AssociationNetwork:
             if not self.db_manager:
                 return
             
-            threshold_time = time.time() - (days_threshold * 24 * 3600)
+            decayed = sum(chunk["decayed"] for chunk in self.iter_decay(days_threshold, decay_factor))
+            pruned = sum(chunk["pruned"] for chunk in self.iter_prune())
+            self.compact_graph()
             
-            # 衰减旧关联
-            self.db_manager.execute_query(
-                """
-                UPDATE memory_association 
-                SET strength = MAX(0.1, strength * ?)
-                WHERE last_activated < ?
-                """,
-                (decay_factor, threshold_time)
-            )
+            logger.info(f"关联衰减完成: 衰减 {decayed} 条, 删除 {pruned} 条")
             
-            # 删除强度过低的关联
-            self.db_manager.execute_query(
-                """
-                DELETE FROM memory_association 
-                WHERE strength < 0.1
-                """,
-                ()
-            )
+        except Exception as e:
+            logger.error(f"关联衰减失败: {e}")
+    
+    def iter_decay(self, days_threshold: float = 30, decay_factor: float = 0.95,
+                   min_strength: float = 0.1, chunk_size: int = 500,
+                   now: Optional[float] = None, cursor: Optional[Tuple[float, str]] = None,
+                   on_chunk: Optional[Callable[[Tuple[float, str]], None]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        分块衰减长时间未激活的关联：按(last_activated, id)键集分页，每块一个事务，
+        强度乘以衰减因子（不低于min_strength），同步到已加载的关联图
+        
+        参数:
+            days_threshold: 最近激活早于此天数的关联才衰减
+            decay_factor: 衰减因子
+            min_strength: 衰减下限
+            chunk_size: 每块的关联数
+            now: 计算天数阈值的参考时间，None为当前时间（续跑时传入中断那次的开始时间）
+            cursor: 从此(last_activated, id)之后继续，None则从头开始
+            on_chunk: 每块提交前在同一事务中调用，参数为本块最后的(last_activated, id)，用于记录进度
             
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+        返回:
+            每提交一块产出 {"decayed": 本块关联数, "cursor": 本块最后的last_activated}
+        """
+        if not self.db_manager:
+            return
+        
+        # 先写入累积的激活时间，避免刚被访问的关联被衰减
+        self.flush_activations()
+        threshold_time = (time.time() if now is None else now) - days_threshold * 24 * 3600
+        cursor = (float("-inf"), "") if cursor is None else tuple(cursor)
+        
+        while True:
+            with self.db_manager.transaction():
+                rows = self.db_manager.execute_named(
+                    "maintenance.stale_associations", (threshold_time,) + cursor + (chunk_size,)
+                ) or []
+                updates = [(max(min_strength, row[3] * decay_factor), row[0]) for row in rows]
+                self.db_manager.executemany_named("maintenance.set_strength", updates)
+                if rows and on_chunk:
+                    on_chunk((rows[-1][4], rows[-1][0]))
+            if not rows:
+                return
             
-            logger.info("关联衰减完成")
+            if self.graph.loaded:
+                self.graph.set_strengths([(row[1], row[2], strength) for row, (strength, _) in zip(rows, updates)])
+            cursor = (rows[-1][4], rows[-1][0])
+            yield {"decayed": len(rows), "cursor": cursor[0]}
+            if len(rows) < chunk_size:
+                return
+    
+    def iter_prune(self, min_strength: float = 0.1, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        分块删除强度不高于阈值的关联（包括衰减到下限的关联，走强度索引，每块一个事务）
+        
+        参数:
+            min_strength: 强度阈值（应与衰减下限一致）
+            chunk_size: 每块的关联数
             
-        except Exception as e:
-            logger.error(f"关联衰减失败: {e}")
+        返回:
+            每提交一块产出 {"pruned": 本块删除数}
+        """
+        if not self.db_manager:
+            return
+        
+        while True:
+            with self.db_manager.transaction():
+                rows = self.db_manager.execute_named(
+                    "maintenance.weak_associations", (min_strength, chunk_size)
+                ) or []
+                self.db_manager.executemany_named("maintenance.delete_association", [(row[0],) for row in rows])
+            if not rows:
+                return
+            
+            if self.graph.loaded:
+                self.graph.set_strengths([(row[1], row[2], None) for row in rows])
+            yield {"pruned": len(rows)}
+            if len(rows) < chunk_size:
+                return
+    
+    def iter_rebalance(self, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        分块裁剪关联数超过max_associations_per_memory的记忆，只保留最强的关联
+        
+        关联数从内存中的关联图统计，超限的记忆逐个读取自己的关联；
+        每块处理的记忆累计删除约chunk_size条关联后提交一次。
+        
+        参数:
+            chunk_size: 每块大约删除的关联数
+            
+        返回:
+            每提交一块产出 {"trimmed": 本块删除数, "memories": 本块处理的记忆数}
+        """
+        if not self.db_manager or not self._ensure_graph():
+            return
+        
+        limit = self.max_associations_per_memory
+        degrees = self.graph.degrees()
+        overloaded = sorted(memory_id for memory_id, degree in degrees.items() if degree > limit)
+        
+        position = 0
+        while position < len(overloaded):
+            removed = []
+            graph_removed = []
+            processed = 0
+            with self.db_manager.transaction():
+                while position < len(overloaded) and len(removed) < chunk_size:
+                    memory_id = overloaded[position]
+                    position += 1
+                    processed += 1
+                    rows = self.db_manager.execute_named(
+                        "maintenance.memory_associations", (memory_id, memory_id)
+                    ) or []
+                    extra = rows[limit:]
+                    self.db_manager.executemany_named("maintenance.delete_association",
+                                                      [(row[0],) for row in extra])
+                    removed.extend(extra)
+                    # 同一对记忆的重复关联只删弱的那条时，图中合并后的关联保留
+                    kept = {frozenset(row[1:3]) for row in rows[:limit]}
+                    graph_removed.extend((row[1], row[2], None) for row in extra
+                                         if frozenset(row[1:3]) not in kept)
+            
+            self.graph.set_strengths(graph_removed)
+            yield {"trimmed": len(removed), "memories": processed}
+    
+    def compact_graph(self):
+        """维护结束后把已删除的关联从关联图中去掉"""
+        if self.graph.loaded:
+            self.graph.compact()
     
     def get_association_stats(self) -> Dict[str, Any]:
         """获取关联网络统计信息"""
@@ -575,7 +504,8 @@ class AssociationNetwork:
                     "strong": strength_stats[0],
                     "medium": strength_stats[1], 
                     "weak": strength_stats[2]
-                }
+                },
+                "activation_tracker": self.activation_tracker.get_stats() if self.activation_tracker else {}
             }
             
         except Exception as e:
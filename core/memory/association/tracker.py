@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关联激活记录 - 延迟批量写入
+读取关联时只在内存中记下被激活的记忆和时间，后台线程定期把累积的激活
+用一次executemany、一个事务写回memory_association，查询路径上不写SQLite
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ActivationTracker:
+    """
+    关联激活时间的写后缓冲
+
+    - record() 只更新内存中的 记忆ID -> 最近激活时间，立即返回
+    - 后台线程每 flush_interval 秒写入一次；累积超过 max_pending 个记忆时提前唤醒
+    - flush() 在当前线程立即写入，shutdown() 写完剩余激活后停止线程
+    """
+
+    def __init__(self, db_manager, flush_interval: float = 30.0, max_pending: int = 1000):
+        """
+        初始化激活记录
+
+        参数:
+            db_manager: 数据库管理器
+            flush_interval: 定期写入的间隔（秒）
+            max_pending: 累积的记忆数超过此值时提前写入
+        """
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 保证同一时间只有一次写入
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._worker = None
+
+        # 统计信息
+        self.stats = {
+            "recorded": 0,
+            "flushed": 0,
+            "flushes": 0,
+            "failed": 0,
+            "last_flush_ms": 0.0
+        }
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="estia-association-activation", daemon=True)
+        self._worker.start()
+        logger.debug(f"关联激活记录已启动 (写入间隔: {self.flush_interval}s)")
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive() and not self._stop_event.is_set()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def record(self, memory_ids: Iterable[str], timestamp: Optional[float] = None):
+        """
+        记录一批记忆的关联被激活（只写内存）
+
+        参数:
+            memory_ids: 被访问的记忆ID
+            timestamp: 激活时间，默认为当前时间
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for memory_id in memory_ids:
+                if self._pending.get(memory_id, 0.0) < timestamp:
+                    self._pending[memory_id] = timestamp
+                self.stats["recorded"] += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake_event.set()
+
+    def record_many(self, activations: Dict[str, float]):
+        """合并一组 记忆ID -> 激活时间（保留较新的时间）"""
+        with self._lock:
+            for memory_id, timestamp in activations.items():
+                if self._pending.get(memory_id, 0.0) < timestamp:
+                    self._pending[memory_id] = timestamp
+
+    def flush(self) -> int:
+        """
+        把累积的激活写入数据库（两个方向各一次executemany，同一个事务）
+
+        返回:
+            int: 写入的记忆数，失败时为0（激活放回缓冲，下次重试）
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending or not self.db_manager:
+                return 0
+
+            start_time = time.perf_counter()
+            rows = [(timestamp, memory_id) for memory_id, timestamp in pending.items()]
+            try:
+                with self.db_manager.transaction():
+                    self.db_manager.executemany_named("association.touch_source", rows)
+                    self.db_manager.executemany_named("association.touch_target", rows)
+            except Exception as e:
+                logger.error(f"写入关联激活时间失败: {e}")
+                self.record_many(pending)
+                self.stats["failed"] += 1
+                return 0
+
+            self.stats["flushes"] += 1
+            self.stats["flushed"] += len(rows)
+            self.stats["last_flush_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+            logger.debug(f"写入 {len(rows)} 个记忆的关联激活时间，耗时 {self.stats['last_flush_ms']}ms")
+            return len(rows)
+
+    def shutdown(self, timeout: float = 2.0):
+        """写入剩余的激活并停止后台线程"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._worker:
+            self._worker.join(timeout=timeout)
+        self.flush()
+        logger.debug(f"关联激活记录已停止 (已写入: {self.stats['flushed']})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        stats = dict(self.stats)
+        stats["pending"] = self.pending_count
+        stats["running"] = self.is_running
+        return stats
+
+    def _run(self):
+        """后台线程主循环"""
+        while not self._stop_event.is_set():
+            self._wake_event.wait(timeout=self.flush_interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            self.flush()
@@ -13,20 +13,25 @@ from datetime import datetime, timedelta
 # 设置日志
 logger = logging.getLogger("estia.memory.context")
 
+# 批量获取会话记忆/总结时的总行数上限（会话多时先截掉每个会话中较旧的记录）
+MAX_SESSION_ROWS = 200
+
 class HistoryRetriever:
     """
     历史对话检索器
     负责从数据库中获取记忆内容，聚合相关对话，提取总结
     """
     
-    def __init__(self, db_manager=None):
+    def __init__(self, db_manager=None, max_session_rows: int = MAX_SESSION_ROWS):
         """
         初始化历史检索器
         
         参数:
             db_manager: 数据库管理器实例
+            max_session_rows: 会话批量查询返回的总行数上限
         """
         self.db_manager = db_manager
+        self.max_session_rows = max_session_rows
         self.logger = logger
         
     def retrieve_memory_contents(self, memory_ids: List[str], 
@@ -98,48 +103,36 @@ class HistoryRetriever:
             return []
         
         try:
-            # 构建查询语句
-            placeholders = ','.join(['?' for _ in memory_ids])
-            query = f"""
-                SELECT id, content, type, role, session_id, timestamp, 
-                       weight, group_id, summary, last_accessed, metadata
-                FROM memories 
-                WHERE id IN ({placeholders})
-                ORDER BY timestamp DESC
-            """
-            
-            results = self.db_manager.query(query, memory_ids)
-            
-            memories = []
-            for row in results:
-                try:
-                    # 解析元数据
-                    metadata = json.loads(row[10]) if row[10] else {}
-                except:
-                    metadata = {}
-                
-                memory = {
-                    "memory_id": row[0],
-                    "content": row[1],
-                    "type": row[2],
-                    "role": row[3],
-                    "session_id": row[4] or "",
-                    "timestamp": row[5],
-                    "weight": row[6],
-                    "group_id": row[7] or "",
-                    "summary": row[8] or "",
-                    "last_accessed": row[9],
-                    "metadata": metadata,
-                    "formatted_time": datetime.fromtimestamp(row[5]).strftime('%Y-%m-%d %H:%M:%S')
-                }
-                memories.append(memory)
-            
-            return memories
+            results = self.db_manager.execute_named("history.memories_by_ids", in_values=memory_ids)
+            return [self._row_to_memory(row) for row in results]
             
         except Exception as e:
             self.logger.error(f"根据ID获取记忆失败: {e}")
             return []
     
+    def _row_to_memory(self, row) -> Dict[str, Any]:
+        """把memories表的一行（_MEMORY_COLUMNS顺序）转换为记忆字典"""
+        try:
+            # 解析元数据
+            metadata = json.loads(row[10]) if row[10] else {}
+        except:
+            metadata = {}
+        
+        return {
+            "memory_id": row[0],
+            "content": row[1],
+            "type": row[2],
+            "role": row[3],
+            "session_id": row[4] or "",
+            "timestamp": row[5],
+            "weight": row[6],
+            "group_id": row[7] or "",
+            "summary": row[8] or "",
+            "last_accessed": row[9],
+            "metadata": metadata,
+            "formatted_time": datetime.fromtimestamp(row[5]).strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
     def _group_memories_by_group_id(self, memories: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """按group_id分组记忆"""
         groups = {}
@@ -175,29 +168,24 @@ class HistoryRetriever:
     
     def _get_session_dialogues(self, memories: List[Dict[str, Any]], 
                               max_dialogues: int = 10) -> Dict[str, Dict[str, Any]]:
-        """获取会话相关的对话"""
+        """获取会话相关的对话（所有会话一次查询）"""
         sessions = {}
         
         # 收集所有session_id
-        session_ids = set()
-        for memory in memories:
-            session_id = memory.get("session_id", "")
-            if session_id:
-                session_ids.add(session_id)
-        
+        session_ids = self._collect_ids(memories, "session_id")
         if not session_ids:
             return sessions
         
         try:
-            # 为每个session获取完整对话
+            session_memories = self._get_session_windows(session_ids, max_dialogues)
             for session_id in session_ids:
-                session_memories = self._get_session_memories(session_id, max_dialogues)
-                if session_memories:
+                memories_in_session = session_memories.get(session_id)
+                if memories_in_session:
                     sessions[session_id] = {
                         "session_id": session_id,
-                        "memories": session_memories,
-                        "count": len(session_memories),
-                        "dialogue_pairs": self._extract_dialogue_pairs(session_memories)
+                        "memories": memories_in_session,
+                        "count": len(memories_in_session),
+                        "dialogue_pairs": self._extract_dialogue_pairs(memories_in_session)
                     }
             
             return sessions
@@ -206,50 +194,34 @@ class HistoryRetriever:
             self.logger.error(f"获取会话对话失败: {e}")
             return {}
     
-    def _get_session_memories(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """获取特定会话的记忆"""
-        try:
-            query = """
-                SELECT id, content, type, role, session_id, timestamp, 
-                       weight, group_id, summary, last_accessed, metadata
-                FROM memories 
-                WHERE session_id = ? AND type != 'summary'
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """
-            
-            results = self.db_manager.query(query, (session_id, limit))
-            
-            memories = []
-            for row in results:
-                try:
-                    metadata = json.loads(row[10]) if row[10] else {}
-                except:
-                    metadata = {}
-                
-                memory = {
-                    "memory_id": row[0],
-                    "content": row[1],
-                    "type": row[2],
-                    "role": row[3],
-                    "session_id": row[4],
-                    "timestamp": row[5],
-                    "weight": row[6],
-                    "group_id": row[7] or "",
-                    "summary": row[8] or "",
-                    "last_accessed": row[9],
-                    "metadata": metadata,
-                    "formatted_time": datetime.fromtimestamp(row[5]).strftime('%Y-%m-%d %H:%M:%S')
-                }
-                memories.append(memory)
-            
-            # 按时间正序排列（最早的在前）
-            memories.reverse()
-            return memories
+    def _get_session_windows(self, session_ids: List[str], limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        用窗口函数一次取出每个会话最近的limit条记忆
+        
+        参数:
+            session_ids: 会话ID列表
+            limit: 每个会话的记忆条数
             
-        except Exception as e:
-            self.logger.error(f"获取会话记忆失败: {e}")
-            return []
+        返回:
+            Dict[str, List]: 会话ID到记忆列表（按时间正序）的映射
+        """
+        results = self.db_manager.execute_named(
+            "history.session_windows", in_values=session_ids,
+            trailing=(limit, self.max_session_rows)
+        )
+        if results is None:
+            return {}
+        
+        windows = {}
+        for row in results:
+            memory = self._row_to_memory(row)
+            windows.setdefault(row[4], []).append((row[5], row[11], memory))
+        
+        # 按时间正序排列（最早的在前），同一时间戳按写入顺序
+        return {
+            session_id: [memory for _, _, memory in sorted(rows, key=lambda item: (item[0], item[1]))]
+            for session_id, rows in windows.items()
+        }
     
     def _extract_dialogue_pairs(self, session_memories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """从会话记忆中提取对话对"""
@@ -305,15 +277,18 @@ class HistoryRetriever:
                         "source": "memory_field"
                     })
             
-            # 3. 获取相关的summary记忆
-            related_summaries = self._get_related_summaries(primary_memories)
+            # 3. 获取相关的summary记忆（分组总结只查询一次，第4步复用）
+            group_summaries = self._get_group_summaries(
+                self._collect_ids(primary_memories, "group_id") + 
+                [group_id for group_id in grouped_memories if group_id]
+            )
+            related_summaries = self._get_related_summaries(primary_memories, group_summaries)
             summaries["direct_summaries"].extend(related_summaries)
             
             # 4. 按组聚合总结
-            for group_id, group_data in grouped_memories.items():
-                group_summaries = self._get_group_summaries(group_id)
-                if group_summaries:
-                    summaries["group_summaries"][group_id] = group_summaries
+            for group_id in grouped_memories:
+                if group_summaries.get(group_id):
+                    summaries["group_summaries"][group_id] = group_summaries[group_id]
             
             return summaries
             
@@ -321,33 +296,38 @@ class HistoryRetriever:
             self.logger.error(f"提取总结失败: {e}")
             return summaries
     
-    def _get_related_summaries(self, memories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """获取相关的总结记忆"""
+    def _get_related_summaries(self, memories: List[Dict[str, Any]],
+                               group_summaries: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[Dict[str, Any]]:
+        """
+        获取相关的总结记忆
+        
+        参数:
+            memories: 记忆列表
+            group_summaries: 已查询的分组总结（为None时查询）
+            
+        返回:
+            List: 会话总结和分组总结
+        """
         if not memories:
             return []
         
         try:
             # 获取所有相关的session_id和group_id
-            session_ids = set()
-            group_ids = set()
-            
-            for memory in memories:
-                if memory.get("session_id"):
-                    session_ids.add(memory["session_id"])
-                if memory.get("group_id"):
-                    group_ids.add(memory["group_id"])
+            session_ids = self._collect_ids(memories, "session_id")
+            group_ids = self._collect_ids(memories, "group_id")
             
             summaries = []
             
             # 按session_id查找总结
+            session_summaries = self._get_session_summaries(session_ids)
             for session_id in session_ids:
-                session_summaries = self._get_session_summaries(session_id)
-                summaries.extend(session_summaries)
+                summaries.extend(session_summaries.get(session_id, []))
             
             # 按group_id查找总结
+            if group_summaries is None:
+                group_summaries = self._get_group_summaries(group_ids)
             for group_id in group_ids:
-                group_summaries = self._get_group_summaries(group_id)
-                summaries.extend(group_summaries)
+                summaries.extend(group_summaries.get(group_id, []))
             
             return summaries
             
@@ -355,66 +335,71 @@ class HistoryRetriever:
             self.logger.error(f"获取相关总结失败: {e}")
             return []
     
-    def _get_session_summaries(self, session_id: str) -> List[Dict[str, Any]]:
-        """获取特定会话的总结"""
+    def _get_session_summaries(self, session_ids: List[str], limit: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        """一次查询获取多个会话最近的总结"""
+        if not session_ids:
+            return {}
+        
         try:
-            query = """
-                SELECT content, timestamp, weight, metadata
-                FROM memories 
-                WHERE session_id = ? AND type = 'summary'
-                ORDER BY timestamp DESC
-                LIMIT 5
-            """
-            
-            results = self.db_manager.query(query, (session_id,))
+            results = self.db_manager.execute_named(
+                "history.session_summaries", in_values=session_ids,
+                trailing=(limit, self.max_session_rows)
+            )
             
-            summaries = []
-            for row in results:
-                summaries.append({
-                    "content": row[0],
-                    "timestamp": row[1],
-                    "formatted_time": datetime.fromtimestamp(row[1]).strftime('%Y-%m-%d %H:%M:%S'),
-                    "weight": row[2],
-                    "source": f"session_{session_id}"
+            summaries = {}
+            for row in results or []:
+                summaries.setdefault(row[0], []).append({
+                    "content": row[1],
+                    "timestamp": row[2],
+                    "formatted_time": datetime.fromtimestamp(row[2]).strftime('%Y-%m-%d %H:%M:%S'),
+                    "weight": row[3],
+                    "source": f"session_{row[0]}"
                 })
             
+            # 每个会话内按时间倒序
+            for session_summaries in summaries.values():
+                session_summaries.sort(key=lambda summary: summary["timestamp"], reverse=True)
+            
             return summaries
             
         except Exception as e:
             self.logger.error(f"获取会话总结失败: {e}")
-            return []
+            return {}
     
-    def _get_group_summaries(self, group_id: str) -> List[Dict[str, Any]]:
-        """获取特定分组的总结"""
+    def _get_group_summaries(self, group_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """一次查询获取多个分组的总结"""
+        group_ids = list(dict.fromkeys(group_ids))
+        if not group_ids:
+            return {}
+        
         try:
             # 从memory_group表获取分组总结
-            query = """
-                SELECT summary, time_start, time_end, score, topic
-                FROM memory_group 
-                WHERE group_id = ?
-            """
+            results = self.db_manager.execute_named("history.group_summaries", in_values=group_ids)
             
-            results = self.db_manager.query(query, (group_id,))
-            
-            summaries = []
-            for row in results:
-                if row[0]:  # summary不为空
-                    summaries.append({
-                        "content": row[0],
-                        "topic": row[4] or "未分类",
+            summaries = {}
+            for row in results or []:
+                if row[1]:  # summary不为空
+                    summaries.setdefault(row[0], []).append({
+                        "content": row[1],
+                        "topic": row[5] or "未分类",
                         "time_span": {
-                            "start": datetime.fromtimestamp(row[1]).strftime('%Y-%m-%d %H:%M:%S') if row[1] else "",
-                            "end": datetime.fromtimestamp(row[2]).strftime('%Y-%m-%d %H:%M:%S') if row[2] else ""
+                            "start": datetime.fromtimestamp(row[2]).strftime('%Y-%m-%d %H:%M:%S') if row[2] else "",
+                            "end": datetime.fromtimestamp(row[3]).strftime('%Y-%m-%d %H:%M:%S') if row[3] else ""
                         },
-                        "score": row[3],
-                        "source": f"group_{group_id}"
+                        "score": row[4],
+                        "source": f"group_{row[0]}"
                     })
             
             return summaries
             
         except Exception as e:
             self.logger.error(f"获取分组总结失败: {e}")
-            return []
+            return {}
+    
+    @staticmethod
+    def _collect_ids(memories: List[Dict[str, Any]], field: str) -> List[str]:
+        """按出现顺序收集记忆中不重复的非空字段值"""
+        return list(dict.fromkeys(memory[field] for memory in memories if memory.get(field)))
     
     def _empty_result(self) -> Dict[str, Any]:
         """返回空结果"""
@@ -0,0 +1,225 @@
+"""
+向量化微批调度器 - 合并并发的单条编码请求
+调用方各自提交一条文本并等待自己的结果，
+后台线程在 max_latency 时间窗口内（或凑满 max_batch_size 条）合并成一次前向计算
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+
+# 尝试导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.embedding.batcher")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.embedding.batcher")
+
+
+@dataclass
+class EmbeddingRequest:
+    """一条待编码的文本"""
+    text: str
+    weight: float
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class EmbeddingBatcher:
+    """
+    微批向量化调度器
+
+    - submit() 立即返回Future，encode() 阻塞等待结果
+    - 后台线程收到第一条请求后最多等待 max_latency 秒凑批，批内相同文本只编码一次
+    - 编码失败时该批所有调用方都会收到异常
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str], List[float]], np.ndarray],
+                 max_batch_size: int = 32, max_latency: float = 0.01,
+                 max_queue_size: int = 1024):
+        """
+        初始化微批调度器
+
+        参数:
+            encode_fn: 批量编码回调，签名为 encode_fn(texts, weights) -> np.ndarray (n, dim)
+            max_batch_size: 单批最大文本数
+            max_latency: 凑批的最长等待时间（秒）
+            max_queue_size: 等待队列上限
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._worker = None
+
+        # 统计信息
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "encoded": 0,           # 实际送入模型的文本数（去重后）
+            "deduplicated": 0,      # 批内重复而省掉的编码次数
+            "failed": 0,
+            "encode_time": 0.0,     # 模型编码的累计耗时
+            "total_wait": 0.0,      # 提交到开始编码的累计等待
+            "max_wait": 0.0,
+            "max_batch_size": 0
+        }
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """启动后台编码线程"""
+        with self._start_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stop_event.clear()
+            self._worker = threading.Thread(target=self._run, name="estia-embedding-batcher", daemon=True)
+            self._worker.start()
+        logger.info(f"向量化微批调度器已启动 (批大小: {self.max_batch_size}, "
+                    f"等待窗口: {self.max_latency * 1000:.0f}ms)")
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive() and not self._stop_event.is_set()
+
+    def submit(self, text: str, weight: float = 1.0) -> Future:
+        """
+        提交一条文本
+
+        参数:
+            text: 待编码文本
+            weight: 记忆重要性权重（传给缓存）
+
+        返回:
+            Future: 结果为该文本的向量
+        """
+        if not self.is_running:
+            self.start()
+        request = EmbeddingRequest(text=text, weight=weight)
+        self._queue.put(request)
+        with self._stats_lock:
+            self.stats["requests"] += 1
+        return request.future
+
+    def encode(self, text: str, weight: float = 1.0, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        提交一条文本并等待结果
+
+        参数:
+            text: 待编码文本
+            weight: 记忆重要性权重
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        返回:
+            np.ndarray: 文本向量
+        """
+        return self.submit(text, weight).result(timeout=timeout)
+
+    def shutdown(self, timeout: float = 2.0):
+        """停止后台线程，队列中剩余的请求在当前线程编码完"""
+        self._stop_event.set()
+        if self._worker:
+            self._worker.join(timeout=timeout)
+
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(leftovers), self.max_batch_size):
+            self._process(leftovers[start:start + self.max_batch_size])
+
+        logger.info(f"向量化微批调度器已停止 (请求: {self.stats['requests']}, 批次: {self.stats['batches']})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计信息"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        served = stats["requests"] - self._queue.qsize()
+        encode_time = stats.pop("encode_time")
+        total_wait = stats.pop("total_wait")
+        stats["queue_depth"] = self._queue.qsize()
+        stats["running"] = self.is_running
+        stats["avg_batch_size"] = round(served / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["throughput_per_sec"] = round(stats["encoded"] / encode_time, 2) if encode_time > 0 else 0.0
+        stats["avg_wait_ms"] = round(total_wait / served * 1000, 2) if served > 0 else 0.0
+        stats["max_wait_ms"] = round(stats.pop("max_wait") * 1000, 2)
+        return stats
+
+    def _run(self):
+        """后台编码线程主循环"""
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = first.enqueued_at + self.max_latency
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                try:
+                    if remaining <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch: List[EmbeddingRequest]):
+        """编码一批请求并分发结果"""
+        started_at = time.time()
+
+        # 批内相同文本只编码一次，权重取最大值
+        positions: Dict[str, int] = {}
+        texts: List[str] = []
+        weights: List[float] = []
+        for request in batch:
+            index = positions.get(request.text)
+            if index is None:
+                positions[request.text] = len(texts)
+                texts.append(request.text)
+                weights.append(request.weight)
+            else:
+                weights[index] = max(weights[index], request.weight)
+
+        try:
+            vectors = np.asarray(self.encode_fn(texts, weights))
+            error = None
+        except Exception as e:
+            logger.error(f"批量向量化失败: {e}")
+            vectors, error = None, e
+
+        finished_at = time.time()
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+            self.stats["encode_time"] += finished_at - started_at
+            if error is None:
+                self.stats["encoded"] += len(texts)
+                self.stats["deduplicated"] += len(batch) - len(texts)
+            else:
+                self.stats["failed"] += len(batch)
+            for request in batch:
+                wait = started_at - request.enqueued_at
+                self.stats["total_wait"] += wait
+                self.stats["max_wait"] = max(self.stats["max_wait"], wait)
+
+        for request in batch:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(vectors[positions[request.text]])
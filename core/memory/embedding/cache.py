@@ -4,12 +4,12 @@
 """
 
 import os
-import json
 import hashlib
 import numpy as np
 import time
 import re
 import logging
+import threading
 from typing import Dict, Any, List, Optional, Tuple, Union
 from collections import OrderedDict
 from pathlib import Path
@@ -23,18 +23,24 @@ except ImportError:
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("estia.memory.embedding.cache")
 
+from core.memory.embedding.vector_arena import VectorArena, open_arenas, import_legacy_npy
+from core.memory.embedding.cache_index import CacheIndexStore, LazyMetadata, LazyKeywordIndex
+
 class EnhancedMemoryCache:
     """
     增强版记忆缓存系统，融合了旧系统的优秀特性：
-    1. 多级缓存策略：热缓存 + 温缓存 + 持久化缓存
+    1. 多级缓存策略：热缓存 + 温缓存 + 持久化缓存（内存映射的向量存储区）
     2. 关键词缓存：加速文本检索
     3. 智能缓存提升机制：基于访问频率和重要性自动调整缓存级别
+
+    缓存会被批量向量化线程和写入线程同时访问，公开方法和定期维护都在同一把锁内执行
     """
     
     def __init__(self, cache_dir: Optional[str] = None, hot_capacity: int = 200, 
                  warm_capacity: int = 1000, persist: bool = True,
                  cache_file: str = "embedding_cache.json",
-                 max_memory_size: Optional[int] = None):  # 向后兼容参数
+                 max_memory_size: Optional[int] = None,  # 向后兼容参数
+                 max_persistent_entries: int = 100000):
         """
         初始化增强版缓存系统
         
@@ -43,8 +49,9 @@ class EnhancedMemoryCache:
             hot_capacity: 热缓存容量，存储最常访问和最重要的记忆
             warm_capacity: 温缓存容量，存储次常访问的记忆
             persist: 是否启用持久化缓存
-            cache_file: 缓存索引文件名
+            cache_file: 旧版JSON缓存索引文件名（存在时导入到同名.db后不再使用）
             max_memory_size: 向后兼容参数，如果提供则用作总缓存大小
+            max_persistent_entries: 持久化缓存最多保留的向量数，超过后按LRU驱逐
         """
         # 向后兼容性处理
         if max_memory_size is not None:
@@ -55,6 +62,7 @@ class EnhancedMemoryCache:
         self.hot_capacity = hot_capacity
         self.warm_capacity = warm_capacity
         self.persist = persist
+        self.max_persistent_entries = max_persistent_entries
         
         # 设置缓存目录
         if cache_dir is None:
@@ -67,16 +75,26 @@ class EnhancedMemoryCache:
         os.makedirs(self.cache_dir, exist_ok=True)
         
         self.cache_file = os.path.join(self.cache_dir, cache_file)
+        self.index_db_path = os.path.splitext(self.cache_file)[0] + ".db"
+        
+        # 保护热/温缓存、元数据、关键词索引和向量存储区的访问
+        self._lock = threading.RLock()
         
         # 三级缓存系统
         self.hot_cache = OrderedDict()    # 热缓存：最常访问和最重要的记忆
         self.warm_cache = OrderedDict()   # 温缓存：次常访问的记忆
         
-        # 关键词缓存：存储关键词到记忆键的映射，用于加速检索
-        self.keyword_cache = {}
+        # 缓存索引存储（SQLite），不持久化时使用内存数据库
+        self.index_store = CacheIndexStore(self.index_db_path if persist else ":memory:")
+        
+        # 关键词缓存：存储关键词到记忆键的映射，用于加速检索（按需加载）
+        self.keyword_cache = LazyKeywordIndex(self.index_store)
+        
+        # 记忆元数据：用于智能缓存提升决策（按需加载，只回写修改过的条目）
+        self.memory_metadata = LazyMetadata(self.index_store)  # key -> {access_count, last_accessed, weight, created_at}
         
-        # 记忆元数据：用于智能缓存提升决策
-        self.memory_metadata = {}  # key -> {access_count, last_accessed, weight, created_at}
+        # 持久化向量存储区：维度 -> VectorArena（切换模型后不同维度的向量互不干扰）
+        self.arenas: Dict[int, VectorArena] = {}
         
         # 统计信息
         self.stats = {
@@ -98,6 +116,7 @@ class EnhancedMemoryCache:
         # 加载持久化缓存
         if persist:
             self._load_cache()
+            self._open_arenas()
             
         logger.info(f"增强版缓存系统初始化完成 - 热缓存:{hot_capacity}, 温缓存:{warm_capacity}")
     
@@ -116,55 +135,56 @@ class EnhancedMemoryCache:
         返回:
             Optional[np.ndarray]: 缓存的向量或None
         """
-        cache_key = self._text_to_key(text)
-        current_time = time.time()
-        
-        # 1. 检查热缓存
-        if cache_key in self.hot_cache:
-            vector = self.hot_cache.pop(cache_key)
-            self.hot_cache[cache_key] = vector  # 移至最近使用位置
-            
-            self._update_access_metadata(cache_key, memory_weight, current_time)
-            self.stats["hot_hits"] += 1
-            logger.debug(f"热缓存命中: {text[:30]}...")
-            return vector
-        
-        # 2. 检查温缓存
-        if cache_key in self.warm_cache:
-            vector = self.warm_cache.pop(cache_key)
-            
-            self._update_access_metadata(cache_key, memory_weight, current_time)
+        with self._lock:
+            cache_key = self._text_to_key(text)
+            current_time = time.time()
+        
+            # 1. 检查热缓存
+            if cache_key in self.hot_cache:
+                vector = self.hot_cache.pop(cache_key)
+                self.hot_cache[cache_key] = vector  # 移至最近使用位置
             
-            # 检查是否应该提升到热缓存
-            if self._should_promote_to_hot(cache_key):
-                self._promote_to_hot_cache(cache_key, vector)
-                self.stats["promotions"] += 1
-                logger.debug(f"记忆提升至热缓存: {text[:30]}...")
-            else:
-                self.warm_cache[cache_key] = vector  # 保留在温缓存
-            
-            self.stats["warm_hits"] += 1
-            return vector
+                self._update_access_metadata(cache_key, memory_weight, current_time)
+                self.stats["hot_hits"] += 1
+                logger.debug(f"热缓存命中: {text[:30]}...")
+                return vector
         
-        # 3. 检查持久化缓存
-        if self.persist:
-            vector = self._load_from_persistent_cache(cache_key)
-            if vector is not None:
+            # 2. 检查温缓存
+            if cache_key in self.warm_cache:
+                vector = self.warm_cache.pop(cache_key)
+            
                 self._update_access_metadata(cache_key, memory_weight, current_time)
-                
-                # 决定添加到哪个缓存级别
+            
+                # 检查是否应该提升到热缓存
                 if self._should_promote_to_hot(cache_key):
                     self._promote_to_hot_cache(cache_key, vector)
+                    self.stats["promotions"] += 1
+                    logger.debug(f"记忆提升至热缓存: {text[:30]}...")
                 else:
-                    self._add_to_warm_cache(cache_key, vector)
-                
-                self.stats["persistent_hits"] += 1
-                logger.debug(f"持久化缓存命中: {text[:30]}...")
+                    self.warm_cache[cache_key] = vector  # 保留在温缓存
+            
+                self.stats["warm_hits"] += 1
                 return vector
         
-        # 4. 缓存未命中
-        self.stats["misses"] += 1
-        return None
+            # 3. 检查持久化缓存
+            if self.persist:
+                vector = self._load_from_persistent_cache(cache_key)
+                if vector is not None:
+                    self._update_access_metadata(cache_key, memory_weight, current_time)
+                
+                    # 决定添加到哪个缓存级别
+                    if self._should_promote_to_hot(cache_key):
+                        self._promote_to_hot_cache(cache_key, vector)
+                    else:
+                        self._add_to_warm_cache(cache_key, vector)
+                
+                    self.stats["persistent_hits"] += 1
+                    logger.debug(f"持久化缓存命中: {text[:30]}...")
+                    return vector
+        
+            # 4. 缓存未命中
+            self.stats["misses"] += 1
+            return None
     
     def put(self, text: str, vector: np.ndarray, memory_weight: float = 1.0) -> None:
         """
@@ -175,38 +195,39 @@ class EnhancedMemoryCache:
             vector: 对应的向量表示
             memory_weight: 记忆重要性权重
         """
-        cache_key = self._text_to_key(text)
-        current_time = time.time()
-        
-        # 初始化元数据
-        if cache_key not in self.memory_metadata:
-            self.memory_metadata[cache_key] = {
-                "access_count": 1,
-                "last_accessed": current_time,
-                "weight": memory_weight,
-                "created_at": current_time,
-                "text_preview": text[:100]  # 保存文本预览用于调试
-            }
-        
-        # 根据重要性决定初始缓存级别
-        if memory_weight >= self.importance_threshold:
-            # 重要记忆直接进入热缓存
-            self._promote_to_hot_cache(cache_key, vector)
-            logger.debug(f"重要记忆直接进入热缓存: {text[:30]}... (权重: {memory_weight})")
-        else:
-            # 普通记忆进入温缓存
-            self._add_to_warm_cache(cache_key, vector)
+        with self._lock:
+            cache_key = self._text_to_key(text)
+            current_time = time.time()
+        
+            # 初始化元数据
+            if cache_key not in self.memory_metadata:
+                self.memory_metadata[cache_key] = {
+                    "access_count": 1,
+                    "last_accessed": current_time,
+                    "weight": memory_weight,
+                    "created_at": current_time,
+                    "text_preview": text[:100]  # 保存文本预览用于调试
+                }
+        
+            # 根据重要性决定初始缓存级别
+            if memory_weight >= self.importance_threshold:
+                # 重要记忆直接进入热缓存
+                self._promote_to_hot_cache(cache_key, vector)
+                logger.debug(f"重要记忆直接进入热缓存: {text[:30]}... (权重: {memory_weight})")
+            else:
+                # 普通记忆进入温缓存
+                self._add_to_warm_cache(cache_key, vector)
         
-        # 更新关键词缓存
-        self._update_keyword_cache(cache_key, text)
+            # 更新关键词缓存
+            self._update_keyword_cache(cache_key, text)
         
-        # 保存到持久化缓存
-        if self.persist:
-            self._save_to_persistent_cache(cache_key, vector, text)
+            # 保存到持久化缓存
+            if self.persist:
+                self._save_to_persistent_cache(cache_key, vector, text)
         
-        # 定期维护缓存
-        if current_time - self.stats["last_maintenance"] > self.maintenance_interval:
-            self._maintain_cache()
+            # 定期维护缓存
+            if current_time - self.stats["last_maintenance"] > self.maintenance_interval:
+                self._maintain_cache()
     
     def search_by_content(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
@@ -219,57 +240,59 @@ class EnhancedMemoryCache:
         返回:
             List[Dict]: 匹配的记忆列表，包含向量和元数据
         """
-        # 1. 先尝试关键词缓存
-        keywords = self._extract_keywords(query)
-        candidates = set()
-        
-        for keyword in keywords:
-            if keyword in self.keyword_cache:
-                self.stats["keyword_hits"] += 1
-                candidates.update(self.keyword_cache[keyword])
-        
-        # 2. 计算相关性分数
-        results = []
-        query_words = set(query.lower().split())
-        
-        # 搜索热缓存
-        for cache_key in self.hot_cache:
-            if not candidates or cache_key in candidates:
-                score = self._calculate_relevance_score(cache_key, query, query_words)
-                if score > 0:
-                    results.append({
-                        "key": cache_key,
-                        "vector": self.hot_cache[cache_key],
-                        "score": score,
-                        "cache_level": "hot",
-                        "metadata": self.memory_metadata.get(cache_key, {})
-                    })
-        
-        # 如果结果不够，搜索温缓存
-        if len(results) < limit:
-            for cache_key in self.warm_cache:
+        with self._lock:
+            # 1. 先尝试关键词缓存
+            keywords = self._extract_keywords(query)
+            candidates = set()
+        
+            for keyword in keywords:
+                cache_keys = self.keyword_cache.get(keyword)
+                if cache_keys:
+                    self.stats["keyword_hits"] += 1
+                    candidates.update(cache_keys)
+        
+            # 2. 计算相关性分数
+            results = []
+            query_words = set(query.lower().split())
+        
+            # 搜索热缓存
+            for cache_key in self.hot_cache:
                 if not candidates or cache_key in candidates:
                     score = self._calculate_relevance_score(cache_key, query, query_words)
                     if score > 0:
                         results.append({
                             "key": cache_key,
-                            "vector": self.warm_cache[cache_key],
+                            "vector": self.hot_cache[cache_key],
                             "score": score,
-                            "cache_level": "warm",
+                            "cache_level": "hot",
                             "metadata": self.memory_metadata.get(cache_key, {})
                         })
         
-        # 按相关性排序
-        results.sort(key=lambda x: x["score"], reverse=True)
-        
-        # 更新访问统计
-        for result in results[:limit]:
-            cache_key = result["key"]
-            self._update_access_metadata(cache_key, 
-                                       result["metadata"].get("weight", 1.0), 
-                                       time.time())
-        
-        return results[:limit]
+            # 如果结果不够，搜索温缓存
+            if len(results) < limit:
+                for cache_key in self.warm_cache:
+                    if not candidates or cache_key in candidates:
+                        score = self._calculate_relevance_score(cache_key, query, query_words)
+                        if score > 0:
+                            results.append({
+                                "key": cache_key,
+                                "vector": self.warm_cache[cache_key],
+                                "score": score,
+                                "cache_level": "warm",
+                                "metadata": self.memory_metadata.get(cache_key, {})
+                            })
+        
+            # 按相关性排序
+            results.sort(key=lambda x: x["score"], reverse=True)
+        
+            # 更新访问统计
+            for result in results[:limit]:
+                cache_key = result["key"]
+                self._update_access_metadata(cache_key, 
+                                           result["metadata"].get("weight", 1.0), 
+                                           time.time())
+        
+            return results[:limit]
     
     def _should_promote_to_hot(self, cache_key: str) -> bool:
         """判断是否应该提升到热缓存"""
@@ -318,6 +341,7 @@ class EnhancedMemoryCache:
         metadata["access_count"] = metadata.get("access_count", 0) + 1
         metadata["last_accessed"] = current_time
         metadata["weight"] = max(metadata.get("weight", 1.0), weight)  # 保持最高权重
+        self.memory_metadata.touch(cache_key)
     
     def _extract_keywords(self, text: str) -> List[str]:
         """从文本中提取关键词"""
@@ -339,9 +363,7 @@ class EnhancedMemoryCache:
         keywords = self._extract_keywords(text)
         
         for keyword in keywords:
-            if keyword not in self.keyword_cache:
-                self.keyword_cache[keyword] = set()
-            self.keyword_cache[keyword].add(cache_key)
+            self.keyword_cache.add(keyword, cache_key)
     
     def _calculate_relevance_score(self, cache_key: str, query: str, query_words: set) -> float:
         """计算记忆与查询的相关性分数"""
@@ -371,12 +393,33 @@ class EnhancedMemoryCache:
         
         return score
     
+    def _open_arenas(self) -> None:
+        """打开已有的向量存储区，并导入旧版的单文件.npy缓存"""
+        try:
+            self.arenas = open_arenas(self.cache_dir, max_entries=self.max_persistent_entries)
+            imported, _ = import_legacy_npy(self.cache_dir, self._arena_for_dim)
+            if imported:
+                for arena in self.arenas.values():
+                    arena.flush()
+        except Exception as e:
+            logger.error(f"打开持久化向量存储区失败: {e}")
+    
+    def _arena_for_dim(self, vector_dim: int) -> VectorArena:
+        """获取指定维度的向量存储区，不存在则创建"""
+        arena = self.arenas.get(vector_dim)
+        if arena is None:
+            arena = VectorArena(os.path.join(self.cache_dir, f"embedding_arena_{vector_dim}"),
+                                vector_dim, max_entries=self.max_persistent_entries)
+            self.arenas[vector_dim] = arena
+        return arena
+    
     def _load_from_persistent_cache(self, cache_key: str) -> Optional[np.ndarray]:
-        """从持久化缓存加载向量"""
+        """从持久化缓存加载向量（内存映射视图，零拷贝）"""
         try:
-            vector_file = os.path.join(self.cache_dir, f"{cache_key}.npy")
-            if os.path.exists(vector_file):
-                return np.load(vector_file)
+            for arena in self.arenas.values():
+                vector = arena.get(cache_key)
+                if vector is not None:
+                    return vector
         except Exception as e:
             logger.error(f"加载持久化缓存失败: {e}")
         return None
@@ -384,32 +427,50 @@ class EnhancedMemoryCache:
     def _save_to_persistent_cache(self, cache_key: str, vector: np.ndarray, text: str) -> None:
         """保存到持久化缓存"""
         try:
-            vector_file = os.path.join(self.cache_dir, f"{cache_key}.npy")
-            np.save(vector_file, vector)
+            vector = np.asarray(vector)
+            self._arena_for_dim(vector.size).put(cache_key, vector)
             
             # 更新索引
             self._update_cache_index(cache_key, text)
         except Exception as e:
             logger.error(f"保存持久化缓存失败: {e}")
     
+    def _compact_arenas(self) -> None:
+        """压缩碎片过多的向量存储区"""
+        for arena in self.arenas.values():
+            if arena.fragmentation < 0.5:
+                continue
+            # 压缩会移动槽位，先把内存缓存中引用存储区的视图换成独立副本
+            for cache in (self.hot_cache, self.warm_cache):
+                for key, vector in cache.items():
+                    if isinstance(vector, np.memmap):
+                        cache[key] = np.array(vector)
+            arena.maybe_compact()
+    
+    def flush(self) -> None:
+        """将缓存索引和向量存储区写回磁盘"""
+        with self._lock:
+            if not self.persist:
+                return
+            self._save_cache_index()
+            for arena in self.arenas.values():
+                arena.flush()
+    
+    def close(self) -> None:
+        """保存并关闭缓存索引和向量存储区"""
+        with self._lock:
+            self.flush()
+            for arena in self.arenas.values():
+                arena.close()
+            self.index_store.close()
+    
     def _load_cache(self) -> None:
-        """加载缓存索引和元数据"""
+        """加载缓存索引（元数据和关键词按需读取，这里只导入旧版JSON索引）"""
         if os.path.exists(self.cache_file):
             try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                self.memory_metadata = data.get("memory_metadata", {})
-                self.keyword_cache = data.get("keyword_cache", {})
-                
-                # 将set转换回来（JSON不支持set）
-                for keyword in self.keyword_cache:
-                    self.keyword_cache[keyword] = set(self.keyword_cache[keyword])
-                    
-                logger.info(f"加载缓存索引: {len(self.memory_metadata)} 个记忆, "
-                          f"{len(self.keyword_cache)} 个关键词")
+                self.index_store.import_json(self.cache_file)
             except Exception as e:
-                logger.error(f"加载缓存索引失败: {e}")
+                logger.error(f"导入旧版缓存索引失败: {e}")
     
     def _update_cache_index(self, cache_key: str, text: str) -> None:
         """更新缓存索引"""
@@ -420,130 +481,104 @@ class EnhancedMemoryCache:
             self.stats["last_save"] = current_time
     
     def _save_cache_index(self) -> None:
-        """保存缓存索引"""
+        """保存缓存索引（只写入变化过的元数据和新增的关键词）"""
         try:
-            # 将set转换为list（JSON不支持set）
-            keyword_cache_serializable = {}
-            for keyword, cache_keys in self.keyword_cache.items():
-                keyword_cache_serializable[keyword] = list(cache_keys)
-            
-            data = {
-                "memory_metadata": self.memory_metadata,
-                "keyword_cache": keyword_cache_serializable,
-                "stats": self.stats
-            }
-            
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-                
+            written = self.memory_metadata.flush()
+            written += self.keyword_cache.flush()
+            if written:
+                logger.debug(f"缓存索引增量保存: {written} 条")
         except Exception as e:
             logger.error(f"保存缓存索引失败: {e}")
     
     def _maintain_cache(self) -> None:
         """定期维护缓存：清理过期项、优化缓存分布"""
-        current_time = time.time()
-        
-        # 1. 清理长时间未访问的关键词缓存
-        expired_keywords = []
-        for keyword, cache_keys in self.keyword_cache.items():
-            # 检查是否还有有效的缓存键
-            valid_keys = set()
-            for cache_key in cache_keys:
-                if (cache_key in self.hot_cache or 
-                    cache_key in self.warm_cache or
-                    cache_key in self.memory_metadata):
-                    valid_keys.add(cache_key)
-            
-            if valid_keys:
-                self.keyword_cache[keyword] = valid_keys
-            else:
-                expired_keywords.append(keyword)
-        
-        # 删除过期关键词
-        for keyword in expired_keywords:
-            del self.keyword_cache[keyword]
-        
-        # 2. 清理过期元数据
-        expired_metadata = []
-        for cache_key in self.memory_metadata:
-            metadata = self.memory_metadata[cache_key]
-            last_accessed = metadata.get("last_accessed", 0)
-            
-            # 30天未访问且不在任何缓存中
-            if (current_time - last_accessed > 30 * 24 * 3600 and
-                cache_key not in self.hot_cache and
-                cache_key not in self.warm_cache):
-                expired_metadata.append(cache_key)
-        
-        for cache_key in expired_metadata:
-            del self.memory_metadata[cache_key]
-        
-        # 3. 保存更新
-        self._save_cache_index()
-        
-        self.stats["last_maintenance"] = current_time
-        logger.info(f"缓存维护完成: 清理 {len(expired_keywords)} 个关键词, "
-                   f"{len(expired_metadata)} 个过期元数据")
+        with self._lock:
+            current_time = time.time()
+        
+            # 1. 清理过期元数据：30天未访问且不在任何缓存中
+            expired_metadata = [
+                cache_key for cache_key in self.memory_metadata.keys_accessed_before(current_time - 30 * 24 * 3600)
+                if cache_key not in self.hot_cache and cache_key not in self.warm_cache
+            ]
+            for cache_key in expired_metadata:
+                del self.memory_metadata[cache_key]
+            self.memory_metadata.flush()
+        
+            # 2. 清理指向已失效记忆的关键词缓存
+            expired_keywords = self.keyword_cache.prune()
+        
+            # 3. 压缩向量存储区并保存更新
+            self._compact_arenas()
+            self.flush()
+        
+            self.stats["last_maintenance"] = current_time
+            logger.info(f"缓存维护完成: 清理 {expired_keywords} 个关键词, "
+                       f"{len(expired_metadata)} 个过期元数据")
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        total_requests = (self.stats["hot_hits"] + self.stats["warm_hits"] + 
-                         self.stats["persistent_hits"] + self.stats["misses"])
-        
-        hit_rate = 0.0
-        if total_requests > 0:
-            total_hits = (self.stats["hot_hits"] + self.stats["warm_hits"] + 
-                         self.stats["persistent_hits"])
-            hit_rate = total_hits / total_requests
-        
-        return {
-            "cache_levels": {
-                "hot_cache_size": len(self.hot_cache),
-                "warm_cache_size": len(self.warm_cache),
-                "hot_capacity": self.hot_capacity,
-                "warm_capacity": self.warm_capacity
-            },
-            "hit_statistics": {
-                "hot_hits": self.stats["hot_hits"],
-                "warm_hits": self.stats["warm_hits"],
-                "persistent_hits": self.stats["persistent_hits"],
-                "keyword_hits": self.stats["keyword_hits"],
-                "misses": self.stats["misses"],
-                "total_requests": total_requests,
-                "hit_rate": f"{hit_rate:.2%}"
-            },
-            "cache_management": {
-                "promotions": self.stats["promotions"],
-                "evictions": self.stats["evictions"],
-                "keyword_count": len(self.keyword_cache),
-                "metadata_count": len(self.memory_metadata)
-            },
-            "maintenance": {
-                "last_maintenance": time.strftime("%Y-%m-%d %H:%M:%S", 
-                                                 time.localtime(self.stats["last_maintenance"]))
+        with self._lock:
+            total_requests = (self.stats["hot_hits"] + self.stats["warm_hits"] + 
+                             self.stats["persistent_hits"] + self.stats["misses"])
+        
+            hit_rate = 0.0
+            if total_requests > 0:
+                total_hits = (self.stats["hot_hits"] + self.stats["warm_hits"] + 
+                             self.stats["persistent_hits"])
+                hit_rate = total_hits / total_requests
+        
+            return {
+                "cache_levels": {
+                    "hot_cache_size": len(self.hot_cache),
+                    "warm_cache_size": len(self.warm_cache),
+                    "hot_capacity": self.hot_capacity,
+                    "warm_capacity": self.warm_capacity
+                },
+                "hit_statistics": {
+                    "hot_hits": self.stats["hot_hits"],
+                    "warm_hits": self.stats["warm_hits"],
+                    "persistent_hits": self.stats["persistent_hits"],
+                    "keyword_hits": self.stats["keyword_hits"],
+                    "misses": self.stats["misses"],
+                    "total_requests": total_requests,
+                    "hit_rate": f"{hit_rate:.2%}"
+                },
+                "cache_management": {
+                    "promotions": self.stats["promotions"],
+                    "evictions": self.stats["evictions"],
+                    "keyword_count": len(self.keyword_cache),
+                    "metadata_count": len(self.memory_metadata)
+                },
+                "persistent_storage": {
+                    str(dim): arena.get_stats() for dim, arena in self.arenas.items()
+                },
+                "maintenance": {
+                    "last_maintenance": time.strftime("%Y-%m-%d %H:%M:%S", 
+                                                     time.localtime(self.stats["last_maintenance"]))
+                }
             }
-        }
     
     def clear_all_cache(self) -> None:
         """清空所有缓存"""
-        self.hot_cache.clear()
-        self.warm_cache.clear()
-        self.keyword_cache.clear()
-        self.memory_metadata.clear()
-        
-        # 重置统计
-        self.stats = {
-            "hot_hits": 0,
-            "warm_hits": 0,
-            "keyword_hits": 0,
-            "persistent_hits": 0,
-            "misses": 0,
-            "promotions": 0,
-            "evictions": 0,
-            "last_maintenance": time.time()
-        }
+        with self._lock:
+            self.hot_cache.clear()
+            self.warm_cache.clear()
+            self.keyword_cache.clear()
+            self.memory_metadata.clear()
+        
+            # 重置统计
+            self.stats = {
+                "hot_hits": 0,
+                "warm_hits": 0,
+                "keyword_hits": 0,
+                "persistent_hits": 0,
+                "misses": 0,
+                "promotions": 0,
+                "evictions": 0,
+                "last_maintenance": time.time()
+            }
         
-        logger.info("所有缓存已清空")
+            logger.info("所有缓存已清空")
 
 
 # 保持向后兼容性的别名
@@ -0,0 +1,348 @@
+"""
+缓存索引存储 - 用SQLite保存缓存元数据和关键词倒排索引
+取代每分钟整体重写一次的embedding_cache.json：
+只写入变化过的条目，启动时不加载全部数据，按需从数据库读取
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+# 尝试导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.embedding.cache")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.embedding.cache")
+
+METADATA_FIELDS = ("access_count", "last_accessed", "weight", "created_at", "text_preview")
+
+
+class CacheIndexStore:
+    """缓存索引的SQLite存储（独立的数据库文件，不占用记忆数据库连接）"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化缓存索引存储
+
+        参数:
+            db_path: 数据库文件路径，":memory:" 表示不持久化
+        """
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache_metadata (
+                key TEXT PRIMARY KEY,
+                access_count INTEGER NOT NULL DEFAULT 0,
+                last_accessed REAL,
+                weight REAL NOT NULL DEFAULT 1.0,
+                created_at REAL,
+                text_preview TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_metadata_last_accessed
+                ON cache_metadata(last_accessed);
+            CREATE TABLE IF NOT EXISTS cache_keywords (
+                keyword TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (keyword, key)
+            ) WITHOUT ROWID;
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def _row_to_metadata(row) -> Dict[str, Any]:
+        metadata = dict(zip(METADATA_FIELDS, row))
+        if metadata["text_preview"] is None:
+            del metadata["text_preview"]
+        return metadata
+
+    # ---------- 元数据 ----------
+
+    def get_metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT access_count, last_accessed, weight, created_at, text_preview "
+                "FROM cache_metadata WHERE key = ?", (key,)
+            ).fetchone()
+        return self._row_to_metadata(row) if row else None
+
+    def count_metadata(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM cache_metadata").fetchone()[0]
+
+    def metadata_keys(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT key FROM cache_metadata")]
+
+    def keys_accessed_before(self, timestamp: float) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT key FROM cache_metadata WHERE COALESCE(last_accessed, 0) < ?", (timestamp,)
+            )]
+
+    def upsert_metadata(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        rows = [
+            (key, int(meta.get("access_count", 0)), meta.get("last_accessed"),
+             float(meta.get("weight", 1.0)), meta.get("created_at"), meta.get("text_preview"))
+            for key, meta in items
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            self.conn.executemany("""
+                INSERT INTO cache_metadata (key, access_count, last_accessed, weight, created_at, text_preview)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    access_count = excluded.access_count,
+                    last_accessed = excluded.last_accessed,
+                    weight = excluded.weight,
+                    created_at = COALESCE(cache_metadata.created_at, excluded.created_at),
+                    text_preview = COALESCE(excluded.text_preview, cache_metadata.text_preview)
+            """, rows)
+            self.conn.commit()
+        return len(rows)
+
+    def delete_metadata(self, keys: Iterable[str]) -> int:
+        rows = [(key,) for key in keys]
+        if not rows:
+            return 0
+        with self._lock:
+            self.conn.executemany("DELETE FROM cache_metadata WHERE key = ?", rows)
+            self.conn.commit()
+        return len(rows)
+
+    # ---------- 关键词 ----------
+
+    def keys_for_keyword(self, keyword: str) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self.conn.execute(
+                "SELECT key FROM cache_keywords WHERE keyword = ?", (keyword,)
+            )}
+
+    def count_keywords(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(DISTINCT keyword) FROM cache_keywords").fetchone()[0]
+
+    def add_keywords(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        rows = list(pairs)
+        if not rows:
+            return 0
+        with self._lock:
+            self.conn.executemany("INSERT OR IGNORE INTO cache_keywords (keyword, key) VALUES (?, ?)", rows)
+            self.conn.commit()
+        return len(rows)
+
+    def prune_keywords(self) -> int:
+        """删除指向已不存在元数据的关键词条目，返回被完全移除的关键词数量"""
+        with self._lock:
+            before = self.count_keywords()
+            self.conn.execute(
+                "DELETE FROM cache_keywords WHERE key NOT IN (SELECT key FROM cache_metadata)"
+            )
+            self.conn.commit()
+            return before - self.count_keywords()
+
+    # ---------- 维护 ----------
+
+    def clear_metadata(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache_metadata")
+            self.conn.commit()
+
+    def clear_keywords(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache_keywords")
+            self.conn.commit()
+
+    def import_json(self, json_path: str) -> int:
+        """
+        导入旧版embedding_cache.json，成功后重命名为 .migrated
+
+        参数:
+            json_path: 旧索引文件路径
+
+        返回:
+            int: 导入的元数据条数
+        """
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"读取旧缓存索引失败: {e}")
+            return 0
+
+        metadata = data.get("memory_metadata", {})
+        keywords = data.get("keyword_cache", {})
+        self.upsert_metadata(metadata.items())
+        self.add_keywords((keyword, key) for keyword, keys in keywords.items() for key in keys)
+        os.replace(json_path, json_path + ".migrated")
+        logger.info(f"已将旧缓存索引导入SQLite: {len(metadata)} 个记忆, {len(keywords)} 个关键词")
+        return len(metadata)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class LazyMetadata(MutableMapping):
+    """
+    按需加载的缓存元数据映射
+
+    读取时从SQLite加载并驻留内存；修改后标记为脏，flush()时只写入脏条目。
+    原地修改元数据字典后需要调用touch()标记
+    """
+
+    def __init__(self, store: CacheIndexStore, max_resident: int = 20000):
+        self._store = store
+        self._max_resident = max_resident
+        self._resident: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        metadata = self._resident.get(key)
+        if metadata is not None:
+            return metadata
+        if key in self._deleted:
+            raise KeyError(key)
+        metadata = self._store.get_metadata(key)
+        if metadata is None:
+            raise KeyError(key)
+        self._resident[key] = metadata
+        return metadata
+
+    def __setitem__(self, key: str, value: Dict[str, Any]):
+        self._resident[key] = value
+        self._dirty.add(key)
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self._resident.pop(key, None)
+        self._dirty.discard(key)
+        self._deleted.add(key)
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        self.flush()
+        return iter(self._store.metadata_keys())
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._store.count_metadata()
+
+    def touch(self, key: str):
+        """标记原地修改过的条目"""
+        if key in self._resident:
+            self._dirty.add(key)
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty) + len(self._deleted)
+
+    def keys_accessed_before(self, timestamp: float) -> List[str]:
+        self.flush()
+        return self._store.keys_accessed_before(timestamp)
+
+    def flush(self) -> int:
+        """
+        写入脏条目和删除
+
+        返回:
+            int: 写入的条目数
+        """
+        if not self._dirty and not self._deleted:
+            return 0
+        written = self._store.upsert_metadata((key, self._resident[key]) for key in self._dirty
+                                              if key in self._resident)
+        written += self._store.delete_metadata(self._deleted)
+        self._dirty.clear()
+        self._deleted.clear()
+
+        # 驻留条目过多时释放（此时全部已落盘）
+        if len(self._resident) > self._max_resident:
+            self._resident.clear()
+        return written
+
+    def clear(self):
+        self._resident.clear()
+        self._dirty.clear()
+        self._deleted.clear()
+        self._store.clear_metadata()
+
+
+class LazyKeywordIndex:
+    """按需加载的关键词倒排索引：关键词 -> 缓存键集合"""
+
+    def __init__(self, store: CacheIndexStore, max_resident: int = 5000):
+        self._store = store
+        self._max_resident = max_resident
+        self._resident: Dict[str, Set[str]] = {}
+        self._pending: List[Tuple[str, str]] = []
+
+    def add(self, keyword: str, cache_key: str):
+        keys = self._resident.get(keyword)
+        if keys is not None:
+            if cache_key in keys:
+                return
+            keys.add(cache_key)
+        self._pending.append((keyword, cache_key))
+
+    def get(self, keyword: str) -> Optional[Set[str]]:
+        """获取关键词对应的缓存键集合，没有则返回None"""
+        keys = self._resident.get(keyword)
+        if keys is None:
+            keys = self._store.keys_for_keyword(keyword)
+            keys.update(key for kw, key in self._pending if kw == keyword)
+            if len(self._resident) >= self._max_resident:
+                self._resident.clear()
+            self._resident[keyword] = keys
+        return keys or None
+
+    def __contains__(self, keyword: str) -> bool:
+        return self.get(keyword) is not None
+
+    def __getitem__(self, keyword: str) -> Set[str]:
+        keys = self.get(keyword)
+        if keys is None:
+            raise KeyError(keyword)
+        return keys
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._store.count_keywords()
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        pending, self._pending = self._pending, []
+        return self._store.add_keywords(pending)
+
+    def prune(self) -> int:
+        """删除指向已失效缓存键的条目"""
+        self.flush()
+        self._resident.clear()
+        return self._store.prune_keywords()
+
+    def clear(self):
+        self._resident.clear()
+        self._pending = []
+        self._store.clear_keywords()
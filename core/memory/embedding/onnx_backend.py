@@ -0,0 +1,152 @@
+"""
+ONNX Runtime向量化后端
+加载由 scripts/export_onnx_model.py 导出的模型（可选int8量化），
+池化和归一化方式与原sentence-transformers模型一致，生成的向量可直接用于现有索引
+"""
+
+import os
+import json
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+# 尝试导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.embedding.onnx")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.embedding.onnx")
+
+CONFIG_FILE = "estia_onnx.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+POOLING_MODES = ("lasttoken", "mean", "cls")
+
+
+def default_onnx_dir(model_cache_dir: str, model_name: str) -> str:
+    """导出模型的默认目录：<模型缓存目录>/onnx/<组织>__<模型名>"""
+    return os.path.join(model_cache_dir, "onnx", model_name.replace("/", "__"))
+
+
+def pool_embeddings(hidden_states: np.ndarray, attention_mask: np.ndarray,
+                    pooling: str = "mean", normalize: bool = True) -> np.ndarray:
+    """
+    将token级隐藏状态池化为句向量
+
+    参数:
+        hidden_states: (batch, seq_len, hidden) 隐藏状态
+        attention_mask: (batch, seq_len) 注意力掩码
+        pooling: 池化方式，lasttoken / mean / cls
+        normalize: 是否做L2归一化
+
+    返回:
+        np.ndarray: (batch, hidden) 句向量
+    """
+    mask = attention_mask.astype(np.float32)
+    if pooling == "lasttoken":
+        # 取每行最后一个有效token，兼容左填充和右填充
+        positions = np.arange(mask.shape[1])[None, :]
+        last = np.where(mask > 0, positions, -1).max(axis=1)
+        embeddings = hidden_states[np.arange(hidden_states.shape[0]), np.maximum(last, 0)]
+    elif pooling == "cls":
+        embeddings = hidden_states[:, 0]
+    elif pooling == "mean":
+        summed = (hidden_states * mask[:, :, None]).sum(axis=1)
+        embeddings = summed / np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+    else:
+        raise ValueError(f"不支持的池化方式: {pooling}")
+
+    embeddings = embeddings.astype(np.float32)
+    if normalize:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.clip(norms, 1e-12, None)
+    return embeddings
+
+
+class OnnxEmbeddingModel:
+    """基于onnxruntime的句向量模型，接口与SentenceTransformer的常用部分一致"""
+
+    def __init__(self, model_dir: str, prefer_quantized: bool = True,
+                 num_threads: Optional[int] = None):
+        """
+        加载导出的ONNX模型
+
+        参数:
+            model_dir: 导出目录（包含estia_onnx.json、分词器和.onnx文件）
+            prefer_quantized: 存在int8量化模型时优先使用
+            num_threads: onnxruntime的线程数，None表示自动
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        config_path = os.path.join(model_dir, CONFIG_FILE)
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(f"未找到ONNX模型配置: {config_path}，请先运行 scripts/export_onnx_model.py")
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        self.pooling = self.config.get("pooling", "mean")
+        self.normalize = self.config.get("normalize", True)
+        self.max_length = self.config.get("max_length", 512)
+        self.dimension = self.config["dimension"]
+
+        model_file = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        if not (prefer_quantized and os.path.exists(model_file)):
+            model_file = os.path.join(model_dir, MODEL_FILE)
+        self.model_file = model_file
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_file, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        logger.info(f"✅ ONNX模型加载完成: {os.path.basename(model_file)} "
+                    f"(池化: {self.pooling}, 维度: {self.dimension})")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        编码文本
+
+        参数:
+            texts: 文本列表
+            batch_size: 批处理大小
+
+        返回:
+            np.ndarray: (n, dimension) 句向量
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        # 按长度排序后分批，减少填充
+        order = np.argsort([len(text) for text in texts])
+        results = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            indices = order[start:start + batch_size]
+            results[indices] = self._encode_batch([texts[i] for i in indices])
+        return results
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True,
+                                 max_length=self.max_length, return_tensors="np")
+        input_ids = encoded["input_ids"].astype(np.int64)
+        attention_mask = encoded["attention_mask"].astype(np.int64)
+
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = encoded.get("token_type_ids", np.zeros_like(input_ids)).astype(np.int64)
+        if "position_ids" in self.input_names:
+            feed["position_ids"] = np.maximum(np.cumsum(attention_mask, axis=1) - 1, 0)
+        feed = {name: value for name, value in feed.items() if name in self.input_names}
+
+        hidden_states = self.session.run(None, feed)[0]
+        return pool_embeddings(hidden_states, attention_mask, self.pooling, self.normalize)
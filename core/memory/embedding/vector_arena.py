@@ -0,0 +1,484 @@
+"""
+向量存储区 - 持久化缓存的向量后端
+所有向量顺序写入一个float32数据文件（np.memmap映射），配合紧凑的 哈希 -> 槽位 二进制索引，
+取代每个文本一个.npy文件的方式：查找零拷贝，冷启动只需读取一个索引文件
+"""
+
+import os
+import time
+import struct
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# 尝试导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.embedding.arena")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.embedding.arena")
+
+# 索引文件格式:
+#   文件头: magic(4s) + version(H) + vector_dim(I) + used_slots(I) + generation(I)
+#   记录:   digest(32s) + slot(i, -1表示删除) + last_access(d)
+# 写入时只追加记录，flush()时重写为只包含有效记录的紧凑文件
+# generation是当前数据文件的代数，压缩时写入下一代文件，不覆盖仍被映射的旧文件
+INDEX_MAGIC = b"EVAR"
+INDEX_VERSION = 2
+HEADER_STRUCT = struct.Struct("<4sHIII")
+LEGACY_HEADER_STRUCT = struct.Struct("<4sHII")  # 版本1，没有generation字段
+RECORD_STRUCT = struct.Struct("<32sid")
+DELETED_SLOT = -1
+
+
+class VectorArena:
+    """
+    单一维度的向量存储区
+
+    - 槽位只追加不复用：驱逐只删除索引项，被get()返回的视图在compact()之前始终有效
+    - 废弃槽位占比过高时由compact()把有效向量拷贝到下一代数据文件并切换过去，
+      旧文件在没有映射引用后删除（Windows上不能替换或删除仍被映射的文件）
+    - 有效条目超过max_entries时按最近访问时间驱逐
+    """
+
+    def __init__(self, path_prefix: str, vector_dim: int, max_entries: int = 100000,
+                 initial_capacity: int = 1024):
+        """
+        初始化向量存储区
+
+        参数:
+            path_prefix: 文件前缀，生成 <prefix>.f32（压缩后为 <prefix>.<代数>.f32）数据文件和 <prefix>.idx 索引文件
+            vector_dim: 向量维度
+            max_entries: 最多保留的向量数，超过后按LRU驱逐
+            initial_capacity: 数据文件初始槽位数
+        """
+        self.path_prefix = path_prefix
+        self.index_path = path_prefix + ".idx"
+        self.generation = 0
+        self.vector_dim = vector_dim
+        self.max_entries = max_entries
+        self.initial_capacity = initial_capacity
+
+        self._lock = threading.RLock()
+        self._slots: Dict[bytes, int] = {}         # 哈希 -> 槽位
+        self._last_access: Dict[bytes, float] = {}  # 哈希 -> 最近访问时间（用于LRU驱逐）
+        self._used_slots = 0                       # 已分配的槽位数（包括废弃槽位）
+        self._capacity = 0
+        self._data = None
+        self._index_file = None
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "compactions": 0
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self._load_index()
+        self._open_data(max(self._used_slots, initial_capacity))
+        self._remove_stale_generations()
+
+    @property
+    def data_path(self) -> str:
+        """当前代数的数据文件路径"""
+        return self._data_path_for(self.generation)
+
+    def _data_path_for(self, generation: int) -> str:
+        if generation == 0:
+            return self.path_prefix + ".f32"
+        return f"{self.path_prefix}.{generation}.f32"
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        """缓存键（sha256十六进制）转换为32字节摘要"""
+        return bytes.fromhex(key)
+
+    # ---------- 读写接口 ----------
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: str) -> bool:
+        return self._digest(key) in self._slots
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        获取向量（零拷贝，返回内存映射上的只读视图）
+
+        参数:
+            key: 缓存键
+
+        返回:
+            Optional[np.ndarray]: 向量视图，不存在时返回None
+        """
+        digest = self._digest(key)
+        # 与put()/_grow()/compact()互斥：扩展和压缩期间_data会被重新映射
+        with self._lock:
+            slot = self._slots.get(digest)
+            if slot is None:
+                self.stats["misses"] += 1
+                return None
+            self._last_access[digest] = time.time()
+            self.stats["hits"] += 1
+            view = self._data[slot]
+        view.flags.writeable = False
+        return view
+
+    def put(self, key: str, vector: np.ndarray) -> bool:
+        """
+        写入向量，已存在的键直接返回
+
+        参数:
+            key: 缓存键
+            vector: 向量，长度必须等于vector_dim
+
+        返回:
+            bool: 是否写入成功
+        """
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.vector_dim:
+            logger.debug(f"向量维度 {vector.shape[0]} 与存储区维度 {self.vector_dim} 不符")
+            return False
+
+        digest = self._digest(key)
+        with self._lock:
+            if digest in self._slots:
+                self._last_access[digest] = time.time()
+                return True
+
+            if len(self._slots) >= self.max_entries:
+                self.evict(max(1, self.max_entries // 10))
+
+            if self._used_slots >= self._capacity:
+                self._grow(self._capacity * 2)
+
+            slot = self._used_slots
+            self._data[slot] = vector
+            self._used_slots += 1
+            now = time.time()
+            self._slots[digest] = slot
+            self._last_access[digest] = now
+            self._append_record(digest, slot, now)
+            self.stats["writes"] += 1
+        return True
+
+    def delete(self, key: str) -> bool:
+        """删除向量（只删除索引项，槽位在compact()时回收）"""
+        digest = self._digest(key)
+        with self._lock:
+            if self._slots.pop(digest, None) is None:
+                return False
+            self._last_access.pop(digest, None)
+            self._append_record(digest, DELETED_SLOT, 0.0)
+        return True
+
+    def evict(self, count: int) -> int:
+        """
+        按最近访问时间驱逐向量
+
+        参数:
+            count: 驱逐数量
+
+        返回:
+            int: 实际驱逐数量
+        """
+        with self._lock:
+            victims = sorted(self._last_access.items(), key=lambda item: item[1])[:count]
+            for digest, _ in victims:
+                self._slots.pop(digest, None)
+                self._last_access.pop(digest, None)
+                self._append_record(digest, DELETED_SLOT, 0.0)
+            self.stats["evictions"] += len(victims)
+        if victims:
+            logger.debug(f"向量存储区驱逐 {len(victims)} 个最久未访问的向量")
+        return len(victims)
+
+    # ---------- 维护 ----------
+
+    @property
+    def fragmentation(self) -> float:
+        """废弃槽位占已分配槽位的比例"""
+        if self._used_slots == 0:
+            return 0.0
+        return 1.0 - len(self._slots) / self._used_slots
+
+    def maybe_compact(self, threshold: float = 0.5) -> bool:
+        """废弃槽位比例超过阈值时压缩"""
+        if self._used_slots > self.initial_capacity and self.fragmentation >= threshold:
+            return self.compact()
+        return False
+
+    def compact(self) -> bool:
+        """
+        压缩存储区：有效向量按访问时间顺序写入下一代数据文件，重写索引后切换过去
+
+        旧文件不会被覆盖，之前get()返回的视图继续指向旧文件中的原始数据；
+        索引重写前中断时仍使用旧文件，下次打开时清理未完成的新文件
+
+        返回:
+            bool: 是否成功
+        """
+        with self._lock:
+            try:
+                order = sorted(self._slots.items(), key=lambda item: self._last_access.get(item[0], 0.0))
+                capacity = max(self.initial_capacity, len(order))
+                new_path = self._data_path_for(self.generation + 1)
+                compacted = np.memmap(new_path, dtype=np.float32, mode="w+",
+                                      shape=(capacity, self.vector_dim))
+                new_slots = {}
+                for new_slot, (digest, old_slot) in enumerate(order):
+                    compacted[new_slot] = self._data[old_slot]
+                    new_slots[digest] = new_slot
+                compacted.flush()
+                del compacted
+            except Exception as e:
+                logger.error(f"压缩向量存储区失败: {e}")
+                self._remove_file(self._data_path_for(self.generation + 1))
+                return False
+
+            # 索引重写完成后新文件才生效
+            old_path = self.data_path
+            reclaimed = self._used_slots - len(new_slots)
+            self._close_data()
+            self.generation += 1
+            self._slots = new_slots
+            self._used_slots = len(new_slots)
+            self._open_data(capacity)
+            self._rewrite_index()
+            self._remove_file(old_path)
+            self.stats["compactions"] += 1
+        logger.info(f"向量存储区压缩完成，回收 {reclaimed} 个槽位，保留 {len(new_slots)} 个向量")
+        return True
+
+    def flush(self):
+        """将数据写回磁盘，并把索引重写为紧凑格式"""
+        with self._lock:
+            if self._data is not None:
+                self._data.flush()
+            self._rewrite_index()
+
+    def close(self):
+        """刷新并关闭文件"""
+        with self._lock:
+            self.flush()
+            self._close_index_file()
+            self._close_data()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储区统计信息"""
+        stats = dict(self.stats)
+        stats.update({
+            "vector_dim": self.vector_dim,
+            "entries": len(self._slots),
+            "used_slots": self._used_slots,
+            "capacity": self._capacity,
+            "generation": self.generation,
+            "fragmentation": round(self.fragmentation, 3),
+            "data_bytes": self._capacity * self.vector_dim * 4
+        })
+        return stats
+
+    # ---------- 文件操作 ----------
+
+    def _open_data(self, capacity: int):
+        """映射数据文件，必要时扩展到capacity个槽位"""
+        capacity = max(capacity, 1)
+        row_bytes = self.vector_dim * 4
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if size < capacity * row_bytes:
+            # 只扩展文件长度，已映射的区域不受影响
+            with open(self.data_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        else:
+            capacity = size // row_bytes
+        self._data = np.memmap(self.data_path, dtype=np.float32, mode="r+",
+                               shape=(capacity, self.vector_dim))
+        self._capacity = capacity
+
+    def _close_data(self):
+        if self._data is not None:
+            self._data.flush()
+            # 不主动关闭mmap：get()返回的视图可能仍引用映射，显式关闭会让这些视图访问已解除的内存；
+            # 最后一个引用释放后由垃圾回收解除映射
+            self._data = None
+
+    def _grow(self, capacity: int):
+        """扩展数据文件；旧映射不关闭，已返回的视图仍然有效"""
+        with self._lock:
+            self._data.flush()
+            self._data = None
+            self._open_data(capacity)
+        logger.debug(f"向量存储区扩展到 {capacity} 个槽位")
+
+    def _remove_file(self, path: str) -> bool:
+        """删除不再使用的数据文件；仍被映射（Windows）时保留，下次打开时再清理"""
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            return True
+        except OSError as e:
+            logger.debug(f"暂时无法删除旧数据文件 {path}: {e}")
+            return False
+
+    def _remove_stale_generations(self):
+        """清理非当前代数的数据文件（已切换走的旧文件和中断压缩留下的新文件）"""
+        directory = os.path.dirname(os.path.abspath(self.path_prefix))
+        base = os.path.basename(self.path_prefix)
+        for name in os.listdir(directory):
+            if not (name.startswith(base + ".") and name.endswith(".f32")):
+                continue
+            middle = name[len(base) + 1:-len(".f32")]
+            if middle == "":
+                generation = 0
+            elif middle.isdigit():
+                generation = int(middle)
+            else:
+                continue
+            if generation != self.generation:
+                self._remove_file(os.path.join(directory, name))
+
+    def _append_record(self, digest: bytes, slot: int, last_access: float):
+        """向索引文件追加一条记录"""
+        if self._index_file is None:
+            is_new = not os.path.exists(self.index_path) or os.path.getsize(self.index_path) == 0
+            self._index_file = open(self.index_path, "ab")
+            if is_new:
+                self._index_file.write(HEADER_STRUCT.pack(INDEX_MAGIC, INDEX_VERSION, self.vector_dim, 0,
+                                                          self.generation))
+        self._index_file.write(RECORD_STRUCT.pack(digest, slot, last_access))
+        self._index_file.flush()
+
+    def _close_index_file(self):
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def _rewrite_index(self):
+        """将当前有效记录写成紧凑的索引文件"""
+        self._close_index_file()
+        buffer = bytearray(HEADER_STRUCT.pack(INDEX_MAGIC, INDEX_VERSION, self.vector_dim,
+                                              self._used_slots, self.generation))
+        for digest, slot in self._slots.items():
+            buffer += RECORD_STRUCT.pack(digest, slot, self._last_access.get(digest, 0.0))
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer)
+        os.replace(tmp_path, self.index_path)
+
+    def _load_index(self):
+        """读取索引文件，按顺序应用追加记录，末尾不完整的记录被忽略"""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            if len(data) < LEGACY_HEADER_STRUCT.size:
+                return
+            magic, version, vector_dim, used_slots = LEGACY_HEADER_STRUCT.unpack_from(data, 0)
+            if version == 1:
+                # 版本1的数据文件就是第0代
+                header_size, generation = LEGACY_HEADER_STRUCT.size, 0
+            elif version == INDEX_VERSION and len(data) >= HEADER_STRUCT.size:
+                header_size, generation = HEADER_STRUCT.size, HEADER_STRUCT.unpack_from(data, 0)[4]
+            else:
+                header_size, generation = 0, None
+            if magic != INDEX_MAGIC or generation is None or vector_dim != self.vector_dim:
+                logger.warning(f"向量存储区索引格式不匹配，忽略: {self.index_path}")
+                return
+            self.generation = generation
+
+            record_count = (len(data) - header_size) // RECORD_STRUCT.size
+            max_slot = used_slots - 1
+            for digest, slot, last_access in RECORD_STRUCT.iter_unpack(
+                    data[header_size:header_size + record_count * RECORD_STRUCT.size]):
+                if slot == DELETED_SLOT:
+                    self._slots.pop(digest, None)
+                    self._last_access.pop(digest, None)
+                else:
+                    self._slots[digest] = slot
+                    self._last_access[digest] = last_access
+                    max_slot = max(max_slot, slot)
+            self._used_slots = max_slot + 1
+
+            # 数据文件比索引短（写入中断）时丢弃越界的记录
+            row_bytes = self.vector_dim * 4
+            data_rows = os.path.getsize(self.data_path) // row_bytes if os.path.exists(self.data_path) else 0
+            if self._used_slots > data_rows:
+                self._slots = {d: s for d, s in self._slots.items() if s < data_rows}
+                self._last_access = {d: t for d, t in self._last_access.items() if d in self._slots}
+                self._used_slots = data_rows
+
+            logger.info(f"加载向量存储区: {len(self._slots)} 个向量 (维度 {self.vector_dim})")
+        except Exception as e:
+            logger.error(f"加载向量存储区索引失败: {e}")
+            self._slots = {}
+            self._last_access = {}
+            self._used_slots = 0
+            self.generation = 0
+
+
+def open_arenas(cache_dir: str, prefix: str = "embedding_arena", **kwargs) -> Dict[int, VectorArena]:
+    """
+    打开缓存目录中已有的所有向量存储区（按维度区分）
+
+    参数:
+        cache_dir: 缓存目录
+        prefix: 文件名前缀
+        **kwargs: 传给VectorArena的其他参数
+
+    返回:
+        Dict[int, VectorArena]: 维度 -> 存储区
+    """
+    arenas = {}
+    if not os.path.isdir(cache_dir):
+        return arenas
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix + "_") and name.endswith(".idx"):
+            try:
+                dim = int(name[len(prefix) + 1:-len(".idx")])
+            except ValueError:
+                continue
+            arenas[dim] = VectorArena(os.path.join(cache_dir, f"{prefix}_{dim}"), dim, **kwargs)
+    return arenas
+
+
+def import_legacy_npy(cache_dir: str, arena_for_dim, remove: bool = True) -> Tuple[int, int]:
+    """
+    将旧版每个文本一个的 <sha256>.npy 文件导入向量存储区
+
+    参数:
+        cache_dir: 缓存目录
+        arena_for_dim: 按维度返回VectorArena的函数
+        remove: 导入成功后是否删除旧文件
+
+    返回:
+        Tuple[int, int]: (导入数量, 失败数量)
+    """
+    imported, failed = 0, 0
+    with os.scandir(cache_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith(".npy") or len(name) != 68:
+                continue
+            key = name[:-4]
+            try:
+                bytes.fromhex(key)
+                vector = np.load(entry.path).astype(np.float32).reshape(-1)
+                if arena_for_dim(vector.shape[0]).put(key, vector):
+                    imported += 1
+                    if remove:
+                        os.remove(entry.path)
+                else:
+                    failed += 1
+            except Exception as e:
+                logger.debug(f"导入旧缓存文件失败 {name}: {e}")
+                failed += 1
+    if imported:
+        logger.info(f"已将 {imported} 个旧版.npy缓存文件导入向量存储区")
+    return imported, failed
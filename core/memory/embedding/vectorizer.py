@@ -8,6 +8,7 @@ import logging
 from typing import List, Dict, Any, Optional, Union, Tuple
 import time
 from pathlib import Path
+from concurrent.futures import Future
 
 # 尝试导入日志工具
 try:
@@ -26,6 +27,8 @@ except ImportError:
     logger.warning("无法导入EnhancedMemoryCache，将不使用缓存功能")
     EmbeddingCache = None
 
+from .batcher import EmbeddingBatcher
+
 class TextVectorizer:
     """
     文本向量化类，负责将文本转换为向量表示
@@ -33,6 +36,7 @@ class TextVectorizer:
     支持多种Embedding模型:
     - 本地模型 (sentence-transformers)
     - OpenAI API
+    - ONNX Runtime（由sentence-transformers模型导出，可int8量化）
     - 自定义模型
     """
     
@@ -41,7 +45,7 @@ class TextVectorizer:
     _initialized = False
     
     # 支持的模型类型
-    MODEL_TYPES = ["sentence-transformers", "openai", "custom"]
+    MODEL_TYPES = ["sentence-transformers", "openai", "onnx", "custom"]
     
     # 默认模型配置
     DEFAULT_MODEL = "sentence-transformers"
@@ -55,17 +59,23 @@ class TextVectorizer:
     
     def __init__(self, model_type: Optional[str] = None, model_name: Optional[str] = None, 
                  api_key: Optional[str] = None, cache_dir: Optional[str] = None, 
-                 use_cache: bool = True, device: str = "cpu"):
+                 use_cache: bool = True, device: str = "cpu",
+                 micro_batching: bool = True, max_batch_size: int = 32,
+                 max_batch_latency: float = 0.01):
         """
         初始化文本向量化器
         
         参数:
-            model_type: 模型类型，可选值为 "sentence-transformers", "openai", "custom"
-            model_name: 模型名称，对于sentence-transformers是模型ID，对于openai是模型名称
+            model_type: 模型类型，可选值为 "sentence-transformers", "openai", "onnx", "custom"
+            model_name: 模型名称，对于sentence-transformers是模型ID，对于openai是模型名称，
+                        对于onnx是导出时使用的模型ID或导出目录
             api_key: API密钥，用于OpenAI API
             cache_dir: 缓存目录，默认使用项目内部cache目录
             use_cache: 是否使用缓存
             device: 设备，可选值为 "cpu", "cuda", "mps"（对于Apple Silicon）
+            micro_batching: 是否合并并发的encode_text请求
+            max_batch_size: 微批的最大文本数
+            max_batch_latency: 微批的最长等待时间（秒）
         """
         # 🔥 单例模式：只初始化一次
         if self._initialized:
@@ -101,6 +111,12 @@ class TextVectorizer:
         # 加载模型
         self._load_model()
         
+        # 微批调度器：并发的单条编码请求合并成一次前向计算（首次使用时启动线程）
+        self.batcher = None
+        if micro_batching and self.model is not None:
+            self.batcher = EmbeddingBatcher(self._encode_batch, max_batch_size=max_batch_size,
+                                            max_latency=max_batch_latency)
+        
         # 🔥 标记为已初始化
         self._initialized = True
         
@@ -113,6 +129,8 @@ class TextVectorizer:
             self._load_sentence_transformers()
         elif self.model_type == "openai":
             self._load_openai()
+        elif self.model_type == "onnx":
+            self._load_onnx()
         elif self.model_type == "custom":
             self._load_custom_model()
         else:
@@ -216,6 +234,28 @@ class TextVectorizer:
             logger.error(f"配置OpenAI API失败: {e}")
             raise
     
+    def _load_onnx(self) -> None:
+        """加载导出的ONNX模型（scripts/export_onnx_model.py），优先使用int8量化版本"""
+        try:
+            from .onnx_backend import OnnxEmbeddingModel, default_onnx_dir
+            
+            if os.path.isdir(self.model_name):
+                model_dir = self.model_name
+            else:
+                model_dir = default_onnx_dir(self.model_cache_dir, self.model_name)
+            
+            logger.info(f"🔄 加载ONNX模型: {model_dir}")
+            self.model = OnnxEmbeddingModel(model_dir)
+            self.vector_dim = self.model.get_sentence_embedding_dimension()
+            logger.info(f"✅ 模型初始化完成，向量维度: {self.vector_dim}")
+            
+        except ImportError:
+            logger.error("未找到onnxruntime或transformers库，请安装: pip install onnxruntime transformers")
+            raise
+        except Exception as e:
+            logger.error(f"加载ONNX模型失败: {e}")
+            raise
+    
     def _load_custom_model(self) -> None:
         """加载自定义模型"""
         # 这里可以实现加载自定义模型的逻辑
@@ -319,6 +359,59 @@ class TextVectorizer:
         
         return vectors[0] if is_single_text else vectors
     
+    def encode_text(self, text: str, memory_weight: float = 1.0,
+                    timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        编码单条文本，启用微批时与其他线程的并发请求合并编码
+        
+        参数:
+            text: 输入文本
+            memory_weight: 记忆重要性权重，用于智能缓存
+            timeout: 等待结果的最长时间（秒）
+            
+        返回:
+            Optional[np.ndarray]: 文本向量，失败时返回None
+        """
+        try:
+            if self.batcher is not None:
+                return self.batcher.encode(text, memory_weight, timeout=timeout)
+            return self.encode(text, memory_weights=memory_weight)
+        except Exception as e:
+            logger.error(f"文本向量化失败: {e}")
+            return None
+    
+    def encode_text_async(self, text: str, memory_weight: float = 1.0) -> Future:
+        """
+        提交单条文本编码，不等待结果（由微批调度器的后台线程计算）
+        
+        参数:
+            text: 输入文本
+            memory_weight: 记忆重要性权重
+            
+        返回:
+            Future: 结果为文本向量；未启用微批时在当前线程同步计算
+        """
+        if self.batcher is not None:
+            return self.batcher.submit(text, memory_weight)
+        future = Future()
+        try:
+            future.set_result(self.encode(text, memory_weights=memory_weight))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def _encode_batch(self, texts: List[str], weights: List[float]) -> np.ndarray:
+        """微批调度器的编码回调"""
+        return self.encode(texts, batch_size=self.batcher.max_batch_size, memory_weights=weights)
+    
+    def get_batching_stats(self) -> Dict[str, Any]:
+        """获取微批调度统计信息"""
+        if self.batcher is None:
+            return {"micro_batching": False}
+        stats = self.batcher.get_stats()
+        stats["micro_batching"] = True
+        return stats
+    
     def _encode_texts(self, texts: List[str], batch_size: int = 32, 
                      show_progress: bool = False) -> np.ndarray:
         """实际的文本编码逻辑"""
@@ -326,6 +419,8 @@ class TextVectorizer:
             return self._encode_with_sentence_transformers(texts, batch_size, show_progress)
         elif self.model_type == "openai":
             return self._encode_with_openai(texts, batch_size)
+        elif self.model_type == "onnx":
+            return self._encode_with_onnx(texts, batch_size)
         elif self.model_type == "custom":
             return self._encode_with_custom_model(texts, batch_size)
         else:
@@ -353,6 +448,20 @@ class TextVectorizer:
             logger.error(f"sentence-transformers编码失败: {e}")
             raise
     
+    def _encode_with_onnx(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """使用ONNX Runtime编码文本"""
+        try:
+            start_time = time.time()
+            embeddings = self.model.encode(texts, batch_size=batch_size)
+            encode_time = time.time() - start_time
+            
+            logger.debug(f"使用ONNX编码 {len(texts)} 个文本，耗时: {encode_time:.2f}秒")
+            return embeddings
+            
+        except Exception as e:
+            logger.error(f"ONNX编码失败: {e}")
+            raise
+    
     def _encode_with_openai(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
         """使用OpenAI API编码文本"""
         try:
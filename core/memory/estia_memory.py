@@ -20,12 +20,14 @@ class EstiaMemorySystem:
     按照设计文档实现完整的13步工作流程
     """
     
-    def __init__(self, enable_advanced: bool = True):
+    def __init__(self, enable_advanced: bool = True, retrieval_config: Optional[Dict[str, Any]] = None):
         """
         初始化Estia记忆系统
         
         Args:
             enable_advanced: 是否启用高级功能（关联网络、异步评估等）
+            retrieval_config: 混合检索参数（vector_k、lexical_k、candidate_budget、fusion等，
+                              见HybridRetriever）
         """
         # 使用模块级logger，避免重复设置
         self.logger = logger
@@ -34,6 +36,8 @@ class EstiaMemorySystem:
         self.db_manager = None
         self.vectorizer = None
         self.faiss_retriever = None
+        self.hybrid_retriever = None
+        self.retrieval_config = retrieval_config or {}
         
         # 高级组件
         self.association_network = None
@@ -41,6 +45,7 @@ class EstiaMemorySystem:
         self.memory_store = None
         self.scorer = None
         self.async_evaluator = None
+        self.maintenance_scheduler = None
         
         # 🆕 会话状态管理
         self.current_session_id = None
@@ -52,11 +57,8 @@ class EstiaMemorySystem:
         self.initialized = False
         self.async_initialized = False
         
-        # 初始化组件
+        # 初始化组件（高级组件和异步评估器在其中各初始化一次）
         self._initialize_components()
-        if enable_advanced:
-            self._initialize_advanced_components()
-            self._initialize_async_evaluator()
         
         logger.info(f"Estia记忆系统初始化完成 (高级功能: {'启用' if enable_advanced else '禁用'})")
     
@@ -96,19 +98,43 @@ class EstiaMemorySystem:
             self.vectorizer = TextVectorizer()
             logger.info("✅ 向量化器初始化成功")
             
-            # FAISS检索
+            # FAISS检索 - 与MemoryStore共享同一个进程内索引
             from .retrieval.faiss_search import FAISSSearchEngine
             self.faiss_retriever = FAISSSearchEngine(
-                index_path="data/vectors/memory_index.bin",
+                index_path=self.memory_store.index_path if self.memory_store else "data/vectors/memory_index.bin",
                 dimension=1024  # Qwen3-Embedding-0.6B
             )
             logger.info("✅ FAISS检索初始化成功")
             
+            # 混合检索：全文索引 + 向量检索，RRF融合；热层候选不足时检索冷记忆归档
+            from .retrieval.lexical_search import LexicalSearch
+            from .retrieval.hybrid_search import HybridRetriever
+            self.hybrid_retriever = HybridRetriever(
+                LexicalSearch(self.db_manager), self.faiss_retriever,
+                archive=self.memory_store.archive if self.memory_store else None,
+                **self.retrieval_config
+            )
+            logger.info("✅ 混合检索初始化成功")
+            
             # 关联网络
             from .association.network import AssociationNetwork
-            self.association_network = AssociationNetwork(self.db_manager)
+            self.association_network = AssociationNetwork(
+                self.db_manager, vector_index=self.memory_store.vector_index if self.memory_store else None
+            )
+            if self.memory_store:
+                # 关联在写入队列提交记忆之后建立，不占用对话轮次，也不会引用尚未入库的记忆
+                self.memory_store.add_commit_listener(self._build_associations_after_commit)
             logger.info("✅ 关联网络初始化成功")
             
+            # 后台维护：关联衰减、剪枝和关联数再平衡，冷记忆归档（都分块执行）
+            from .maintenance import MaintenanceScheduler, AssociationMaintenanceJob, ArchiveMaintenanceJob
+            self.maintenance_scheduler = MaintenanceScheduler()
+            self.maintenance_scheduler.register(AssociationMaintenanceJob(self.association_network))
+            if self.memory_store:
+                self.maintenance_scheduler.register(ArchiveMaintenanceJob(self.memory_store))
+            self.maintenance_scheduler.start()
+            logger.info("✅ 后台维护调度初始化成功")
+            
             # 历史检索器
             from .context.history import HistoryRetriever
             self.history_retriever = HistoryRetriever(self.db_manager)
@@ -213,46 +239,77 @@ class EstiaMemorySystem:
         """
         try:
             self.logger.debug("🚀 开始记忆增强查询流程")
+            if context is None:
+                context = {}
+            
+            # Step 3（提前提交）: 向量化在后台进行，与会话管理重叠
+            embedding_future = None
+            if self.vectorizer:
+                embedding_future = self.vectorizer.encode_text_async(user_input)
+            
+            # 全文检索不需要查询向量，同时提交
+            lexical_future = None
+            if self.hybrid_retriever:
+                lexical_future = self.hybrid_retriever.submit_lexical(user_input)
             
             # 🆕 Step 0: 会话管理
-            if context and 'session_id' in context:
+            if 'session_id' in context:
                 # 使用指定的session_id
                 if context['session_id'] != self.current_session_id:
                     self.start_new_session(context['session_id'])
             else:
                 # 确保有当前会话
-                current_session = self.get_current_session_id()
-                if not context:
-                    context = {}
-                context['session_id'] = current_session
+                context['session_id'] = self.get_current_session_id()
             
-            # Step 3: 向量化当前输入
+            # Step 3: 等待用户输入的向量
             self.logger.debug("📝 Step 3: 向量化用户输入")
-            if not self.vectorizer:
+            if embedding_future is None:
                 return self._build_fallback_context(user_input)
             
-            query_vector = self.vectorizer.encode_text(user_input)
+            try:
+                query_vector = embedding_future.result()
+            except Exception as e:
+                self.logger.warning(f"向量化失败: {e}")
+                query_vector = None
             if query_vector is None:
                 self.logger.warning("向量化失败，使用降级模式")
                 return self._build_fallback_context(user_input)
             
-            # Step 4: FAISS检索相似记忆
-            self.logger.debug("🎯 Step 4: FAISS向量检索")
+            # 本轮的查询向量随context传给store_interaction，存储时不再重复编码
+            context['query_embedding'] = {'text': user_input, 'vector': query_vector}
+            
+            # Step 4: 混合检索相似记忆（向量 + 全文，RRF融合）
             similar_memory_ids = []
-            if self.faiss_retriever:
+            similarities = {}
+            retrieval_scores = {}
+            cold_memories = []
+            if self.hybrid_retriever:
+                self.logger.debug("🎯 Step 4: 混合检索")
+                candidates = self.hybrid_retriever.search(user_input, query_vector, lexical_future)
+                # 归档中的记忆不参与关联拓展和会话聚合，直接加入上下文
+                cold_memories = [candidate['memory'] for candidate in candidates if candidate.get('tier') == 'cold']
+                similar_memory_ids = [candidate['memory_id'] for candidate in candidates
+                                      if candidate.get('tier') != 'cold']
+                similarities = {candidate['memory_id']: candidate['similarity'] for candidate in candidates}
+                retrieval_scores = {candidate['memory_id']: candidate['score'] for candidate in candidates}
+            elif self.faiss_retriever:
+                self.logger.debug("🎯 Step 4: FAISS向量检索")
                 search_results = self.faiss_retriever.search_similar(query_vector, k=15)
                 similar_memory_ids = [result['memory_id'] for result in search_results 
                                     if result.get('memory_id')]
+                similarities = {result['memory_id']: result.get('similarity', 0.0)
+                                for result in search_results if result.get('memory_id')}
             
-            # Step 5: 关联网络拓展 (可选)
+            # Step 5: 关联网络拓展 (可选)：以前5条检索结果为种子扩散激活
             expanded_memory_ids = similar_memory_ids.copy()
+            activations = {}
             if self.enable_advanced and self.association_network:
                 self.logger.debug("🕸️ Step 5: 关联网络拓展")
                 try:
-                    associated_ids = self.association_network.find_associated_memories(
-                        similar_memory_ids[:5], depth=2, max_results=10
-                    )
-                    expanded_memory_ids.extend(associated_ids)
+                    seed_scores = {memory_id: similarities.get(memory_id, 0.5)
+                                   for memory_id in similar_memory_ids[:5]}
+                    activations = dict(self.association_network.activate_memories(seed_scores, max_results=10))
+                    expanded_memory_ids.extend(activations)
                     # 去重
                     expanded_memory_ids = list(dict.fromkeys(expanded_memory_ids))
                 except Exception as e:
@@ -287,16 +344,29 @@ class EstiaMemorySystem:
                 # 降级：使用MemoryStore直接获取记忆
                 context_memories = self.memory_store.get_memories_by_ids(expanded_memory_ids) if self.memory_store else []
             
+            loaded_ids = {memory.get('memory_id', memory.get('id')) for memory in context_memories}
+            context_memories = context_memories + [memory for memory in cold_memories
+                                                   if memory['memory_id'] not in loaded_ids]
+            
+            # 复用检索阶段的相似度，排序时不再重新计算
+            for memory in context_memories:
+                memory_id = memory.get('memory_id', memory.get('id'))
+                if memory_id in similarities and 'similarity' not in memory:
+                    memory['similarity'] = similarities[memory_id]
+                if memory_id in retrieval_scores:
+                    memory['retrieval_score'] = retrieval_scores[memory_id]
+                if memory_id in activations:
+                    memory['activation'] = activations[memory_id]
+            
             # 保存上下文记忆到context（供后续异步评估使用）
-            if context:
-                context['context_memories'] = context_memories
+            context['context_memories'] = context_memories
             
             # Step 7: 权重排序 + 去重
             self.logger.debug("⚖️ Step 7: 记忆排序与去重")
             if self.scorer:
                 try:
-                    ranked_memories = self.scorer.rank_memories(context_memories, user_input)
-                    context_memories = ranked_memories[:20]  # 取前20条
+                    # 取前20条
+                    context_memories = self.scorer.score_memories(context_memories, user_input, max_results=20)
                 except Exception as e:
                     self.logger.warning(f"记忆排序失败: {e}")
             
@@ -334,14 +404,21 @@ class EstiaMemorySystem:
             if context:
                 context['session_id'] = session_id
             
-            # 🔥 Step 12: 使用MemoryStore保存对话（包含向量化）
+            # 复用enhance_query已经算好的用户输入向量
+            query_embedding = context.get('query_embedding') if context else None
+            user_vector = None
+            if query_embedding and query_embedding.get('text') == user_input:
+                user_vector = query_embedding.get('vector')
+            
+            # 🔥 Step 12: 使用MemoryStore保存对话（向量化和入库由后台写入队列批量完成）
             user_memory_id = self.memory_store.add_interaction_memory(
                 content=user_input,
                 memory_type="user_input", 
                 role="user",
                 session_id=session_id,
                 timestamp=timestamp,
-                weight=5.0
+                weight=5.0,
+                vector=user_vector
             )
             
             ai_memory_id = self.memory_store.add_interaction_memory(
@@ -371,6 +448,26 @@ class EstiaMemorySystem:
         except Exception as e:
             logger.error(f"存储交互失败: {e}")
     
+    def _build_associations_after_commit(self, items: List, vectors: Optional[Any]):
+        """
+        写入队列提交一批交互记忆后，用提交时的向量为其中的用户输入建立关联（在写入线程中执行）
+        
+        Args:
+            items: 已提交的写入条目
+            vectors: 与条目逐行对应的向量矩阵，向量化失败时为None
+        """
+        if not self.association_network or vectors is None:
+            return
+        for item, vector in zip(items, vectors):
+            if item.role != "user":
+                continue
+            self.association_network.build_associations(
+                item.memory_id,
+                {"memory_id": item.memory_id, "content": item.content,
+                 "created_at": item.timestamp, "weight": item.weight},
+                vector=vector
+            )
+    
     def _safe_trigger_async_evaluation(self, user_input: str, ai_response: str, 
                                      session_id: str, context_memories: List):
         """安全地触发异步评估"""
@@ -530,6 +627,29 @@ class EstiaMemorySystem:
             except:
                 stats['total_memories'] = 0
         
+        # 获取写入队列状态（背压指标）
+        if self.memory_store:
+            try:
+                stats['ingestion'] = self.memory_store.get_ingestion_stats()
+            except:
+                stats['ingestion'] = {'status': 'unknown'}
+        
+        # 获取向量化微批调度状态
+        if self.vectorizer and hasattr(self.vectorizer, 'get_batching_stats'):
+            try:
+                stats['embedding_batching'] = self.vectorizer.get_batching_stats()
+            except:
+                stats['embedding_batching'] = {'status': 'unknown'}
+        
+        # 获取后台维护任务进度
+        if self.maintenance_scheduler:
+            stats['maintenance'] = self.maintenance_scheduler.get_stats()
+        
+        # 获取数据库连接池状态
+        if self.db_manager:
+            stats['database_pool'] = self.db_manager.get_pool_stats()
+            stats['query_latency'] = self.db_manager.get_query_stats()
+        
         # 获取异步队列状态
         if self.async_evaluator:
             try:
@@ -547,9 +667,23 @@ class EstiaMemorySystem:
                 await self.async_evaluator.stop()
                 logger.info("✅ 异步评估器已停止")
             
+            if self.hybrid_retriever:
+                self.hybrid_retriever.shutdown()
+            
+            if self.maintenance_scheduler:
+                self.maintenance_scheduler.shutdown()
+            
+            if self.memory_store:
+                # 先排空写入队列，提交回调中的关联在关联网络关闭前写完
+                self.memory_store.flush_pending()
+            
+            if self.association_network:
+                self.association_network.close()
+            
             if self.memory_store:
+                # close() 会先排空写入队列，再保存索引
                 self.memory_store.close()
-                logger.info("✅ MemoryStore已关闭")
+                logger.info("✅ MemoryStore已关闭（写入队列已排空）")
             
             if self.db_manager:
                 self.db_manager.close()
@@ -561,6 +695,7 @@ class EstiaMemorySystem:
             logger.error(f"系统关闭失败: {e}")
 
 
-def create_estia_memory(enable_advanced: bool = True) -> EstiaMemorySystem:
+def create_estia_memory(enable_advanced: bool = True,
+                        retrieval_config: Optional[Dict[str, Any]] = None) -> EstiaMemorySystem:
     """创建Estia记忆系统实例"""
-    return EstiaMemorySystem(enable_advanced=enable_advanced) 
\ No newline at end of file
+    return EstiaMemorySystem(enable_advanced=enable_advanced, retrieval_config=retrieval_config) 
\ No newline at end of file
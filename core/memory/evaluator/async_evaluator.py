@@ -11,7 +11,7 @@ import json
 import time
 import uuid
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 from core.dialogue.engine import DialogueEngine
@@ -248,84 +248,62 @@ class AsyncMemoryEvaluator:
         try:
             self.logger.debug("保存评估结果到数据库")
             
-            # 保存用户输入记忆
-            user_memory_id = await self._save_single_memory(
-                content=dialogue_data['user_input'],
-                role="user",
-                evaluation=evaluation
-            )
-            
-            # 保存AI回复记忆
-            ai_memory_id = await self._save_single_memory(
-                content=dialogue_data['ai_response'],
-                role="assistant", 
-                evaluation=evaluation
-            )
-            
-            # 🆕 更新现有记忆的group_id（如果session中有相关记忆）
-            await self._update_existing_memories_group_id(dialogue_data, evaluation)
-            
-            # 创建或更新memory_group表
-            await self._create_or_update_memory_group(evaluation)
-            
-            # 更新分组统计
-            await self._update_group_statistics(evaluation['group_id'])
+            # 一次评估的所有写入在同一个事务中完成，只提交一次
+            with self.db_manager.transaction():
+                # 保存用户输入和AI回复记忆
+                user_memory_id, ai_memory_id = await self._save_dialogue_memories(
+                    dialogue_data, evaluation
+                )
+                
+                # 🆕 更新现有记忆的group_id（如果session中有相关记忆）
+                await self._update_existing_memories_group_id(dialogue_data, evaluation)
+                
+                # 创建或更新memory_group表
+                await self._create_or_update_memory_group(evaluation)
+                
+                # 更新分组统计
+                await self._update_group_statistics(evaluation['group_id'])
             
             self.logger.info(f"✅ 评估结果保存完成 - 分组: {evaluation['group_id']}")
             
         except Exception as e:
             self.logger.error(f"保存评估结果失败: {e}")
     
-    async def _save_single_memory(self, content: str, role: str, 
-                                evaluation: Dict[str, Any]) -> str:
+    async def _save_dialogue_memories(self, dialogue_data: Dict[str, Any],
+                                      evaluation: Dict[str, Any]) -> Tuple[str, str]:
         """
-        保存单条记忆到数据库
+        批量保存用户输入和AI回复两条记忆
         
         参数:
-            content: 记忆内容
-            role: 角色 (user/assistant)
+            dialogue_data: 对话数据
             evaluation: 评估结果
             
         返回:
-            记忆ID
+            (用户记忆ID, AI记忆ID)
         """
-        memory_id = str(uuid.uuid4())
-        
         # 构建元数据
-        metadata = {
+        metadata = json.dumps({
             "super_group": evaluation['super_group'],
             "evaluation_time": evaluation.get('evaluation_time', 0),
             "auto_generated": True
-        }
+        })
         
-        # 插入数据库
-        self.db_manager.execute_query(
-            """
-            INSERT INTO memories 
-            (id, content, type, role, session_id, timestamp, weight, 
-             group_id, summary, last_accessed, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                memory_id,
-                content,
-                "dialogue",
-                role,
-                evaluation['session_id'],
-                evaluation['timestamp'],
-                evaluation['weight'],
-                evaluation['group_id'],
-                evaluation['summary'],
-                evaluation['timestamp'],
-                json.dumps(metadata)
+        memory_ids = (str(uuid.uuid4()), str(uuid.uuid4()))
+        rows = [
+            (memory_id, content, "dialogue", role, evaluation['session_id'],
+             evaluation['timestamp'], evaluation['weight'], evaluation['group_id'],
+             evaluation['summary'], evaluation['timestamp'], metadata)
+            for memory_id, content, role in zip(
+                memory_ids,
+                (dialogue_data['user_input'], dialogue_data['ai_response']),
+                ("user", "assistant")
             )
-        )
+        ]
         
-        # 提交事务
-        if self.db_manager.conn:
-            self.db_manager.conn.commit()
+        # 插入数据库
+        self.db_manager.bulk_insert("memories", rows)
         
-        return memory_id
+        return memory_ids
     
     async def _update_existing_memories_group_id(self, dialogue_data: Dict[str, Any], 
                                                evaluation: Dict[str, Any]):
@@ -345,20 +323,8 @@ class AsyncMemoryEvaluator:
             super_group = evaluation['super_group']
             
             # 查找同一session中的相关记忆（最近24小时内，相同主题）
-            recent_memories = self.db_manager.query(
-                """
-                SELECT id FROM memories 
-                WHERE session_id = ? 
-                  AND timestamp > ? 
-                  AND (group_id IS NULL OR group_id = '')
-                  AND (
-                    content LIKE ? OR 
-                    metadata LIKE ? OR
-                    type = 'user_input' OR type = 'assistant_reply'
-                  )
-                ORDER BY timestamp DESC
-                LIMIT 10
-                """,
+            recent_memories = self.db_manager.execute_named(
+                "evaluator.ungrouped_session_memories",
                 (
                     session_id,
                     evaluation['timestamp'] - 24*3600,  # 24小时内
@@ -370,20 +336,7 @@ class AsyncMemoryEvaluator:
             if recent_memories:
                 # 批量更新这些记忆的group_id
                 memory_ids = [memory[0] for memory in recent_memories]
-                placeholders = ','.join(['?' for _ in memory_ids])
-                
-                self.db_manager.execute_query(
-                    f"""
-                    UPDATE memories 
-                    SET group_id = ? 
-                    WHERE id IN ({placeholders})
-                    """,
-                    [group_id] + memory_ids
-                )
-                
-                # 提交事务
-                if self.db_manager.conn:
-                    self.db_manager.conn.commit()
+                self.db_manager.execute_named("evaluator.assign_group", (group_id,), in_values=memory_ids)
                 
                 self.logger.info(f"✅ 更新了 {len(memory_ids)} 条现有记忆的group_id为 {group_id}")
             
@@ -404,10 +357,7 @@ class AsyncMemoryEvaluator:
             group_id = evaluation['group_id']
             
             # 检查分组是否已存在
-            existing_group = self.db_manager.query(
-                "SELECT group_id, time_start, time_end, summary FROM memory_group WHERE group_id = ?",
-                (group_id,)
-            )
+            existing_group = self.db_manager.execute_named("evaluator.group_by_id", (group_id,))
             
             if existing_group:
                 # 更新现有分组
@@ -433,26 +383,15 @@ class AsyncMemoryEvaluator:
             topic = await self._generate_topic_description(evaluation)
             
             # 插入新分组记录
-            self.db_manager.execute_query(
-                """
-                INSERT INTO memory_group 
-                (group_id, super_group, topic, time_start, time_end, summary, score)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    evaluation['group_id'],
-                    evaluation['super_group'],
-                    topic,
-                    evaluation['timestamp'],  # 设置开始时间为当前对话时间
-                    evaluation['timestamp'],  # 暂时设置结束时间也为当前时间
-                    evaluation['summary'],
-                    evaluation['weight']
-                )
-            )
-            
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+            self.db_manager.bulk_insert("memory_group", [(
+                evaluation['group_id'],
+                evaluation['super_group'],
+                topic,
+                evaluation['timestamp'],  # 设置开始时间为当前对话时间
+                evaluation['timestamp'],  # 暂时设置结束时间也为当前时间
+                evaluation['summary'],
+                evaluation['weight']
+            )])
             
             self.logger.info(f"✅ 创建新话题分组: {evaluation['group_id']} - {topic}")
             
@@ -489,10 +428,6 @@ class AsyncMemoryEvaluator:
                 )
             )
             
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
-            
             self.logger.debug(f"更新分组时间范围: {group_id}")
             
         except Exception as e:
@@ -541,17 +476,7 @@ class AsyncMemoryEvaluator:
                 return
             
             # 获取该分组下的所有记忆统计
-            stats = self.db_manager.query(
-                """
-                SELECT COUNT(*) as memory_count,
-                       AVG(weight) as avg_weight,
-                       MIN(timestamp) as earliest_time,
-                       MAX(timestamp) as latest_time
-                FROM memories 
-                WHERE group_id = ?
-                """,
-                (group_id,)
-            )
+            stats = self.db_manager.execute_named("evaluator.group_statistics", (group_id,))
             
             if stats and stats[0]:
                 memory_count, avg_weight, earliest_time, latest_time = stats[0]
@@ -568,10 +493,6 @@ class AsyncMemoryEvaluator:
                     (earliest_time, latest_time, avg_weight or 1.0, group_id)
                 )
                 
-                # 提交事务
-                if self.db_manager.conn:
-                    self.db_manager.conn.commit()
-                
                 self.logger.debug(f"更新分组统计: {group_id}, 记忆数: {memory_count}, 平均权重: {avg_weight:.2f}")
             
         except Exception as e:
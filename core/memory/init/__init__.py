@@ -7,4 +7,8 @@
 
 # 导出主要类，方便直接导入
 from .db_manager import DatabaseManager
-from .vector_index import VectorIndexManager
+from .connection_pool import ConnectionPool
+from .query_registry import QueryRegistry
+from .vector_index import VectorIndexManager, get_shared_vector_index
+from .index_policy import IndexPolicy, IndexPromoter
+from .vector_projection import VectorProjector
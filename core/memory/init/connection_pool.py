@@ -0,0 +1,172 @@
+"""
+SQLite连接池 - WAL模式下的读连接池 + 单个串行化写连接
+对话线程、异步评估线程和后台写入线程各自拿独立的读连接，读取不再排在写事务后面；
+所有写操作通过同一个写连接串行执行（SQLite同一时刻只允许一个写者）
+"""
+
+import re
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.db")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.db")
+
+# 每个连接都会设置的PRAGMA
+DEFAULT_PRAGMAS = {
+    "synchronous": "NORMAL",     # WAL下NORMAL已保证崩溃一致性，只在检查点时fsync
+    "cache_size": -16000,        # 每个连接16MB页缓存（负数单位为KB）
+    "mmap_size": 268435456,      # 256MB内存映射读取
+    "temp_store": "MEMORY",
+}
+
+# 每个连接缓存的预编译语句数（命名语句和按档位补齐的IN列表都能命中）
+STATEMENT_CACHE_SIZE = 256
+
+# 以这些关键字开头的语句在读连接上执行
+READ_PREFIXES = ("SELECT", "EXPLAIN", "PRAGMA TABLE_INFO", "PRAGMA INDEX_LIST", "PRAGMA INDEX_INFO")
+
+# WITH开头的语句可能是 WITH ... INSERT/UPDATE/DELETE，含有这些关键字时交给写连接
+DML_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE)\b")
+
+
+def is_read_query(query: str) -> bool:
+    """判断SQL是否为只读查询"""
+    statement = query.lstrip().upper()
+    if statement.startswith("WITH"):
+        return DML_KEYWORDS.search(statement) is None
+    return statement.startswith(READ_PREFIXES)
+
+
+class ConnectionPool:
+    """
+    SQLite连接池
+
+    - writer(): 独占的写连接（可重入锁），调用方负责提交或回滚
+    - reader(): 从池中借出读连接，用完归还；池空时等待或临时新建
+    - 内存数据库无法跨连接共享，读操作直接使用写连接
+    """
+
+    def __init__(self, db_path: str, max_readers: int = 4, busy_timeout: float = 5.0,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        """
+        初始化连接池
+
+        参数:
+            db_path: 数据库文件路径
+            max_readers: 读连接数上限
+            busy_timeout: 数据库被锁时的等待时间（秒）
+            pragmas: 覆盖默认PRAGMA设置
+        """
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.busy_timeout = busy_timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.shared_memory = db_path == ":memory:"
+
+        self._writer_lock = threading.RLock()
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+
+        self.writer_conn = self._open(writer=True)
+
+        # 统计信息
+        self.stats = {
+            "reads": 0,
+            "writes": 0,
+            "read_wait": 0.0,    # 等待读连接的累计时间
+            "write_wait": 0.0,   # 等待写锁的累计时间
+        }
+        self._stats_lock = threading.Lock()
+
+    def _open(self, writer: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+        if writer and not self.shared_memory:
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if str(mode).lower() != "wal":
+                logger.warning(f"数据库未能切换到WAL模式，当前: {mode}")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        if not writer:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """获取写连接（同一时刻只有一个线程持有）"""
+        start_time = time.time()
+        with self._writer_lock:
+            with self._stats_lock:
+                self.stats["writes"] += 1
+                self.stats["write_wait"] += time.time() - start_time
+            yield self.writer_conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """借出一个读连接"""
+        if self.shared_memory:
+            with self.writer() as conn:
+                yield conn
+            return
+
+        start_time = time.time()
+        conn = self._acquire_reader()
+        with self._stats_lock:
+            self.stats["reads"] += 1
+            self.stats["read_wait"] += time.time() - start_time
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                return self._open()
+        return self._readers.get(timeout=self.busy_timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["read_wait_ms"] = round(stats.pop("read_wait") * 1000, 2)
+        stats["write_wait_ms"] = round(stats.pop("write_wait") * 1000, 2)
+        stats["readers_open"] = self._reader_count
+        stats["readers_idle"] = self._readers.qsize()
+        stats["max_readers"] = self.max_readers
+        return stats
+
+    def close(self):
+        """关闭所有连接"""
+        self._closed = True
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._writer_lock:
+            self.writer_conn.close()
@@ -7,8 +7,14 @@ import sqlite3
 import logging
 import json
 import time
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+from .connection_pool import ConnectionPool, is_read_query
+from .query_registry import QueryRegistry
+from . import migrations
+
 # 导入日志工具
 try:
     from core.utils.logger import get_logger
@@ -18,15 +24,19 @@ except ImportError:
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("estia.memory.db")
 
+# memories的全文索引（外部内容表，按rowid与memories对应）
+FTS_TABLE = "memories_fts"
+
 class DatabaseManager:
     """数据库管理器类，负责初始化和管理SQLite数据库"""
     
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, max_readers=4):
         """
         初始化数据库管理器
         
         参数:
             db_path: 数据库文件路径，如果为None则使用默认路径
+            max_readers: 读连接池大小
         """
         if db_path is None:
             # 使用统一的默认路径配置
@@ -41,23 +51,32 @@ class DatabaseManager:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
             
         self.db_path = db_path
+        self.max_readers = max_readers
+        self.pool = None
+        # conn/cursor指向写连接，供建表等初始化代码使用
         self.conn = None
         self.cursor = None
         self.is_connected = False
+        # 当前线程的事务嵌套深度，事务内的写入由最外层统一提交
+        self._local = threading.local()
+        # 命名语句及其延迟统计
+        self.queries = QueryRegistry()
         
         logger.info(f"数据库管理器初始化，使用数据库: {db_path}")
     
     def connect(self):
         """连接到数据库"""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+            # WAL模式：读连接池 + 单个写连接，读取不会被评估线程的写入阻塞
+            self.pool = ConnectionPool(self.db_path, max_readers=self.max_readers)
+            self.conn = self.pool.writer_conn
             self.cursor = self.conn.cursor()
             self.is_connected = True
             logger.info("成功连接到数据库")
             return True
         except Exception as e:
             logger.error(f"连接数据库失败: {e}")
+            self.pool = None
             self.conn = None
             self.cursor = None
             self.is_connected = False
@@ -65,8 +84,12 @@ class DatabaseManager:
     
     def close(self):
         """关闭数据库连接"""
-        if self.conn:
-            self.conn.close()
+        if self.pool:
+            # 关闭前让SQLite按需更新统计信息
+            with self.pool.writer() as conn:
+                migrations.optimize(conn)
+            self.pool.close()
+            self.pool = None
             self.conn = None
             self.cursor = None
             self.is_connected = False
@@ -81,6 +104,9 @@ class DatabaseManager:
                 return False
         
         try:
+            # 修复旧版本的memories表（缺列时无法创建索引）
+            migrations.repair_legacy_memories(self.conn)
+            
             # 创建记忆表
             if not self._create_memories_table():
                 return False
@@ -101,12 +127,50 @@ class DatabaseManager:
             if not self._create_cache_table():
                 return False
             
+            # 创建全文索引（SQLite不支持FTS5/trigram时仅记录警告，关键词检索退化为LIKE）
+            self._create_fts_table()
+            
+            # 执行版本迁移（组合索引等）
+            if not self.migrate():
+                return False
+            migrations.optimize(self.conn)
+            
             logger.info("数据库初始化完成")
             return True
         except Exception as e:
             logger.error(f"初始化数据库失败: {e}")
             return False
     
+    def migrate(self, target=None):
+        """
+        执行未完成的Schema迁移
+        
+        参数:
+            target: 目标版本，None表示最新
+            
+        返回:
+            bool: 是否成功
+        """
+        if not self._ensure_connection():
+            return False
+        
+        try:
+            with self.pool.writer() as conn:
+                applied = migrations.run_migrations(conn, target=target)
+            if applied:
+                logger.info(f"Schema已迁移到版本 {applied[-1].version}")
+            return True
+        except Exception as e:
+            logger.error(f"Schema迁移失败: {e}")
+            return False
+    
+    def get_schema_version(self):
+        """获取当前Schema版本（PRAGMA user_version）"""
+        if not self._ensure_connection():
+            return 0
+        with self.pool.writer() as conn:
+            return migrations.get_schema_version(conn)
+    
     def _ensure_connection(self):
         """确保数据库连接有效"""
         if not self.is_connected or not self.conn or not self.cursor:
@@ -139,10 +203,8 @@ class DatabaseManager:
             ''')
             
             # 创建索引
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_session ON memories(session_id)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_group ON memories(group_id)')
+            # session_id、group_id、type的组合索引由迁移创建（见migrations.py）
             self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_timestamp ON memories(timestamp)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_type ON memories(type)')
             self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memories_last_accessed ON memories(last_accessed)')
             
             # 提交更改
@@ -214,8 +276,7 @@ class DatabaseManager:
             ''')
             
             # 创建索引
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_association_source ON memory_association(source_key)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_association_target ON memory_association(target_key)')
+            # source_key/target_key的双向组合索引由迁移创建（见migrations.py）
             self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_memory_association_group ON memory_association(group_id)')
             
             # 提交更改
@@ -297,6 +358,118 @@ class DatabaseManager:
                 self.conn.rollback()
             return False
     
+    def _create_fts_table(self):
+        """创建memories的FTS5全文索引及同步触发器"""
+        # 确保连接
+        if not self._ensure_connection():
+            logger.error(f"无法创建{FTS_TABLE}表：数据库未连接")
+            return False
+        
+        try:
+            exists = self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+            ).fetchone()
+            
+            # trigram按字符三元组切分，中文无需分词词典
+            self.cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                    content, summary,
+                    content='memories', content_rowid='rowid',
+                    tokenize='trigram'
+                )
+            ''')
+            
+            # 触发器保持索引与memories同步
+            self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON memories BEGIN
+                    INSERT INTO {FTS_TABLE}(rowid, content, summary) VALUES (new.rowid, new.content, new.summary);
+                END
+            ''')
+            self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON memories BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, summary)
+                    VALUES ('delete', old.rowid, old.content, old.summary);
+                END
+            ''')
+            self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF content, summary ON memories BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content, summary)
+                    VALUES ('delete', old.rowid, old.content, old.summary);
+                    INSERT INTO {FTS_TABLE}(rowid, content, summary) VALUES (new.rowid, new.content, new.summary);
+                END
+            ''')
+            
+            # 新建索引时导入已有记忆
+            if not exists:
+                self.cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+            
+            # 提交更改
+            self.conn.commit()
+            logger.info(f"创建{FTS_TABLE}全文索引完成")
+            return True
+        except Exception as e:
+            logger.warning(f"创建{FTS_TABLE}全文索引失败: {e}")
+            if self.conn:
+                self.conn.rollback()
+            return False
+    
+    # 批量写入的固定列，与建表语句一致
+    BULK_INSERTS = {
+        "memories": (
+            "INSERT INTO memories (id, content, type, role, session_id, timestamp, weight, "
+            "group_id, summary, last_accessed, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        ),
+        "memory_vectors": (
+            "INSERT INTO memory_vectors (id, memory_id, vector, vector_format, model_name, timestamp) "
+            "VALUES (?, ?, ?, ?, ?, ?)"
+        ),
+        "memory_association": (
+            "INSERT INTO memory_association (id, source_key, target_key, association_type, "
+            "strength, created_at, last_activated) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        ),
+        "memory_group": (
+            "INSERT INTO memory_group (group_id, super_group, topic, time_start, time_end, summary, score) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)"
+        ),
+    }
+    
+    @property
+    def in_transaction(self):
+        """当前线程是否处于transaction()中"""
+        return getattr(self._local, "depth", 0) > 0
+    
+    @contextmanager
+    def transaction(self):
+        """
+        工作单元：块内所有写操作在同一个事务中执行，退出时只提交一次
+        
+        块内的execute_query/executemany不再逐条提交，出错时直接抛出异常，
+        最外层回滚整个事务；块内的读取使用写连接，可以看到未提交的写入。
+        可以嵌套，只有最外层提交。
+        
+        用法:
+            with db_manager.transaction():
+                db_manager.execute_query(...)
+                db_manager.executemany(...)
+        """
+        if not self._ensure_connection():
+            raise sqlite3.OperationalError("未连接到数据库")
+        
+        with self.pool.writer() as conn:
+            depth = getattr(self._local, "depth", 0)
+            self._local.depth = depth + 1
+            try:
+                yield self
+                if depth == 0:
+                    conn.commit()
+            except Exception:
+                if depth == 0 and conn.in_transaction:
+                    conn.rollback()
+                    logger.debug("事务已回滚")
+                raise
+            finally:
+                self._local.depth = depth
+    
     def execute_query(self, query, params=None):
         """
         执行SQL查询
@@ -313,26 +486,129 @@ class DatabaseManager:
             logger.error("无法执行查询：未连接到数据库")
             return None
         
+        if self.in_transaction:
+            # 事务内：使用写连接，不单独提交，错误交给transaction()回滚
+            with self.pool.writer() as conn:
+                return conn.execute(query, params or ()).fetchall()
+        
+        if is_read_query(query):
+            # 只读查询在读连接上执行，每次调用使用独立游标
+            try:
+                with self.pool.reader() as conn:
+                    return conn.execute(query, params or ()).fetchall()
+            except Exception as e:
+                logger.error(f"执行查询失败: {e}")
+                return None
+        
+        with self.pool.writer() as conn:
+            try:
+                cursor = conn.execute(query, params or ())
+                    
+                # 🔥 关键修复：如果是写入操作，立即提交事务
+                query_upper = query.strip().upper()
+                if query_upper.startswith(('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER', 'REPLACE')):
+                    conn.commit()
+                    logger.debug("数据库写入操作已提交")
+                    
+                return cursor.fetchall()
+            except Exception as e:
+                logger.error(f"执行查询失败: {e}")
+                if conn.in_transaction:
+                    conn.rollback()
+                    logger.debug("数据库操作已回滚")
+                return None
+    
+    def execute_named(self, name, params=None, in_values=None, trailing=None):
+        """
+        执行注册表中的命名语句，并记录调用次数和延迟
+        
+        参数:
+            name: 语句名（见query_registry.QUERIES）
+            params: 普通参数（绑定在IN列表之前）
+            in_values: IN列表的值
+            trailing: 尾部参数（绑定在IN列表之后）
+            
+        返回:
+            查询结果，失败时返回None（在transaction()中失败时抛出异常）
+        """
+        query, bound = self.queries.render(name, params, in_values, trailing)
+        start_time = time.perf_counter()
+        result = None
+        try:
+            result = self.execute_query(query, bound)
+            return result
+        finally:
+            self.queries.record(name, time.perf_counter() - start_time, error=result is None)
+    
+    def executemany_named(self, name, params_list):
+        """
+        用注册表中的命名语句批量执行多行参数，并记录一次调用的延迟
+        
+        参数:
+            name: 语句名（不能包含IN列表）
+            params_list: 参数序列
+            
+        返回:
+            写入的行数，失败时返回None（在transaction()中失败时抛出异常）
+        """
+        query, _ = self.queries.render(name)
+        start_time = time.perf_counter()
+        result = None
         try:
-            if params:
-                self.cursor.execute(query, params)
-            else:
-                self.cursor.execute(query)
-                
-            # 🔥 关键修复：如果是写入操作，立即提交事务
-            query_upper = query.strip().upper()
-            if query_upper.startswith(('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER')):
-                self.conn.commit()
-                logger.debug("数据库写入操作已提交")
-                
-            return self.cursor.fetchall()
+            result = self.executemany(query, params_list)
+            return result
+        finally:
+            self.queries.record(name, time.perf_counter() - start_time, error=result is None)
+    
+    def get_query_stats(self, sort_by="total_ms"):
+        """获取命名语句的调用次数和p50/p95/p99延迟"""
+        return self.queries.get_stats(sort_by)
+    
+    def executemany(self, query, params_list):
+        """
+        用同一条语句批量写入多行
+        
+        参数:
+            query: SQL语句
+            params_list: 参数序列
+            
+        返回:
+            写入的行数，失败时返回None（在transaction()中失败时抛出异常）
+        """
+        params_list = list(params_list)
+        if not params_list:
+            return 0
+        
+        if self.in_transaction:
+            with self.pool.writer() as conn:
+                return conn.executemany(query, params_list).rowcount
+        
+        try:
+            with self.transaction():
+                return self.executemany(query, params_list)
         except Exception as e:
-            logger.error(f"执行查询失败: {e}")
-            if self.conn and query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
-                self.conn.rollback()
-                logger.debug("数据库操作已回滚")
+            logger.error(f"批量写入失败: {e}")
             return None
     
+    def bulk_insert(self, table, rows):
+        """
+        批量插入记忆、向量、关联或分组（列顺序见BULK_INSERTS）
+        
+        参数:
+            table: 表名，memories / memory_vectors / memory_association / memory_group
+            rows: 行元组序列
+            
+        返回:
+            写入的行数，失败时返回None
+        """
+        if table not in self.BULK_INSERTS:
+            raise ValueError(f"不支持批量插入的表: {table}")
+        return self.executemany(self.BULK_INSERTS[table], rows)
+    
+    def get_pool_stats(self):
+        """获取连接池统计信息"""
+        return self.pool.get_stats() if self.pool else {}
+    
     def query(self, query_sql, params=None):
         """
         执行SQL查询（execute_query的别名，为了兼容性）
@@ -362,17 +638,11 @@ class DatabaseManager:
             return False
         
         try:
-            for query, params in queries:
-                if params:
-                    self.cursor.execute(query, params)
-                else:
-                    self.cursor.execute(query)
-                    
-            self.conn.commit()
+            with self.transaction() as tx:
+                for query, params in queries:
+                    tx.execute_query(query, params)
             return True
         except Exception as e:
-            if self.conn:
-                self.conn.rollback()
             logger.error(f"执行事务失败: {e}")
             return False
     
@@ -402,8 +672,8 @@ class DatabaseManager:
             backup_conn = sqlite3.connect(backup_path)
             
             # 执行备份
-            with backup_conn:
-                self.conn.backup(backup_conn)
+            with backup_conn, self.pool.reader() as conn:
+                conn.backup(backup_conn)
             
             backup_conn.close()
             logger.info(f"数据库已备份到: {backup_path}")
@@ -428,13 +698,12 @@ class DatabaseManager:
             return None
         
         try:
-            # 获取表结构
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = self.cursor.fetchall()
-            
-            # 获取记录数
-            self.cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = self.cursor.fetchone()[0]
+            with self.pool.reader() as conn:
+                # 获取表结构
+                columns = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+                
+                # 获取记录数
+                count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
             
             return {
                 "table_name": table_name,
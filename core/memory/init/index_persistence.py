@@ -0,0 +1,253 @@
+"""
+向量索引持久化 - 脏标记、检查点策略和追加式增量日志
+每次写入只追加一条增量记录（O(1)），完整索引按数量/时间阈值定期落盘，
+加载时先读快照再重放增量日志
+"""
+
+import os
+import time
+import zlib
+import struct
+import logging
+import threading
+from typing import Iterator, Tuple, Optional
+
+import numpy as np
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.vector")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.vector")
+
+# 日志文件格式:
+#   文件头: magic(4s) + version(H) + vector_dim(I) + base(I)
+#   记录:   op(c) + internal_id(q) + id_len(H) + external_id(utf-8) [+ vector(float32 * dim)]
+# base为日志所基于的索引快照的校验和，与当前快照不符的日志已经过时
+DELTA_MAGIC = b"EIDL"
+DELTA_VERSION = 2
+HEADER_STRUCT = struct.Struct("<4sHII")
+LEGACY_HEADER_STRUCT = struct.Struct("<4sHI")  # 版本1没有base
+
+
+def file_checksum(path: str, chunk_size: int = 1 << 20) -> int:
+    """
+    分块计算文件的CRC32校验和，用于确认索引文件与.meta、增量日志属于同一个快照
+
+    参数:
+        path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    返回:
+        int: 校验和
+    """
+    checksum = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return checksum
+            checksum = zlib.crc32(chunk, checksum)
+RECORD_STRUCT = struct.Struct("<cqH")
+
+OP_ADD = b"A"
+OP_DELETE = b"D"
+
+
+class CheckpointPolicy:
+    """
+    检查点策略：满足任一条件即触发完整保存
+    - 未落盘的操作数达到 max_pending_ops
+    - 距上次检查点超过 max_interval 秒
+    - 增量日志大小超过 max_log_bytes
+    """
+
+    def __init__(self, max_pending_ops: int = 1000, max_interval: float = 300.0,
+                 max_log_bytes: int = 64 * 1024 * 1024):
+        self.max_pending_ops = max_pending_ops
+        self.max_interval = max_interval
+        self.max_log_bytes = max_log_bytes
+
+    def should_checkpoint(self, pending_ops: int, last_checkpoint: float, log_bytes: int) -> bool:
+        """
+        判断是否需要执行检查点
+
+        参数:
+            pending_ops: 上次检查点之后的操作数
+            last_checkpoint: 上次检查点时间戳
+            log_bytes: 当前增量日志大小
+
+        返回:
+            bool: 是否需要完整保存
+        """
+        if pending_ops <= 0:
+            return False
+        if pending_ops >= self.max_pending_ops:
+            return True
+        if log_bytes >= self.max_log_bytes:
+            return True
+        return time.time() - last_checkpoint >= self.max_interval
+
+
+class IndexDeltaLog:
+    """追加式增量日志，记录检查点之后的向量添加和删除"""
+
+    def __init__(self, path: str, vector_dim: int, sync: bool = False):
+        """
+        初始化增量日志
+
+        参数:
+            path: 日志文件路径
+            vector_dim: 向量维度
+            sync: 每次追加后是否fsync（更安全但更慢）
+        """
+        self.path = path
+        self.vector_dim = vector_dim
+        self.sync = sync
+        self.base = 0  # 当前索引快照的校验和，没有快照时为0
+        self._file = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """当前日志大小（字节）"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _open(self):
+        """以追加模式打开日志，必要时写入文件头"""
+        if self._file is not None:
+            return
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "ab")
+        if is_new:
+            self._file.write(HEADER_STRUCT.pack(DELTA_MAGIC, DELTA_VERSION, self.vector_dim, self.base))
+            self._file.flush()
+
+    def append_adds(self, internal_ids, external_ids, vectors: np.ndarray):
+        """
+        追加一批添加记录
+
+        参数:
+            internal_ids: 内部索引ID序列
+            external_ids: 外部记忆ID序列
+            vectors: 向量数组，形状为 (n, vector_dim)
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        buffer = bytearray()
+        for internal_id, external_id, vector in zip(internal_ids, external_ids, vectors):
+            encoded = str(external_id).encode("utf-8")
+            buffer += RECORD_STRUCT.pack(OP_ADD, int(internal_id), len(encoded))
+            buffer += encoded
+            buffer += vector.tobytes()
+        self._append(buffer)
+
+    def append_deletes(self, internal_ids, external_ids):
+        """
+        追加一批删除记录
+
+        参数:
+            internal_ids: 内部索引ID序列
+            external_ids: 外部记忆ID序列
+        """
+        buffer = bytearray()
+        for internal_id, external_id in zip(internal_ids, external_ids):
+            encoded = str(external_id).encode("utf-8")
+            buffer += RECORD_STRUCT.pack(OP_DELETE, int(internal_id), len(encoded))
+            buffer += encoded
+        self._append(buffer)
+
+    def _append(self, buffer: bytes):
+        if not buffer:
+            return
+        with self._lock:
+            self._open()
+            self._file.write(buffer)
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+
+    def replay(self) -> Iterator[Tuple[bytes, int, str, Optional[np.ndarray]]]:
+        """
+        按顺序读取日志记录，末尾不完整的记录（写入中断）会被截断；
+        基于其他快照的日志（替换快照后未及清空）已经过时，直接删除
+
+        返回:
+            Iterator: (op, internal_id, external_id, vector) 元组，删除记录的vector为None
+        """
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        if len(data) < LEGACY_HEADER_STRUCT.size:
+            return
+
+        magic, version, vector_dim = LEGACY_HEADER_STRUCT.unpack_from(data, 0)
+        if magic != DELTA_MAGIC or version not in (1, DELTA_VERSION):
+            logger.warning(f"增量日志格式不匹配，忽略: {self.path}")
+            return
+        if vector_dim != self.vector_dim:
+            logger.warning(f"增量日志维度不匹配 (日志: {vector_dim}, 索引: {self.vector_dim})，忽略")
+            return
+
+        offset = LEGACY_HEADER_STRUCT.size
+        if version == DELTA_VERSION:
+            if len(data) < HEADER_STRUCT.size:
+                return
+            base = HEADER_STRUCT.unpack_from(data, 0)[3]
+            if base != self.base:
+                logger.warning(f"增量日志基于其他索引快照，已丢弃: {self.path}")
+                self.reset()
+                return
+            offset = HEADER_STRUCT.size
+
+        vector_bytes = vector_dim * 4
+        valid_end = offset
+        while offset + RECORD_STRUCT.size <= len(data):
+            op, internal_id, id_len = RECORD_STRUCT.unpack_from(data, offset)
+            cursor = offset + RECORD_STRUCT.size
+            if cursor + id_len > len(data):
+                break
+            external_id = data[cursor:cursor + id_len].decode("utf-8")
+            cursor += id_len
+
+            vector = None
+            if op == OP_ADD:
+                if cursor + vector_bytes > len(data):
+                    break
+                vector = np.frombuffer(data, dtype=np.float32, count=vector_dim, offset=cursor)
+                cursor += vector_bytes
+            elif op != OP_DELETE:
+                logger.warning(f"增量日志在偏移 {offset} 处损坏，停止重放")
+                break
+
+            yield op, internal_id, external_id, vector
+            offset = valid_end = cursor
+
+        if valid_end < len(data):
+            logger.warning(f"增量日志末尾有 {len(data) - valid_end} 字节不完整记录，已截断")
+            self.close()
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+
+    def reset(self):
+        """检查点完成后清空日志"""
+        with self._lock:
+            self.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def close(self):
+        """关闭日志文件句柄"""
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
@@ -0,0 +1,342 @@
+"""
+向量索引策略 - 根据向量数量自动升级索引类型
+小规模使用Flat精确搜索；超过阈值后在后台从memory_vectors训练IVF-PQ或HNSW索引，
+训练期间的写入记录在日志中，完成后重放并原子替换
+"""
+
+import math
+import time
+import logging
+import threading
+from typing import Callable, Iterator, List, Optional, Tuple, Dict, Any
+
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.vector")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.vector")
+
+# 支持的索引类型
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+
+# 不支持remove_ids的索引类型，删除通过墓碑标记实现
+TOMBSTONE_INDEX_TYPES = ("hnsw",)
+
+
+def build_faiss_index(index_type: str, vector_dim: int, nlist: int = 100,
+                      pq_m: int = 64, pq_nbits: int = 8, hnsw_m: int = 32,
+                      ef_construction: int = 40):
+    """
+    创建空的FAISS索引，统一使用内积度量
+
+    Flat/HNSW包装在IndexIDMap2中；IVF类索引原生支持自定义ID和删除
+    （IndexIDMap2的删除依赖子索引压缩位置，不适用于IVF），改用哈希直接映射以支持按ID取回向量
+
+    参数:
+        index_type: 索引类型，flat/ivf/ivfpq/hnsw
+        vector_dim: 向量维度
+        nlist: IVF聚类中心数量
+        pq_m: PQ子量化器数量（必须整除vector_dim）
+        pq_nbits: 每个子量化器的编码位数
+        hnsw_m: HNSW每个节点的连接数
+        ef_construction: HNSW构建时的搜索宽度
+
+    返回:
+        faiss.Index: 空索引（IVF类需要训练）
+    """
+    if index_type in ("ivf", "ivfpq"):
+        quantizer = faiss.IndexFlatIP(vector_dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, vector_dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            logger.info(f"创建FAISS IVF索引，维度: {vector_dim}，聚类中心: {nlist}")
+        else:
+            index = faiss.IndexIVFPQ(quantizer, vector_dim, nlist, pq_m, pq_nbits, faiss.METRIC_INNER_PRODUCT)
+            logger.info(f"创建FAISS IVF-PQ索引，维度: {vector_dim}，聚类中心: {nlist}，子量化器: {pq_m}x{pq_nbits}bit")
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+    elif index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(vector_dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = ef_construction
+        logger.info(f"创建FAISS HNSW索引，维度: {vector_dim}，连接数: {hnsw_m}")
+    else:
+        base = faiss.IndexFlatIP(vector_dim)
+        logger.info(f"创建FAISS Flat索引，维度: {vector_dim}")
+
+    return faiss.IndexIDMap2(base)
+
+
+def detect_index_type(index) -> str:
+    """
+    根据已加载的FAISS索引推断索引类型
+
+    参数:
+        index: FAISS索引（Flat/HNSW为IndexIDMap2包装）
+
+    返回:
+        str: flat/ivf/ivfpq/hnsw
+    """
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+class IndexPolicy:
+    """索引选择策略和检索参数"""
+
+    def __init__(self, promote_threshold: int = 200000, target_type: str = "ivfpq",
+                 nprobe: int = 16, ef_search: int = 64, ef_construction: int = 80,
+                 hnsw_m: int = 32, pq_m: Optional[int] = None, pq_nbits: int = 8,
+                 max_training_vectors: int = 100000, tombstone_ratio: float = 0.2):
+        """
+        初始化索引策略
+
+        参数:
+            promote_threshold: Flat索引向量数达到此值后升级
+            target_type: 升级目标类型，ivfpq/ivf/hnsw
+            nprobe: IVF检索时访问的聚类数（越大召回越高、越慢）
+            ef_search: HNSW检索宽度（越大召回越高、越慢）
+            ef_construction: HNSW构建宽度
+            hnsw_m: HNSW每个节点的连接数
+            pq_m: PQ子量化器数量，None则按维度自动选择
+            pq_nbits: PQ编码位数
+            max_training_vectors: IVF训练采样上限
+            tombstone_ratio: HNSW墓碑占比超过此值时重建
+        """
+        if target_type not in INDEX_TYPES or target_type == "flat":
+            raise ValueError(f"不支持的升级目标索引类型: {target_type}")
+        self.promote_threshold = promote_threshold
+        self.target_type = target_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.ef_construction = ef_construction
+        self.hnsw_m = hnsw_m
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.max_training_vectors = max_training_vectors
+        self.tombstone_ratio = tombstone_ratio
+
+    def target_for(self, index_type: str, ntotal: int, tombstones: int = 0) -> Optional[str]:
+        """
+        判断当前索引是否需要升级或重建
+
+        参数:
+            index_type: 当前索引类型
+            ntotal: 索引中的向量数（包括墓碑）
+            tombstones: 墓碑数量
+
+        返回:
+            Optional[str]: 需要构建的索引类型，None表示保持不变
+        """
+        if index_type == "flat" and ntotal >= self.promote_threshold:
+            return self.target_type
+        if index_type in TOMBSTONE_INDEX_TYPES and ntotal and tombstones / ntotal > self.tombstone_ratio:
+            return index_type
+        return None
+
+    def nlist_for(self, ntotal: int) -> int:
+        """按向量数选择IVF聚类数：约4*sqrt(n)，且保证每个聚类至少39个训练样本"""
+        nlist = int(4 * math.sqrt(max(ntotal, 1)))
+        nlist = min(nlist, max(1, min(ntotal, self.max_training_vectors) // 39))
+        return max(1, min(nlist, 65536))
+
+    def pq_m_for(self, vector_dim: int) -> int:
+        """选择PQ子量化器数量：整除维度、每个子空间不少于16维"""
+        if self.pq_m:
+            return self.pq_m
+        for m in range(max(1, vector_dim // 16), 0, -1):
+            if vector_dim % m == 0:
+                return m
+        return 1
+
+
+class IndexPromoter:
+    """
+    后台索引升级器
+
+    maybe_promote() 开销很小，可在每次写入后调用；需要升级时启动后台线程：
+    1. 通知索引管理器开始记录变更日志，拿到当前ID映射快照
+    2. 从memory_vectors分块读取向量（先采样训练，再分块添加）
+    3. 管理器在锁内重放训练期间的增删并替换索引，然后写检查点
+    """
+
+    def __init__(self, manager, vector_loader: Callable[[], Iterator[Tuple[List[str], np.ndarray]]],
+                 policy: Optional[IndexPolicy] = None):
+        """
+        初始化索引升级器
+
+        参数:
+            manager: VectorIndexManager实例
+            vector_loader: 返回 (记忆ID列表, 向量数组) 分块迭代器的函数
+            policy: 索引策略，None则使用默认策略
+        """
+        self.manager = manager
+        self.vector_loader = vector_loader
+        self.policy = policy or IndexPolicy()
+        self._thread = None
+        self._cancel = threading.Event()
+        self.stats = {
+            "promotions": 0,
+            "failures": 0,
+            "last_duration": 0.0,
+            "last_error": None
+        }
+
+        self.manager.set_search_params(nprobe=self.policy.nprobe, ef_search=self.policy.ef_search)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def maybe_promote(self) -> bool:
+        """
+        检查是否需要升级索引，需要时在后台线程中构建
+
+        返回:
+            bool: 是否启动了后台构建
+        """
+        if self.is_running or not self.manager.available or self.manager.index is None:
+            return False
+
+        target = self.policy.target_for(self.manager.index_type, self.manager.index.ntotal,
+                                        len(self.manager.tombstones))
+        if target is None:
+            return False
+
+        self._cancel.clear()
+        self._thread = threading.Thread(target=self.promote, args=(target,),
+                                        name="estia-index-promoter", daemon=True)
+        self._thread.start()
+        return True
+
+    def promote(self, index_type: Optional[str] = None) -> bool:
+        """
+        同步构建新索引并替换
+
+        参数:
+            index_type: 目标索引类型，None则使用策略的目标类型
+
+        返回:
+            bool: 是否成功替换
+        """
+        index_type = index_type or self.policy.target_type
+        snapshot = self.manager.begin_rebuild()
+        if snapshot is None:
+            logger.info("索引正在重建中，跳过")
+            return False
+
+        start_time = time.time()
+        try:
+            new_index = self._build(index_type, snapshot)
+            if new_index is None:
+                self.manager.abort_rebuild()
+                return False
+
+            self.manager.finish_rebuild(new_index, index_type)
+            duration = time.time() - start_time
+            self.stats["promotions"] += 1
+            self.stats["last_duration"] = duration
+            logger.info(f"✅ 向量索引已切换为 {index_type}，{len(snapshot)} 个向量，耗时 {duration:.1f}秒")
+            return True
+        except InterruptedError:
+            self.manager.abort_rebuild()
+            logger.info(f"{index_type} 索引构建已取消")
+            return False
+        except Exception as e:
+            self.manager.abort_rebuild()
+            self.stats["failures"] += 1
+            self.stats["last_error"] = str(e)
+            logger.error(f"构建 {index_type} 索引失败: {e}")
+            return False
+
+    def cancel(self, timeout: float = 5.0):
+        """取消正在进行的后台构建"""
+        if self.is_running:
+            self._cancel.set()
+            self._thread.join(timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取升级器统计信息"""
+        stats = dict(self.stats)
+        stats["running"] = self.is_running
+        return stats
+
+    def _iter_snapshot_vectors(self, snapshot: Dict[str, int]):
+        """按快照过滤存储的向量，产出 (内部ID数组, 归一化向量数组)"""
+        for memory_ids, vectors in self.vector_loader():
+            if self._cancel.is_set():
+                raise InterruptedError("索引构建已取消")
+            keep = [i for i, memory_id in enumerate(memory_ids) if memory_id in snapshot]
+            if not keep:
+                continue
+            chunk = np.array(vectors[keep], dtype=np.float32)
+            faiss.normalize_L2(chunk)
+            yield np.array([snapshot[memory_ids[i]] for i in keep], dtype=np.int64), chunk
+
+    def _build(self, index_type: str, snapshot: Dict[str, int]):
+        """
+        构建新索引
+
+        参数:
+            index_type: 索引类型
+            snapshot: 外部ID -> 内部ID 快照
+
+        返回:
+            faiss.Index: 构建好的索引，失败返回None
+        """
+        dim = self.manager.vector_dim
+        ntotal = len(snapshot)
+        policy = self.policy
+        nlist = policy.nlist_for(ntotal)
+        new_index = build_faiss_index(index_type, dim, nlist=nlist, pq_m=policy.pq_m_for(dim),
+                                      pq_nbits=policy.pq_nbits, hnsw_m=policy.hnsw_m,
+                                      ef_construction=policy.ef_construction)
+
+        # 第一遍：采样训练（仅IVF类索引需要）
+        if not new_index.is_trained:
+            rng = np.random.default_rng()
+            keep_prob = min(1.0, policy.max_training_vectors / max(ntotal, 1))
+            samples = []
+            for _, chunk in self._iter_snapshot_vectors(snapshot):
+                if keep_prob < 1.0:
+                    chunk = chunk[rng.random(len(chunk)) < keep_prob]
+                samples.append(chunk)
+            training = np.vstack(samples) if samples else np.empty((0, dim), dtype=np.float32)
+            if len(training) < nlist:
+                logger.warning(f"训练样本不足 ({len(training)} < {nlist})，放弃构建 {index_type} 索引")
+                return None
+            logger.info(f"训练 {index_type} 索引，样本数: {len(training)}")
+            new_index.train(training)
+            del samples, training
+
+        # 第二遍：分块添加
+        added = set()
+        for internal_ids, chunk in self._iter_snapshot_vectors(snapshot):
+            new_index.add_with_ids(chunk, internal_ids)
+            added.update(internal_ids.tolist())
+
+        # 快照中有、但数据库里没有向量的记录，从当前索引中取回
+        missing = [internal_id for internal_id in snapshot.values() if internal_id not in added]
+        if missing:
+            vectors = self.manager.reconstruct(missing)
+            if vectors is not None:
+                new_index.add_with_ids(vectors, np.array(missing, dtype=np.int64))
+            else:
+                logger.warning(f"{len(missing)} 个向量在数据库和当前索引中都不可用，已跳过")
+
+        return new_index
@@ -0,0 +1,250 @@
+"""
+数据库Schema迁移 - 按版本号顺序执行迁移，版本记录在 PRAGMA user_version 中
+每个迁移在单独的事务中执行，失败时回滚并停止后续迁移；迁移后更新查询规划器统计信息
+"""
+
+import time
+import logging
+import sqlite3
+from typing import Callable, List, NamedTuple, Optional
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.db")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.db")
+
+# memories表的完整列定义（列名, 类型, 旧表补列时的默认值）
+MEMORY_COLUMNS = (
+    ("id", "TEXT", None),
+    ("content", "TEXT", "''"),
+    ("type", "TEXT", "'memory'"),
+    ("role", "TEXT", "'user'"),
+    ("session_id", "TEXT", "''"),
+    ("timestamp", "REAL", "0.0"),
+    ("weight", "REAL", "1.0"),
+    ("group_id", "TEXT", "''"),
+    ("summary", "TEXT", "''"),
+    ("last_accessed", "REAL", "0.0"),
+    ("metadata", "TEXT", "'{}'"),
+)
+
+
+class Migration(NamedTuple):
+    """一个Schema版本"""
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def _table_columns(cursor, table: str) -> dict:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1]: (row[2] or "").upper() for row in cursor.fetchall()}
+
+
+def repair_legacy_memories(conn: sqlite3.Connection) -> bool:
+    """
+    修复旧版本的memories表：补齐缺失的列，把INTEGER类型的id改为TEXT
+
+    在建表和版本迁移之前执行（旧表缺少session_id等列时无法创建索引），表结构已是最新时不做任何修改。
+    id改为TEXT时保留原值（转为字符串），memory_vectors和memory_association中的引用本身就是TEXT，无需改写。
+
+    参数:
+        conn: 写连接
+
+    返回:
+        bool: 是否修改了表结构
+    """
+    cursor = conn.cursor()
+    if not _table_exists(cursor, "memories"):
+        return False
+
+    columns = _table_columns(cursor, "memories")
+    missing = [(name, col_type, default) for name, col_type, default in MEMORY_COLUMNS
+               if name not in columns]
+    integer_id = columns.get("id") == "INTEGER"
+    if not missing and not integer_id:
+        return False
+
+    try:
+        cursor.execute("BEGIN")
+        now = time.time()
+        for name, col_type, default in missing:
+            cursor.execute(f"ALTER TABLE memories ADD COLUMN {name} {col_type} DEFAULT {default}")
+            logger.info(f"memories表补充列: {name}")
+        # 时间字段不能使用动态默认值，补列后统一填当前时间
+        missing_names = {name for name, _, _ in missing}
+        for name in ("timestamp", "last_accessed"):
+            if name in missing_names:
+                cursor.execute(f"UPDATE memories SET {name} = ? WHERE {name} IS NULL OR {name} = 0", (now,))
+
+        if integer_id:
+            column_list = ", ".join(name for name, _, _ in MEMORY_COLUMNS)
+            cursor.execute('''
+                CREATE TABLE memories_new (
+                    id TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    session_id TEXT,
+                    timestamp REAL NOT NULL,
+                    weight REAL DEFAULT 1.0,
+                    group_id TEXT,
+                    summary TEXT,
+                    last_accessed REAL NOT NULL,
+                    metadata TEXT
+                )
+            ''')
+            cursor.execute(f'''
+                INSERT INTO memories_new ({column_list})
+                SELECT CAST(id AS TEXT), COALESCE(content, ''), COALESCE(type, 'memory'),
+                       COALESCE(role, 'user'), session_id, COALESCE(timestamp, ?), weight,
+                       group_id, summary, COALESCE(last_accessed, ?), metadata
+                FROM memories
+            ''', (now, now))
+            cursor.execute("DROP TABLE memories")
+            cursor.execute("ALTER TABLE memories_new RENAME TO memories")
+            logger.info("memories表id列已迁移为TEXT")
+
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"修复旧版memories表失败: {e}")
+        raise
+
+
+def _composite_indexes(cursor):
+    """按热点查询的过滤+排序列建立组合/覆盖索引，替换被其前缀覆盖的单列索引"""
+    # 会话窗口、评估器的会话内时间过滤
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_session_time ON memories(session_id, timestamp DESC)")
+    # 会话总结（type = 'summary' AND session_id IN …）
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_type_session "
+                   "ON memories(type, session_id, timestamp DESC)")
+    # 按重要度取记忆（weight DESC, timestamp DESC）
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_weight_time ON memories(weight DESC, timestamp DESC)")
+    # 分组内按角色过滤；包含timestamp和weight，分组统计只读索引
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_group_role ON memories(group_id, role, timestamp, weight)")
+    # 关联双向查找，strength放入索引以便直接过滤
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memory_association_pair "
+                   "ON memory_association(source_key, target_key, strength)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memory_association_reverse "
+                   "ON memory_association(target_key, source_key, strength)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memory_association_strength ON memory_association(strength)")
+    # 缓存条目按memory_id更新
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memory_cache_memory ON memory_cache(memory_id)")
+
+    for index in ("idx_memories_session", "idx_memories_group", "idx_memories_type",
+                  "idx_memory_association_source", "idx_memory_association_target"):
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def _vector_format(cursor):
+    """memory_vectors增加存储格式列，已有的向量都是原始float32"""
+    if "vector_format" not in _table_columns(cursor, "memory_vectors"):
+        cursor.execute("ALTER TABLE memory_vectors ADD COLUMN vector_format TEXT NOT NULL DEFAULT 'f32'")
+
+
+def _association_activation_index(cursor):
+    """后台维护按(last_activated, id)分块遍历关联"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memory_association_activated "
+                   "ON memory_association(last_activated, id)")
+
+
+def _maintenance_state(cursor):
+    """
+    后台维护任务的进度：上次完成衰减的时间（重启后衰减仍按实际经过的时间计算），
+    以及进行中那次衰减的开始时间和(last_activated, id)游标（中断后从游标继续，已衰减的关联不再重复衰减）
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS maintenance_state ("
+                   "job TEXT PRIMARY KEY, last_run REAL, "
+                   "run_started REAL, cursor_time REAL, cursor_id TEXT)")
+
+
+# 按版本号递增排列，新的迁移只能追加
+MIGRATIONS: List[Migration] = [
+    Migration(1, "composite_indexes", _composite_indexes),
+    Migration(2, "vector_format", _vector_format),
+    Migration(3, "association_activation_index", _association_activation_index),
+    Migration(4, "maintenance_state", _maintenance_state),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """读取当前Schema版本"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection,
+                       migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    """返回尚未执行的迁移"""
+    current = get_schema_version(conn)
+    return [m for m in (migrations or MIGRATIONS) if m.version > current]
+
+
+def run_migrations(conn: sqlite3.Connection,
+                   migrations: Optional[List[Migration]] = None,
+                   target: Optional[int] = None) -> List[Migration]:
+    """
+    执行所有未执行的迁移（到target版本为止）
+
+    参数:
+        conn: 写连接（表已创建）
+        migrations: 迁移列表，默认使用MIGRATIONS
+        target: 目标版本，None表示最新
+
+    返回:
+        List[Migration]: 本次执行的迁移
+
+    异常:
+        迁移失败时回滚该迁移并抛出异常，之前已完成的迁移保留
+    """
+    applied = []
+    for migration in pending_migrations(conn, migrations):
+        if target is not None and migration.version > target:
+            break
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            migration.apply(cursor)
+            # user_version不能使用参数绑定
+            cursor.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Schema迁移失败 v{migration.version} ({migration.name}): {e}")
+            raise
+        applied.append(migration)
+        logger.info(f"Schema迁移完成 v{migration.version} ({migration.name})")
+
+    if applied:
+        # 新索引需要统计信息，规划器才能在单列索引和组合索引之间正确选择
+        analyze(conn)
+    return applied
+
+
+def analyze(conn: sqlite3.Connection):
+    """更新查询规划器的统计信息"""
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def optimize(conn: sqlite3.Connection):
+    """
+    PRAGMA optimize：只对统计信息过期的表重新ANALYZE，开销很小，
+    建议在初始化后和关闭连接前执行
+    """
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        logger.debug(f"PRAGMA optimize失败: {e}")
@@ -0,0 +1,342 @@
+"""
+查询注册表 - 集中管理命名SQL语句，并统计每条语句的调用次数和延迟分布
+IN (?, ?, …) 列表按固定档位补齐长度，相同语句文本可以命中sqlite3的语句缓存
+"""
+
+import bisect
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.db")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.db")
+
+# IN列表长度档位，超过最大档位时按最大档位的整数倍补齐
+IN_LIST_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# 记忆字段组合
+_MEMORY_COLUMNS = "id, content, type, role, session_id, timestamp, weight, group_id, summary, last_accessed, metadata"
+_STARTUP_COLUMNS = "id, content, type, role, weight, group_id, summary, timestamp, last_accessed"
+
+# 命名语句。{ids} 为IN列表占位，绑定顺序为：普通参数、IN列表、尾部参数
+QUERIES = {
+    # ---- memory_store ----
+    "store.full_vectors": "SELECT memory_id, vector, vector_format FROM memory_vectors WHERE memory_id IN ({ids})",
+    "store.search_details": """
+        SELECT m.id as memory_id, m.content, m.role as source, m.timestamp as created_at,
+               m.weight as importance, m.metadata
+        FROM memories m
+        WHERE m.id IN ({ids})
+        ORDER BY m.timestamp DESC
+    """,
+    "store.memories_by_ids": """
+        SELECT id, content, type, role, session_id, timestamp, weight, group_id, summary, metadata
+        FROM memories WHERE id IN ({ids})
+        ORDER BY timestamp DESC
+    """,
+
+    # ---- history ----
+    "history.memories_by_ids": f"""
+        SELECT {_MEMORY_COLUMNS}
+        FROM memories
+        WHERE id IN ({{ids}})
+        ORDER BY timestamp DESC
+    """,
+    # 每个会话最近的N条记忆（尾部参数：每会话条数、总行数上限）
+    "history.session_windows": f"""
+        SELECT {_MEMORY_COLUMNS}, row_order
+        FROM (
+            SELECT {_MEMORY_COLUMNS}, rowid AS row_order,
+                   ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY timestamp DESC, rowid DESC) AS rn
+            FROM memories
+            WHERE session_id IN ({{ids}}) AND type != 'summary'
+        )
+        WHERE rn <= ?
+        ORDER BY rn
+        LIMIT ?
+    """,
+    # 每个会话最近的N条总结（尾部参数：每会话条数、总行数上限）
+    "history.session_summaries": """
+        SELECT session_id, content, timestamp, weight, metadata
+        FROM (
+            SELECT session_id, content, timestamp, weight, metadata,
+                   ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY timestamp DESC) AS rn
+            FROM memories
+            WHERE session_id IN ({ids}) AND type = 'summary'
+        )
+        WHERE rn <= ?
+        ORDER BY rn
+        LIMIT ?
+    """,
+    "history.group_summaries": """
+        SELECT group_id, summary, time_start, time_end, score, topic
+        FROM memory_group
+        WHERE group_id IN ({ids})
+    """,
+
+    # ---- smart_retriever ----
+    "retriever.memories_by_ids": f"""
+        SELECT {_STARTUP_COLUMNS}
+        FROM memories
+        WHERE id IN ({{ids}})
+        ORDER BY weight DESC, timestamp DESC
+    """,
+    "retriever.recent_excluding": f"""
+        SELECT {_STARTUP_COLUMNS}, 'recent' as source
+        FROM memories
+        WHERE id NOT IN ({{ids}})
+        ORDER BY timestamp DESC
+        LIMIT 5
+    """,
+    "retriever.important_excluding": f"""
+        SELECT {_STARTUP_COLUMNS}, 'important' as source
+        FROM memories
+        WHERE id NOT IN ({{ids}}) AND weight >= 6.0
+        ORDER BY weight DESC, timestamp DESC
+        LIMIT 3
+    """,
+
+    # ---- association network ----
+    "association.update": """
+        UPDATE memory_association
+        SET strength = ?, association_type = ?, last_activated = ?
+        WHERE id = ?
+    """,
+    # 关联图扩展结果的记忆详情
+    "association.memories": """
+        SELECT id, content, role, timestamp, weight, metadata
+        FROM memories WHERE id IN ({ids})
+    """,
+    # 关联构建：候选记忆的向量，以及新记忆与候选之间已有的关联（两个方向）
+    "association.candidate_vectors": """
+        SELECT memory_id, vector, vector_format FROM memory_vectors WHERE memory_id IN ({ids})
+    """,
+    "association.pairs_from": """
+        SELECT target_key, id FROM memory_association WHERE source_key = ? AND target_key IN ({ids})
+    """,
+    "association.pairs_to": """
+        SELECT source_key, id FROM memory_association WHERE target_key = ? AND source_key IN ({ids})
+    """,
+    # 延迟写入的关联激活时间，按记忆executemany（两个方向分别走各自的索引）
+    "association.touch_source": """
+        UPDATE memory_association SET last_activated = MAX(last_activated, ?) WHERE source_key = ?
+    """,
+    "association.touch_target": """
+        UPDATE memory_association SET last_activated = MAX(last_activated, ?) WHERE target_key = ?
+    """,
+
+    # ---- maintenance ----
+    # 长时间未激活的关联，按(last_activated, id)键集分页
+    "maintenance.stale_associations": """
+        SELECT id, source_key, target_key, strength, last_activated
+        FROM memory_association
+        WHERE last_activated < ? AND (last_activated, id) > (?, ?)
+        ORDER BY last_activated, id
+        LIMIT ?
+    """,
+    # 衰减时强度不低于下限，等于下限的关联同样删除
+    "maintenance.weak_associations": """
+        SELECT id, source_key, target_key FROM memory_association WHERE strength <= ? LIMIT ?
+    """,
+    # 一个记忆两个方向的全部关联，强度从高到低
+    "maintenance.memory_associations": """
+        SELECT id, source_key, target_key, strength FROM memory_association WHERE source_key = ?
+        UNION ALL
+        SELECT id, source_key, target_key, strength FROM memory_association WHERE target_key = ?
+        ORDER BY strength DESC
+    """,
+    "maintenance.set_strength": "UPDATE memory_association SET strength = ? WHERE id = ?",
+    "maintenance.delete_association": "DELETE FROM memory_association WHERE id = ?",
+    "maintenance.state": """
+        SELECT last_run, run_started, cursor_time, cursor_id FROM maintenance_state WHERE job = ?
+    """,
+    # 与衰减的分块在同一事务中记录进度
+    "maintenance.save_progress": """
+        INSERT INTO maintenance_state (job, run_started, cursor_time, cursor_id) VALUES (?, ?, ?, ?)
+        ON CONFLICT(job) DO UPDATE SET
+            run_started = excluded.run_started, cursor_time = excluded.cursor_time, cursor_id = excluded.cursor_id
+    """,
+    "maintenance.finish_run": """
+        INSERT INTO maintenance_state (job, last_run) VALUES (?, ?)
+        ON CONFLICT(job) DO UPDATE SET
+            last_run = excluded.last_run, run_started = NULL, cursor_time = NULL, cursor_id = NULL
+    """,
+
+    # ---- cache_manager ----
+    "cache.memory_weight": "SELECT weight FROM memories WHERE id = ?",
+    "cache.update_entry": """
+        UPDATE memory_cache
+        SET cache_level = ?, priority = ?, access_count = ?, last_accessed = ?
+        WHERE memory_id = ?
+    """,
+    "cache.insert_entry": """
+        INSERT INTO memory_cache (id, memory_id, cache_level, priority, access_count, last_accessed)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+
+    # ---- async_evaluator ----
+    "evaluator.ungrouped_session_memories": """
+        SELECT id FROM memories
+        WHERE session_id = ?
+          AND timestamp > ?
+          AND (group_id IS NULL OR group_id = '')
+          AND (
+            content LIKE ? OR
+            metadata LIKE ? OR
+            type = 'user_input' OR type = 'assistant_reply'
+          )
+        ORDER BY timestamp DESC
+        LIMIT 10
+    """,
+    "evaluator.assign_group": "UPDATE memories SET group_id = ? WHERE id IN ({ids})",
+    "evaluator.group_by_id": "SELECT group_id, time_start, time_end, summary FROM memory_group WHERE group_id = ?",
+    "evaluator.group_statistics": """
+        SELECT COUNT(*) as memory_count,
+               AVG(weight) as avg_weight,
+               MIN(timestamp) as earliest_time,
+               MAX(timestamp) as latest_time
+        FROM memories
+        WHERE group_id = ?
+    """,
+}
+
+
+def bucket_size(count: int) -> int:
+    """
+    计算IN列表补齐后的长度
+
+    参数:
+        count: 实际元素个数
+
+    返回:
+        int: 档位长度
+    """
+    if count <= IN_LIST_BUCKETS[-1]:
+        return IN_LIST_BUCKETS[bisect.bisect_left(IN_LIST_BUCKETS, count)]
+    largest = IN_LIST_BUCKETS[-1]
+    return -(-count // largest) * largest
+
+
+class QueryStats:
+    """单条语句的调用统计（保留最近window次的延迟用于计算分位数）"""
+
+    def __init__(self, window: int = 2048):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, elapsed: float, error: bool = False):
+        self.calls += 1
+        self.errors += int(error)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.latencies.append(elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = np.percentile(self.latencies, [50, 95, 99]) if self.latencies else (0.0, 0.0, 0.0)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_time * 1000, 2),
+            "avg_ms": round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": round(float(p50) * 1000, 3),
+            "p95_ms": round(float(p95) * 1000, 3),
+            "p99_ms": round(float(p99) * 1000, 3),
+            "max_ms": round(self.max_time * 1000, 3),
+        }
+
+
+class QueryRegistry:
+    """命名SQL语句注册表"""
+
+    def __init__(self, queries: Optional[Dict[str, str]] = None, window: int = 2048):
+        """
+        初始化查询注册表
+
+        参数:
+            queries: 初始语句，默认使用QUERIES
+            window: 每条语句保留的延迟样本数
+        """
+        self._queries = dict(QUERIES if queries is None else queries)
+        self._window = window
+        self._stats: Dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, sql: str):
+        """注册（或覆盖）一条命名语句"""
+        self._queries[name] = sql
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def render(self, name: str, params: Optional[Sequence] = None,
+               in_values: Optional[Sequence] = None,
+               trailing: Optional[Sequence] = None) -> Tuple[str, List]:
+        """
+        生成可执行的SQL和参数
+
+        参数:
+            name: 语句名
+            params: 普通参数（绑定在IN列表之前）
+            in_values: IN列表的值，按档位用最后一个值补齐
+            trailing: 尾部参数（绑定在IN列表之后）
+
+        返回:
+            (SQL, 参数列表)
+        """
+        if name not in self._queries:
+            raise KeyError(f"未注册的查询: {name}")
+        sql = self._queries[name]
+        bound = list(params or ())
+
+        if "{ids}" in sql:
+            values = list(in_values or ())
+            if not values:
+                raise ValueError(f"查询 {name} 需要非空的IN列表")
+            size = bucket_size(len(values))
+            sql = sql.replace("{ids}", ",".join("?" * size))
+            bound.extend(values + [values[-1]] * (size - len(values)))
+        bound.extend(trailing or ())
+        return sql, bound
+
+    def record(self, name: str, elapsed: float, error: bool = False):
+        """记录一次执行耗时"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = QueryStats(self._window)
+            stats.record(elapsed, error)
+
+    def get_stats(self, sort_by: str = "total_ms") -> Dict[str, Dict[str, Any]]:
+        """
+        获取所有语句的统计信息
+
+        参数:
+            sort_by: 排序字段（降序），如 total_ms / p95_ms / calls
+
+        返回:
+            Dict[str, Dict[str, Any]]: 语句名到统计信息的映射
+        """
+        with self._lock:
+            snapshots = {name: stats.snapshot() for name, stats in self._stats.items()}
+        return dict(sorted(snapshots.items(), key=lambda item: item[1].get(sort_by, 0), reverse=True))
+
+    def slow_queries(self, threshold_ms: float = 50.0) -> Dict[str, Dict[str, Any]]:
+        """返回p95延迟超过阈值的语句"""
+        return {name: stats for name, stats in self.get_stats("p95_ms").items()
+                if stats["p95_ms"] >= threshold_ms}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,296 @@
+"""
+向量编码 - memory_vectors.vector 的存储格式
+支持 f32（原始float32，旧数据）、f16（半精度，体积减半）和 i8（每个向量一个float32缩放系数 + int8，
+体积约为四分之一）；格式记录在 memory_vectors.vector_format 列中。
+批量读取时把同一格式的BLOB拼接后一次 np.frombuffer 解码，直接写入预分配的数组
+"""
+
+import logging
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.vector")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.vector")
+
+# 支持的存储格式；未记录格式的旧数据视为 f32
+VECTOR_FORMATS = ("f32", "f16", "i8")
+LEGACY_VECTOR_FORMAT = "f32"
+DEFAULT_VECTOR_FORMAT = "f16"
+
+# 固定小端序，数据库文件可以跨平台复制
+_ELEMENT_TYPES = {"f32": np.dtype("<f4"), "f16": np.dtype("<f2")}
+_SCALE_TYPE = np.dtype("<f4")
+_INT8_MAX = 127
+
+
+def _check_format(vector_format: str):
+    if vector_format not in VECTOR_FORMATS:
+        raise ValueError(f"不支持的向量格式: {vector_format}")
+
+
+def _int8_record(dim: int) -> np.dtype:
+    """i8格式的单条记录：缩放系数 + dim个int8"""
+    return np.dtype([("scale", _SCALE_TYPE), ("values", np.int8, (dim,))])
+
+
+def encoded_size(vector_format: str, dim: int) -> int:
+    """
+    单个向量编码后的字节数
+
+    参数:
+        vector_format: 存储格式
+        dim: 向量维度
+
+    返回:
+        int: 字节数
+    """
+    _check_format(vector_format)
+    if vector_format == "i8":
+        return _SCALE_TYPE.itemsize + dim
+    return _ELEMENT_TYPES[vector_format].itemsize * dim
+
+
+def blob_dim(size: int, vector_format: str) -> int:
+    """根据BLOB长度推算向量维度"""
+    _check_format(vector_format)
+    if vector_format == "i8":
+        return size - _SCALE_TYPE.itemsize
+    return size // _ELEMENT_TYPES[vector_format].itemsize
+
+
+def encode_vectors(vectors: np.ndarray, vector_format: str = DEFAULT_VECTOR_FORMAT) -> List[bytes]:
+    """
+    批量编码向量
+
+    参数:
+        vectors: (n, dim) 向量数组
+        vector_format: 存储格式
+
+    返回:
+        List[bytes]: 每个向量的BLOB
+    """
+    _check_format(vector_format)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    n, dim = vectors.shape
+
+    if vector_format == "i8":
+        # 对称量化：每个向量按最大绝对值缩放到[-127, 127]
+        scales = np.abs(vectors).max(axis=1) / _INT8_MAX
+        scales[scales == 0] = 1.0
+        records = np.empty(n, dtype=_int8_record(dim))
+        records["scale"] = scales
+        records["values"] = np.clip(np.rint(vectors / scales[:, None]), -_INT8_MAX, _INT8_MAX)
+        encoded = records.tobytes()
+    else:
+        encoded = vectors.astype(_ELEMENT_TYPES[vector_format]).tobytes()
+
+    size = len(encoded) // n if n else 0
+    return [encoded[i * size:(i + 1) * size] for i in range(n)]
+
+
+def encode_vector(vector: np.ndarray, vector_format: str = DEFAULT_VECTOR_FORMAT) -> bytes:
+    """编码单个向量"""
+    return encode_vectors(np.asarray(vector).reshape(1, -1), vector_format)[0]
+
+
+def decode_into(blobs: Sequence[bytes], vector_format: str, out: np.ndarray):
+    """
+    把同一格式、同一维度的BLOB解码到预分配的数组中
+
+    参数:
+        blobs: BLOB列表（长度必须与out的行数一致）
+        vector_format: 存储格式
+        out: (len(blobs), dim) float32数组
+    """
+    _check_format(vector_format)
+    if not len(blobs):
+        return
+    dim = out.shape[1]
+    data = b"".join(blobs)
+
+    if vector_format == "i8":
+        records = np.frombuffer(data, dtype=_int8_record(dim))
+        np.multiply(records["values"], records["scale"][:, None], out=out, casting="unsafe")
+    else:
+        out[...] = np.frombuffer(data, dtype=_ELEMENT_TYPES[vector_format]).reshape(len(blobs), dim)
+
+
+def decode_vector(blob: bytes, vector_format: Optional[str] = None) -> np.ndarray:
+    """
+    解码单个向量
+
+    参数:
+        blob: 向量BLOB
+        vector_format: 存储格式，None视为旧的f32
+
+    返回:
+        np.ndarray: float32向量
+    """
+    vector_format = vector_format or LEGACY_VECTOR_FORMAT
+    out = np.empty((1, blob_dim(len(blob), vector_format)), dtype=np.float32)
+    decode_into([blob], vector_format, out)
+    return out[0]
+
+
+def decode_rows(rows, vector_dim: Optional[int] = None,
+                out: Optional[np.ndarray] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    批量解码 (memory_id, vector, vector_format) 行
+
+    按格式分组后每组一次frombuffer；维度与vector_dim不符或为空的行被跳过。
+
+    参数:
+        rows: 数据库行
+        vector_dim: 向量维度，None则取第一条有效记录的维度
+        out: 可选的预分配数组（行数不少于len(rows)），结果写入其前若干行
+
+    返回:
+        (记忆ID列表, 向量数组)
+    """
+    groups = {}
+    for row in rows:
+        blob, vector_format = row[1], row[2] or LEGACY_VECTOR_FORMAT
+        if not blob or vector_format not in VECTOR_FORMATS:
+            continue
+        dim = blob_dim(len(blob), vector_format)
+        if vector_dim is None:
+            vector_dim = dim
+        if dim != vector_dim or len(blob) != encoded_size(vector_format, vector_dim):
+            continue
+        groups.setdefault(vector_format, []).append(row)
+
+    count = sum(len(group) for group in groups.values())
+    if out is None:
+        out = np.empty((count, vector_dim or 0), dtype=np.float32)
+    memory_ids = []
+    for vector_format, group in groups.items():
+        start = len(memory_ids)
+        decode_into([row[1] for row in group], vector_format, out[start:start + len(group)])
+        memory_ids.extend(row[0] for row in group)
+    return memory_ids, out[:count]
+
+
+def iter_vector_chunks(db_manager, vector_dim: int,
+                       chunk_size: int = 5000) -> Iterator[Tuple[List[str], np.ndarray]]:
+    """
+    按rowid分块读取memory_vectors，每块只短暂占用数据库连接
+
+    参数:
+        db_manager: 数据库管理器
+        vector_dim: 向量维度，维度不符的记录会被跳过
+        chunk_size: 每块行数
+
+    返回:
+        Iterator: (记忆ID列表, 向量数组) 元组
+    """
+    last_rowid = 0
+    while True:
+        rows = db_manager.query(
+            "SELECT rowid, memory_id, vector, vector_format FROM memory_vectors "
+            "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, chunk_size)
+        )
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+
+        memory_ids, vectors = decode_rows([row[1:] for row in rows], vector_dim)
+        if memory_ids:
+            yield memory_ids, vectors
+
+        if len(rows) < chunk_size:
+            return
+
+
+def load_all_vectors(db_manager, vector_dim: int,
+                     chunk_size: int = 5000) -> Tuple[List[str], np.ndarray]:
+    """
+    把memory_vectors中的全部向量读入一个预分配的数组（用于重建索引）
+
+    参数:
+        db_manager: 数据库管理器
+        vector_dim: 向量维度
+        chunk_size: 每次读取的行数
+
+    返回:
+        (记忆ID列表, (n, vector_dim) float32数组)
+    """
+    rows = db_manager.query("SELECT COUNT(*) FROM memory_vectors")
+    total = rows[0][0] if rows else 0
+    vectors = np.empty((total, vector_dim), dtype=np.float32)
+    memory_ids: List[str] = []
+
+    last_rowid = 0
+    while len(memory_ids) < total:
+        rows = db_manager.query(
+            "SELECT rowid, memory_id, vector, vector_format FROM memory_vectors "
+            "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, min(chunk_size, total - len(memory_ids)))
+        )
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        chunk_ids, _ = decode_rows([row[1:] for row in rows], vector_dim, vectors[len(memory_ids):])
+        memory_ids.extend(chunk_ids)
+
+    return memory_ids, vectors[:len(memory_ids)]
+
+
+def convert_vector_format(db_manager, vector_format: str, chunk_size: int = 2000) -> int:
+    """
+    把memory_vectors中其他格式的向量重新编码为指定格式
+
+    参数:
+        db_manager: 数据库管理器
+        vector_format: 目标格式
+        chunk_size: 每个事务处理的行数
+
+    返回:
+        int: 转换的行数
+    """
+    _check_format(vector_format)
+    converted = 0
+    last_rowid = 0
+    while True:
+        rows = db_manager.query(
+            "SELECT rowid, memory_id, vector, vector_format FROM memory_vectors "
+            "WHERE rowid > ? AND vector_format != ? ORDER BY rowid LIMIT ?",
+            (last_rowid, vector_format, chunk_size)
+        )
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+
+        # 同一块内可能有不同维度的旧数据，按维度分别编码
+        by_dim = {}
+        for row in rows:
+            if not row[2]:
+                continue
+            vector = decode_vector(row[2], row[3])
+            by_dim.setdefault(len(vector), []).append((row[0], vector))
+
+        updates = []
+        for items in by_dim.values():
+            blobs = encode_vectors(np.stack([vector for _, vector in items]), vector_format)
+            updates.extend((blob, vector_format, rowid) for (rowid, _), blob in zip(items, blobs))
+
+        with db_manager.transaction():
+            db_manager.executemany(
+                "UPDATE memory_vectors SET vector = ?, vector_format = ? WHERE rowid = ?", updates
+            )
+        converted += len(updates)
+
+        if len(rows) < chunk_size:
+            break
+
+    logger.info(f"已将 {converted} 条向量转换为 {vector_format} 格式")
+    return converted
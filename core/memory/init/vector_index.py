@@ -1,5 +1,6 @@
 """
 向量索引管理器 - 负责FAISS向量索引的初始化、管理和搜索
+同一索引文件在进程内只加载一份（get_shared_vector_index），写入路径和检索路径共享
 """
 
 import os
@@ -7,6 +8,7 @@ import numpy as np
 import pickle
 import time
 import logging
+import threading
 from typing import List, Dict, Any, Optional, Tuple, Union
 
 # 尝试导入FAISS
@@ -26,17 +28,32 @@ except ImportError:
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger("estia.memory.vector")
 
+from core.memory.init.index_persistence import CheckpointPolicy, IndexDeltaLog, OP_ADD, file_checksum
+from core.memory.init.index_policy import build_faiss_index, detect_index_type, TOMBSTONE_INDEX_TYPES
+from core.memory.init.vector_projection import VectorProjector
+
+# 索引文件格式版本：2 = 索引内ID即内部ID（IndexIDMap2或IVF）+ 归一化向量内积（余弦相似度）
+INDEX_FORMAT_VERSION = 2
+
 class VectorIndexManager:
-    """向量索引管理器类，负责FAISS向量索引的初始化、管理和搜索"""
+    """
+    向量索引管理器类，负责FAISS向量索引的初始化、管理和搜索
+    
+    FAISS中的ID即内部ID（Flat/HNSW包装在IndexIDMap2中，IVF原生支持），删除后不会错位；
+    向量写入前做L2归一化，用内积作为余弦相似度，检索分数统一在0-1之间；
+    配置了降维投影时索引只保存投影后的向量，检索多取候选后用完整向量精确重排
+    """
     
-    def __init__(self, index_path=None, vector_dim=768, index_type="flat"):
+    def __init__(self, index_path=None, vector_dim=768, index_type="flat",
+                 checkpoint_policy: Optional[CheckpointPolicy] = None):
         """
         初始化向量索引管理器
         
         参数:
             index_path: 索引文件路径，如果为None则使用默认路径
             vector_dim: 向量维度，默认为768（适用于大多数Transformer模型）
-            index_type: 索引类型，可选值为"flat"（精确搜索）、"ivf"（近似搜索）、"hnsw"（图索引）
+            index_type: 索引类型，可选值为"flat"（精确搜索）、"ivf"/"ivfpq"（近似搜索）、"hnsw"（图索引）
+            checkpoint_policy: 完整保存索引的检查点策略，None则使用默认策略
         """
         if not FAISS_AVAILABLE:
             logger.error("FAISS库未安装，向量索引管理器无法正常工作")
@@ -44,6 +61,8 @@ class VectorIndexManager:
             return
             
         self.available = True
+        # 后台写入线程与检索线程共享同一个索引
+        self._lock = threading.RLock()
         self.vector_dim = vector_dim
         self.index_type = index_type
         
@@ -57,7 +76,29 @@ class VectorIndexManager:
         self.index_path = index_path
         self.index = None
         self.id_map = {}  # 映射内部索引ID到外部记忆ID
+        self.reverse_map = {}  # 映射外部记忆ID到内部索引ID
         self.next_id = 0  # 下一个可用的内部索引ID
+        self.tombstones = set()  # 已删除但仍在索引中的内部ID（HNSW不支持删除）
+        
+        # 检索参数（召回/延迟权衡）
+        self.nprobe = 16
+        self.ef_search = 64
+        
+        # 后台重建期间的变更日志，None表示没有重建在进行
+        self._journal = None
+        
+        # 降维投影（scripts/reduce_index_dim.py生成），None表示索引保存完整向量
+        self.projection_path = index_path + ".proj.npz"
+        self.projector: Optional[VectorProjector] = None
+        # 按记忆ID取完整向量的回调（由MemoryStore提供），用于投影索引的精确重排
+        self.full_vector_loader = None
+        self.rerank_factor = 4
+        
+        # 增量持久化：写入只追加增量日志，完整索引按检查点策略落盘
+        self.delta_log = IndexDeltaLog(index_path + ".delta", vector_dim)
+        self.checkpoint_policy = checkpoint_policy or CheckpointPolicy()
+        self._pending_ops = 0  # 上次检查点之后未落盘的操作数
+        self._last_checkpoint = time.time()
         
         # 元数据
         self.metadata = {
@@ -65,6 +106,8 @@ class VectorIndexManager:
             "last_modified": time.time(),
             "vector_dim": vector_dim,
             "index_type": index_type,
+            "metric": "cosine",
+            "format_version": INDEX_FORMAT_VERSION,
             "vector_count": 0
         }
         
@@ -81,29 +124,21 @@ class VectorIndexManager:
             logger.error("FAISS库未安装，无法创建索引")
             return False
             
+        # 新索引不继承旧的增量记录
+        self.delta_log.reset()
+        self.delta_log.base = 0
+        return self._new_index()
+    
+    def _new_index(self):
+        """创建空索引并重置ID映射，不触碰增量日志"""
         try:
-            # 根据索引类型创建不同的索引
-            if self.index_type == "flat":
-                # 创建精确搜索索引（L2距离）
-                self.index = faiss.IndexFlatL2(self.vector_dim)
-                logger.info(f"创建FAISS Flat索引，维度: {self.vector_dim}")
-            elif self.index_type == "ivf":
-                # 创建IVF索引（近似搜索，需要训练）
-                quantizer = faiss.IndexFlatL2(self.vector_dim)
-                nlist = 100  # 聚类中心数量
-                self.index = faiss.IndexIVFFlat(quantizer, self.vector_dim, nlist, faiss.METRIC_L2)
-                logger.info(f"创建FAISS IVF索引，维度: {self.vector_dim}，聚类中心: {nlist}")
-            elif self.index_type == "hnsw":
-                # 创建HNSW索引（图索引，高效近似搜索）
-                self.index = faiss.IndexHNSWFlat(self.vector_dim, 32)  # 32是每个节点的连接数
-                logger.info(f"创建FAISS HNSW索引，维度: {self.vector_dim}")
-            else:
-                # 默认使用Flat索引
-                self.index = faiss.IndexFlatL2(self.vector_dim)
-                logger.info(f"创建默认FAISS Flat索引，维度: {self.vector_dim}")
+            self.index = self._build_index()
+            self._apply_search_params()
                 
             # 重置ID映射
             self.id_map = {}
+            self.reverse_map = {}
+            self.tombstones = set()
             self.next_id = 0
             
             # 更新元数据
@@ -111,11 +146,23 @@ class VectorIndexManager:
             self.metadata["last_modified"] = time.time()
             self.metadata["vector_count"] = 0
             
+            self._pending_ops = 0
+            self._last_checkpoint = time.time()
+            
             return True
         except Exception as e:
             logger.error(f"创建FAISS索引失败: {e}")
             return False
     
+    def _build_index(self):
+        """
+        按索引类型创建空索引，统一使用内积度量
+        
+        返回:
+            faiss.Index: 空索引
+        """
+        return build_faiss_index(self.index_type, self.vector_dim)
+    
     def load_index(self):
         """
         加载已有的FAISS索引
@@ -129,34 +176,164 @@ class VectorIndexManager:
             
         if not os.path.exists(self.index_path):
             logger.warning(f"索引文件不存在: {self.index_path}，将创建新索引")
-            return self.create_index()
+            # 首次检查点之前退出时，只有增量日志中有数据
+            if not self._new_index():
+                return False
+            self._replay_delta_log()
+            return True
             
         try:
             # 加载索引
             self.index = faiss.read_index(self.index_path)
             
-            # 加载ID映射和元数据
-            metadata_path = self.index_path + ".meta"
-            if os.path.exists(metadata_path):
-                with open(metadata_path, "rb") as f:
-                    data = pickle.load(f)
-                    self.id_map = data.get("id_map", {})
-                    self.next_id = data.get("next_id", 0)
-                    self.metadata = data.get("metadata", self.metadata)
-                    
-                    # 更新维度信息
-                    self.vector_dim = self.metadata.get("vector_dim", self.vector_dim)
-                    
-                    logger.info(f"加载索引元数据成功，包含 {self.metadata['vector_count']} 个向量")
+            # 加载与索引文件属于同一快照的ID映射和元数据
+            data = self._load_metadata()
+            if data is None:
+                return False
+            self.delta_log.base = data.get("checksum", 0)
+            
+            # 以索引文件中的实际维度为准
+            self.vector_dim = self.index.d
+            self.projector = VectorProjector.load(self.projection_path)
+            if self.projector is not None and self.projector.output_dim != self.vector_dim:
+                logger.error(f"投影维度 ({self.projector.output_dim}) 与索引维度 ({self.vector_dim}) 不一致，忽略投影")
+                self.projector = None
+            self.metadata["projection"] = self.projector.describe() if self.projector else None
+            self.delta_log.vector_dim = self.vector_dim
+            self.metadata["vector_dim"] = self.vector_dim
+            
+            upgraded = False
+            format_version = data.get("metadata", {}).get("format_version", 1)
+            if format_version >= INDEX_FORMAT_VERSION and "id_map" in data:
+                self.id_map = {int(k): v for k, v in data["id_map"].items()}
+                self.next_id = data.get("next_id", 0)
+                self.tombstones = set(data.get("tombstones", ()))
+                self.metadata.update(data.get("metadata", {}))
+                self.index_type = detect_index_type(self.index)
+                logger.info(f"加载索引元数据成功，包含 {self.metadata['vector_count']} 个向量")
             else:
-                logger.warning(f"索引元数据文件不存在: {metadata_path}")
+                # 旧版本索引（FAISSSearchEngine或位置ID的Flat索引），转换为统一格式
+                self._upgrade_legacy_index(data)
+                upgraded = True
+            self.reverse_map = {v: k for k, v in self.id_map.items()}
+            self.metadata["index_type"] = self.index_type
+            self._apply_search_params()
                 
+            self._pending_ops = 0
+            self._last_checkpoint = time.time()
+            self._replay_delta_log()
+            
+            if upgraded:
+                self.save_index()
+            
             logger.info(f"加载FAISS索引成功，维度: {self.index.d}")
             return True
         except Exception as e:
             logger.error(f"加载FAISS索引失败: {e}")
             return False
     
+    def _load_metadata(self) -> Optional[Dict[str, Any]]:
+        """
+        读取与索引文件匹配的.meta
+        
+        .meta中记录了写入时索引文件的校验和。保存在两次替换之间中断时，
+        索引文件和.meta分属新旧两个快照，此时用与索引文件匹配的.meta.tmp补上替换
+        
+        返回:
+            Optional[Dict[str, Any]]: .meta内容（没有.meta时为空字典），
+            索引文件与.meta不匹配时返回None
+        """
+        metadata_path = self.index_path + ".meta"
+        candidates = [path for path in (metadata_path, metadata_path + ".tmp") if os.path.exists(path)]
+        if not candidates:
+            logger.warning(f"索引元数据文件不存在: {metadata_path}")
+            return {}
+        
+        checksum = file_checksum(self.index_path)
+        for path in candidates:
+            try:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
+            except Exception as e:
+                logger.warning(f"读取索引元数据失败 {path}: {e}")
+                continue
+            # 旧版本的.meta没有校验和
+            if data.get("checksum", checksum) != checksum or data.get("ntotal", self.index.ntotal) != self.index.ntotal:
+                continue
+            if path != metadata_path:
+                os.replace(path, metadata_path)
+                logger.warning("上次保存在替换索引和元数据之间中断，已用新的元数据补全")
+            return data
+        
+        logger.error(f"索引文件与元数据不属于同一个快照，拒绝加载: {self.index_path}")
+        return None
+    
+    def _upgrade_legacy_index(self, data: Dict[str, Any]):
+        """
+        将旧格式索引转换为IndexIDMap2 + 余弦相似度格式
+        
+        旧格式中内部ID就是向量在索引中的位置：VectorIndexManager使用id_map字典，
+        FAISSSearchEngine使用memory_keys列表。向量从旧索引中取出后归一化重新添加
+        
+        参数:
+            data: 旧的.meta文件内容
+        """
+        legacy = self.index
+        ntotal = legacy.ntotal
+        
+        if "id_map" in data:
+            keys = {int(k): v for k, v in data["id_map"].items()}
+        else:
+            keys = dict(enumerate(data.get("memory_keys", [])))
+        
+        self.index_type = "flat"
+        self.index = self._build_index()
+        self.id_map = {}
+        self.reverse_map = {}
+        self.tombstones = set()
+        self.next_id = 0
+        
+        positions = [pos for pos in range(ntotal)
+                     if keys.get(pos) and not str(keys[pos]).startswith("unknown_")]
+        if positions:
+            try:
+                vectors = legacy.reconstruct_n(0, ntotal)[positions]
+                self._add_to_index(vectors, np.array(positions, dtype=np.int64),
+                                   [keys[pos] for pos in positions])
+            except Exception as e:
+                logger.error(f"旧索引向量无法导出，需要重建索引: {e}")
+                self.index = self._build_index()
+                self.id_map = {}
+                self.reverse_map = {}
+        self.next_id = max(self.next_id, max(keys) + 1 if keys else 0)
+        
+        self.metadata["metric"] = "cosine"
+        self.metadata["format_version"] = INDEX_FORMAT_VERSION
+        self.metadata["vector_count"] = self.index.ntotal
+        logger.info(f"旧格式索引已转换: {ntotal} -> {self.index.ntotal} 个向量")
+    
+    @property
+    def input_dim(self) -> int:
+        """写入和检索时接受的向量维度（有投影时为投影前的完整维度）"""
+        return self.projector.input_dim if self.projector is not None else self.vector_dim
+    
+    def set_projector(self, projector: Optional[VectorProjector]):
+        """
+        设置降维投影并保存；索引需要按投影后的维度重建（见scripts/reduce_index_dim.py）
+        
+        参数:
+            projector: 投影，None表示恢复为完整向量
+        """
+        with self._lock:
+            if projector is not None and projector.output_dim != self.vector_dim:
+                raise ValueError(f"投影维度 ({projector.output_dim}) 与索引维度 ({self.vector_dim}) 不一致")
+            self.projector = projector
+            self.metadata["projection"] = projector.describe() if projector else None
+            if projector is not None:
+                projector.save(self.projection_path)
+            elif os.path.exists(self.projection_path):
+                os.remove(self.projection_path)
+    
     def save_index(self):
         """
         保存FAISS索引到文件
@@ -169,21 +346,33 @@ class VectorIndexManager:
             return False
             
         try:
-            # 更新元数据
-            self.metadata["last_modified"] = time.time()
-            self.metadata["vector_count"] = self.index.ntotal
-            
-            # 保存索引
-            faiss.write_index(self.index, self.index_path)
-            
-            # 保存ID映射和元数据
-            metadata_path = self.index_path + ".meta"
-            with open(metadata_path, "wb") as f:
-                pickle.dump({
-                    "id_map": self.id_map,
-                    "next_id": self.next_id,
-                    "metadata": self.metadata
-                }, f)
+            with self._lock:
+                # 更新元数据
+                self.metadata["last_modified"] = time.time()
+                self.metadata["vector_count"] = self.index.ntotal
+                
+                # 先写临时文件再替换，避免中途退出留下半个索引；
+                # .meta记录索引文件的校验和，两次替换之间中断时加载可以发现并补全
+                metadata_path = self.index_path + ".meta"
+                faiss.write_index(self.index, self.index_path + ".tmp")
+                checksum = file_checksum(self.index_path + ".tmp")
+                with open(metadata_path + ".tmp", "wb") as f:
+                    pickle.dump({
+                        "id_map": self.id_map,
+                        "next_id": self.next_id,
+                        "tombstones": self.tombstones,
+                        "metadata": self.metadata,
+                        "checksum": checksum,
+                        "ntotal": self.index.ntotal
+                    }, f)
+                os.replace(self.index_path + ".tmp", self.index_path)
+                os.replace(metadata_path + ".tmp", metadata_path)
+                
+                # 快照已包含所有增量，清空日志；此前中断时旧日志的快照标记不符，加载时被丢弃
+                self.delta_log.base = checksum
+                self.delta_log.reset()
+                self._pending_ops = 0
+                self._last_checkpoint = time.time()
                 
             logger.info(f"保存FAISS索引成功: {self.index_path}")
             return True
@@ -191,6 +380,85 @@ class VectorIndexManager:
             logger.error(f"保存FAISS索引失败: {e}")
             return False
     
+    @property
+    def is_dirty(self) -> bool:
+        """是否有未写入完整快照的修改"""
+        return self._pending_ops > 0
+    
+    def maybe_checkpoint(self, force: bool = False) -> bool:
+        """
+        按检查点策略决定是否完整保存索引
+        
+        写入路径调用此方法代替save_index()，未达到阈值时修改只存在于增量日志中
+        
+        参数:
+            force: 是否忽略策略立即保存（仅在有未落盘修改时）
+            
+        返回:
+            bool: 是否执行了完整保存
+        """
+        if not self.available or self.index is None:
+            return False
+            
+        if force:
+            should_save = self.is_dirty
+        else:
+            should_save = self.checkpoint_policy.should_checkpoint(
+                self._pending_ops, self._last_checkpoint, self.delta_log.size
+            )
+        if not should_save:
+            return False
+            
+        logger.debug(f"触发索引检查点，未落盘操作: {self._pending_ops}")
+        return self.save_index()
+    
+    def _replay_delta_log(self) -> int:
+        """
+        将增量日志重放到当前索引
+        
+        快照中已经包含的记录（检查点后日志未及清空）会被跳过，重放是幂等的
+        
+        返回:
+            int: 重放的记录数
+        """
+        replayed = 0
+        add_ids, add_external, add_vectors = [], [], []
+        seen = set()
+        
+        def flush_adds():
+            if add_ids:
+                self._add_to_index(np.vstack(add_vectors), np.array(add_ids, dtype=np.int64), add_external)
+                add_ids.clear()
+                add_external.clear()
+                add_vectors.clear()
+        
+        try:
+            with self._lock:
+                for op, internal_id, external_id, vector in self.delta_log.replay():
+                    if op == OP_ADD:
+                        if internal_id < self.next_id or internal_id in seen:
+                            continue
+                        seen.add(internal_id)
+                        add_ids.append(internal_id)
+                        add_external.append(external_id)
+                        add_vectors.append(vector.reshape(1, -1))
+                    else:
+                        flush_adds()
+                        if internal_id not in self.id_map:
+                            continue
+                        self._remove_from_index([internal_id])
+                    replayed += 1
+                flush_adds()
+                
+                self._pending_ops = replayed
+                self.metadata["vector_count"] = self.index.ntotal
+        except Exception as e:
+            logger.error(f"重放增量日志失败: {e}")
+            
+        if replayed:
+            logger.info(f"从增量日志恢复 {replayed} 条索引修改")
+        return replayed
+    
     def add_vectors(self, vectors: np.ndarray, ids: List[str]) -> bool:
         """
         添加向量到索引
@@ -218,48 +486,26 @@ class VectorIndexManager:
             # 确保向量是float32类型，FAISS要求
             vectors = vectors.astype('float32')
             
+            # 降维投影：索引只保存投影后的向量
+            if self.projector is not None:
+                if vectors.shape[1] != self.projector.input_dim:
+                    logger.error(f"向量维度不匹配: 预期 {self.projector.input_dim}，实际 {vectors.shape[1]}")
+                    return False
+                vectors = self.projector.project(vectors)
+            
             # 检查向量维度
             if vectors.shape[1] != self.vector_dim:
                 logger.error(f"向量维度不匹配: 预期 {self.vector_dim}，实际 {vectors.shape[1]}")
                 return False
                 
-            # 创建内部索引ID
-            internal_ids = np.array([self.next_id + i for i in range(len(vectors))], dtype=np.int64)
-            
-            # 更新ID映射
-            for i, external_id in enumerate(ids):
-                self.id_map[internal_ids[i]] = external_id
-                
-            # 添加向量到索引
-            # 注意：不是所有索引类型都支持add_with_ids，例如IndexFlatL2只支持add
-            # 我们需要根据索引类型选择正确的添加方法
-            index_type_name = type(self.index).__name__
-            logger.debug(f"索引类型: {index_type_name}")
-            
-            # 检查索引类型是否支持add_with_ids
-            supports_add_with_ids = False
-            try:
-                # 尝试获取add_with_ids方法
-                if hasattr(self.index, 'add_with_ids'):
-                    # 对于某些索引类型，虽然有add_with_ids方法但实际不支持
-                    # 我们需要进一步检查索引类型
-                    if not (index_type_name == "IndexFlatL2" or 
-                            index_type_name == "IndexFlat" or
-                            index_type_name == "IndexHNSWFlat"):
-                        supports_add_with_ids = True
-            except:
-                supports_add_with_ids = False
-            
-            # 根据索引类型选择添加方法
-            if supports_add_with_ids:
-                logger.debug(f"使用add_with_ids添加向量，数量: {len(vectors)}")
-                self.index.add_with_ids(vectors, internal_ids)
-            else:
-                logger.debug(f"使用add添加向量，数量: {len(vectors)}")
-                self.index.add(vectors)
+            with self._lock:
+                # 创建内部索引ID
+                internal_ids = np.arange(self.next_id, self.next_id + len(vectors), dtype=np.int64)
+                self._add_to_index(vectors, internal_ids, ids)
                 
-            # 更新下一个可用ID
-            self.next_id += len(vectors)
+                # 追加增量记录，完整保存交给检查点
+                self.delta_log.append_adds(internal_ids, ids, vectors)
+                self._pending_ops += len(vectors)
             
             # 更新元数据
             self.metadata["last_modified"] = time.time()
@@ -273,6 +519,197 @@ class VectorIndexManager:
             logger.error(traceback.format_exc())
             return False
     
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """返回L2归一化后的float32副本，内积即余弦相似度"""
+        vectors = np.array(vectors, dtype=np.float32, copy=True)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        faiss.normalize_L2(vectors)
+        return vectors
+    
+    def _add_to_index(self, vectors: np.ndarray, internal_ids: np.ndarray, ids: List[str]):
+        """
+        将向量写入FAISS索引并更新ID映射（调用方持有锁）
+        
+        同一外部ID重复添加时替换旧向量
+        
+        参数:
+            vectors: float32向量数组
+            internal_ids: 内部索引ID数组
+            ids: 外部ID列表
+        """
+        replaced = [self.reverse_map[external_id] for external_id in ids if external_id in self.reverse_map]
+        if replaced:
+            self._remove_from_index(replaced)
+        
+        normalized = self._normalize(vectors)
+        internal_ids = np.asarray(internal_ids, dtype=np.int64)
+        self.index.add_with_ids(normalized, internal_ids)
+        if self._journal is not None:
+            self._journal.append(("add", normalized, internal_ids))
+        
+        # 更新ID映射
+        for internal_id, external_id in zip(internal_ids, ids):
+            self.id_map[int(internal_id)] = external_id
+            self.reverse_map[external_id] = int(internal_id)
+            
+        # 更新下一个可用ID
+        self.next_id = max(self.next_id, int(internal_ids[-1]) + 1)
+    
+    def _remove_from_index(self, internal_ids: List[int]):
+        """从FAISS索引中删除向量并更新ID映射（调用方持有锁）"""
+        if self.index_type in TOMBSTONE_INDEX_TYPES:
+            # 索引不支持删除：标记墓碑，检索时过滤，墓碑过多时由索引策略重建
+            self.tombstones.update(int(internal_id) for internal_id in internal_ids)
+        else:
+            self.index.remove_ids(np.array(internal_ids, dtype=np.int64))
+        if self._journal is not None:
+            self._journal.append(("remove", list(internal_ids)))
+        for internal_id in internal_ids:
+            external_id = self.id_map.pop(internal_id, None)
+            if external_id is not None and self.reverse_map.get(external_id) == internal_id:
+                del self.reverse_map[external_id]
+    
+    def _search_k(self, k: int) -> int:
+        """考虑墓碑后实际需要从FAISS取回的结果数"""
+        return min(self.index.ntotal, k + len(self.tombstones)) or k
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        设置检索参数（召回率/延迟权衡）
+        
+        参数:
+            nprobe: IVF类索引检索时访问的聚类数
+            ef_search: HNSW检索宽度
+        """
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        with self._lock:
+            self._apply_search_params()
+    
+    def _apply_search_params(self, index=None):
+        """将检索参数应用到索引"""
+        index = index if index is not None else self.index
+        if index is None:
+            return
+        inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+        if isinstance(inner, faiss.IndexIVF):
+            inner.nprobe = self.nprobe
+        elif isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.ef_search
+    
+    def reconstruct(self, internal_ids: List[int]) -> Optional[np.ndarray]:
+        """
+        从当前索引中取回向量（归一化后的，PQ索引为近似值）
+        
+        参数:
+            internal_ids: 内部ID列表
+            
+        返回:
+            Optional[np.ndarray]: 向量数组，索引不支持时返回None
+        """
+        try:
+            with self._lock:
+                return np.vstack([self.index.reconstruct(int(internal_id)) for internal_id in internal_ids])
+        except Exception as e:
+            logger.debug(f"从索引取回向量失败: {e}")
+            return None
+    
+    def begin_rebuild(self) -> Optional[Dict[str, int]]:
+        """
+        开始后台重建：记录此后的增删，返回当前ID映射快照
+        
+        返回:
+            Optional[Dict[str, int]]: 外部ID -> 内部ID 快照，已有重建在进行时返回None
+        """
+        with self._lock:
+            if self._journal is not None:
+                return None
+            self._journal = []
+            return dict(self.reverse_map)
+    
+    def abort_rebuild(self):
+        """放弃后台重建，丢弃变更日志"""
+        with self._lock:
+            self._journal = None
+    
+    def finish_rebuild(self, new_index, index_type: str):
+        """
+        重放重建期间的增删并原子替换索引，随后写入检查点
+        
+        参数:
+            new_index: 用begin_rebuild快照构建好的索引
+            index_type: 新索引类型
+        """
+        with self._lock:
+            journal, self._journal = self._journal or [], None
+            tombstones = set()
+            for entry in journal:
+                if entry[0] == "add":
+                    new_index.add_with_ids(entry[1], entry[2])
+                elif index_type in TOMBSTONE_INDEX_TYPES:
+                    tombstones.update(entry[1])
+                else:
+                    new_index.remove_ids(np.array(entry[1], dtype=np.int64))
+            
+            self._apply_search_params(new_index)
+            self.index = new_index
+            self.index_type = index_type
+            self.tombstones = tombstones
+            self.metadata["index_type"] = index_type
+            self.metadata["vector_count"] = new_index.ntotal
+            self.metadata["last_modified"] = time.time()
+            logger.info(f"索引替换完成，重放 {len(journal)} 条重建期间的修改")
+            
+            # 新索引必须完整落盘，增量日志中的记录已包含在内
+            self._pending_ops += 1
+        self.save_index()
+    
+    @staticmethod
+    def _to_similarity(score: float) -> float:
+        """将内积（余弦相似度）截断到0-1之间作为相似度分数"""
+        return float(min(1.0, max(0.0, score)))
+    
+    def _project_query(self, query_vectors: np.ndarray) -> Optional[np.ndarray]:
+        """检索前投影查询向量，维度不符时返回None"""
+        if self.projector is None:
+            return query_vectors
+        if query_vectors.shape[1] != self.projector.input_dim:
+            logger.error(f"查询向量维度不匹配: 预期 {self.projector.input_dim}，实际 {query_vectors.shape[1]}")
+            return None
+        return self.projector.project(query_vectors)
+    
+    def _fetch_k(self, k: int) -> int:
+        """需要精确重排时多取候选"""
+        if self.projector is not None and self.full_vector_loader is not None:
+            return k * self.rerank_factor
+        return k
+    
+    def _rerank(self, query_vector: np.ndarray, external_ids: List[str], scores: List[float],
+                k: int) -> Tuple[List[str], List[float]]:
+        """用完整维度向量对候选精确重排，取不到完整向量的候选保留投影后的分数"""
+        if self.projector is None or self.full_vector_loader is None or not external_ids:
+            return external_ids[:k], scores[:k]
+        try:
+            full_vectors = self.full_vector_loader(external_ids)
+        except Exception as e:
+            logger.warning(f"读取完整向量失败，跳过重排: {e}")
+            return external_ids[:k], scores[:k]
+        
+        query = self._normalize(query_vector)[0]
+        rescored = []
+        for external_id, score in zip(external_ids, scores):
+            vector = full_vectors.get(external_id)
+            if vector is not None and vector.size == query.size:
+                score = self._to_similarity(float(self._normalize(vector)[0] @ query))
+            rescored.append((score, external_id))
+        rescored.sort(key=lambda item: item[0], reverse=True)
+        rescored = rescored[:k]
+        return [external_id for _, external_id in rescored], [score for score, _ in rescored]
+    
     def search(self, query_vector: np.ndarray, k: int = 5) -> Tuple[List[str], List[float]]:
         """
         搜索最相似的向量
@@ -292,6 +729,10 @@ class VectorIndexManager:
             # 确保查询向量是二维的
             if query_vector.ndim == 1:
                 query_vector = query_vector.reshape(1, -1)
+            full_query = query_vector
+            query_vector = self._project_query(query_vector)
+            if query_vector is None:
+                return [], []
                 
             # 检查向量维度
             if query_vector.shape[1] != self.vector_dim:
@@ -299,23 +740,25 @@ class VectorIndexManager:
                 return [], []
                 
             # 执行搜索
-            distances, indices = self.index.search(query_vector, k)
+            fetch_k = self._fetch_k(k)
+            with self._lock:
+                if self.index.ntotal == 0:
+                    return [], []
+                similarities, indices = self.index.search(self._normalize(query_vector), self._search_k(fetch_k))
+                id_map = self.id_map
             
             # 转换内部索引ID为外部ID
             external_ids = []
             scores = []
             
             for i, idx in enumerate(indices[0]):
-                if idx != -1 and idx in self.id_map:  # -1表示无效结果
-                    external_ids.append(self.id_map[idx])
-                    # 将距离转换为相似度分数（1 - 归一化距离）
-                    distance = distances[0][i]
-                    if distance > 0:
-                        score = 1.0 / (1.0 + distance)  # 将距离转换为0-1之间的相似度
-                    else:
-                        score = 1.0  # 完全匹配
-                    scores.append(score)
+                if idx != -1 and idx in id_map:  # -1表示无效结果
+                    external_ids.append(id_map[idx])
+                    scores.append(self._to_similarity(similarities[0][i]))
+                    if len(external_ids) >= fetch_k:
+                        break
             
+            external_ids, scores = self._rerank(full_query, external_ids, scores, k)
             logger.debug(f"搜索完成，找到 {len(external_ids)} 个结果")
             return external_ids, scores
         except Exception as e:
@@ -338,13 +781,23 @@ class VectorIndexManager:
             return []
             
         try:
+            full_queries = query_vectors
+            query_vectors = self._project_query(query_vectors)
+            if query_vectors is None:
+                return []
+            
             # 检查向量维度
             if query_vectors.shape[1] != self.vector_dim:
                 logger.error(f"查询向量维度不匹配: 预期 {self.vector_dim}，实际 {query_vectors.shape[1]}")
                 return []
                 
             # 执行搜索
-            distances, indices = self.index.search(query_vectors, k)
+            fetch_k = self._fetch_k(k)
+            with self._lock:
+                if self.index.ntotal == 0:
+                    return [([], []) for _ in range(len(query_vectors))]
+                similarities, indices = self.index.search(self._normalize(query_vectors), self._search_k(fetch_k))
+                id_map = self.id_map
             
             results = []
             for i in range(len(query_vectors)):
@@ -352,16 +805,13 @@ class VectorIndexManager:
                 scores = []
                 
                 for j, idx in enumerate(indices[i]):
-                    if idx != -1 and idx in self.id_map:
-                        external_ids.append(self.id_map[idx])
-                        distance = distances[i][j]
-                        if distance > 0:
-                            score = 1.0 / (1.0 + distance)
-                        else:
-                            score = 1.0
-                        scores.append(score)
+                    if idx != -1 and idx in id_map:
+                        external_ids.append(id_map[idx])
+                        scores.append(self._to_similarity(similarities[i][j]))
+                        if len(external_ids) >= fetch_k:
+                            break
                 
-                results.append((external_ids, scores))
+                results.append(self._rerank(full_queries[i:i + 1], external_ids, scores, k))
             
             logger.debug(f"批量搜索完成，处理了 {len(query_vectors)} 个查询")
             return results
@@ -385,10 +835,8 @@ class VectorIndexManager:
             
         try:
             # 查找内部索引ID
-            internal_ids = []
-            for internal_id, external_id in self.id_map.items():
-                if external_id in ids:
-                    internal_ids.append(internal_id)
+            internal_ids = [self.reverse_map[external_id] for external_id in ids
+                            if external_id in self.reverse_map]
             
             if not internal_ids:
                 logger.warning(f"未找到要删除的向量ID: {ids}")
@@ -396,14 +844,11 @@ class VectorIndexManager:
                 
             # 检查索引是否支持删除
             if hasattr(self.index, 'remove_ids'):
-                # 转换为numpy数组
-                internal_ids_np = np.array(internal_ids, dtype=np.int64)
-                self.index.remove_ids(internal_ids_np)
-                
-                # 更新ID映射
-                for internal_id in internal_ids:
-                    if internal_id in self.id_map:
-                        del self.id_map[internal_id]
+                with self._lock:
+                    external_ids = [self.id_map[internal_id] for internal_id in internal_ids]
+                    self._remove_from_index(internal_ids)
+                    self.delta_log.append_deletes(internal_ids, external_ids)
+                    self._pending_ops += len(internal_ids)
                 
                 # 更新元数据
                 self.metadata["last_modified"] = time.time()
@@ -432,8 +877,16 @@ class VectorIndexManager:
         info = {
             "index_type": self.index_type,
             "vector_dim": self.vector_dim,
+            "input_dim": self.input_dim,
+            "projection": self.projector.describe() if self.projector else None,
             "vector_count": self.index.ntotal,
             "id_map_size": len(self.id_map),
+            "pending_ops": self._pending_ops,
+            "tombstones": len(self.tombstones),
+            "nprobe": self.nprobe,
+            "ef_search": self.ef_search,
+            "rebuilding": self._journal is not None,
+            "delta_log_bytes": self.delta_log.size,
             "created_at": self.metadata.get("created_at", 0),
             "last_modified": self.metadata.get("last_modified", 0),
             "index_path": self.index_path
@@ -467,7 +920,7 @@ class VectorIndexManager:
                 return False
                 
             # 训练索引
-            self.index.train(training_vectors)
+            self.index.train(self._normalize(training_vectors))
             
             # 更新元数据
             self.metadata["last_modified"] = time.time()
@@ -478,6 +931,46 @@ class VectorIndexManager:
             logger.error(f"训练索引失败: {e}")
             return False
 
+# 进程内共享的索引实例，按索引文件绝对路径区分
+_shared_indexes: Dict[str, VectorIndexManager] = {}
+_shared_lock = threading.Lock()
+
+def get_shared_vector_index(index_path=None, vector_dim=1024, index_type="flat") -> VectorIndexManager:
+    """
+    获取进程内共享的向量索引，首次调用时加载或创建
+    
+    MemoryStore（写入）和FAISSSearchEngine（检索）通过此函数拿到同一个实例，
+    内存中只有一份索引，新写入的记忆可以立即被检索到
+    
+    参数:
+        index_path: 索引文件路径，如果为None则使用默认路径
+        vector_dim: 向量维度（仅在首次创建时使用）
+        index_type: 索引类型（仅在首次创建时使用）
+        
+    返回:
+        VectorIndexManager: 共享的索引管理器
+    """
+    if index_path is None:
+        index_path = os.path.join("data", "vectors", "memory_index.bin")
+    key = os.path.abspath(index_path)
+    
+    with _shared_lock:
+        manager = _shared_indexes.get(key)
+        if manager is not None:
+            if manager.input_dim != vector_dim:
+                logger.warning(f"共享索引维度为 {manager.input_dim}，忽略请求的维度 {vector_dim}")
+            return manager
+        
+        manager = VectorIndexManager(index_path=index_path, vector_dim=vector_dim, index_type=index_type)
+        if manager.available:
+            if manager.load_index():
+                logger.info(f"加载共享向量索引: {index_path}")
+            else:
+                logger.warning(f"加载向量索引失败，创建新索引: {index_path}")
+                manager.create_index()
+            _shared_indexes[key] = manager
+        return manager
+
 # 模块测试代码
 if __name__ == "__main__":
     import numpy as np
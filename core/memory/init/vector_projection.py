@@ -0,0 +1,120 @@
+"""
+向量降维投影 - ANN索引中只保存降维后的向量
+支持两种方式：
+- truncate: 直接截取前N维（适用于Matryoshka训练的模型，如Qwen3-Embedding）
+- pca: 用已有向量拟合PCA投影矩阵
+完整维度的向量仍保存在memory_vectors表中，用于对Top-K候选做精确重排
+"""
+
+import os
+import logging
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.vector")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.vector")
+
+PROJECTION_METHODS = ("truncate", "pca")
+
+
+class VectorProjector:
+    """完整维度向量到索引维度的投影"""
+
+    def __init__(self, input_dim: int, output_dim: int, method: str = "truncate",
+                 mean: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None):
+        """
+        初始化投影
+
+        参数:
+            input_dim: 完整向量维度
+            output_dim: 投影后维度
+            method: 投影方式，truncate 或 pca
+            mean: PCA的均值向量 (input_dim,)
+            components: PCA的主成分矩阵 (output_dim, input_dim)
+        """
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"不支持的投影方式: {method}")
+        if output_dim > input_dim:
+            raise ValueError(f"投影维度 ({output_dim}) 不能大于原始维度 ({input_dim})")
+        if method == "pca" and (mean is None or components is None):
+            raise ValueError("PCA投影需要均值和主成分矩阵")
+
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.method = method
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.components = None if components is None else np.asarray(components, dtype=np.float32)
+
+    @classmethod
+    def fit_pca(cls, vectors: np.ndarray, output_dim: int) -> "VectorProjector":
+        """
+        用样本向量拟合PCA投影（样本先做L2归一化，与索引中的余弦相似度一致）
+
+        参数:
+            vectors: 样本向量 (n, input_dim)，n应明显大于output_dim
+            output_dim: 投影后维度
+
+        返回:
+            VectorProjector: PCA投影
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) < output_dim:
+            raise ValueError(f"PCA样本数 ({len(vectors)}) 少于目标维度 ({output_dim})")
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        mean = vectors.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        explained = (singular_values[:output_dim] ** 2).sum() / (singular_values ** 2).sum()
+        logger.info(f"PCA拟合完成: {vectors.shape[1]} -> {output_dim} 维，保留方差 {explained:.1%}")
+        return cls(vectors.shape[1], output_dim, "pca", mean=mean, components=vt[:output_dim])
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        投影向量（结果未归一化，索引写入和检索时统一归一化）
+
+        参数:
+            vectors: (n, input_dim) 或 (input_dim,) 向量
+
+        返回:
+            np.ndarray: (n, output_dim) float32向量
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if vectors.shape[1] != self.input_dim:
+            raise ValueError(f"投影输入维度不匹配: 预期 {self.input_dim}，实际 {vectors.shape[1]}")
+
+        if self.method == "truncate":
+            return np.ascontiguousarray(vectors[:, :self.output_dim])
+        normalized = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return np.ascontiguousarray((normalized - self.mean) @ self.components.T, dtype=np.float32)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"method": self.method, "input_dim": self.input_dim, "output_dim": self.output_dim}
+
+    def save(self, path: str):
+        """保存投影参数（先写临时文件再替换）"""
+        arrays = {"method": np.array(self.method), "input_dim": np.array(self.input_dim),
+                  "output_dim": np.array(self.output_dim)}
+        if self.method == "pca":
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorProjector"]:
+        """加载投影参数，文件不存在时返回None"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(int(data["input_dim"]), int(data["output_dim"]), str(data["method"]),
+                       mean=data["mean"] if "mean" in data else None,
+                       components=data["components"] if "components" in data else None)
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+记忆维护模块
+提供后台维护任务的调度，以及关联网络的分块衰减、剪枝和再平衡、冷记忆的分块归档
+"""
+
+from .scheduler import MaintenanceJob, MaintenanceScheduler
+from .association_maintenance import AssociationMaintenanceJob
+from .archive_maintenance import ArchiveMaintenanceJob
+
+__all__ = ['MaintenanceJob', 'MaintenanceScheduler', 'AssociationMaintenanceJob', 'ArchiveMaintenanceJob']
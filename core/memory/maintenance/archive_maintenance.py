@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+归档维护任务
+定期把低权重、长时间未访问的记忆移到冷层归档，每批移动完成后交给调度器停顿。
+"""
+
+import logging
+from typing import Any, Dict, Iterator
+
+from .scheduler import MaintenanceJob
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveMaintenanceJob(MaintenanceJob):
+    """冷记忆归档"""
+
+    name = "memory_archive"
+    interval = 24 * 3600.0
+
+    def __init__(self, memory_store, policy=None):
+        """
+        初始化归档维护任务
+
+        参数:
+            memory_store: 记忆存储（MemoryStore），提供数据库、热层向量索引和归档
+            policy: 归档策略（ArchivePolicy），batch_size即每个分块移动的记忆数，None则使用默认策略
+        """
+        self.memory_store = memory_store
+        self.policy = policy
+
+    def run(self) -> Iterator[Dict[str, Any]]:
+        progress: Dict[str, Any] = {"phase": "archive", "archived": 0, "vectors": 0, "partitions": []}
+        store = self.memory_store
+        if store.db_manager is None:
+            progress["phase"] = "done"
+            yield progress
+            return
+
+        # 先让写入队列中的记忆落盘，避免归档与写入交错
+        store.flush_pending()
+        partitions = set()
+        for batch in store.archive.iter_archive(store.db_manager, store.vector_index, self.policy):
+            progress["archived"] += batch["archived"]
+            progress["vectors"] += batch["vectors"]
+            partitions.update(batch["partitions"])
+            progress["partitions"] = sorted(partitions)
+            yield progress
+
+        progress["phase"] = "done"
+        yield progress
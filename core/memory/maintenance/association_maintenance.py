@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+关联维护任务
+依次衰减长时间未激活的关联、删除强度过低的关联、裁剪关联数超过上限的记忆，
+每个阶段都按分块提交，块之间交给调度器停顿。
+衰减量按距上次衰减实际经过的时间计算，与运行频率和重启无关；衰减进度与每个分块在同一事务中记录，
+中断后从记录的位置继续，已衰减的关联不会被再次衰减。
+"""
+
+import time
+import logging
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .scheduler import MaintenanceJob
+
+logger = logging.getLogger(__name__)
+
+
+class AssociationMaintenanceJob(MaintenanceJob):
+    """关联衰减、剪枝和关联数再平衡"""
+
+    name = "association_maintenance"
+    interval = 6 * 3600.0
+
+    def __init__(self, network, chunk_size: int = 500, days_threshold: float = 30,
+                 decay_factor: float = 0.95, min_strength: float = 0.1,
+                 decay_period: Optional[float] = None):
+        """
+        初始化关联维护任务
+
+        参数:
+            network: 关联网络（AssociationNetwork）
+            chunk_size: 每个分块处理的关联数
+            days_threshold: 最近激活早于此天数的关联才衰减
+            decay_factor: 每个衰减周期的衰减因子
+            min_strength: 衰减下限，强度不高于此值的关联被删除
+            decay_period: 衰减周期（秒），None则等于任务的默认间隔
+        """
+        self.network = network
+        self.chunk_size = chunk_size
+        self.days_threshold = days_threshold
+        self.decay_factor = decay_factor
+        self.min_strength = min_strength
+        self.decay_period = decay_period or self.interval
+
+    def run(self) -> Iterator[Dict[str, Any]]:
+        last_run, started, cursor = self._load_state()
+        if started is None:
+            started = time.time()
+        periods = 1.0 if last_run is None else max(0.0, started - last_run) / self.decay_period
+        decay_factor = self.decay_factor ** periods
+        progress = {"phase": "decay", "decayed": 0, "pruned": 0, "trimmed": 0, "cursor": None,
+                    "decay_factor": decay_factor, "resumed": cursor is not None}
+        try:
+            for chunk in self.network.iter_decay(self.days_threshold, decay_factor, self.min_strength,
+                                                 self.chunk_size, now=started, cursor=cursor,
+                                                 on_chunk=lambda c: self._save_progress(started, c)):
+                progress["decayed"] += chunk["decayed"]
+                progress["cursor"] = chunk["cursor"]
+                yield progress
+            self._finish_decay(started)
+
+            progress["phase"] = "prune"
+            for chunk in self.network.iter_prune(self.min_strength, self.chunk_size):
+                progress["pruned"] += chunk["pruned"]
+                yield progress
+
+            progress["phase"] = "rebalance"
+            for chunk in self.network.iter_rebalance(self.chunk_size):
+                progress["trimmed"] += chunk["trimmed"]
+                yield progress
+
+            progress["phase"] = "done"
+            yield progress
+        finally:
+            # 中途停止时也把已删除的关联从图中合并掉
+            if progress["pruned"] or progress["trimmed"]:
+                self.network.compact_graph()
+
+    def _load_state(self) -> Tuple[Optional[float], Optional[float], Optional[Tuple[float, str]]]:
+        """
+        读取上次完成衰减的时间，以及中断的那次衰减的开始时间和游标
+
+        返回:
+            (last_run, run_started, cursor)，没有中断的衰减时后两项为None
+        """
+        db_manager = self.network.db_manager
+        rows = db_manager.execute_named("maintenance.state", (self.name,)) if db_manager else None
+        if not rows:
+            return None, None, None
+        last_run, run_started, cursor_time, cursor_id = rows[0]
+        if run_started is None or cursor_time is None:
+            return last_run, None, None
+        return last_run, run_started, (cursor_time, cursor_id)
+
+    def _save_progress(self, started: float, cursor: Tuple[float, str]):
+        """在衰减分块的事务中记录进度"""
+        self.network.db_manager.execute_named("maintenance.save_progress", (self.name, started) + tuple(cursor))
+
+    def _finish_decay(self, started: float):
+        """衰减阶段完成：记录本次衰减的开始时间，清除进度"""
+        db_manager = self.network.db_manager
+        if db_manager:
+            with db_manager.transaction():
+                db_manager.execute_named("maintenance.finish_run", (self.name, started))
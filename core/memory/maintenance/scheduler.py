@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+后台维护调度
+维护任务按分块执行：每处理完一块就交出控制权，调度线程在块之间停顿，
+避免长时间占用写锁；每个任务的运行次数、进度和耗时都可以随时查询。
+"""
+
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceJob(ABC):
+    """
+    维护任务基类
+
+    子类实现run()：生成器，每提交一个分块yield一次当前进度（字典），
+    在块之间被中止时（调度器关闭）下次运行重新开始，因此每个分块都必须是完整的事务。
+    """
+
+    name = "maintenance"
+    interval = 3600.0  # 默认运行间隔（秒）
+
+    @abstractmethod
+    def run(self) -> Iterator[Dict[str, Any]]:
+        """按分块执行任务，每提交一个分块yield一次进度"""
+
+
+class MaintenanceScheduler:
+    """
+    维护任务调度器
+
+    - register() 注册任务和运行间隔，start() 启动后台线程，到期的任务依次运行
+    - 分块之间停顿 chunk_pause 秒，关闭时在下一个分块边界停止
+    - run_now() 在当前线程把任务完整运行一次
+    """
+
+    def __init__(self, chunk_pause: float = 0.05, poll_interval: float = 1.0):
+        """
+        初始化调度器
+
+        参数:
+            chunk_pause: 两个分块之间的停顿（秒），让出数据库写锁
+            poll_interval: 检查到期任务的间隔（秒）
+        """
+        self.chunk_pause = chunk_pause
+        self.poll_interval = poll_interval
+
+        self._jobs: Dict[str, MaintenanceJob] = {}
+        self._intervals: Dict[str, float] = {}
+        self._next_run: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # 同一时间只运行一个任务
+        self._stop_event = threading.Event()
+        self._worker = None
+
+    def register(self, job: MaintenanceJob, interval: Optional[float] = None, initial_delay: Optional[float] = None):
+        """
+        注册维护任务
+
+        参数:
+            job: 维护任务
+            interval: 运行间隔（秒），None使用任务的默认间隔
+            initial_delay: 首次运行前的等待时间（秒），None则等待一个完整间隔
+        """
+        interval = job.interval if interval is None else interval
+        with self._lock:
+            self._jobs[job.name] = job
+            self._intervals[job.name] = interval
+            self._next_run[job.name] = time.time() + (interval if initial_delay is None else initial_delay)
+            self._stats[job.name] = {
+                "runs": 0,
+                "running": False,
+                "chunks": 0,
+                "progress": {},
+                "last_started": None,
+                "last_finished": None,
+                "last_duration": 0.0,
+                "last_error": None,
+                "interrupted": 0
+            }
+        logger.debug(f"注册维护任务: {job.name} (间隔: {interval}s)")
+
+    def start(self):
+        """启动后台调度线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="estia-memory-maintenance", daemon=True)
+        self._worker.start()
+        logger.info(f"后台维护调度已启动 ({len(self._jobs)} 个任务)")
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive() and not self._stop_event.is_set()
+
+    def run_now(self, name: str) -> Dict[str, Any]:
+        """
+        在当前线程立即完整运行一次任务
+
+        参数:
+            name: 任务名
+
+        返回:
+            Dict[str, Any]: 任务最后的进度
+        """
+        if name not in self._jobs:
+            raise KeyError(f"未注册的维护任务: {name}")
+        self._execute(name, pause=0.0)
+        return self.get_stats()[name]["progress"]
+
+    def shutdown(self, timeout: float = 5.0):
+        """在当前分块结束后停止后台线程"""
+        self._stop_event.set()
+        if self._worker:
+            self._worker.join(timeout=timeout)
+        logger.info("后台维护调度已停止")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各任务的运行统计和进度"""
+        with self._lock:
+            stats = {}
+            for name, job_stats in self._stats.items():
+                stats[name] = dict(job_stats, progress=dict(job_stats["progress"]),
+                                   next_run=self._next_run[name])
+            return stats
+
+    def _due_jobs(self) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [name for name, next_run in self._next_run.items() if next_run <= now]
+
+    def _run(self):
+        """后台线程主循环"""
+        while not self._stop_event.is_set():
+            for name in self._due_jobs():
+                if self._stop_event.is_set():
+                    break
+                self._execute(name, pause=self.chunk_pause)
+            self._stop_event.wait(timeout=self.poll_interval)
+
+    def _execute(self, name: str, pause: float):
+        """运行一个任务直到完成、出错或调度器关闭"""
+        job = self._jobs[name]
+        with self._run_lock:
+            start_time = time.time()
+            with self._lock:
+                stats = self._stats[name]
+                stats["running"] = True
+                stats["last_started"] = start_time
+                stats["chunks"] = 0
+                stats["progress"] = {}
+
+            interrupted = False
+            error = None
+            steps = job.run()
+            try:
+                for progress in steps:
+                    with self._lock:
+                        stats["chunks"] += 1
+                        stats["progress"] = dict(progress)
+                    if pause > 0 and self._stop_event.wait(timeout=pause):
+                        interrupted = True
+                        break
+            except Exception as e:
+                error = str(e)
+                logger.error(f"维护任务 {name} 失败: {e}")
+            finally:
+                steps.close()
+
+            finished = time.time()
+            with self._lock:
+                stats["running"] = False
+                stats["runs"] += 1
+                stats["last_finished"] = finished
+                stats["last_duration"] = round(finished - start_time, 3)
+                stats["last_error"] = error
+                stats["interrupted"] += int(interrupted)
+                self._next_run[name] = finished + self._intervals[name]
+
+            if not interrupted and error is None:
+                logger.info(f"维护任务 {name} 完成: {stats['chunks']} 个分块, "
+                            f"耗时 {stats['last_duration']}s, {stats['progress']}")
@@ -152,10 +152,7 @@ class CacheManager:
             current_time = time.time()
             
             # 获取记忆基本信息
-            memory_info = self.db_manager.query(
-                "SELECT weight FROM memories WHERE id = ?", 
-                (memory_id,)
-            )
+            memory_info = self.db_manager.execute_named("cache.memory_weight", (memory_id,))
             
             if not memory_info:
                 self.logger.warning(f"记忆不存在: {memory_id}")
@@ -190,7 +187,7 @@ class CacheManager:
         cache_entry.last_accessed = current_time
         
         # 获取记忆权重
-        memory_info = self.db_manager.query("SELECT weight FROM memories WHERE id = ?", (memory_id,))
+        memory_info = self.db_manager.execute_named("cache.memory_weight", (memory_id,))
         memory_weight = memory_info[0][0] if memory_info else 5.0
         
         # 重新计算优先级
@@ -208,11 +205,7 @@ class CacheManager:
             self.logger.debug(f"记忆 {memory_id} 缓存级别更新为: {new_cache_level}")
         
         # 更新数据库
-        self.db_manager.execute_query("""
-            UPDATE memory_cache 
-            SET cache_level = ?, priority = ?, access_count = ?, last_accessed = ?
-            WHERE memory_id = ?
-        """, (cache_entry.cache_level, cache_entry.priority, cache_entry.access_count, 
+        self.db_manager.execute_named("cache.update_entry", (cache_entry.cache_level, cache_entry.priority, cache_entry.access_count, 
               cache_entry.last_accessed, memory_id))
     
     def _create_new_cache(self, memory_id: str, memory_weight: float, access_weight: float, current_time: float):
@@ -239,10 +232,7 @@ class CacheManager:
         cache_id = str(uuid.uuid4())
         
         # 插入数据库
-        self.db_manager.execute_query("""
-            INSERT INTO memory_cache (id, memory_id, cache_level, priority, access_count, last_accessed)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (cache_id, memory_id, cache_level, priority, access_count, last_accessed))
+        self.db_manager.execute_named("cache.insert_entry", (cache_id, memory_id, cache_level, priority, access_count, last_accessed))
         
         # 更新内存映射
         cache_entry = CacheEntry(
@@ -254,10 +244,6 @@ class CacheManager:
             last_accessed=last_accessed
         )
         self._memory_cache_map[memory_id] = cache_entry
-        
-        # 提交事务
-        if self.db_manager.conn:
-            self.db_manager.conn.commit()
     
     def _calculate_priority(self, weight: float, access_count: int, last_accessed: float, 
                           access_weight: float = 1.0) -> float:
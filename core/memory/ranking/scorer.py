@@ -6,6 +6,7 @@ Step 7: 记忆排序和去重模块
 智能的记忆排序、评分和去重处理
 """
 
+import re
 import time
 import logging
 from typing import List, Dict, Any, Optional
@@ -14,6 +15,31 @@ from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+# 中文（含日文假名、韩文）连续片段与英文/数字单词
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_WORD = re.compile(r"[0-9a-zA-Z_]+")
+
+
+def text_units(text: str) -> set:
+    """
+    把文本切分为用于重叠度计算的单元：英文按单词，中文按相邻两字（单字片段保留单字）
+    
+    参数:
+        text: 文本
+        
+    返回:
+        单元集合
+    """
+    lowered = text.lower()
+    units = set(_WORD.findall(lowered))
+    for run in _CJK_RUN.findall(lowered):
+        if len(run) == 1:
+            units.add(run)
+        else:
+            units.update(run[i:i + 2] for i in range(len(run) - 1))
+    return units
+
+
 class MemoryScorer:
     """记忆评分器 - Step 7核心组件"""
     
@@ -21,7 +47,8 @@ class MemoryScorer:
                  weight_factor: float = 0.3,
                  time_factor: float = 0.2,
                  similarity_factor: float = 0.4,
-                 type_factor: float = 0.1):
+                 type_factor: float = 0.1,
+                 activation_factor: float = 0.1):
         """
         初始化记忆评分器
         
@@ -30,11 +57,13 @@ class MemoryScorer:
             time_factor: 时间因子  
             similarity_factor: 相似度因子
             type_factor: 类型因子
+            activation_factor: 关联扩散激活因子（只作用于带activation字段的记忆）
         """
         self.weight_factor = weight_factor
         self.time_factor = time_factor
         self.similarity_factor = similarity_factor
         self.type_factor = type_factor
+        self.activation_factor = activation_factor
         
         # 记忆类型权重
         self.type_weights = {
@@ -130,12 +159,16 @@ class MemoryScorer:
             memory_type = memory.get('type', memory.get('memory_type', 'dialogue'))
             type_score = self.type_weights.get(memory_type, 0.5)
             
+            # 关联网络的扩散激活值（0-1），没有经过关联拓展的记忆为0
+            activation_score = memory.get('activation', 0.0)
+            
             # 综合分数计算
             final_score = (
                 weight_score * self.weight_factor +
                 time_score * self.time_factor +
                 similarity_score * 10 * self.similarity_factor +  # 相似度转换为10分制
-                type_score * 10 * self.type_factor  # 类型分数转换为10分制
+                type_score * 10 * self.type_factor +  # 类型分数转换为10分制
+                activation_score * 10 * self.activation_factor
             )
             
             return round(final_score, 2)
@@ -173,9 +206,9 @@ class MemoryScorer:
             if query_lower in content_lower:
                 return 0.8
             
-            # 关键词匹配
-            query_words = set(query_lower.split())
-            content_words = set(content_lower.split())
+            # 关键词匹配（中文按二字片段，不依赖空格分词）
+            query_words = text_units(query_lower)
+            content_words = text_units(content_lower)
             
             if not query_words:
                 return 0.0
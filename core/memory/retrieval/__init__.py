@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 """
 记忆检索模块
-提供基于FAISS的向量搜索和智能记忆检索功能
+提供基于FAISS的向量搜索、全文检索和智能记忆检索功能
 """
 
 from .faiss_search import FAISSSearchEngine
 from .smart_retriever import SmartRetriever
+from .lexical_search import LexicalSearch
+from .hybrid_search import HybridRetriever
 
-__all__ = ['FAISSSearchEngine', 'SmartRetriever']
+__all__ = ['FAISSSearchEngine', 'SmartRetriever', 'LexicalSearch', 'HybridRetriever']
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+混合检索
+全文检索（FTS5/bm25）与向量检索（FAISS）并行执行，用倒数排名融合（RRF）或加权分数合并候选。
+全文检索不依赖查询向量，可以在向量化完成之前就开始。
+热层候选不足时再检索冷记忆归档，归档候选排在热层候选之后。
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .lexical_search import LexicalSearch
+
+logger = logging.getLogger(__name__)
+
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def lexical_similarity(relevance: float) -> float:
+    """把全文检索的相对相关度（0-1）映射为与关键词搜索一致的相似度"""
+    return 0.5 + 0.2 * relevance
+
+
+class HybridRetriever:
+    """全文 + 向量混合检索"""
+
+    def __init__(self, lexical_search: LexicalSearch, faiss_retriever=None,
+                 vector_k: int = 15, lexical_k: int = 15, candidate_budget: int = 20,
+                 fusion: str = "rrf", rrf_k: int = 60,
+                 vector_weight: float = 1.0, lexical_weight: float = 1.0,
+                 archive=None, min_hot_results: int = 5):
+        """
+        初始化混合检索
+
+        参数:
+            lexical_search: 全文检索
+            faiss_retriever: FAISS检索引擎（为None时只用全文检索）
+            vector_k: 向量检索的候选数
+            lexical_k: 全文检索的候选数
+            candidate_budget: 融合后保留的候选数
+            fusion: 融合方式，rrf 或 weighted
+            rrf_k: RRF平滑常数，越大排名靠后的候选权重衰减越慢
+            vector_weight: 向量检索的权重
+            lexical_weight: 全文检索的权重
+            archive: 冷记忆归档（MemoryArchive，为None时不检索归档）
+            min_hot_results: 热层候选少于此数时检索归档
+        """
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"不支持的融合方式: {fusion}")
+
+        self.lexical_search = lexical_search
+        self.faiss_retriever = faiss_retriever
+        self.vector_k = vector_k
+        self.lexical_k = lexical_k
+        self.candidate_budget = candidate_budget
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.vector_weight = vector_weight
+        self.lexical_weight = lexical_weight
+        self.archive = archive
+        self.min_hot_results = min_hot_results
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="estia-lexical")
+
+    def submit_lexical(self, query: str) -> Future:
+        """
+        在后台线程中提交全文检索
+
+        参数:
+            query: 查询文本
+
+        返回:
+            Future: 结果为全文检索结果列表
+        """
+        return self._executor.submit(self.lexical_search.search, query, self.lexical_k)
+
+    def search(self, query: str, query_vector: Optional[np.ndarray] = None,
+               lexical_future: Optional[Future] = None) -> List[Dict[str, Any]]:
+        """
+        混合检索
+
+        参数:
+            query: 查询文本
+            query_vector: 查询向量（为None时只用全文检索）
+            lexical_future: 提前提交的全文检索（submit_lexical的返回值）
+
+        返回:
+            List[Dict[str, Any]]: 融合后的候选，按融合分数降序，
+            包含memory_id、score、similarity、vector_rank、lexical_rank
+        """
+        start_time = time.time()
+        if lexical_future is None:
+            lexical_future = self.submit_lexical(query)
+
+        # 向量检索在当前线程执行，与全文检索并行
+        vector_results = []
+        if query_vector is not None and self.faiss_retriever is not None:
+            try:
+                vector_results = self.faiss_retriever.search_similar(query_vector, k=self.vector_k)
+            except Exception as e:
+                logger.warning(f"向量检索失败，仅使用全文检索: {e}")
+
+        try:
+            lexical_results = lexical_future.result()
+        except Exception as e:
+            logger.warning(f"全文检索失败，仅使用向量检索: {e}")
+            lexical_results = []
+
+        candidates = self.fuse(vector_results, lexical_results)
+        hot_count = len(candidates)
+        if self.archive is not None and hot_count < self.min_hot_results:
+            candidates.extend(self._search_archive(query, query_vector, {c["memory_id"] for c in candidates}))
+
+        logger.debug(f"混合检索: 向量 {len(vector_results)} 条, 全文 {len(lexical_results)} 条, "
+                     f"融合后 {hot_count} 条, 归档 {len(candidates) - hot_count} 条, "
+                     f"耗时 {(time.time() - start_time) * 1000:.1f}ms")
+        return candidates
+
+    def _search_archive(self, query: str, query_vector: Optional[np.ndarray],
+                        exclude: set) -> List[Dict[str, Any]]:
+        """
+        检索冷记忆归档，按同样的方式融合
+
+        返回:
+            List[Dict[str, Any]]: 归档候选（tier为cold，memory为记忆内容），不超过剩余的候选预算
+        """
+        budget = self.candidate_budget - len(exclude)
+        if budget <= 0:
+            return []
+
+        memories: Dict[str, Dict[str, Any]] = {}
+        vector_results, lexical_results = [], []
+        try:
+            if query_vector is not None:
+                for memory in self.archive.search_vectors(query_vector, k=self.vector_k):
+                    memories[memory["memory_id"]] = memory
+                    vector_results.append(memory)
+            for memory in self.archive.search_keywords(query, limit=self.lexical_k):
+                memories.setdefault(memory["memory_id"], memory)
+                lexical_results.append({"id": memory["memory_id"], "relevance": memory["relevance"]})
+        except Exception as e:
+            logger.warning(f"检索归档记忆失败: {e}")
+
+        cold = []
+        for entry in self.fuse(vector_results, lexical_results):
+            if entry["memory_id"] in exclude:
+                continue
+            entry["tier"] = "cold"
+            entry["memory"] = memories[entry["memory_id"]]
+            cold.append(entry)
+        return cold[:budget]
+
+    def fuse(self, vector_results: List[Dict[str, Any]],
+             lexical_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        合并两路候选
+
+        参数:
+            vector_results: 向量检索结果（memory_id, similarity），按相似度降序
+            lexical_results: 全文检索结果（id, relevance），按bm25排序
+
+        返回:
+            List[Dict[str, Any]]: 融合后的候选（不超过candidate_budget条）
+        """
+        candidates: Dict[str, Dict[str, Any]] = {}
+
+        def candidate(memory_id):
+            if memory_id not in candidates:
+                candidates[memory_id] = {"memory_id": memory_id, "score": 0.0,
+                                         "vector_rank": None, "lexical_rank": None}
+            return candidates[memory_id]
+
+        for rank, result in enumerate(vector_results):
+            memory_id = result.get("memory_id")
+            if not memory_id:
+                continue
+            entry = candidate(memory_id)
+            if entry["vector_rank"] is not None:
+                continue
+            entry["vector_rank"] = rank
+            entry["vector_similarity"] = float(result.get("similarity", 0.0))
+            entry["score"] += self._component(rank, entry["vector_similarity"], self.vector_weight)
+
+        for rank, result in enumerate(lexical_results):
+            memory_id = result.get("id")
+            if not memory_id:
+                continue
+            entry = candidate(memory_id)
+            if entry["lexical_rank"] is not None:
+                continue
+            entry["lexical_rank"] = rank
+            entry["lexical_relevance"] = float(result.get("relevance", 0.0))
+            entry["score"] += self._component(rank, entry["lexical_relevance"], self.lexical_weight)
+
+        for entry in candidates.values():
+            # 排序阶段使用的相似度：有向量相似度时优先使用
+            if "vector_similarity" in entry:
+                entry["similarity"] = entry["vector_similarity"]
+            else:
+                entry["similarity"] = lexical_similarity(entry["lexical_relevance"])
+
+        fused = sorted(candidates.values(), key=lambda entry: entry["score"], reverse=True)
+        return fused[:self.candidate_budget]
+
+    def _component(self, rank: int, score: float, weight: float) -> float:
+        if self.fusion == "rrf":
+            return weight / (self.rrf_k + rank + 1)
+        return weight * score
+
+    def shutdown(self):
+        """关闭后台线程"""
+        self._executor.shutdown(wait=False)
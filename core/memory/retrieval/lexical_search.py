@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+全文检索
+基于memories_fts（FTS5 trigram分词，由触发器与memories表同步）做关键词检索，按bm25排序。
+trigram按字符切分，不依赖中文分词词典；中文查询按连续三字切片，命中片段越多排名越靠前。
+"""
+
+import re
+import logging
+from typing import List, Dict, Any, Tuple
+
+from ..init.db_manager import DatabaseManager, FTS_TABLE
+
+logger = logging.getLogger(__name__)
+
+# content与summary的bm25列权重
+BM25_WEIGHTS = (1.0, 0.5)
+
+# 单次查询最多使用的检索片段数
+MAX_QUERY_TERMS = 32
+
+# 中文（含日文假名、韩文）连续片段与英文/数字单词
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_WORD = re.compile(r"[0-9a-zA-Z_]+")
+
+MEMORY_COLUMNS = "m.id, m.content, m.type, m.role, m.weight, m.group_id, m.summary, m.timestamp, m.last_accessed"
+
+
+def extract_terms(text: str) -> Tuple[List[str], List[str]]:
+    """
+    把查询文本切分为检索片段
+
+    中文连续片段切成重叠的三字片段，英文单词整体保留（trigram分词支持子串匹配）。
+    不足三个字符的片段无法走索引，单独返回供LIKE回退使用。
+
+    参数:
+        text: 查询文本
+
+    返回:
+        (可走索引的片段, 短片段)
+    """
+    terms, short_terms = [], []
+    lowered = text.lower()
+
+    for run in _CJK_RUN.findall(lowered):
+        if len(run) < 3:
+            short_terms.append(run)
+        else:
+            terms.extend(run[i:i + 3] for i in range(len(run) - 2))
+
+    for word in _WORD.findall(lowered):
+        if len(word) >= 3:
+            terms.append(word)
+        elif len(word) == 2:
+            short_terms.append(word)
+
+    # 去重并保持顺序
+    terms = list(dict.fromkeys(terms))[:MAX_QUERY_TERMS]
+    short_terms = list(dict.fromkeys(short_terms))[:MAX_QUERY_TERMS]
+    return terms, short_terms
+
+
+def build_match_expression(terms: List[str]) -> str:
+    """把片段组合成FTS5 MATCH表达式（每个片段作为短语，之间为OR）"""
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class LexicalSearch:
+    """基于FTS5的关键词检索"""
+
+    def __init__(self, db_manager: DatabaseManager):
+        """
+        初始化全文检索
+
+        参数:
+            db_manager: 数据库管理器
+        """
+        self.db_manager = db_manager
+        self._available = None
+
+    @property
+    def available(self) -> bool:
+        """全文索引表是否存在（SQLite不支持FTS5/trigram时建表会失败）"""
+        if self._available is None:
+            rows = self.db_manager.query(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+            )
+            self._available = bool(rows)
+            if not self._available:
+                logger.warning("全文索引不可用，关键词检索退化为LIKE扫描")
+        return self._available
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        关键词检索记忆
+
+        参数:
+            query: 查询文本
+            limit: 返回结果数量
+
+        返回:
+            记忆行字典列表（按相关度降序），包含bm25分数和归一化的相关度
+        """
+        terms, short_terms = extract_terms(query)
+        if not terms and not short_terms:
+            return []
+
+        try:
+            if terms and self.available:
+                rows = self._match(terms, limit)
+            else:
+                rows = self._like(terms + short_terms, limit)
+        except Exception as e:
+            logger.error(f"全文检索失败: {e}")
+            return []
+
+        return self._to_results(rows)
+
+    def _match(self, terms: List[str], limit: int):
+        """FTS5索引检索，bm25越小越相关"""
+        return self.db_manager.query(
+            f"""
+            SELECT {MEMORY_COLUMNS}, bm25({FTS_TABLE}, ?, ?) AS rank
+            FROM {FTS_TABLE}
+            JOIN memories m ON m.rowid = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH ?
+            ORDER BY rank, m.weight DESC
+            LIMIT ?
+            """,
+            (*BM25_WEIGHTS, build_match_expression(terms), limit)
+        )
+
+    def _like(self, terms: List[str], limit: int):
+        """短片段（或全文索引不可用时）的LIKE回退"""
+        conditions = " OR ".join(["(LOWER(m.content) LIKE ? OR LOWER(m.summary) LIKE ?)"] * len(terms))
+        params = []
+        for term in terms:
+            params.extend([f"%{term}%", f"%{term}%"])
+        return self.db_manager.query(
+            f"""
+            SELECT {MEMORY_COLUMNS}, 0.0 AS rank
+            FROM memories m
+            WHERE {conditions}
+            ORDER BY m.weight DESC, m.timestamp DESC
+            LIMIT ?
+            """,
+            (*params, limit)
+        )
+
+    @staticmethod
+    def _to_results(rows) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        results = []
+        best = min(row[9] for row in rows)
+        for row in rows:
+            result = {
+                "id": row[0],
+                "content": row[1],
+                "type": row[2],
+                "role": row[3],
+                "weight": row[4],
+                "group_id": row[5],
+                "summary": row[6],
+                "timestamp": row[7],
+                "last_accessed": row[8],
+                "bm25": row[9],
+            }
+            # bm25为负数，除以本次最优分数得到0-1的相对相关度
+            result["relevance"] = row[9] / best if best < 0 else 1.0
+            results.append(result)
+        return results
+
+    def rebuild(self) -> bool:
+        """
+        从memories表重建全文索引（VACUUM会重排rowid，之后需要重建）
+
+        返回:
+            bool: 是否成功
+        """
+        if not self.available:
+            return False
+        return self.db_manager.execute_query(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"
+        ) is not None
@@ -12,6 +12,8 @@ import logging
 from typing import List, Dict, Any, Optional
 from ..init.db_manager import DatabaseManager
 from ..memory_cache.cache_manager import CacheManager
+from .lexical_search import LexicalSearch
+from .hybrid_search import lexical_similarity
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,10 @@ logger = logging.getLogger(__name__)
 class SmartRetriever:
     """智能记忆检索器"""
     
+    # 全文检索结果转换为_row_to_memory所需的列顺序
+    LEXICAL_FIELDS = ("id", "content", "type", "role", "weight", "group_id",
+                      "summary", "timestamp", "last_accessed")
+    
     def __init__(self, db_manager: DatabaseManager):
         """
         初始化智能检索器
@@ -28,6 +34,7 @@ class SmartRetriever:
         """
         self.db_manager = db_manager
         self.cache_manager = CacheManager(db_manager)
+        self.lexical_search = LexicalSearch(db_manager)
         self.logger = logger
         
         # 初始化缓存系统
@@ -65,16 +72,8 @@ class SmartRetriever:
             
             # 1. 获取最近5条记忆（排除已缓存的）
             if memory_ids:
-                placeholders = ','.join(['?' for _ in memory_ids])
-                recent_query = f"""
-                SELECT id, content, type, role, weight, group_id, 
-                       summary, timestamp, last_accessed, 'recent' as source
-                FROM memories 
-                WHERE id NOT IN ({placeholders})
-                ORDER BY timestamp DESC 
-                LIMIT 5
-                """
-                recent_rows = self.db_manager.query(recent_query, list(memory_ids))
+                recent_rows = self.db_manager.execute_named("retriever.recent_excluding",
+                                                            in_values=list(memory_ids))
             else:
                 recent_query = """
                 SELECT id, content, type, role, weight, group_id, 
@@ -91,16 +90,8 @@ class SmartRetriever:
                 all_existing_ids.update([row[0] for row in recent_rows])
             
             if all_existing_ids:
-                placeholders = ','.join(['?' for _ in all_existing_ids])
-                weight_query = f"""
-                SELECT id, content, type, role, weight, group_id, 
-                       summary, timestamp, last_accessed, 'important' as source
-                FROM memories 
-                WHERE id NOT IN ({placeholders}) AND weight >= 6.0
-                ORDER BY weight DESC, timestamp DESC 
-                LIMIT 3
-                """
-                weight_rows = self.db_manager.query(weight_query, list(all_existing_ids))
+                weight_rows = self.db_manager.execute_named("retriever.important_excluding",
+                                                            in_values=list(all_existing_ids))
             else:
                 weight_query = """
                 SELECT id, content, type, role, weight, group_id, 
@@ -178,35 +169,16 @@ class SmartRetriever:
             记忆列表
         """
         try:
-            keywords = [w for w in user_input.lower().split() if len(w) > 1]
-            
-            if not keywords:
-                return self.get_recent_memories(limit=5)
-            
-            # 构建搜索查询
-            search_conditions = []
-            params = []
+            # 全文索引检索，按bm25相关度排序
+            results = self.lexical_search.search(user_input, limit=10)
             
-            for keyword in keywords[:3]:  # 限制关键词数量
-                search_conditions.append("(LOWER(content) LIKE ? OR LOWER(summary) LIKE ?)")
-                params.extend([f"%{keyword}%", f"%{keyword}%"])
-            
-            query = f"""
-            SELECT id, content, type, role, weight, group_id, 
-                   summary, timestamp, last_accessed
-            FROM memories 
-            WHERE {' OR '.join(search_conditions)}
-            ORDER BY weight DESC, timestamp DESC 
-            LIMIT 10
-            """
-            
-            rows = self.db_manager.query(query, params)
-            
-            if rows:
+            if results:
                 memories = []
-                for row in rows:
-                    memory = self._row_to_memory(row)
-                    memory['similarity'] = 0.6  # 关键词匹配相似度
+                for result in results:
+                    memory = self._row_to_memory(tuple(result[key] for key in self.LEXICAL_FIELDS))
+                    # 关键词匹配相似度，按相对bm25在0.5-0.7之间（与混合检索一致）
+                    memory['similarity'] = lexical_similarity(result['relevance'])
+                    memory['bm25'] = result['bm25']
                     memories.append(memory)
                     # 记录访问，关键词搜索权重更高
                     self._record_memory_access(memory['id'], 1.0)
@@ -337,16 +309,7 @@ class SmartRetriever:
             return []
         
         try:
-            placeholders = ','.join(['?' for _ in memory_ids])
-            query = f"""
-            SELECT id, content, type, role, weight, group_id, 
-                   summary, timestamp, last_accessed
-            FROM memories 
-            WHERE id IN ({placeholders})
-            ORDER BY weight DESC, timestamp DESC
-            """
-            
-            rows = self.db_manager.query(query, memory_ids)
+            rows = self.db_manager.execute_named("retriever.memories_by_ids", in_values=memory_ids)
             
             memories = []
             for row in rows:
@@ -5,5 +5,7 @@
 """
 
 from core.memory.storage.memory_store import MemoryStore
+from core.memory.storage.index_rebuild import IndexRebuilder
+from core.memory.storage.archive import MemoryArchive, ArchivePolicy
 
-__all__ = ['MemoryStore']
+__all__ = ['MemoryStore', 'IndexRebuilder', 'MemoryArchive', 'ArchivePolicy']
@@ -0,0 +1,520 @@
+"""
+记忆归档 - 热/冷两级存储
+低权重且长时间未访问的记忆从memories表移到按月分区的归档库（内容zlib压缩），向量移到单独的冷向量索引；
+每个分区另有一个明文的FTS5 trigram索引供关键词检索，不需要解压全部记录；
+检索时热层结果不足才查询归档，热表和热索引的规模保持有界
+"""
+
+import os
+import json
+import glob
+import zlib
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.vector_codec import decode_rows
+from core.memory.retrieval.lexical_search import extract_terms, build_match_expression
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.storage")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.storage")
+
+# 分区文件名：memories_2024_01.db，按记忆创建时间的月份划分
+PARTITION_PREFIX = "memories_"
+PARTITION_FORMAT = "%Y_%m"
+
+COLD_INDEX_FILE = "cold_index.bin"
+
+# content、summary、metadata压缩后存在payload中，其余列保持可查询
+ARCHIVE_COLUMNS = ("id", "type", "role", "session_id", "timestamp", "weight", "group_id",
+                   "last_accessed", "payload", "vector", "vector_format", "model_name", "archived_at")
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_memories (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    role TEXT NOT NULL,
+    session_id TEXT,
+    timestamp REAL NOT NULL,
+    weight REAL,
+    group_id TEXT,
+    last_accessed REAL,
+    payload BLOB NOT NULL,
+    vector BLOB,
+    vector_format TEXT,
+    model_name TEXT,
+    archived_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archived_session_time ON archived_memories(session_id, timestamp);
+"""
+
+# 归档候选：按创建时间从旧到新，每批一起移动
+CANDIDATE_QUERY = """
+SELECT m.id, m.content, m.type, m.role, m.session_id, m.timestamp, m.weight, m.group_id,
+       m.summary, m.last_accessed, m.metadata, v.vector, v.vector_format, v.model_name
+FROM memories m
+LEFT JOIN memory_vectors v ON v.memory_id = m.id
+WHERE m.weight < ? AND m.timestamp < ? AND m.last_accessed < ? AND m.type NOT IN ({types})
+ORDER BY m.timestamp
+LIMIT ?
+"""
+
+SELECT_COLUMNS = "id, type, role, session_id, timestamp, weight, group_id, last_accessed, payload"
+
+# 分区的全文索引：rowid与archived_memories一致，text为明文的content和summary
+ARCHIVE_FTS_TABLE = "archived_fts"
+ARCHIVE_FTS_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {ARCHIVE_FTS_TABLE} USING fts5(text, tokenize='trigram')
+"""
+
+
+def _payload_text(payload: bytes) -> str:
+    """压缩内容中可检索的文本（content和summary）"""
+    data = json.loads(zlib.decompress(payload))
+    return f"{data.get('content') or ''}\n{data.get('summary') or ''}"
+
+
+class ArchivePolicy:
+    """归档策略：权重低于 max_weight 且创建和最近访问都早于 min_age_days 天的记忆移到冷层"""
+
+    def __init__(self, max_weight: float = 3.0, min_age_days: float = 90.0,
+                 batch_size: int = 500, keep_types=("summary",)):
+        """
+        初始化归档策略
+
+        参数:
+            max_weight: 权重低于此值的记忆才会归档（权重范围1-10）
+            min_age_days: 创建和最近访问都早于此天数的记忆才会归档
+            batch_size: 每批移动的记忆数
+            keep_types: 不归档的记忆类型（摘要由历史检索直接使用）
+        """
+        self.max_weight = max_weight
+        self.min_age_days = min_age_days
+        self.batch_size = batch_size
+        self.keep_types = tuple(keep_types) or ("",)
+
+    def cutoff(self, now: Optional[float] = None) -> float:
+        """早于此时间戳的记忆满足时间条件"""
+        return (now if now is not None else time.time()) - self.min_age_days * 86400
+
+
+class MemoryArchive:
+    """按月分区的冷记忆归档"""
+
+    def __init__(self, archive_dir: str, vector_dim: int = 1024):
+        """
+        初始化记忆归档（分区库和冷索引在首次使用时才打开）
+
+        参数:
+            archive_dir: 归档目录，存放分区库和冷向量索引
+            vector_dim: 冷索引的向量维度（与memory_vectors中的完整向量一致）
+        """
+        self.archive_dir = archive_dir
+        self.vector_dim = vector_dim
+        self._cold_index: Optional[VectorIndexManager] = None
+        self._lock = threading.Lock()
+        self._fts_available: Optional[bool] = None  # SQLite不支持FTS5/trigram时为False
+
+    # ---------- 分区 ----------
+
+    @staticmethod
+    def partition_key(timestamp: float) -> str:
+        """记忆所属的分区"""
+        return datetime.fromtimestamp(timestamp or 0).strftime(PARTITION_FORMAT)
+
+    def _partition_path(self, key: str) -> str:
+        return os.path.join(self.archive_dir, f"{PARTITION_PREFIX}{key}.db")
+
+    def list_partitions(self) -> List[str]:
+        """已有的分区，从新到旧"""
+        paths = glob.glob(os.path.join(self.archive_dir, f"{PARTITION_PREFIX}*.db"))
+        keys = [os.path.basename(path)[len(PARTITION_PREFIX):-3] for path in paths]
+        return sorted(keys, reverse=True)
+
+    def _connect(self, key: str) -> sqlite3.Connection:
+        """打开分区库（不存在时创建），确保全文索引存在"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        conn = sqlite3.connect(self._partition_path(key))
+        conn.executescript(ARCHIVE_SCHEMA)
+        if self._fts_available is not False:
+            self._ensure_fts(conn, key)
+        return conn
+
+    def _ensure_fts(self, conn: sqlite3.Connection, key: str):
+        """创建分区的全文索引；旧分区没有索引时从压缩内容回填一次"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ARCHIVE_FTS_TABLE,)
+        ).fetchone()
+        if exists:
+            self._fts_available = True
+            return
+        try:
+            with conn:
+                conn.execute(ARCHIVE_FTS_SCHEMA)
+                conn.create_function("archive_text", 1, _payload_text, deterministic=True)
+                count = conn.execute(
+                    f"INSERT INTO {ARCHIVE_FTS_TABLE}(rowid, text) "
+                    f"SELECT rowid, archive_text(payload) FROM archived_memories"
+                ).rowcount
+            self._fts_available = True
+            if count > 0:
+                logger.info(f"为归档分区 {key} 建立全文索引: {count} 条记忆")
+        except sqlite3.Error as e:
+            self._fts_available = False
+            logger.warning(f"归档分区无法建立全文索引，关键词检索退化为逐条解压匹配: {e}")
+
+    # ---------- 冷索引 ----------
+
+    @property
+    def cold_index(self) -> Optional[VectorIndexManager]:
+        """冷向量索引，首次访问时加载或创建"""
+        with self._lock:
+            if self._cold_index is None:
+                os.makedirs(self.archive_dir, exist_ok=True)
+                index = VectorIndexManager(index_path=os.path.join(self.archive_dir, COLD_INDEX_FILE),
+                                           vector_dim=self.vector_dim, index_type="flat")
+                if not index.available:
+                    return None
+                if not index.load_index():
+                    index.create_index()
+                self._cold_index = index
+            return self._cold_index
+
+    def _has_cold_index(self) -> bool:
+        return self._cold_index is not None or os.path.exists(os.path.join(self.archive_dir, COLD_INDEX_FILE))
+
+    # ---------- 归档 ----------
+
+    def archive(self, db_manager, vector_index=None, policy: Optional[ArchivePolicy] = None,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        把满足策略的记忆从热层移到归档
+
+        每批先写入分区库和冷索引，再从热表和热索引删除；中途失败时已写入分区的记录会在下次归档时覆盖，不会丢失记忆。
+        关联记录保留在memory_association中。
+
+        参数:
+            db_manager: 热层数据库管理器
+            vector_index: 热层向量索引（归档的记忆从中删除）
+            policy: 归档策略，None则使用默认策略
+            now: 当前时间（测试用）
+
+        返回:
+            Dict[str, Any]: 统计信息（archived、vectors、partitions）
+        """
+        stats = {"archived": 0, "vectors": 0, "partitions": set()}
+        start_time = time.time()
+        for batch in self.iter_archive(db_manager, vector_index, policy, now):
+            stats["archived"] += batch["archived"]
+            stats["vectors"] += batch["vectors"]
+            stats["partitions"].update(batch["partitions"])
+
+        stats["partitions"] = sorted(stats["partitions"])
+        if stats["archived"]:
+            logger.info(f"📦 归档 {stats['archived']} 条记忆（{stats['vectors']} 个向量）到 "
+                        f"{len(stats['partitions'])} 个分区，耗时 {time.time() - start_time:.2f}秒")
+        return stats
+
+    def iter_archive(self, db_manager, vector_index=None, policy: Optional[ArchivePolicy] = None,
+                     now: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐批归档：每批移动完成后yield本批的统计，供后台维护任务在批之间停顿或中止
+
+        每次都重新查询候选，中止后再次运行从剩余的记忆继续。
+
+        参数:
+            db_manager: 热层数据库管理器
+            vector_index: 热层向量索引
+            policy: 归档策略，None则使用默认策略
+            now: 当前时间（测试用）
+
+        返回:
+            Iterator[Dict[str, Any]]: 每批的统计（archived、vectors、partitions）
+        """
+        policy = policy or ArchivePolicy()
+        cutoff = policy.cutoff(now)
+        query = CANDIDATE_QUERY.format(types=", ".join("?" * len(policy.keep_types)))
+
+        try:
+            while True:
+                rows = db_manager.query(query, (policy.max_weight, cutoff, cutoff, *policy.keep_types,
+                                                policy.batch_size))
+                if not rows:
+                    break
+
+                # 一条记忆有多个向量时只保留第一个
+                batch = list({row[0]: row for row in reversed(rows)}.values())[::-1]
+                memory_ids = [row[0] for row in batch]
+
+                partitions = self._write_partitions(batch)
+                vectors = self._add_cold_vectors(batch)
+
+                with db_manager.transaction():
+                    for table, column in (("memories", "id"), ("memory_vectors", "memory_id"),
+                                          ("memory_cache", "memory_id")):
+                        db_manager.executemany(f"DELETE FROM {table} WHERE {column} = ?",
+                                               [(memory_id,) for memory_id in memory_ids])
+
+                if vector_index and vector_index.available:
+                    vector_index.delete_vectors(memory_ids)
+                    vector_index.maybe_checkpoint()
+
+                yield {"archived": len(memory_ids), "vectors": vectors, "partitions": partitions}
+                if len(rows) < policy.batch_size:
+                    break
+        finally:
+            # 中途停止时也保存已写入冷索引的向量
+            if self._cold_index is not None:
+                self._cold_index.maybe_checkpoint(force=True)
+
+    def _write_partitions(self, rows) -> List[str]:
+        """按月份写入分区库（记录和全文索引在同一事务中），返回涉及的分区"""
+        by_partition: Dict[str, List[tuple]] = {}
+        texts: Dict[str, List[tuple]] = {}
+        archived_at = time.time()
+        for row in rows:
+            (memory_id, content, memory_type, role, session_id, timestamp, weight, group_id,
+             summary, last_accessed, metadata, vector, vector_format, model_name) = row
+            payload = zlib.compress(json.dumps(
+                {"content": content, "summary": summary, "metadata": metadata}, ensure_ascii=False
+            ).encode("utf-8"))
+            key = self.partition_key(timestamp)
+            by_partition.setdefault(key, []).append((
+                memory_id, memory_type, role, session_id, timestamp, weight, group_id, last_accessed,
+                payload, vector, vector_format, model_name, archived_at
+            ))
+            texts.setdefault(key, []).append((memory_id, f"{content or ''}\n{summary or ''}"))
+
+        placeholders = ", ".join("?" * len(ARCHIVE_COLUMNS))
+        for key, records in by_partition.items():
+            with closing(self._connect(key)) as conn:
+                with conn:
+                    if self._fts_available:
+                        # 重新归档时REPLACE会换掉rowid，先删除旧的索引项
+                        conn.executemany(
+                            f"DELETE FROM {ARCHIVE_FTS_TABLE} WHERE rowid = "
+                            f"(SELECT rowid FROM archived_memories WHERE id = ?)",
+                            [(memory_id,) for memory_id, _ in texts[key]]
+                        )
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO archived_memories ({', '.join(ARCHIVE_COLUMNS)}) "
+                        f"VALUES ({placeholders})",
+                        records
+                    )
+                    if self._fts_available:
+                        conn.executemany(
+                            f"INSERT INTO {ARCHIVE_FTS_TABLE}(rowid, text) "
+                            f"SELECT rowid, ? FROM archived_memories WHERE id = ?",
+                            [(text, memory_id) for memory_id, text in texts[key]]
+                        )
+        return list(by_partition)
+
+    def _add_cold_vectors(self, rows) -> int:
+        """把有向量的记忆加入冷索引（已在冷索引中的跳过）"""
+        index = self.cold_index
+        if index is None:
+            return 0
+        vector_rows = [(row[0], row[11], row[12]) for row in rows
+                       if row[11] and row[0] not in index.reverse_map]
+        memory_ids, vectors = decode_rows(vector_rows, index.input_dim)
+        if not memory_ids:
+            return 0
+        if not index.add_vectors(vectors, memory_ids):
+            raise RuntimeError("写入冷向量索引失败")
+        index.maybe_checkpoint()
+        return len(memory_ids)
+
+    # ---------- 查询 ----------
+
+    def get_memories(self, memory_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        从归档中按ID读取记忆（从新分区到旧分区，全部找到即停止）
+
+        参数:
+            memory_ids: 记忆ID列表
+
+        返回:
+            List[Dict[str, Any]]: 找到的记忆，顺序与memory_ids一致
+        """
+        remaining = list(dict.fromkeys(memory_ids))
+        found: Dict[str, Dict[str, Any]] = {}
+        for key in self.list_partitions():
+            if not remaining:
+                break
+            with closing(self._connect(key)) as conn:
+                rows = conn.execute(
+                    f"SELECT {SELECT_COLUMNS} FROM archived_memories "
+                    f"WHERE id IN ({', '.join('?' * len(remaining))})",
+                    remaining
+                ).fetchall()
+            for row in rows:
+                found[row[0]] = self._row_to_memory(row)
+            remaining = [memory_id for memory_id in remaining if memory_id not in found]
+        return [found[memory_id] for memory_id in memory_ids if memory_id in found]
+
+    def search_vectors(self, query_vector: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        在冷索引中检索相似记忆
+
+        参数:
+            query_vector: 查询向量（完整维度）
+            k: 返回结果数量
+
+        返回:
+            List[Dict[str, Any]]: 记忆列表（含similarity），按相似度降序
+        """
+        if not self._has_cold_index():
+            return []
+        index = self.cold_index
+        if index is None:
+            return []
+        memory_ids, scores = index.search(query_vector, k=k)
+        similarities = dict(zip(memory_ids, scores))
+        memories = self.get_memories(memory_ids)
+        for memory in memories:
+            memory["similarity"] = float(similarities[memory["memory_id"]])
+        return memories
+
+    def search_keywords(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        在归档中做关键词检索（从新分区到旧分区，凑够limit条即停止）
+
+        三字及以上的片段走分区的全文索引，只有不足三字的片段时对明文做LIKE匹配；
+        相关度为命中片段的比例，只对返回的记录计算
+
+        参数:
+            query: 查询文本
+            limit: 返回结果数量
+
+        返回:
+            List[Dict[str, Any]]: 记忆列表（含relevance，命中片段的比例），按相关度降序
+        """
+        terms, short_terms = extract_terms(query)
+        all_terms = terms + short_terms
+        if not all_terms:
+            return []
+
+        results = []
+        for key in self.list_partitions():
+            with closing(self._connect(key)) as conn:
+                if self._fts_available:
+                    rows = self._match_partition(conn, terms, short_terms, limit)
+                else:
+                    rows = self._scan_partition(conn, all_terms, limit)
+            for row in rows:
+                text = row[-1].lower()
+                hits = sum(1 for term in all_terms if term in text)
+                if hits == 0:
+                    continue
+                memory = self._row_to_memory(row)
+                memory["relevance"] = hits / len(all_terms)
+                results.append(memory)
+            if len(results) >= limit:
+                break
+
+        results.sort(key=lambda memory: memory["relevance"], reverse=True)
+        return results[:limit]
+
+    @staticmethod
+    def _match_partition(conn: sqlite3.Connection, terms: List[str], short_terms: List[str], limit: int):
+        """用分区全文索引检索，返回记录列和明文"""
+        columns = ", ".join(f"a.{column}" for column in SELECT_COLUMNS.split(", "))
+        if terms:
+            return conn.execute(
+                f"""
+                SELECT {columns}, f.text
+                FROM {ARCHIVE_FTS_TABLE} f
+                JOIN archived_memories a ON a.rowid = f.rowid
+                WHERE {ARCHIVE_FTS_TABLE} MATCH ?
+                ORDER BY bm25({ARCHIVE_FTS_TABLE}), a.weight DESC, a.timestamp DESC
+                LIMIT ?
+                """,
+                (build_match_expression(terms), limit)
+            ).fetchall()
+        # 短片段无法走trigram索引，对明文做子串匹配（不解压）；
+        # 不用LIKE：FTS5会接管trigram表上的LIKE，不足三字的模式在部分SQLite版本中匹配不到
+        conditions = " OR ".join(["instr(lower(f.text), ?) > 0"] * len(short_terms))
+        return conn.execute(
+            f"""
+            SELECT {columns}, f.text
+            FROM {ARCHIVE_FTS_TABLE} f
+            JOIN archived_memories a ON a.rowid = f.rowid
+            WHERE {conditions}
+            ORDER BY a.weight DESC, a.timestamp DESC
+            LIMIT ?
+            """,
+            (*short_terms, limit)
+        ).fetchall()
+
+    @staticmethod
+    def _scan_partition(conn: sqlite3.Connection, terms: List[str], limit: int):
+        """没有全文索引时逐条解压匹配"""
+        def hits(payload):
+            text = _payload_text(payload).lower()
+            return sum(1 for term in terms if term in text)
+
+        conn.create_function("archive_hits", 1, hits, deterministic=True)
+        conn.create_function("archive_text", 1, _payload_text, deterministic=True)
+        return conn.execute(
+            f"""
+            SELECT {SELECT_COLUMNS}, archive_text(payload) FROM archived_memories
+            WHERE archive_hits(payload) > 0
+            ORDER BY archive_hits(payload) DESC, weight DESC, timestamp DESC
+            LIMIT ?
+            """,
+            (limit,)
+        ).fetchall()
+
+    @staticmethod
+    def _row_to_memory(row) -> Dict[str, Any]:
+        data = json.loads(zlib.decompress(row[8]))
+        try:
+            metadata = json.loads(data.get("metadata") or "{}")
+        except (TypeError, ValueError):
+            metadata = {}
+        return {
+            "memory_id": row[0],
+            "content": data.get("content") or "",
+            "type": row[1],
+            "role": row[2],
+            "session_id": row[3] or "",
+            "timestamp": row[4],
+            "weight": row[5] if row[5] is not None else 5.0,
+            "group_id": row[6] or "",
+            "last_accessed": row[7],
+            "summary": data.get("summary") or "",
+            "metadata": metadata,
+            "tier": "cold",
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """归档统计：分区数、记忆数、冷索引向量数"""
+        partitions = self.list_partitions()
+        total = 0
+        for key in partitions:
+            with closing(self._connect(key)) as conn:
+                total += conn.execute("SELECT COUNT(*) FROM archived_memories").fetchone()[0]
+        index = self.cold_index if self._has_cold_index() else None
+        return {
+            "partitions": len(partitions),
+            "memories": total,
+            "cold_vectors": index.index.ntotal if index is not None else 0,
+        }
+
+    def close(self):
+        """保存冷索引"""
+        if self._cold_index is not None:
+            self._cold_index.maybe_checkpoint(force=True)
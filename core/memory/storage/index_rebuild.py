@@ -0,0 +1,284 @@
+"""
+向量索引重建 - 从SQLite分块读取记忆重建FAISS索引
+已存向量的模型与当前向量化模型一致时直接复用，只对缺失的记忆批量编码并写回memory_vectors；
+新索引先写到临时文件，每块处理完后记录进度，中断后再次运行会从上次的位置继续
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.index_persistence import CheckpointPolicy
+from core.memory.init.vector_codec import decode_rows, encode_vectors
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.storage")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.storage")
+
+# 进度文件格式版本
+STATE_VERSION = 1
+
+# 临时索引的检查点策略：进度主要靠增量日志保存，完整快照只在日志较大时写，避免反复写整个索引
+REBUILD_CHECKPOINT_POLICY = CheckpointPolicy(max_pending_ops=200000, max_interval=600.0,
+                                             max_log_bytes=512 * 1024 * 1024)
+
+
+class IndexRebuilder:
+    """可恢复的向量索引重建"""
+
+    def __init__(self, store, chunk_size: int = 1000, encode_batch_size: int = 64):
+        """
+        初始化索引重建
+
+        参数:
+            store: MemoryStore实例（使用其数据库、向量化器、存储格式和向量索引）
+            chunk_size: 每块读取的记忆数，也是进度记录的粒度
+            encode_batch_size: 向量化的批大小
+        """
+        self.store = store
+        self.db_manager = store.db_manager
+        self.vectorizer = store.vectorizer
+        self.target = store.vector_index
+        self.chunk_size = chunk_size
+        self.encode_batch_size = encode_batch_size
+
+        self.temp_path = self.target.index_path + ".rebuild"
+        self.state_path = self.target.index_path + ".rebuild.json"
+
+    @property
+    def model_name(self) -> Optional[str]:
+        """与MemoryStore写入memory_vectors时一致的模型名，没有向量化器时为None"""
+        if self.vectorizer is None:
+            return None
+        return f"{self.vectorizer.model_type}/{self.vectorizer.model_name}"
+
+    def rebuild(self, resume: bool = True,
+                progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        重建向量索引并替换当前索引
+
+        应在没有其他进程写入记忆时运行；替换完成前当前索引保持不变。
+
+        参数:
+            resume: 有未完成的重建时是否继续（False则重新开始）
+            progress_callback: 每块完成后调用，参数为进度统计
+
+        返回:
+            Dict[str, Any]: 统计信息（processed/reused/encoded/skipped/vectors_per_sec等）
+        """
+        if not self.target or not self.target.available:
+            raise RuntimeError("向量索引不可用")
+
+        state = self._load_state() if resume else None
+        index, state = self._open_temp_index(state)
+        if state is None:
+            state = self._new_state()
+            self._save_state(state)
+        else:
+            logger.info(f"继续未完成的索引重建，已处理 {state['processed']} 条记忆")
+
+        session_start = time.time()
+        session_vectors = 0
+        elapsed_before = state["elapsed"]
+
+        while True:
+            rows = self.db_manager.query(
+                """
+                SELECT m.rowid, m.id, m.content, m.weight, v.vector, v.vector_format, v.model_name
+                FROM memories m
+                LEFT JOIN memory_vectors v ON v.memory_id = m.id
+                WHERE m.rowid > ?
+                ORDER BY m.rowid
+                LIMIT ?
+                """,
+                (state["last_rowid"], self.chunk_size)
+            )
+            if not rows:
+                break
+
+            memory_ids, vectors = self._chunk_vectors(rows, state)
+            # 中断发生在添加之后、记录进度之前时，这一块会重新处理
+            keep = [i for i, memory_id in enumerate(memory_ids) if memory_id not in index.reverse_map]
+            if keep:
+                if not index.add_vectors(vectors[keep], [memory_ids[i] for i in keep]):
+                    raise RuntimeError("写入临时索引失败")
+                index.maybe_checkpoint()
+                session_vectors += len(keep)
+
+            state["last_rowid"] = rows[-1][0]
+            state["processed"] += len({row[1] for row in rows})
+            state["indexed"] = index.index.ntotal
+            state["elapsed"] = elapsed_before + time.time() - session_start
+            self._save_state(state)
+
+            if progress_callback:
+                progress_callback(self._stats(state, session_vectors, time.time() - session_start))
+
+            if len(rows) < self.chunk_size:
+                break
+
+        index.save_index()
+        index.delta_log.close()
+        self._install()
+        self._cleanup()
+
+        stats = self._stats(state, session_vectors, time.time() - session_start)
+        logger.info(f"✅ 向量索引重建完成: {stats['indexed']} 个向量，复用 {stats['reused']}，"
+                    f"编码 {stats['encoded']}，跳过 {stats['skipped']}，{stats['vectors_per_sec']:.1f} 向量/秒")
+        return stats
+
+    def _chunk_vectors(self, rows, state: Dict[str, Any]) -> Tuple[List[str], np.ndarray]:
+        """取出一块记忆的向量：模型一致的已存向量直接解码，其余批量编码并写回"""
+        input_dim = self.target.input_dim
+        model_name = self.model_name
+
+        stored, missing = {}, {}
+        for row in rows:
+            memory_id = row[1]
+            if memory_id in stored:
+                continue
+            if row[4] and (model_name is None or row[6] == model_name):
+                stored[memory_id] = (memory_id, row[4], row[5])
+                missing.pop(memory_id, None)
+            elif row[2]:
+                missing[memory_id] = row
+
+        memory_ids, vectors = decode_rows(list(stored.values()), input_dim)
+        # 维度不符的已存向量（换过模型）也需要重新编码
+        for memory_id in set(stored) - set(memory_ids):
+            missing[memory_id] = next(row for row in rows if row[1] == memory_id)
+        state["reused"] += len(memory_ids)
+
+        if missing and self.vectorizer is not None:
+            encoded_ids, encoded = self._encode_missing(list(missing.values()))
+            state["encoded"] += len(encoded_ids)
+            memory_ids = memory_ids + encoded_ids
+            vectors = np.vstack([vectors, encoded]) if len(encoded_ids) else vectors
+        else:
+            state["skipped"] += len(missing)
+
+        return memory_ids, vectors
+
+    def _encode_missing(self, rows) -> Tuple[List[str], np.ndarray]:
+        """批量编码缺失向量的记忆，并写回memory_vectors供下次复用"""
+        memory_ids = [row[1] for row in rows]
+        vectors = self.vectorizer.encode(
+            [row[2] for row in rows],
+            batch_size=self.encode_batch_size,
+            memory_weights=[float(row[3] or 1.0) for row in rows]
+        )
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(rows), -1)
+        if vectors.shape[1] != self.target.input_dim:
+            raise RuntimeError(f"向量化模型维度 ({vectors.shape[1]}) 与索引维度 ({self.target.input_dim}) 不一致")
+
+        vector_format = self.store.vector_format
+        blobs = encode_vectors(vectors, vector_format)
+        now = time.time()
+        with self.db_manager.transaction():
+            self.db_manager.executemany("DELETE FROM memory_vectors WHERE memory_id = ?",
+                                        [(memory_id,) for memory_id in memory_ids])
+            self.db_manager.bulk_insert("memory_vectors", [
+                (f"vec_{memory_id}", memory_id, blob, vector_format, self.model_name, now)
+                for memory_id, blob in zip(memory_ids, blobs)
+            ])
+        return memory_ids, vectors
+
+    def _open_temp_index(self, state: Optional[Dict[str, Any]]) -> Tuple[VectorIndexManager, Optional[Dict[str, Any]]]:
+        """
+        打开临时索引：继续时加载已写入的部分，否则新建
+
+        返回:
+            (临时索引, 进度)，需要重新开始时进度为None
+        """
+        index = VectorIndexManager(index_path=self.temp_path, vector_dim=self.target.vector_dim,
+                                   index_type="flat", checkpoint_policy=REBUILD_CHECKPOINT_POLICY)
+        if state is None or not index.load_index():
+            if state is not None:
+                logger.warning("临时索引无法加载，重新开始重建")
+                state = None
+            self._cleanup()
+            index.create_index()
+
+        # 首次检查点之前中断时，加载的临时索引没有投影文件
+        if self.target.projector is not None and index.projector is None:
+            index.set_projector(self.target.projector)
+        return index, state
+
+    def _install(self):
+        """
+        用临时索引替换当前索引并重新加载
+
+        先删除进度文件，此后中断只会从头重建；新的.meta先放到.meta.tmp，再依次替换索引和.meta，
+        两次替换之间中断时load_index按校验和用.meta.tmp补全；旧索引的增量日志最后才清空，
+        中断时它的快照标记与新索引不符，加载时被丢弃
+        """
+        target = self.target
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        metadata_path = target.index_path + ".meta"
+        os.replace(self.temp_path + ".meta", metadata_path + ".tmp")
+        os.replace(self.temp_path, target.index_path)
+        os.replace(metadata_path + ".tmp", metadata_path)
+        target.delta_log.reset()
+        target.load_index()
+
+    def _cleanup(self):
+        """删除临时索引和进度文件"""
+        for path in (self.temp_path, self.temp_path + ".meta", self.temp_path + ".delta",
+                     self.temp_path + ".proj.npz", self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _new_state(self) -> Dict[str, Any]:
+        return {
+            "version": STATE_VERSION,
+            "model_name": self.model_name,
+            "input_dim": self.target.input_dim,
+            "last_rowid": 0,
+            "processed": 0,
+            "indexed": 0,
+            "reused": 0,
+            "encoded": 0,
+            "skipped": 0,
+            "elapsed": 0.0,
+            "started_at": time.time(),
+        }
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        """读取未完成重建的进度，模型或维度变化时作废"""
+        if not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取重建进度失败，重新开始: {e}")
+            return None
+        if (state.get("version") != STATE_VERSION or state.get("model_name") != self.model_name
+                or state.get("input_dim") != self.target.input_dim):
+            logger.info("向量化模型或索引维度已变化，重新开始重建")
+            return None
+        return state
+
+    def _save_state(self, state: Dict[str, Any]):
+        """原子写入进度文件"""
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    @staticmethod
+    def _stats(state: Dict[str, Any], session_vectors: int, session_elapsed: float) -> Dict[str, Any]:
+        stats = dict(state)
+        stats["vectors_per_sec"] = session_vectors / session_elapsed if session_elapsed > 0 else 0.0
+        return stats
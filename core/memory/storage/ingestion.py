@@ -0,0 +1,281 @@
+"""
+记忆写入队列 - 写后（write-behind）批量入库
+add_interaction_memory 只负责生成记忆ID并入队，
+向量化、SQLite写入和FAISS添加在后台线程中按批完成
+"""
+
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+# 导入日志工具
+try:
+    from core.utils.logger import get_logger
+    logger = get_logger("estia.memory.ingestion")
+except ImportError:
+    # 如果还没有日志工具，使用标准日志
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("estia.memory.ingestion")
+
+
+@dataclass
+class IngestionItem:
+    """待写入的记忆条目"""
+    memory_id: str
+    content: str
+    memory_type: str
+    role: str
+    session_id: str
+    timestamp: float
+    weight: float
+    metadata_json: str
+    vector: Optional[Any] = None  # 已经计算好的向量（如本轮查询向量），写入时不再重复编码
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class IngestionQueue:
+    """
+    有界写后队列
+
+    - submit() 立即返回，队列满时等待 enqueue_timeout 秒，仍然满则拒绝（由调用方同步写入）
+    - 后台线程按 max_batch_size / max_wait 聚合一批记忆，一次向量化、一个事务、一次索引添加
+    - 整批写入失败时重试，仍失败则逐条写入，只丢弃单独写入也失败的记忆（记录其ID）
+    - flush() 等待队列排空，shutdown() 排空后停止线程
+    """
+
+    def __init__(self, writer, max_queue_size: int = 256, max_batch_size: int = 32,
+                 max_wait: float = 0.05, enqueue_timeout: float = 0.5,
+                 max_retries: int = 1, retry_delay: float = 0.1):
+        """
+        初始化写入队列
+
+        参数:
+            writer: 批量写入回调，签名为 writer(items: List[IngestionItem]) -> bool
+            max_queue_size: 队列最大长度（背压上限）
+            max_batch_size: 单批最大记忆数
+            max_wait: 凑批的最长等待时间（秒）
+            enqueue_timeout: 队列满时入队的最长等待时间（秒）
+            max_retries: 整批写入失败后的重试次数（之后改为逐条写入）
+            retry_delay: 重试前的等待时间（秒）
+        """
+        self.writer = writer
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._pending = 0  # 已入队但尚未写入完成的条目数
+        self._pending_cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._worker = None
+
+        # 统计信息
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "failed": 0,
+            "batches": 0,
+            "retries": 0,           # 整批重试次数
+            "fallback_items": 0,    # 整批失败后逐条写入的条目数
+            "rejected": 0,          # 队列满被拒绝的次数（调用方改为同步写入）
+            "blocked_time": 0.0,    # 入队等待的累计时间
+            "max_depth": 0,
+            "total_latency": 0.0,   # 入队到写入完成的累计延迟
+            "max_latency": 0.0
+        }
+        self._stats_lock = threading.Lock()
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._run, name="estia-memory-ingestion", daemon=True)
+        self._worker.start()
+        logger.info(f"记忆写入队列已启动 (队列上限: {self.max_queue_size}, 批大小: {self.max_batch_size})")
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive() and not self._stop_event.is_set()
+
+    def submit(self, item: IngestionItem) -> bool:
+        """
+        提交一条记忆
+
+        参数:
+            item: 待写入条目
+
+        返回:
+            bool: 是否入队成功，False表示队列已满或已停止，调用方应同步写入
+        """
+        if not self.is_running:
+            return False
+
+        start_time = time.time()
+        with self._pending_cond:
+            self._pending += 1
+        try:
+            self._queue.put(item, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._pending_cond:
+                self._pending -= 1
+                self._pending_cond.notify_all()
+            with self._stats_lock:
+                self.stats["rejected"] += 1
+                self.stats["blocked_time"] += time.time() - start_time
+            logger.warning(f"记忆写入队列已满 ({self.max_queue_size})，改为同步写入")
+            return False
+
+        with self._stats_lock:
+            self.stats["enqueued"] += 1
+            self.stats["blocked_time"] += time.time() - start_time
+            self.stats["max_depth"] = max(self.stats["max_depth"], self._queue.qsize())
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有已入队的记忆写入完成
+
+        参数:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        返回:
+            bool: 是否在超时前排空
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._pending_cond:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if not self._worker or not self._worker.is_alive():
+                    return False
+                self._pending_cond.wait(timeout=remaining if remaining is not None else 0.5)
+        return True
+
+    def shutdown(self, drain: bool = True, timeout: float = 10.0) -> bool:
+        """
+        停止写入队列
+
+        参数:
+            drain: 是否先排空队列
+            timeout: 排空的最长等待时间（秒）
+
+        返回:
+            bool: 是否所有记忆都已写入
+        """
+        drained = True
+        if drain and self._worker and self._worker.is_alive():
+            drained = self.flush(timeout=timeout)
+            if not drained:
+                logger.warning(f"写入队列排空超时，仍有 {self._pending} 条记忆未写入")
+
+        self._stop_event.set()
+        if self._worker:
+            self._worker.join(timeout=2.0)
+
+        # 线程已停止但队列中仍有残留时，在当前线程同步写完
+        if drain:
+            leftovers = self._drain_nowait()
+            if leftovers:
+                self._write(leftovers)
+            drained = self._pending == 0
+
+        logger.info(f"记忆写入队列已停止 (已写入: {self.stats['written']}, 失败: {self.stats['failed']})")
+        return drained
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计信息"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        written = stats["written"]
+        stats["queue_depth"] = self._queue.qsize()
+        stats["pending"] = self._pending
+        stats["capacity"] = self.max_queue_size
+        stats["running"] = self.is_running
+        stats["avg_batch_size"] = round(written / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["avg_latency_ms"] = round(stats["total_latency"] / written * 1000, 2) if written else 0.0
+        stats["max_latency_ms"] = round(stats.pop("max_latency") * 1000, 2)
+        stats.pop("total_latency")
+        return stats
+
+    def _run(self):
+        """后台写入线程主循环"""
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write(batch)
+
+    def _drain_nowait(self) -> List[IngestionItem]:
+        """取出队列中剩余的所有条目"""
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _call_writer(self, items: List[IngestionItem]) -> bool:
+        try:
+            return bool(self.writer(items))
+        except Exception as e:
+            logger.error(f"批量写入记忆失败: {e}")
+            return False
+
+    def _write(self, batch: List[IngestionItem]):
+        """写入一批记忆并更新统计：整批重试，仍失败则逐条写入"""
+        failed: List[IngestionItem] = []
+        success = self._call_writer(batch)
+        attempt = 0
+        while not success and attempt < self.max_retries:
+            attempt += 1
+            with self._stats_lock:
+                self.stats["retries"] += 1
+            time.sleep(self.retry_delay)
+            success = self._call_writer(batch)
+
+        if not success:
+            # 逐条写入，把失败限制在出问题的记忆上
+            if len(batch) > 1:
+                with self._stats_lock:
+                    self.stats["fallback_items"] += len(batch)
+                failed = [item for item in batch if not self._call_writer([item])]
+            else:
+                failed = list(batch)
+            if failed:
+                logger.error(f"{len(failed)} 条记忆写入失败已丢弃: "
+                             f"{', '.join(item.memory_id for item in failed)}")
+
+        finished_at = time.time()
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["written"] += len(batch) - len(failed)
+            self.stats["failed"] += len(failed)
+            for item in batch:
+                latency = finished_at - item.enqueued_at
+                self.stats["total_latency"] += latency
+                self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+
+        with self._pending_cond:
+            self._pending -= len(batch)
+            self._pending_cond.notify_all()
@@ -9,13 +9,20 @@ import json
 import uuid
 import logging
 import numpy as np
-from typing import List, Dict, Any, Optional, Union, Tuple
+from typing import List, Dict, Any, Optional, Union, Tuple, Callable
 from datetime import datetime
 from pathlib import Path
 
+from core.memory.storage.ingestion import IngestionQueue, IngestionItem
+from core.memory.storage.archive import MemoryArchive, ArchivePolicy
+from core.memory.init.index_policy import IndexPolicy, IndexPromoter
+from core.memory.init.vector_codec import (
+    DEFAULT_VECTOR_FORMAT, encode_vectors, decode_rows, iter_vector_chunks
+)
+
 # 导入记忆系统组件
 try:
-    from core.memory.init import DatabaseManager, VectorIndexManager
+    from core.memory.init import DatabaseManager, VectorIndexManager, get_shared_vector_index
     from core.memory.embedding import TextVectorizer, EmbeddingCache
     from core.utils.logger import get_logger
     logger = get_logger("estia.memory.storage")
@@ -26,11 +33,12 @@ except ImportError:
     
     # 尝试导入必要组件
     try:
-        from core.memory.init import DatabaseManager, VectorIndexManager
+        from core.memory.init import DatabaseManager, VectorIndexManager, get_shared_vector_index
     except ImportError:
         logger.error("无法导入DatabaseManager或VectorIndexManager")
         DatabaseManager = None
         VectorIndexManager = None
+        get_shared_vector_index = None
     
     try:
         from core.memory.embedding import TextVectorizer, EmbeddingCache
@@ -52,7 +60,11 @@ class MemoryStore:
                  cache_dir: Optional[str] = None,
                  vector_dim: int = 1024,
                  model_type: str = "sentence-transformers",
-                 model_name: str = "Qwen/Qwen3-Embedding-0.6B"):
+                 model_name: str = "Qwen/Qwen3-Embedding-0.6B",
+                 async_ingestion: bool = True,
+                 index_policy: Optional[IndexPolicy] = None,
+                 vector_format: str = DEFAULT_VECTOR_FORMAT,
+                 archive_dir: Optional[str] = None):
         """
         初始化记忆存储管理器
         
@@ -64,6 +76,10 @@ class MemoryStore:
             vector_dim: 向量维度，默认为1024（适用于Qwen模型）
             model_type: 向量化模型类型
             model_name: 向量化模型名称
+            async_ingestion: 是否启用后台批量写入交互记忆
+            index_policy: 向量索引升级策略（阈值、nprobe、efSearch等），None则使用默认策略
+            vector_format: memory_vectors中向量的存储格式，f32/f16/i8
+            archive_dir: 冷记忆归档目录，None则使用数据库所在目录下的archive
         """
         # 设置默认路径 - 使用统一的配置
         if db_path is None:
@@ -80,6 +96,9 @@ class MemoryStore:
         if cache_dir is None:
             # 使用data/memory/cache作为运行时缓存目录（保持现有数据）
             cache_dir = os.path.join("data", "memory", "cache")
+            
+        if archive_dir is None:
+            archive_dir = os.path.join(os.path.dirname(db_path), "archive")
         
         # 确保目录存在
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
@@ -90,6 +109,7 @@ class MemoryStore:
         self.index_path = index_path
         self.cache_dir = cache_dir
         self.vector_dim = vector_dim
+        self.vector_format = vector_format
         
         # 初始化组件
         self.vector_index: Optional["VectorIndexManager"] = None
@@ -107,9 +127,30 @@ class MemoryStore:
         # 初始化向量索引管理器
         self._init_vector_index()
         
+        # 向量数超过阈值后在后台升级索引类型
+        self.index_promoter: Optional[IndexPromoter] = None
+        if self.vector_index and self.vector_index.available:
+            self.index_promoter = IndexPromoter(
+                self.vector_index,
+                vector_loader=self._iter_index_vectors,
+                policy=index_policy
+            )
+        
+        # 冷记忆归档（分区库和冷索引在首次归档或查询时才打开）
+        self.archive = MemoryArchive(archive_dir, vector_dim=vector_dim)
+        
         # 初始化文本向量化器
         self._init_vectorizer(model_type, model_name)
         
+        # 交互记忆提交后的回调（如建立关联），在写入线程中依次调用
+        self._commit_listeners: List[Callable[[List[IngestionItem], Optional[np.ndarray]], None]] = []
+        
+        # 初始化交互记忆写入队列
+        self.ingestion: Optional[IngestionQueue] = None
+        if async_ingestion:
+            self.ingestion = IngestionQueue(writer=self._write_interaction_batch)
+            self.ingestion.start()
+        
         logger.info(f"记忆存储管理器初始化完成，数据库: {db_path}, 向量索引: {index_path}")
     
     def _init_db_manager(self):
@@ -131,13 +172,14 @@ class MemoryStore:
             self.db_manager = None
     
     def _init_vector_index(self):
-        """初始化向量索引管理器"""
+        """初始化向量索引管理器（进程内共享，与FAISSSearchEngine使用同一份索引）"""
         try:
             if VectorIndexManager is None:
                 logger.error("VectorIndexManager类未导入")
                 return
                 
-            self.vector_index = VectorIndexManager(
+            # 共享索引在首次获取时加载（包括重放增量日志）或创建
+            self.vector_index = get_shared_vector_index(
                 index_path=self.index_path,
                 vector_dim=self.vector_dim
             )
@@ -146,21 +188,36 @@ class MemoryStore:
                 logger.warning("FAISS不可用，向量索引功能将被禁用")
                 return
             
-            # 加载或创建索引
-            if self.vector_index and os.path.exists(self.index_path):
-                success = self.vector_index.load_index()
-                if success:
-                    logger.info(f"加载向量索引成功: {self.index_path}")
-                else:
-                    logger.warning(f"加载向量索引失败，创建新索引")
-                    self.vector_index.create_index()
-            elif self.vector_index:
-                self.vector_index.create_index()
-                logger.info(f"创建新向量索引: {self.index_path}")
+            # 降维索引检索时用memory_vectors中的完整向量重排
+            self.vector_index.full_vector_loader = self._load_full_vectors
+            
+            logger.info(f"向量索引就绪: {self.index_path} ({self.vector_index.index.ntotal} 个向量)")
         except Exception as e:
             logger.error(f"初始化向量索引管理器失败: {e}")
             self.vector_index = None
     
+    def _load_full_vectors(self, memory_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        读取记忆的完整维度向量
+        
+        参数:
+            memory_ids: 记忆ID列表
+            
+        返回:
+            Dict[str, np.ndarray]: 记忆ID到向量的映射
+        """
+        if not memory_ids or self.db_manager is None:
+            return {}
+        rows = self.db_manager.execute_named("store.full_vectors", in_values=memory_ids)
+        ids, vectors = decode_rows(rows or [], self.vector_index.input_dim if self.vector_index else None)
+        return dict(zip(ids, vectors))
+    
+    def _iter_index_vectors(self):
+        """按块读取memory_vectors中的向量，并投影到索引维度（供后台重建索引使用）"""
+        projector = self.vector_index.projector
+        for ids, vectors in iter_vector_chunks(self.db_manager, self.vector_index.input_dim):
+            yield ids, projector.project(vectors) if projector is not None else vectors
+    
     def _init_vectorizer(self, model_type, model_name):
         """初始化文本向量化器"""
         try:
@@ -214,44 +271,25 @@ class MemoryStore:
                 
             metadata_json = json.dumps(metadata, ensure_ascii=False)
             
-            # 步骤1：将记忆存入数据库
-            self.db_manager.execute_query(
-                """
-                INSERT INTO memories 
-                (id, content, type, role, session_id, timestamp, weight, last_accessed, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (memory_id, content, "memory", source, "", timestamp, importance, timestamp, metadata_json)
-            )
-            
-            # 提交数据库事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
-            
-            # 步骤2：对内容进行向量化
+            # 步骤1：对内容进行向量化（在事务之外，避免编码期间占用写连接）
             vector = self._vectorize_text(content)
             
+            # 步骤2：记忆与向量在同一个事务中写入
+            with self.db_manager.transaction():
+                self.db_manager.bulk_insert("memories", [
+                    (memory_id, content, "memory", source, "", timestamp, importance,
+                     None, None, timestamp, metadata_json)
+                ])
+                if vector is not None:
+                    # 按存储格式编码向量
+                    self.db_manager.bulk_insert("memory_vectors", [
+                        (f"vec_{memory_id}", memory_id, encode_vectors(vector, self.vector_format)[0],
+                         self.vector_format, f"{self.vectorizer.model_type}/{self.vectorizer.model_name}",
+                         timestamp)
+                    ])
+            
             if vector is not None:
-                # 步骤3：将向量存入向量表
-                vector_id = f"vec_{memory_id}"
-                
-                # 将向量转换为二进制格式存储
-                vector_blob = vector.tobytes()
-                
-                self.db_manager.execute_query(
-                    """
-                    INSERT INTO memory_vectors
-                    (id, memory_id, vector, model_name, timestamp)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (vector_id, memory_id, vector_blob, f"{self.vectorizer.model_type}/{self.vectorizer.model_name}", timestamp)
-                )
-                
-                # 提交向量数据
-                if self.db_manager.conn:
-                    self.db_manager.conn.commit()
-                
-                # 步骤4：将向量添加到向量索引
+                # 步骤3：将向量添加到向量索引
                 if self.vector_index and self.vector_index.available:
                     success = self.vector_index.add_vectors(
                         vectors=vector.reshape(1, -1),
@@ -259,8 +297,9 @@ class MemoryStore:
                     )
                     
                     if success:
-                        # 保存索引
-                        self.vector_index.save_index()
+                        # 增量已写入日志，按检查点策略保存完整索引
+                        self.vector_index.maybe_checkpoint()
+                        self._maybe_promote_index()
                     else:
                         logger.warning("添加向量到索引失败，但记忆已保存到数据库")
                 else:
@@ -276,10 +315,14 @@ class MemoryStore:
             return None
     
     def add_interaction_memory(self, content: str, memory_type: str, role: str,
-                              session_id: str, timestamp: float, weight: float = 5.0) -> Optional[str]:
+                              session_id: str, timestamp: float, weight: float = 5.0,
+                              vector: Optional[np.ndarray] = None) -> Optional[str]:
         """
         添加交互记忆（兼容EstiaMemorySystem接口）
         
+        启用写入队列时立即返回记忆ID，向量化、入库和索引在后台批量完成；
+        队列不可用或已满时退化为同步写入。
+        
         参数:
             content: 记忆内容
             memory_type: 记忆类型（user_input, assistant_reply等）
@@ -287,6 +330,7 @@ class MemoryStore:
             session_id: 会话ID
             timestamp: 时间戳
             weight: 权重
+            vector: 已计算好的内容向量，提供时跳过向量化
             
         返回:
             Optional[str]: 记忆ID，失败时返回None
@@ -309,51 +353,26 @@ class MemoryStore:
                 "memory_type": memory_type,
                 "role": role
             }
-            metadata_json = json.dumps(metadata, ensure_ascii=False)
-            
-            # 存储到数据库
-            self.db_manager.execute_query(
-                """
-                INSERT INTO memories 
-                (id, content, type, role, session_id, timestamp, weight, last_accessed, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (memory_id, content, memory_type, role, session_id, timestamp, weight, timestamp, metadata_json)
+            item = IngestionItem(
+                memory_id=memory_id,
+                content=content,
+                memory_type=memory_type,
+                role=role,
+                session_id=session_id,
+                timestamp=timestamp,
+                weight=weight,
+                metadata_json=json.dumps(metadata, ensure_ascii=False),
+                vector=vector
             )
             
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+            # 优先交给后台写入队列
+            if self.ingestion and self.ingestion.submit(item):
+                logger.debug(f"✅ 交互记忆已入队: {memory_id}")
+                return memory_id
             
-            # 向量化和索引（异步进行，避免阻塞）
-            try:
-                vector = self._vectorize_text(content)
-                if vector is not None:
-                    # 存储向量到数据库
-                    vector_id = f"vec_{memory_id}"
-                    vector_blob = vector.tobytes()
-                    
-                    self.db_manager.execute_query(
-                        """
-                        INSERT INTO memory_vectors
-                        (id, memory_id, vector, model_name, timestamp)
-                        VALUES (?, ?, ?, ?, ?)
-                        """,
-                        (vector_id, memory_id, vector_blob, 
-                         f"{self.vectorizer.model_type}/{self.vectorizer.model_name}" if self.vectorizer else "unknown", 
-                         timestamp)
-                    )
-                    
-                    # 添加到FAISS索引
-                    if self.vector_index and self.vector_index.available:
-                        success = self.vector_index.add_vectors(
-                            vectors=vector.reshape(1, -1),
-                            ids=[memory_id]
-                        )
-                        if success:
-                            self.vector_index.save_index()
-            except Exception as e:
-                logger.warning(f"向量化处理失败，但记忆已保存: {e}")
+            # 同步写入
+            if not self._write_interaction_batch([item]):
+                return None
             
             logger.debug(f"✅ 交互记忆存储成功: {memory_id}")
             return memory_id
@@ -362,6 +381,124 @@ class MemoryStore:
             logger.error(f"交互记忆存储失败: {e}")
             return None
     
+    def _write_interaction_batch(self, items: List[IngestionItem]) -> bool:
+        """
+        批量写入交互记忆：一次向量化、一个事务、一次索引添加
+        
+        参数:
+            items: 待写入条目列表
+            
+        返回:
+            bool: 记忆是否写入数据库
+        """
+        if not items:
+            return True
+        
+        # 步骤1：批量向量化，已带向量的条目直接复用（失败时仍保存记忆本身）
+        vectors = None
+        if self.vectorizer:
+            try:
+                missing = [i for i, item in enumerate(items) if item.vector is None]
+                encoded = None
+                if missing:
+                    encoded = self.vectorizer.encode(
+                        [items[i].content for i in missing],
+                        memory_weights=[items[i].weight for i in missing]
+                    )
+                    encoded = np.asarray(encoded, dtype=np.float32).reshape(len(missing), -1)
+                width = encoded.shape[1] if encoded is not None else np.asarray(items[0].vector).size
+                vectors = np.empty((len(items), width), dtype=np.float32)
+                for i, item in enumerate(items):
+                    if item.vector is not None:
+                        vectors[i] = np.asarray(item.vector, dtype=np.float32).reshape(-1)
+                for j, i in enumerate(missing):
+                    vectors[i] = encoded[j]
+            except Exception as e:
+                logger.warning(f"批量向量化失败，记忆将不带向量保存: {e}")
+                vectors = None
+        
+        # 步骤2：记忆与向量在同一个事务中批量写入
+        model_name = f"{self.vectorizer.model_type}/{self.vectorizer.model_name}" if self.vectorizer else "unknown"
+        try:
+            with self.db_manager.transaction():
+                self.db_manager.bulk_insert("memories", [
+                    (item.memory_id, item.content, item.memory_type, item.role, item.session_id,
+                     item.timestamp, item.weight, None, None, item.timestamp, item.metadata_json)
+                    for item in items
+                ])
+                if vectors is not None:
+                    blobs = encode_vectors(vectors, self.vector_format)
+                    self.db_manager.bulk_insert("memory_vectors", [
+                        (f"vec_{item.memory_id}", item.memory_id, blobs[i], self.vector_format,
+                         model_name, item.timestamp)
+                        for i, item in enumerate(items)
+                    ])
+        except Exception as e:
+            logger.error(f"批量写入 {len(items)} 条交互记忆失败: {e}")
+            return False
+        
+        # 步骤3：一次性添加到FAISS索引
+        if vectors is not None and self.vector_index and self.vector_index.available:
+            try:
+                success = self.vector_index.add_vectors(
+                    vectors=vectors,
+                    ids=[item.memory_id for item in items]
+                )
+                if success:
+                    self.vector_index.maybe_checkpoint()
+                    self._maybe_promote_index()
+            except Exception as e:
+                logger.warning(f"添加向量到索引失败，但记忆已保存: {e}")
+        
+        # 步骤4：记忆和向量都已可见，通知提交后的回调
+        for listener in self._commit_listeners:
+            try:
+                listener(items, vectors)
+            except Exception as e:
+                logger.warning(f"交互记忆提交回调失败: {e}")
+        
+        logger.debug(f"批量写入 {len(items)} 条交互记忆完成")
+        return True
+    
+    def add_commit_listener(self, listener: Callable[[List[IngestionItem], Optional[np.ndarray]], None]):
+        """
+        注册交互记忆提交后的回调，回调在记忆和向量提交、加入索引之后调用
+        
+        参数:
+            listener: 回调函数 listener(items, vectors)，vectors与items逐行对应，向量化失败时为None
+        """
+        self._commit_listeners.append(listener)
+    
+    def _maybe_promote_index(self):
+        """向量数或墓碑数达到阈值时，在后台构建新索引"""
+        if self.index_promoter:
+            try:
+                self.index_promoter.maybe_promote()
+            except Exception as e:
+                logger.warning(f"检查索引升级失败: {e}")
+    
+    def flush_pending(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待写入队列中的交互记忆全部落盘
+        
+        参数:
+            timeout: 最长等待时间（秒），None表示一直等待
+            
+        返回:
+            bool: 是否已全部写入
+        """
+        if not self.ingestion:
+            return True
+        return self.ingestion.flush(timeout=timeout)
+    
+    def get_ingestion_stats(self) -> Dict[str, Any]:
+        """获取写入队列统计信息（队列深度、拒绝次数、批大小和延迟）"""
+        if not self.ingestion:
+            return {"enabled": False}
+        stats = self.ingestion.get_stats()
+        stats["enabled"] = True
+        return stats
+    
     def _vectorize_text(self, text: str) -> np.ndarray:
         """
         将文本向量化
@@ -373,8 +510,8 @@ class MemoryStore:
             np.ndarray: 向量表示
         """
         try:
-            # 使用向量化器将文本转换为向量
-            vector = self.vectorizer.encode(text)
+            # 使用向量化器将文本转换为向量（并发请求由微批调度器合并）
+            vector = self.vectorizer.encode_text(text)
             return vector
         except Exception as e:
             logger.error(f"文本向量化失败: {e}")
@@ -405,22 +542,8 @@ class MemoryStore:
                 k=limit
             )
             
-            if not memory_ids:
-                logger.info(f"未找到与查询相似的记忆: {query[:30]}...")
-                return []
-            
             # 从数据库中获取记忆详情
-            placeholders = ','.join(['?'] * len(memory_ids))
-            results = self.db_manager.query(
-                f"""
-                SELECT m.id as memory_id, m.content, m.role as source, m.timestamp as created_at, 
-                       m.weight as importance, m.metadata
-                FROM memories m
-                WHERE m.id IN ({placeholders})
-                ORDER BY m.timestamp DESC
-                """,
-                memory_ids
-            )
+            results = self.db_manager.execute_named("store.search_details", in_values=memory_ids) if memory_ids else []
             
             # 构建结果列表
             memories = []
@@ -453,6 +576,14 @@ class MemoryStore:
             # 按相似度排序
             memories.sort(key=lambda x: x["similarity"], reverse=True)
             
+            # 热层结果不足时再查询归档
+            if len(memories) < limit:
+                memories.extend(self._search_archive(query_vector, limit - len(memories)))
+            
+            if not memories:
+                logger.info(f"未找到与查询相似的记忆: {query[:30]}...")
+                return []
+            
             logger.info(f"找到 {len(memories)} 条与查询相似的记忆")
             return memories
             
@@ -460,6 +591,26 @@ class MemoryStore:
             logger.error(f"搜索相似记忆失败: {e}")
             return []
     
+    def _search_archive(self, query_vector: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        """在冷索引中检索，结果转换为search_similar的格式"""
+        try:
+            cold_memories = self.archive.search_vectors(query_vector, k=limit)
+        except Exception as e:
+            logger.warning(f"检索归档记忆失败: {e}")
+            return []
+        
+        return [{
+            "memory_id": memory["memory_id"],
+            "content": memory["content"],
+            "source": memory["role"],
+            "created_at": memory["timestamp"],
+            "timestamp": datetime.fromtimestamp(memory["timestamp"]).strftime('%Y-%m-%d %H:%M:%S'),
+            "importance": memory["weight"],
+            "similarity": memory["similarity"],
+            "metadata": memory["metadata"],
+            "tier": "cold"
+        } for memory in cold_memories]
+    
     def get_memory(self, memory_id: str) -> Optional[Dict[str, Any]]:
         """
         获取指定ID的记忆
@@ -539,10 +690,6 @@ class MemoryStore:
                 (importance, memory_id)
             )
             
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
-            
             logger.info(f"更新记忆重要性成功: {memory_id}, 新重要性: {importance}")
             return True
             
@@ -565,27 +712,25 @@ class MemoryStore:
             return False
             
         try:
-            # 从数据库中删除记忆
-            self.db_manager.execute_query(
-                "DELETE FROM memories WHERE id = ?",
-                (memory_id,)
-            )
-            
-            # 删除对应的向量
-            self.db_manager.execute_query(
-                "DELETE FROM memory_vectors WHERE memory_id = ?",
-                (memory_id,)
-            )
-            
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+            with self.db_manager.transaction():
+                # 从数据库中删除记忆
+                self.db_manager.execute_query(
+                    "DELETE FROM memories WHERE id = ?",
+                    (memory_id,)
+                )
+                
+                # 删除对应的向量
+                self.db_manager.execute_query(
+                    "DELETE FROM memory_vectors WHERE memory_id = ?",
+                    (memory_id,)
+                )
             
             # 从向量索引中删除（如果可用）
             if self.vector_index and self.vector_index.available:
                 success = self.vector_index.delete_vectors([memory_id])
                 if success:
-                    self.vector_index.save_index()
+                    self.vector_index.maybe_checkpoint()
+                    self._maybe_promote_index()
             
             logger.info(f"删除记忆成功: {memory_id}")
             return True
@@ -656,12 +801,7 @@ class MemoryStore:
             return []
         
         try:
-            placeholders = ','.join(['?' for _ in memory_ids])
-            results = self.db_manager.query(f"""
-                SELECT id, content, type, role, session_id, timestamp, weight, group_id, summary, metadata
-                FROM memories WHERE id IN ({placeholders})
-                ORDER BY timestamp DESC
-            """, memory_ids)
+            results = self.db_manager.execute_named("store.memories_by_ids", in_values=memory_ids)
             
             memories = []
             for row in results:
@@ -684,6 +824,12 @@ class MemoryStore:
                     'metadata': metadata
                 })
             
+            # 热表中找不到的记忆可能已经归档
+            if len(memories) < len(set(memory_ids)):
+                found = {memory['memory_id'] for memory in memories}
+                missing = [memory_id for memory_id in memory_ids if memory_id not in found]
+                memories.extend(self.archive.get_memories(missing))
+            
             logger.debug(f"批量获取 {len(memories)} 条记忆")
             return memories
             
@@ -691,6 +837,28 @@ class MemoryStore:
             logger.error(f"批量获取记忆失败: {e}")
             return []
     
+    def archive_memories(self, policy: Optional[ArchivePolicy] = None) -> Dict[str, Any]:
+        """
+        把低权重、长时间未访问的记忆移到冷层归档
+        
+        参数:
+            policy: 归档策略，None则使用默认策略
+            
+        返回:
+            Dict[str, Any]: 统计信息（archived、vectors、partitions），失败时archived为0并包含error
+        """
+        if self.db_manager is None:
+            logger.error("数据库管理器未初始化，无法归档记忆")
+            return {"archived": 0, "vectors": 0, "partitions": [], "error": "数据库管理器未初始化"}
+        
+        # 先让写入队列中的记忆落盘
+        self.flush_pending()
+        try:
+            return self.archive.archive(self.db_manager, self.vector_index, policy)
+        except Exception as e:
+            logger.error(f"归档记忆失败: {e}")
+            return {"archived": 0, "vectors": 0, "partitions": [], "error": str(e)}
+    
     def add_association(self, source_id: str, target_id: str, 
                        association_type: str = "related", 
                        strength: float = 0.5) -> bool:
@@ -718,18 +886,10 @@ class MemoryStore:
             timestamp = int(time.time())
             
             # 添加关联
-            self.db_manager.execute_query(
-                """
-                INSERT INTO memory_association
-                (id, source_key, target_key, association_type, strength, created_at, last_activated)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
+            if self.db_manager.bulk_insert("memory_association", [
                 (association_id, source_id, target_id, association_type, strength, timestamp, timestamp)
-            )
-            
-            # 提交事务
-            if self.db_manager.conn:
-                self.db_manager.conn.commit()
+            ]) is None:
+                return False
             
             logger.info(f"添加记忆关联成功: {source_id} -> {target_id}, 类型: {association_type}")
             return True
@@ -802,9 +962,19 @@ class MemoryStore:
     def close(self):
         """关闭记忆存储管理器，保存所有数据"""
         try:
-            # 保存向量索引
-            if self.vector_index:
-                self.vector_index.save_index()
+            # 先排空写入队列，确保已返回ID的记忆全部落盘
+            if self.ingestion:
+                self.ingestion.shutdown(drain=True)
+            
+            # 停止未完成的后台索引构建，下次启动时重新检查
+            if self.index_promoter:
+                self.index_promoter.cancel()
+            
+            # 保存向量索引（有未落盘修改时写完整快照并清空增量日志）
+            if self.vector_index and self.vector_index.available:
+                self.vector_index.maybe_checkpoint(force=True)
+            
+            self.archive.close()
                 
             # 关闭数据库连接
             if self.db_manager:
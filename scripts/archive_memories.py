@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+冷记忆归档工具
+把低权重、长时间未访问的记忆从memories表移到按月分区的压缩归档库，向量移到冷索引
+"""
+
+import os
+import sys
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.storage.memory_store import MemoryStore
+from core.memory.storage.archive import ArchivePolicy
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Estia冷记忆归档工具")
+    parser.add_argument("--db", default=os.path.join("assets", "memory.db"), help="记忆数据库路径")
+    parser.add_argument("--index", default=os.path.join("data", "vectors", "memory_index.bin"), help="热索引文件路径")
+    parser.add_argument("--archive-dir", default=None, help="归档目录（默认为数据库所在目录下的archive）")
+    parser.add_argument("--dim", type=int, default=1024, help="向量维度")
+    parser.add_argument("--max-weight", type=float, default=3.0, help="权重低于此值的记忆才归档")
+    parser.add_argument("--min-age-days", type=float, default=90.0, help="创建和最近访问都早于此天数的记忆才归档")
+    parser.add_argument("--status", action="store_true", help="只显示归档统计")
+    args = parser.parse_args()
+
+    print("📦 Estia冷记忆归档工具")
+    print("=" * 50)
+
+    if not os.path.exists(args.db):
+        print(f"❌ 数据库文件不存在: {args.db}")
+        return 1
+
+    store = MemoryStore(db_path=args.db, index_path=args.index, archive_dir=args.archive_dir,
+                        vector_dim=args.dim, async_ingestion=False)
+    try:
+        if not args.status:
+            policy = ArchivePolicy(max_weight=args.max_weight, min_age_days=args.min_age_days)
+            stats = store.archive_memories(policy)
+            if "error" in stats:
+                print(f"❌ 归档失败: {stats['error']}")
+                return 1
+            print(f"✅ 归档 {stats['archived']} 条记忆，{stats['vectors']} 个向量移到冷索引")
+            for partition in stats["partitions"]:
+                print(f"   • {partition}")
+
+        hot_count = store.db_manager.query("SELECT COUNT(*) FROM memories")[0][0]
+        archive_stats = store.archive.get_stats()
+        print(f"📊 热层记忆: {hot_count}")
+        print(f"📊 归档: {archive_stats['memories']} 条记忆，{archive_stats['partitions']} 个分区，"
+              f"冷索引 {archive_stats['cold_vectors']} 个向量")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量化后端基准测试
+对比sentence-transformers（PyTorch）与导出的ONNX模型（fp32 / int8）的
+加载时间、单条延迟、批量吞吐，以及以PyTorch结果为基准的向量一致性和检索召回率。
+
+用法:
+    python scripts/benchmark_embedding.py [--db assets/memory.db] [--corpus 500] [--queries 50]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.embedding.vectorizer import TextVectorizer
+from core.memory.embedding.onnx_backend import OnnxEmbeddingModel, default_onnx_dir, QUANTIZED_MODEL_FILE
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
+
+SAMPLE_TOPICS = ["天气", "工作", "学习Python", "晚饭吃什么", "周末计划", "看电影", "身体不舒服",
+                 "旅行", "音乐", "养猫", "考试", "开会", "买东西", "运动", "睡眠"]
+
+
+def load_texts(db_path, limit):
+    """优先使用记忆数据库中的真实内容，没有时生成示例文本"""
+    if db_path and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            "SELECT content FROM memories WHERE content != '' ORDER BY timestamp DESC LIMIT ?", (limit,)
+        ).fetchall()
+        conn.close()
+        if rows:
+            return [row[0] for row in rows]
+    rng = np.random.default_rng(0)
+    return [f"我们聊到了{SAMPLE_TOPICS[i % len(SAMPLE_TOPICS)]}，"
+            f"你说第{int(rng.integers(1, 100))}次觉得{SAMPLE_TOPICS[int(rng.integers(len(SAMPLE_TOPICS)))]}很重要"
+            for i in range(limit)]
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def measure(name, encode_fn, corpus, queries, batch_size):
+    """测量单条延迟和批量吞吐，返回语料与查询的向量"""
+    encode_fn(queries[:2])  # 预热
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(encode_fn([query])[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    corpus_vectors = encode_fn(corpus, batch_size)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    print(f"   {name:<12} 单条 p50 {np.percentile(latencies, 50):7.1f}ms  "
+          f"p95 {np.percentile(latencies, 95):7.1f}ms  批量 {len(corpus) / elapsed:7.1f} 条/秒")
+    return normalize(corpus_vectors), normalize(query_vectors)
+
+
+def recall_at_k(reference, candidate, k):
+    """以基准向量的Top-K为真值，计算候选向量的召回率"""
+    ref_corpus, ref_queries = reference
+    cand_corpus, cand_queries = candidate
+    ref_top = np.argsort(-(ref_queries @ ref_corpus.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand_queries @ cand_corpus.T), axis=1)[:, :k]
+    hits = [len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]
+    return float(np.mean(hits))
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量化后端基准测试")
+    parser.add_argument("--model-name", default=TextVectorizer.DEFAULT_MODEL_NAME, help="sentence-transformers模型ID")
+    parser.add_argument("--onnx-dir", default=None, help="ONNX导出目录，默认 cache/onnx/<模型ID>")
+    parser.add_argument("--db", default=os.path.join("assets", "memory.db"), help="用作语料的记忆数据库")
+    parser.add_argument("--corpus", type=int, default=500, help="语料条数")
+    parser.add_argument("--queries", type=int, default=50, help="查询条数")
+    parser.add_argument("--batch-size", type=int, default=32, help="批量编码大小")
+    parser.add_argument("--k", type=int, default=10, help="召回率的K")
+    args = parser.parse_args()
+
+    print("⏱️ Estia向量化后端基准测试")
+    print("=" * 50)
+
+    texts = load_texts(args.db, args.corpus + args.queries)
+    queries, corpus = texts[:args.queries], texts[args.queries:]
+    print(f"📍 语料: {len(corpus)} 条, 查询: {len(queries)} 条")
+
+    backends = []
+
+    print("\n🔄 加载模型:")
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+    from sentence_transformers import SentenceTransformer
+    start = time.perf_counter()
+    reference_model = SentenceTransformer(args.model_name, device="cpu", cache_folder=MODEL_CACHE_DIR)
+    print(f"   pytorch      {time.perf_counter() - start:6.1f}秒")
+    backends.append(("pytorch", lambda items, batch_size=32: reference_model.encode(
+        items, batch_size=batch_size, convert_to_numpy=True)))
+
+    onnx_dir = args.onnx_dir or default_onnx_dir(MODEL_CACHE_DIR, args.model_name)
+    variants = [("onnx-fp32", False)]
+    if os.path.exists(os.path.join(onnx_dir, QUANTIZED_MODEL_FILE)):
+        variants.append(("onnx-int8", True))
+    for name, quantized in variants:
+        try:
+            start = time.perf_counter()
+            model = OnnxEmbeddingModel(onnx_dir, prefer_quantized=quantized)
+            print(f"   {name:<12} {time.perf_counter() - start:6.1f}秒")
+            backends.append((name, lambda items, batch_size=32, model=model: model.encode(items, batch_size)))
+        except Exception as e:
+            print(f"   {name:<12} 加载失败: {e}")
+
+    print("\n🚀 延迟与吞吐:")
+    results = {name: measure(name, encode_fn, corpus, queries, args.batch_size) for name, encode_fn in backends}
+
+    print(f"\n🎯 与pytorch的一致性 (recall@{args.k}):")
+    reference = results["pytorch"]
+    for name, vectors in results.items():
+        if name == "pytorch":
+            continue
+        cosines = (reference[0] * vectors[0]).sum(axis=1)
+        print(f"   {name:<12} 余弦 最小 {cosines.min():.4f} 平均 {cosines.mean():.4f}  "
+              f"recall@{args.k} {recall_at_k(reference, vectors, args.k):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ONNX模型导出工具
+从项目缓存中的sentence-transformers模型导出ONNX模型，可选int8动态量化，
+导出后与原模型对比向量，确认可直接用于现有索引。
+
+用法:
+    python scripts/export_onnx_model.py [--model-name Qwen/Qwen3-Embedding-0.6B] [--quantize]
+导出后在TextVectorizer中使用 model_type="onnx"（model_name保持不变）
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.embedding.vectorizer import TextVectorizer
+from core.memory.embedding.onnx_backend import (
+    OnnxEmbeddingModel, default_onnx_dir, CONFIG_FILE, MODEL_FILE, QUANTIZED_MODEL_FILE, POOLING_MODES
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache")
+
+VERIFY_TEXTS = [
+    "今天天气怎么样？",
+    "我最近在学习Python编程，感觉有点难",
+    "What did we talk about yesterday?",
+    "记得提醒我明天下午三点开会",
+    "你还记得我喜欢吃什么吗"
+]
+
+
+def load_sentence_transformer(model_name):
+    """离线加载项目缓存中的sentence-transformers模型"""
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu", cache_folder=MODEL_CACHE_DIR)
+
+
+def describe_pipeline(model):
+    """读取池化方式和是否归一化，ONNX后端按同样方式处理"""
+    from sentence_transformers.models import Pooling, Normalize
+
+    pooling = None
+    normalize = False
+    for module in model:
+        if isinstance(module, Pooling):
+            pooling = module.get_pooling_mode_str()
+        elif isinstance(module, Normalize):
+            normalize = True
+
+    pooling = {"mean_tokens": "mean", "cls_token": "cls"}.get(pooling, pooling)
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"不支持的池化方式: {pooling}（支持: {', '.join(POOLING_MODES)}）")
+    return pooling, normalize
+
+
+def export_transformer(model, output_path, opset):
+    """把sentence-transformers的Transformer模块导出为输出last_hidden_state的ONNX图"""
+    import torch
+
+    transformer = model[0]
+    auto_model = transformer.auto_model.eval()
+    accepts_cache = hasattr(auto_model.config, "use_cache")
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask):
+            kwargs = {"use_cache": False} if accepts_cache else {}
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask,
+                              return_dict=True, **kwargs).last_hidden_state
+
+    sample = transformer.tokenizer(VERIFY_TEXTS[:2], padding=True, return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(auto_model),
+            (sample["input_ids"], sample["attention_mask"]),
+            output_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "last_hidden_state": {0: "batch", 1: "sequence"}
+            },
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    return transformer.tokenizer, transformer.max_seq_length
+
+
+def quantize_model(model_path, output_path):
+    """int8动态量化（权重量化，激活在运行时量化）"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8, per_channel=True)
+
+
+def verify(model, output_dir, prefer_quantized):
+    """对比ONNX模型与原模型的向量"""
+    reference = model.encode(VERIFY_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    onnx_model = OnnxEmbeddingModel(output_dir, prefer_quantized=prefer_quantized)
+    candidate = onnx_model.encode(VERIFY_TEXTS)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    print(f"   {os.path.basename(onnx_model.model_file)}: 余弦相似度 最小 {cosines.min():.4f}, 平均 {cosines.mean():.4f}")
+    return float(cosines.min())
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="导出ONNX向量化模型")
+    parser.add_argument("--model-name", default=TextVectorizer.DEFAULT_MODEL_NAME, help="sentence-transformers模型ID")
+    parser.add_argument("--output-dir", default=None, help="导出目录，默认 cache/onnx/<模型ID>")
+    parser.add_argument("--quantize", action="store_true", help="额外生成int8量化模型")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset版本")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="与原模型向量的最小余弦相似度")
+    args = parser.parse_args()
+
+    print("📦 Estia ONNX模型导出工具")
+    print("=" * 50)
+
+    output_dir = args.output_dir or default_onnx_dir(MODEL_CACHE_DIR, args.model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📍 模型: {args.model_name}")
+    print(f"📍 导出目录: {output_dir}")
+
+    start_time = time.time()
+    model = load_sentence_transformer(args.model_name)
+    pooling, normalize = describe_pipeline(model)
+    print(f"🔧 池化方式: {pooling}, 归一化: {normalize}")
+
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    print("🔄 导出ONNX图...")
+    tokenizer, max_length = export_transformer(model, model_path, args.opset)
+    tokenizer.save_pretrained(output_dir)
+
+    config = {
+        "source_model": args.model_name,
+        "pooling": pooling,
+        "normalize": normalize,
+        "max_length": max_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "quantized": args.quantize,
+        "exported_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    if args.quantize:
+        print("🔄 int8量化...")
+        quantize_model(model_path, quantized_path)
+    elif os.path.exists(quantized_path):
+        os.remove(quantized_path)  # 旧的量化模型与新导出的模型不匹配
+
+    print(f"✅ 导出完成，耗时 {time.time() - start_time:.1f}秒")
+
+    print("\n🔍 与原模型对比:")
+    results = [verify(model, output_dir, prefer_quantized=False)]
+    if args.quantize:
+        results.append(verify(model, output_dir, prefer_quantized=True))
+
+    if min(results) < args.min_cosine:
+        print(f"⚠️ 向量差异超过阈值 ({args.min_cosine})，不建议与现有索引混用，请重建索引")
+        sys.exit(1)
+    print("✅ 向量与原模型一致，可直接使用 model_type=\"onnx\"")
+
+
+if __name__ == "__main__":
+    main()
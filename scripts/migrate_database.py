@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库迁移脚本
+备份数据库后修复旧版表结构、执行未完成的Schema迁移，并更新查询规划器统计信息
+（取代原来的 fix_database_schema.py 和 migrate_id_column.py）
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.db_manager import DatabaseManager
+from core.memory.init import migrations
+from core.memory.init.vector_codec import VECTOR_FORMATS, convert_vector_format
+
+
+def backup_database(db_path):
+    """备份数据库文件（连同WAL文件）"""
+    if not os.path.exists(db_path):
+        return None
+
+    backup_path = f"{db_path}.backup_{int(time.time())}"
+    shutil.copy2(db_path, backup_path)
+    if os.path.exists(f"{db_path}-wal"):
+        shutil.copy2(f"{db_path}-wal", f"{backup_path}-wal")
+    print(f"✅ 数据库已备份到: {backup_path}")
+    return backup_path
+
+
+def show_status(db_manager):
+    """打印Schema版本和索引"""
+    with db_manager.pool.writer() as conn:
+        version = migrations.get_schema_version(conn)
+        pending = migrations.pending_migrations(conn)
+        indexes = conn.execute(
+            "SELECT tbl_name, name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY tbl_name, name"
+        ).fetchall()
+
+    print(f"📋 Schema版本: {version} (最新: {migrations.LATEST_VERSION})")
+    for migration in pending:
+        print(f"   ⏳ 待执行: v{migration.version} {migration.name}")
+    print(f"📊 索引 ({len(indexes)}):")
+    for table, name in indexes:
+        print(f"   • {table}.{name}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Estia数据库迁移工具")
+    parser.add_argument("--db", default=os.path.join("assets", "memory.db"), help="数据库路径")
+    parser.add_argument("--status", action="store_true", help="只显示当前版本，不执行迁移")
+    parser.add_argument("--no-backup", action="store_true", help="迁移前不备份")
+    parser.add_argument("--vector-format", choices=VECTOR_FORMATS,
+                        help="把memory_vectors中的已有向量重新编码为指定格式")
+    args = parser.parse_args()
+
+    print("🔧 Estia数据库迁移工具")
+    print("=" * 50)
+    print(f"📍 数据库路径: {args.db}")
+
+    if args.status:
+        if not os.path.exists(args.db):
+            print("❌ 数据库文件不存在")
+            return 1
+        db_manager = DatabaseManager(args.db)
+        if not db_manager.connect():
+            return 1
+        show_status(db_manager)
+        db_manager.close()
+        return 0
+
+    if not args.no_backup:
+        try:
+            backup_database(args.db)
+        except Exception as e:
+            print(f"❌ 备份数据库失败: {e}")
+            return 1
+
+    db_manager = DatabaseManager(args.db)
+    # 建表、修复旧版表结构、执行迁移、ANALYZE
+    if not db_manager.initialize_database():
+        print("\n❌ 数据库迁移失败，请检查日志，必要时从备份恢复")
+        return 1
+
+    if args.vector_format:
+        converted = convert_vector_format(db_manager, args.vector_format)
+        print(f"✅ 已将 {converted} 条向量转换为 {args.vector_format} 格式")
+        # 未执行VACUUM（会重排rowid），释放的页面由后续写入复用
+
+    show_status(db_manager)
+    db_manager.close()
+    print("\n🎉 数据库迁移完成")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量索引重建工具（取代原来的 build_index.py）
+从记忆数据库分块读取记忆，复用memory_vectors中同一模型的向量，只对缺失的记忆批量编码；
+中断后再次运行会从上次的进度继续
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.storage.memory_store import MemoryStore
+from core.memory.storage.index_rebuild import IndexRebuilder
+from core.memory.init.index_policy import INDEX_TYPES
+
+
+def print_progress(stats):
+    """打印每块的进度"""
+    print(f"   📦 已处理 {stats['processed']} 条记忆，索引 {stats['indexed']} 个向量 "
+          f"(复用 {stats['reused']}，编码 {stats['encoded']}，跳过 {stats['skipped']})，"
+          f"{stats['vectors_per_sec']:.1f} 向量/秒")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Estia向量索引重建工具")
+    parser.add_argument("--db", default=os.path.join("assets", "memory.db"), help="记忆数据库路径")
+    parser.add_argument("--index", default=os.path.join("data", "vectors", "memory_index.bin"), help="索引文件路径")
+    parser.add_argument("--dim", type=int, default=1024, help="向量维度")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每块读取的记忆数")
+    parser.add_argument("--batch-size", type=int, default=64, help="向量化批大小")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="重建后升级为指定索引类型（默认保持Flat，由升级策略按规模自动切换）")
+    parser.add_argument("--restart", action="store_true", help="忽略未完成的进度，重新开始")
+    args = parser.parse_args()
+
+    print("🛠️ Estia向量索引重建工具")
+    print("=" * 50)
+
+    if not os.path.exists(args.db):
+        print(f"❌ 数据库文件不存在: {args.db}")
+        return 1
+
+    print(f"📍 数据库: {args.db}")
+    print(f"📍 索引: {args.index}")
+
+    store = MemoryStore(db_path=args.db, index_path=args.index, vector_dim=args.dim, async_ingestion=False)
+    try:
+        if not store.vector_index or not store.vector_index.available:
+            print("❌ 向量索引不可用（FAISS未安装？）")
+            return 1
+        if store.vectorizer is None:
+            print("⚠️ 向量化模型不可用，只复用已存的向量，缺失向量的记忆将被跳过")
+
+        rebuilder = IndexRebuilder(store, chunk_size=args.chunk_size, encode_batch_size=args.batch_size)
+        start_time = time.time()
+        try:
+            stats = rebuilder.rebuild(resume=not args.restart, progress_callback=print_progress)
+        except KeyboardInterrupt:
+            print("\n⏸️ 已中断，再次运行将从上次的进度继续")
+            return 1
+        except Exception as e:
+            print(f"\n❌ 重建失败: {e}，再次运行将从上次的进度继续")
+            return 1
+
+        if args.index_type and args.index_type != "flat" and store.index_promoter:
+            print(f"🔄 构建 {args.index_type} 索引...")
+            store.index_promoter.promote(args.index_type)
+
+        print(f"\n✅ 重建完成，耗时 {time.time() - start_time:.1f}秒")
+        print(f"   • 索引向量: {stats['indexed']}")
+        print(f"   • 复用已存向量: {stats['reused']}")
+        print(f"   • 新编码: {stats['encoded']}")
+        print(f"   • 跳过: {stats['skipped']}")
+        print(f"   • 吞吐量: {stats['vectors_per_sec']:.1f} 向量/秒")
+        return 0
+    finally:
+        # 中途退出时也关闭数据库并保存已写入的索引
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
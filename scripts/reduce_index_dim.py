@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+向量索引降维迁移工具
+用memory_vectors表中的完整向量重建FAISS索引：索引只保存截断/PCA投影后的低维向量，
+检索时多取候选并用完整向量精确重排。--restore 恢复为完整维度索引。
+
+用法:
+    python scripts/reduce_index_dim.py --dim 256 [--method truncate|pca] [--evaluate 100]
+    python scripts/reduce_index_dim.py --restore
+运行前请先关闭Estia（索引文件会被整体替换）
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.db_manager import DatabaseManager
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.vector_projection import VectorProjector, PROJECTION_METHODS
+from core.memory.init.index_policy import IndexPolicy, IndexPromoter
+from core.memory.init.vector_codec import blob_dim, decode_rows, iter_vector_chunks
+
+
+def detect_full_dim(db_manager):
+    """从memory_vectors表推断完整向量维度"""
+    rows = db_manager.query(
+        "SELECT length(vector), vector_format FROM memory_vectors WHERE vector IS NOT NULL LIMIT 1")
+    return blob_dim(rows[0][0], rows[0][1]) if rows else None
+
+
+def sample_vectors(db_manager, full_dim, limit):
+    """取前limit条向量作为PCA样本"""
+    samples = []
+    count = 0
+    for _, vectors in iter_vector_chunks(db_manager, full_dim):
+        samples.append(vectors[:limit - count])
+        count += len(samples[-1])
+        if count >= limit:
+            break
+    return np.vstack(samples) if samples else np.zeros((0, full_dim), dtype=np.float32)
+
+
+def exact_top_k(db_manager, full_dim, queries, k):
+    """分块暴力检索完整向量，作为召回率的基准"""
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.empty((len(queries), 0), dtype=object)
+    for ids, vectors in iter_vector_chunks(db_manager, full_dim):
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        scores = np.hstack([best_scores, queries @ vectors.T])
+        candidates = np.hstack([best_ids, np.tile(np.array(ids, dtype=object), (len(queries), 1))])
+        order = np.argsort(-scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, order, axis=1)
+        best_ids = np.take_along_axis(candidates, order, axis=1)
+    return [list(row) for row in best_ids]
+
+
+def rebuild(db_manager, index_path, full_dim, projector, index_type):
+    """按投影重建索引，返回新的索引管理器"""
+    index_dim = projector.output_dim if projector else full_dim
+    manager = VectorIndexManager(index_path=index_path, vector_dim=index_dim, index_type="flat")
+    manager.create_index()
+    manager.set_projector(projector)
+
+    added = 0
+    for ids, vectors in iter_vector_chunks(db_manager, full_dim):
+        manager.add_vectors(vectors, ids)
+        added += len(ids)
+    manager.save_index()
+    print(f"✅ 已写入 {added} 个向量 (索引维度: {index_dim})")
+
+    if index_type != "flat" and added:
+        def projected():
+            for ids, vectors in iter_vector_chunks(db_manager, full_dim):
+                yield ids, projector.project(vectors) if projector else vectors
+        promoter = IndexPromoter(manager, vector_loader=projected, policy=IndexPolicy(target_type=index_type))
+        print(f"🔄 构建 {index_type} 索引...")
+        promoter.promote(index_type)
+    return manager
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="向量索引降维迁移")
+    parser.add_argument("--db", default=os.path.join("assets", "memory.db"), help="记忆数据库路径")
+    parser.add_argument("--index", default=os.path.join("data", "vectors", "memory_index.bin"), help="索引文件路径")
+    parser.add_argument("--dim", type=int, default=256, help="索引中保存的向量维度")
+    parser.add_argument("--method", choices=PROJECTION_METHODS, default="truncate",
+                        help="truncate适用于Matryoshka模型（如Qwen3-Embedding），其他模型建议pca")
+    parser.add_argument("--pca-samples", type=int, default=20000, help="PCA拟合使用的向量数")
+    parser.add_argument("--index-type", default=None, help="重建后的索引类型，默认沿用当前类型")
+    parser.add_argument("--restore", action="store_true", help="恢复为完整维度索引")
+    parser.add_argument("--evaluate", type=int, default=0, help="用多少条已存向量作查询评估recall@10")
+    args = parser.parse_args()
+
+    print("📐 Estia向量索引降维工具")
+    print("=" * 50)
+
+    if not os.path.exists(args.db):
+        print(f"❌ 数据库文件不存在: {args.db}")
+        return
+
+    db_manager = DatabaseManager(args.db)
+    db_manager.connect()
+    full_dim = detect_full_dim(db_manager)
+    if not full_dim:
+        print("❌ memory_vectors表中没有向量")
+        return
+
+    index_type = args.index_type
+    old_size = os.path.getsize(args.index) if os.path.exists(args.index) else 0
+    if index_type is None:
+        index_type = "flat"
+        if os.path.exists(args.index):
+            current = VectorIndexManager(index_path=args.index, vector_dim=full_dim)
+            if current.load_index():
+                index_type = current.index_type
+            current.delta_log.close()
+
+    print(f"📍 数据库: {args.db}")
+    print(f"📍 索引: {args.index} ({index_type})")
+
+    projector = None
+    if not args.restore:
+        if args.method == "pca":
+            samples = sample_vectors(db_manager, full_dim, args.pca_samples)
+            projector = VectorProjector.fit_pca(samples, args.dim)
+        else:
+            projector = VectorProjector(full_dim, args.dim, "truncate")
+        print(f"🔧 投影: {full_dim} -> {args.dim} 维 ({args.method})")
+    else:
+        print(f"🔧 恢复完整维度: {full_dim} 维")
+
+    start_time = time.time()
+    manager = rebuild(db_manager, args.index, full_dim, projector, index_type)
+    new_size = os.path.getsize(args.index)
+    print(f"✅ 重建完成，耗时 {time.time() - start_time:.1f}秒，"
+          f"索引文件 {old_size / 1024 / 1024:.1f}MB -> {new_size / 1024 / 1024:.1f}MB")
+
+    if args.evaluate and projector is not None:
+        def load_full(memory_ids):
+            placeholders = ','.join(['?'] * len(memory_ids))
+            rows = db_manager.query(
+                f"SELECT memory_id, vector, vector_format FROM memory_vectors WHERE memory_id IN ({placeholders})",
+                memory_ids)
+            return dict(zip(*decode_rows(rows, full_dim)))
+
+        queries = sample_vectors(db_manager, full_dim, args.evaluate)
+        expected = exact_top_k(db_manager, full_dim, queries, 10)
+        for label, loader in (("仅投影", None), ("投影+重排", load_full)):
+            manager.full_vector_loader = loader
+            start = time.perf_counter()
+            found = [manager.search(query, k=10)[0] for query in queries]
+            elapsed = (time.perf_counter() - start) / len(queries) * 1000
+            recall = np.mean([len(set(f) & set(e)) / 10 for f, e in zip(found, expected)])
+            print(f"🎯 {label}: recall@10 {recall:.3f}, 平均 {elapsed:.2f}ms/查询")
+
+    manager.delta_log.close()
+    db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试共用的夹具：每个测试一个临时目录和一个初始化好的数据库
+以脚本方式运行测试文件时，run_tests() 按参数名提供同样的对象
+"""
+
+import os
+import sys
+import inspect
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.db_manager import DatabaseManager
+
+
+def open_db_manager(directory) -> DatabaseManager:
+    """在目录中创建并初始化 memory.db"""
+    db_manager = DatabaseManager(os.path.join(str(directory), "memory.db"))
+    assert db_manager.initialize_database()
+    return db_manager
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """初始化好的临时数据库，测试结束后关闭"""
+    manager = open_db_manager(tmp_path)
+    yield manager
+    manager.close()
+
+
+def run_tests(*tests):
+    """
+    以脚本方式依次运行测试函数，为 tmp_path / db_manager 参数提供临时目录和数据库
+
+    参数:
+        tests: 测试函数
+    """
+    for test in tests:
+        params = inspect.signature(test).parameters
+        with tempfile.TemporaryDirectory(prefix="estia_test_") as temp_dir:
+            kwargs = {}
+            if "tmp_path" in params:
+                kwargs["tmp_path"] = Path(temp_dir)
+            if "db_manager" in params:
+                kwargs["db_manager"] = open_db_manager(temp_dir)
+            try:
+                test(**kwargs)
+            finally:
+                if "db_manager" in kwargs:
+                    kwargs["db_manager"].close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试关联激活记录：查询路径只写内存，定期用一个事务批量写回数据库
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.association.tracker import ActivationTracker
+from core.memory.association.network import AssociationNetwork
+
+OLD = 1000.0
+
+
+def _seed(db_manager):
+    db_manager.bulk_insert("memory_association", [
+        ("assoc_1", "m1", "m2", "is_related_to", 0.8, OLD, OLD),
+        ("assoc_2", "m3", "m1", "is_related_to", 0.7, OLD, OLD),
+        ("assoc_3", "m3", "m4", "is_related_to", 0.6, OLD, OLD),
+    ])
+
+
+def _last_activated(db_manager):
+    return dict(db_manager.query("SELECT id, last_activated FROM memory_association"))
+
+
+def test_deferred_flush(db_manager):
+    """测试记录只写内存，flush一次写入两个方向并保留较新的时间"""
+    print("\n===== 测试关联激活延迟写入 =====")
+    _seed(db_manager)
+    tracker = ActivationTracker(db_manager)
+
+    db_manager.queries.reset_stats()
+    tracker.record(["m1"], 2000.0)
+    tracker.record(["m1", "m4"], 1500.0)  # 较旧的时间不覆盖m1
+    assert tracker.pending_count == 2
+    assert db_manager.get_query_stats() == {}
+    assert set(_last_activated(db_manager).values()) == {OLD}
+
+    assert tracker.flush() == 2
+    stats = db_manager.get_query_stats()
+    assert stats["association.touch_source"]["calls"] == 1
+    assert stats["association.touch_target"]["calls"] == 1
+    assert _last_activated(db_manager) == {"assoc_1": 2000.0, "assoc_2": 2000.0, "assoc_3": 1500.0}
+    assert tracker.pending_count == 0 and tracker.flush() == 0
+
+    # 数据库中已有更新的激活时间时不回退
+    tracker.record(["m2"], 1800.0)
+    tracker.flush()
+    assert _last_activated(db_manager)["assoc_1"] == 2000.0
+
+    print("✅ 关联激活延迟写入测试通过")
+
+
+def test_background_flush(db_manager):
+    """测试后台线程定期写入、累积过多时提前写入、失败后保留激活"""
+    print("\n===== 测试关联激活后台写入 =====")
+    _seed(db_manager)
+
+    tracker = ActivationTracker(db_manager, flush_interval=0.05)
+    tracker.start()
+    tracker.record(["m3"], 3000.0)
+    deadline = time.time() + 2.0
+    while tracker.pending_count and time.time() < deadline:
+        time.sleep(0.01)
+    assert tracker.get_stats()["flushed"] == 1
+    assert _last_activated(db_manager)["assoc_3"] == 3000.0
+    tracker.shutdown()
+    assert not tracker.is_running
+
+    tracker = ActivationTracker(db_manager, flush_interval=60.0, max_pending=2)
+    tracker.start()
+    tracker.record(["m1", "m2"], 4000.0)
+    deadline = time.time() + 2.0
+    while tracker.pending_count and time.time() < deadline:
+        time.sleep(0.01)
+    assert tracker.get_stats()["flushes"] == 1
+    tracker.shutdown()
+
+    # 写入失败时激活放回缓冲
+    broken = ActivationTracker(db_manager)
+    broken.db_manager.queries.register("association.touch_target", "UPDATE missing_table SET x = ?")
+    broken.record(["m4"], 5000.0)
+    assert broken.flush() == 0
+    assert broken.pending_count == 1 and broken.get_stats()["failed"] == 1
+    assert _last_activated(db_manager)["assoc_3"] == 3000.0  # 整个事务回滚
+    print("✅ 关联激活后台写入测试通过")
+
+
+def test_network_close_flushes(db_manager):
+    """测试AssociationNetwork关闭时写完剩余激活"""
+    print("\n===== 测试关闭时写入剩余激活 =====")
+    _seed(db_manager)
+    network = AssociationNetwork(db_manager)
+    assert network.find_associated_memories(["m1"], depth=1) == ["m2", "m3"]
+    assert set(_last_activated(db_manager).values()) == {OLD}
+    network.close()
+    activated = _last_activated(db_manager)
+    assert activated["assoc_1"] > OLD and activated["assoc_2"] > OLD and activated["assoc_3"] == OLD
+    print("✅ 关闭时写入剩余激活测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_deferred_flush,
+        test_background_flush,
+        test_network_close_flushes
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试基于向量的关联构建：候选取自向量索引，批量打分，一个事务写入前k个关联
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.vector_codec import encode_vector, DEFAULT_VECTOR_FORMAT
+from core.memory.association.builder import AssociationBuilder
+from core.memory.association.network import AssociationNetwork
+
+DIM = 16
+DAY = 86400
+
+
+def _setup(db_manager, tmp_path, count=200):
+    """写入count条随机向量的记忆，其中near_0..near_4与query方向接近"""
+    index = VectorIndexManager(str(tmp_path / "index.bin"), vector_dim=DIM)
+    assert index.create_index()
+
+    rng = np.random.default_rng(7)
+    query = rng.normal(size=DIM).astype(np.float32)
+    ids = [f"near_{i}" for i in range(5)] + [f"far_{i}" for i in range(count - 5)]
+    vectors = rng.normal(size=(count, DIM)).astype(np.float32)
+    vectors[:5] = query + rng.normal(scale=0.1, size=(5, DIM))
+    now = time.time()
+    db_manager.bulk_insert("memories", [
+        (memory_id, f"随便聊聊第{i}件事", "user_input", "user", "s1", now - i * DAY, 5.0, None, None, now, "{}")
+        for i, memory_id in enumerate(ids)
+    ])
+    db_manager.bulk_insert("memory_vectors", [
+        (f"vec_{memory_id}", memory_id, encode_vector(vector), DEFAULT_VECTOR_FORMAT, "test", now)
+        for memory_id, vector in zip(ids, vectors)
+    ])
+    assert index.add_vectors(vectors, ids)
+    return index, query, now
+
+
+def test_build_from_index(db_manager, tmp_path):
+    """测试候选取自向量索引、只写入前k个，重复构建时更新已有关联"""
+    print("\n===== 测试向量关联构建 =====")
+    index, query, now = _setup(db_manager, tmp_path)
+    builder = AssociationBuilder(db_manager, index, top_k=3, candidate_k=20, strength_threshold=0.3)
+    memory = {"memory_id": "new", "content": "新的一句话", "created_at": now, "weight": 5.0}
+
+    db_manager.queries.reset_stats()
+    associations = builder.build("new", memory, vector=query)
+    stats = db_manager.get_query_stats()
+    print(f"关联: {[(a['target_id'], round(a['strength'], 3)) for a in associations]}")
+    assert len(associations) == 3
+    assert all(a["target_id"].startswith("near_") for a in associations)
+    assert [a["strength"] for a in associations] == sorted((a["strength"] for a in associations), reverse=True)
+    # 候选记忆和向量各一次批量查询
+    assert stats["association.memories"]["calls"] == 1
+    assert stats["association.candidate_vectors"]["calls"] == 1
+
+    rows = db_manager.query("SELECT source_key, target_key FROM memory_association")
+    assert sorted(tuple(row) for row in rows) == sorted(("new", a["target_id"]) for a in associations)
+
+    # 再次构建：已有关联（含反方向）被更新而不是重复插入
+    db_manager.execute_query("UPDATE memory_association SET source_key = target_key, target_key = 'new' "
+                             "WHERE target_key = ?", (associations[0]["target_id"],))
+    again = builder.build("new", memory, vector=query)
+    assert [a["target_id"] for a in again] == [a["target_id"] for a in associations]
+    assert db_manager.query("SELECT COUNT(*) FROM memory_association")[0][0] == 3
+    stats = db_manager.get_query_stats()
+    assert stats["association.update"]["calls"] == 1
+
+    # 已入库的记忆：内容和向量从数据库读取
+    stored = builder.build("near_0")
+    assert stored and all(a["source_id"] == "near_0" for a in stored)
+    assert {a["target_id"] for a in stored} <= {"near_1", "near_2", "near_3", "near_4", "new"}
+    print("✅ 向量关联构建测试通过")
+
+
+def test_vectorized_scoring():
+    """测试批量打分与逐对计算一致，中文内容没有向量时按双字重叠计算"""
+    print("\n===== 测试批量关联打分 =====")
+    now = time.time()
+    builder = AssociationBuilder()
+    rng = np.random.default_rng(3)
+    memory = {"content": "我在学习python编程", "created_at": now, "vector": rng.normal(size=DIM)}
+    candidates = [
+        {"content": "python编程很有趣", "created_at": now - 0.5 * DAY, "vector": rng.normal(size=DIM)},
+        {"content": "周末去散步", "created_at": now - 10 * DAY, "vector": rng.normal(size=DIM)},
+        {"content": "今天学习了python编程", "created_at": now - 3 * DAY},
+        {"content": "天气很好", "created_at": 0},
+    ]
+    batch = builder.score(memory, candidates)
+    single = [builder.score(memory, [candidate])[0] for candidate in candidates]
+    print(f"批量: {np.round(batch, 3).tolist()}")
+    assert np.allclose(batch, single)
+    assert batch[2] > batch[3]
+
+    # 没有向量的中文内容：共同的双字越多强度越高
+    text_only = builder.score({"content": "我喜欢喝咖啡"},
+                              [{"content": "我也喜欢喝咖啡"}, {"content": "今天下雨了"}])
+    assert text_only[0] > 0.3 and text_only[1] == 0.0
+
+    # AssociationNetwork沿用原来的接口，中文内容能建立关联
+    network = AssociationNetwork()
+    strength = network.calculate_association_strength(
+        {"content": "我喜欢喝咖啡", "created_at": now}, {"content": "我也喜欢喝咖啡", "created_at": now})
+    assert strength > network.strength_threshold
+    associations = network.auto_create_associations(
+        "m0", {"content": "我喜欢喝咖啡", "created_at": now},
+        [{"memory_id": "m1", "content": "我也喜欢喝咖啡", "created_at": now},
+         {"memory_id": "m2", "content": "完全无关", "created_at": now - 100 * DAY}])
+    assert [a["target_id"] for a in associations] == ["m1"]
+    print("✅ 批量关联打分测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_build_from_index,
+        test_vectorized_scoring
+    )
+    print("\n🎉 所有测试通过")
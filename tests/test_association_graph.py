@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试内存关联图：CSR加载、多种子多跳剪枝扩展、增量更新与衰减，以及AssociationNetwork的批量拓展
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.association.graph import AssociationGraph
+from core.memory.association.network import AssociationNetwork
+
+# (源, 目标, 强度, 类型)；a3-a1 与 a1-a3 重复，保留较强的一条
+EDGES = [
+    ("a1", "a2", 0.9, "same_topic"),
+    ("a2", "a3", 0.7, "is_related_to"),
+    ("a3", "a1", 0.3, "is_related_to"),
+    ("a1", "a3", 0.35, "cause_effect"),
+    ("a2", "a4", 0.45, "is_related_to"),
+    ("a4", "a5", 0.95, "is_related_to"),
+    ("a6", "a1", 0.6, "temporal_sequence"),
+    ("a6", "a7", 0.5, "is_related_to"),
+]
+
+
+def _seed(db_manager):
+    now = time.time()
+    db_manager.bulk_insert("memories", [
+        (f"a{i}", f"记忆{i}", "user_input", "user", "s1", now, 5.0, None, None, now, "{}")
+        for i in range(1, 8)
+    ])
+    db_manager.bulk_insert("memory_association", [
+        (f"assoc_{i}", source, target, association_type, strength, now - 100 * 86400, now - 100 * 86400)
+        for i, (source, target, strength, association_type) in enumerate(EDGES)
+    ])
+
+
+def test_graph_expand(db_manager):
+    """测试CSR加载和多跳扩展的阈值、路径和类型"""
+    print("\n===== 测试关联图扩展 =====")
+    _seed(db_manager)
+    graph = AssociationGraph()
+    assert graph.load(db_manager)
+    print(f"节点: {graph.num_nodes}, 关联: {graph.num_edges}")
+    assert graph.num_nodes == 7 and graph.num_edges == 7
+    assert len(graph.indices) == 14
+
+    # 一跳：强度 >= 0.5
+    direct = graph.neighbors("a1", min_strength=0.5)
+    assert [(r["memory_id"], round(r["strength"], 2)) for r in direct] == [("a2", 0.9), ("a6", 0.6)]
+    assert direct[0]["association_type"] == "same_topic"
+
+    # 两跳：边强度 >= 0.4、路径强度 >= 0.3；a3经a2到达（0.9*0.7），a4路径 0.9*0.45=0.405
+    results = graph.expand(["a1"], depth=2, min_strength=0.5)
+    print(f"两跳: {[(r['memory_id'], round(r['strength'], 3), r['depth']) for r in results]}")
+    by_id = {r["memory_id"]: r for r in results}
+    assert set(by_id) == {"a2", "a6", "a3", "a7", "a4"}
+    assert by_id["a3"]["depth"] == 2 and abs(by_id["a3"]["strength"] - 0.63) < 1e-6
+    assert by_id["a3"]["association_path"] == ["a1", "a2", "a3"]
+    assert by_id["a7"]["association_path"] == ["a1", "a6", "a7"]
+    assert [r["strength"] for r in results] == sorted((r["strength"] for r in results), reverse=True)
+
+    # 三跳才能到达a5；多种子时种子本身不出现在结果中
+    results = graph.expand(["a1", "a2"], depth=3, min_strength=0.4, max_results=10)
+    by_id = {r["memory_id"]: r for r in results}
+    assert "a1" not in by_id and "a2" not in by_id
+    assert by_id["a5"]["depth"] == 2 and by_id["a5"]["association_path"] == ["a2", "a4", "a5"]
+    assert len(graph.expand(["a1"], depth=3, min_strength=0.5, max_results=2)) == 2
+    assert graph.expand(["missing"], depth=2) == []
+
+    print("✅ 关联图扩展测试通过")
+
+
+def test_graph_incremental_updates(db_manager):
+    """测试增量关联、合并、强度调整和批量同步强度"""
+    print("\n===== 测试关联图增量更新 =====")
+    _seed(db_manager)
+    graph = AssociationGraph(compact_threshold=2)
+    graph.load(db_manager)
+
+    graph.upsert_edge("a5", "new1", 0.8, "same_topic")
+    graph.upsert_edge("a1", "a2", 0.4)  # 更新已有关联
+    assert len(graph._pending) == 1
+    assert {r["memory_id"] for r in graph.neighbors("a5", min_strength=0.5)} == {"a4", "new1"}
+    assert graph.neighbors("a2", min_strength=0.5)[0]["memory_id"] == "a3"
+
+    # 超过阈值后合并进CSR，结果不变
+    graph.upsert_edge("new1", "new2", 0.7)
+    graph.upsert_edge("new2", "new3", 0.7)
+    assert graph._pending == [] and graph.num_nodes == 10
+    results = graph.expand(["a5"], depth=3, min_strength=0.5)
+    assert [r["memory_id"] for r in results][:2] == ["a4", "new1"]
+    assert {r["memory_id"] for r in results} >= {"new2", "new3"}
+
+    graph.adjust_strength("a1", "a2", 0.05)
+    strengths = {r["memory_id"]: r["strength"] for r in graph.neighbors("a1", min_strength=0.4)}
+    assert abs(strengths["a2"] - 0.45) < 1e-6
+
+    # 分块维护把数据库中衰减、删除的结果同步到图中，None表示删除
+    assert graph.set_strengths([("a5", "a4", 0.5), ("a6", "a7", None), ("a1", "missing", 0.2)]) == 2
+    strengths = {r["memory_id"]: round(r["strength"], 3) for r in graph.neighbors("a4", min_strength=0.0)}
+    assert strengths == {"a5": 0.5, "a2": 0.45}
+    assert [r["memory_id"] for r in graph.neighbors("a6", min_strength=0.0)] == ["a1"]
+
+    print("✅ 关联图增量更新测试通过")
+
+
+def test_network_batch_expansion(db_manager):
+    """测试AssociationNetwork的批量拓展只执行固定次数的查询"""
+    print("\n===== 测试关联网络批量拓展 =====")
+    _seed(db_manager)
+    network = AssociationNetwork(db_manager)
+
+    ids = network.find_associated_memories(["a1", "a4"], depth=2, max_results=10)
+    print(f"拓展结果: {ids}")
+    assert "a1" not in ids and "a4" not in ids
+    assert ids[0] == "a5"
+    assert set(ids) >= {"a2", "a6", "a3"}
+
+    db_manager.queries.reset_stats()
+    related = network.get_related_memories("a1", depth=2, min_strength=0.5)
+    stats = db_manager.get_query_stats()
+    assert stats["association.memories"]["calls"] == 1
+    assert "association.touch_source" not in stats
+    assert {r["memory_id"] for r in related} == {"a2", "a6", "a3", "a7", "a4"}
+    two_hop = [r for r in related if r.get("is_two_hop")]
+    assert two_hop and all(len(r["association_path"]) == 3 for r in two_hop)
+    assert related[0]["content"] == "记忆2"
+
+    # 激活时间写入后关联的最近激活时间已更新
+    assert network.flush_activations() == 2  # 两次拓展的种子a1、a4
+    rows = db_manager.query(
+        "SELECT MIN(last_activated) FROM memory_association WHERE source_key = 'a1' OR target_key = 'a1'")
+    assert rows[0][0] > time.time() - 60
+
+    # 新建的关联同步到已加载的图
+    network.auto_create_associations("a7", {"content": "python 编程 项目", "created_at": time.time()},
+                                     [{"memory_id": "a5", "content": "python 编程 项目",
+                                       "created_at": time.time()}])
+    assert "a5" in {r["memory_id"] for r in network.graph.neighbors("a7", min_strength=0.2)}
+
+    # 较大的图上一次批量扩展的耗时
+    rng = np.random.default_rng(0)
+    pairs = rng.integers(0, 20000, size=(100000, 2))
+    strengths = rng.random(len(pairs))
+    db_manager.bulk_insert("memory_association", [
+        (f"bulk_{i}", f"n{a}", f"n{b}", "is_related_to", float(strength), 0.0, 0.0)
+        for i, ((a, b), strength) in enumerate(zip(pairs.tolist(), strengths))
+    ])
+    graph = AssociationGraph()
+    load_start = time.perf_counter()
+    assert graph.load(db_manager)
+    print(f"加载 {graph.num_edges} 条关联: {(time.perf_counter() - load_start) * 1000:.0f}ms")
+    start = time.perf_counter()
+    for _ in range(100):
+        results = graph.expand([f"n{i}" for i in range(5)], depth=2, min_strength=0.5, max_results=10)
+    elapsed = (time.perf_counter() - start) / 100 * 1e6
+    print(f"{graph.num_nodes}节点/{graph.num_edges}关联，5个种子两跳扩展: {elapsed:.0f}µs")
+    assert len(results) == 10
+
+    network.close()
+    print("✅ 关联网络批量拓展测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_graph_expand,
+        test_graph_incremental_updates,
+        test_network_batch_expansion
+    )
+    print("\n🎉 所有测试通过")
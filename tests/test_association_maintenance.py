@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试后台关联维护：分块衰减、剪枝、关联数再平衡，以及调度器的进度和中止
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.association.network import AssociationNetwork
+from core.memory.maintenance import MaintenanceJob, MaintenanceScheduler, AssociationMaintenanceJob
+
+DAY = 86400
+
+
+def _create_network(db_manager):
+    """写入600条旧关联、600条近期关联、50条弱关联，hub有15条关联"""
+    now = time.time()
+    rows = []
+    for i in range(600):
+        rows.append((f"old_{i:04d}", f"o{i}", f"p{i}", "is_related_to", 0.5, now - 100 * DAY, now - (60 + i % 30) * DAY))
+        rows.append((f"new_{i:04d}", f"n{i}", f"q{i}", "is_related_to", 0.5, now, now - i))
+    for i in range(50):
+        rows.append((f"weak_{i:02d}", f"w{i}", f"x{i}", "is_related_to", 0.05, now, now))
+    for i in range(15):
+        rows.append((f"hub_{i:02d}", "hub", f"h{i}", "is_related_to", 0.3 + i * 0.02, now, now))
+    db_manager.bulk_insert("memory_association", rows)
+    return AssociationNetwork(db_manager)
+
+
+def _strengths(db_manager, prefix):
+    return [row[0] for row in db_manager.query(
+        "SELECT strength FROM memory_association WHERE id LIKE ?", (prefix + "%",))]
+
+
+def test_chunked_maintenance(db_manager):
+    """测试分块衰减只影响旧关联、弱关联被删除、超限记忆只保留最强的关联"""
+    print("\n===== 测试关联分块维护 =====")
+    network = _create_network(db_manager)
+    assert network.find_associated_memories(["hub"], depth=1, max_results=20)  # 加载关联图
+    assert len(network.graph.neighbors("hub")) == 15
+
+    scheduler = MaintenanceScheduler()
+    scheduler.register(AssociationMaintenanceJob(network, chunk_size=100, days_threshold=30))
+    db_manager.queries.reset_stats()
+    progress = scheduler.run_now("association_maintenance")
+    stats = scheduler.get_stats()["association_maintenance"]
+    print(f"进度: {progress}, 分块: {stats['chunks']}, 耗时: {stats['last_duration']}s")
+    assert progress["phase"] == "done"
+    assert progress["decayed"] == 600 and progress["pruned"] == 50 and progress["trimmed"] == 5
+    assert stats["runs"] == 1 and stats["last_error"] is None and not stats["running"]
+    assert stats["chunks"] == 6 + 1 + 1 + 1
+
+    # 每块一次有界查询：6块旧关联（最后一块正好满，再查一次确认结束）
+    query_stats = db_manager.get_query_stats()
+    assert query_stats["maintenance.stale_associations"]["calls"] == 7
+    assert query_stats["maintenance.set_strength"]["calls"] == 7
+
+    assert set(_strengths(db_manager, "old_")) == {0.5 * 0.95}
+    assert set(_strengths(db_manager, "new_")) == {0.5}
+    assert _strengths(db_manager, "weak_") == []
+    hub = sorted(_strengths(db_manager, "hub_"))
+    assert len(hub) == network.max_associations_per_memory and abs(hub[0] - 0.4) < 1e-6
+
+    # 已加载的关联图同步更新
+    graph = network.graph
+    assert abs(graph.neighbors("o1")[0]["strength"] - 0.475) < 1e-6
+    assert graph.neighbors("w1") == []
+    assert len(graph.neighbors("hub")) == 10
+    assert graph.num_edges == 1210
+
+    # 兼容接口：衰减到下限的关联在同一次维护中被删除
+    network.decay_unused_associations(days_threshold=30, decay_factor=0.1)
+    assert _strengths(db_manager, "old_") == []
+    assert graph.neighbors("o1") == []
+
+    network.close()
+    print("✅ 关联分块维护测试通过")
+
+
+def _state(db_manager, job):
+    return tuple(db_manager.execute_named("maintenance.state", (job.name,))[0])
+
+
+def test_decay_follows_elapsed_time(db_manager):
+    """测试衰减量按距上次衰减经过的时间计算，上次衰减时间记录在数据库中"""
+    print("\n===== 测试按经过时间衰减 =====")
+    network = _create_network(db_manager)
+    job = AssociationMaintenanceJob(network, chunk_size=200, decay_period=DAY)
+    scheduler = MaintenanceScheduler()
+    scheduler.register(job)
+
+    # 上次衰减在三个周期之前（例如进程停止了三天）
+    with db_manager.transaction():
+        db_manager.execute_named("maintenance.finish_run", (job.name, time.time() - 3 * DAY))
+    progress = scheduler.run_now(job.name)
+    print(f"进度: {progress}")
+    assert abs(progress["decay_factor"] - 0.95 ** 3) < 1e-4
+    assert all(abs(s - 0.5 * 0.95 ** 3) < 1e-4 for s in _strengths(db_manager, "old_"))
+    last_run, run_started, cursor_time, cursor_id = _state(db_manager, job)
+    assert time.time() - last_run < 60 and run_started is None and cursor_time is None
+
+    # 紧接着再运行一次（例如重启后立即运行）几乎不再衰减
+    restarted = AssociationMaintenanceJob(network, chunk_size=200, decay_period=DAY)
+    scheduler.register(restarted)
+    progress = scheduler.run_now(restarted.name)
+    assert progress["decay_factor"] > 0.9999
+    assert all(abs(s - 0.5 * 0.95 ** 3) < 1e-4 for s in _strengths(db_manager, "old_"))
+
+    network.close()
+    print("✅ 按经过时间衰减测试通过")
+
+
+def test_interrupted_decay_resumes(db_manager):
+    """测试衰减中途停止后从记录的游标继续，已衰减的关联不会再次衰减"""
+    print("\n===== 测试衰减中断后续跑 =====")
+    network = _create_network(db_manager)
+    with db_manager.transaction():
+        db_manager.execute_named("maintenance.finish_run", ("association_maintenance", time.time() - 2 * DAY))
+
+    # 衰减两个分块后停止（调度器关闭时同样关闭生成器）
+    job = AssociationMaintenanceJob(network, chunk_size=100, decay_period=DAY)
+    steps = job.run()
+    first = next(steps)
+    next(steps)
+    steps.close()
+    assert first["phase"] == "decay" and not first["resumed"]
+    factor = first["decay_factor"]
+    last_run, run_started, cursor_time, cursor_id = _state(db_manager, job)
+    assert run_started is not None and cursor_id
+    strengths = _strengths(db_manager, "old_")
+    assert sum(abs(s - 0.5 * factor) < 1e-9 for s in strengths) == 200
+    assert sum(s == 0.5 for s in strengths) == 400
+
+    # 重启后的新任务从游标继续，使用中断那次的衰减因子
+    resumed = AssociationMaintenanceJob(network, chunk_size=100, decay_period=DAY)
+    scheduler = MaintenanceScheduler()
+    scheduler.register(resumed)
+    progress = scheduler.run_now(resumed.name)
+    print(f"续跑进度: {progress}")
+    assert progress["resumed"] and progress["decayed"] == 400 and progress["phase"] == "done"
+    assert progress["decay_factor"] == factor
+    assert all(abs(s - 0.5 * factor) < 1e-9 for s in _strengths(db_manager, "old_"))
+    assert set(_strengths(db_manager, "new_")) == {0.5}
+
+    # 完成后上次衰减时间为中断那次的开始时间，进度被清除
+    assert _state(db_manager, job) == (run_started, None, None, None)
+
+    network.close()
+    print("✅ 衰减中断后续跑测试通过")
+
+
+class EndlessJob(MaintenanceJob):
+    """永不结束的任务，用于测试在分块之间停止"""
+    name = "endless"
+    interval = 60.0
+
+    def __init__(self):
+        self.closed = False
+
+    def run(self):
+        count = 0
+        try:
+            while True:
+                count += 1
+                yield {"count": count}
+        finally:
+            self.closed = True
+
+
+def test_scheduler_background(db_manager):
+    """测试后台线程按时运行任务、分块间停顿，关闭时在分块边界停止"""
+    print("\n===== 测试后台维护调度 =====")
+    network = _create_network(db_manager)
+    scheduler = MaintenanceScheduler(chunk_pause=0.001, poll_interval=0.01)
+    scheduler.register(AssociationMaintenanceJob(network, chunk_size=200), initial_delay=0)
+    scheduler.start()
+    deadline = time.time() + 5.0
+    while scheduler.get_stats()["association_maintenance"]["runs"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    stats = scheduler.get_stats()["association_maintenance"]
+    assert stats["runs"] == 1 and stats["progress"]["decayed"] == 600
+    assert stats["next_run"] > time.time() + 3600  # 下次运行在一个间隔之后
+    scheduler.shutdown()
+    assert not scheduler.is_running
+
+    job = EndlessJob()
+    scheduler = MaintenanceScheduler(chunk_pause=0.01, poll_interval=0.01)
+    scheduler.register(job, initial_delay=0)
+    scheduler.start()
+    while scheduler.get_stats()["endless"]["chunks"] < 3:
+        time.sleep(0.01)
+    assert scheduler.get_stats()["endless"]["running"]
+    scheduler.shutdown()
+    stats = scheduler.get_stats()["endless"]
+    print(f"中止前分块数: {stats['chunks']}")
+    assert job.closed and stats["interrupted"] == 1 and not stats["running"]
+
+    try:
+        scheduler.run_now("missing")
+        assert False, "未注册的任务应该报错"
+    except KeyError:
+        pass
+
+    try:
+        MaintenanceJob()
+        assert False, "没有实现run()的任务不能实例化"
+    except TypeError:
+        pass
+
+    network.close()
+    print("✅ 后台维护调度测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_chunked_maintenance,
+        test_decay_follows_elapsed_time,
+        test_interrupted_decay_resumes,
+        test_scheduler_background
+    )
+    print("\n🎉 所有测试通过")
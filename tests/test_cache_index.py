@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试SQLite缓存索引：增量保存、按需加载和旧版JSON索引导入
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.embedding.cache import EnhancedMemoryCache
+from core.memory.embedding.cache_index import CacheIndexStore, LazyMetadata
+
+VECTOR_DIM = 16
+
+
+def test_incremental_save():
+    """测试只写入脏条目，重启后按需读取"""
+    print("\n===== 测试缓存索引增量保存 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_cache_index_")
+    try:
+        rng = np.random.default_rng(0)
+        cache = EnhancedMemoryCache(cache_dir=temp_dir)
+        for i in range(20):
+            cache.put(f"测试记忆 编号{i} 天气", rng.random(VECTOR_DIM).astype(np.float32))
+        cache.flush()
+        assert cache.memory_metadata.dirty_count == 0
+
+        # 只访问一条，只应有一条脏数据
+        cache.get("测试记忆 编号3 天气")
+        assert cache.memory_metadata.dirty_count == 1
+        assert cache.memory_metadata.flush() == 1
+        cache.close()
+
+        reopened = EnhancedMemoryCache(cache_dir=temp_dir)
+        assert not reopened.memory_metadata._resident  # 启动时不加载
+        key = hashlib.sha256("测试记忆 编号3 天气".encode("utf-8")).hexdigest()
+        assert reopened.memory_metadata[key]["access_count"] == 2
+        assert len(reopened.memory_metadata) == 20
+        assert len(reopened.keyword_cache["天气"]) == 20
+        stats = reopened.get_stats()["cache_management"]
+        print(f"缓存管理统计: {stats}")
+        reopened.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_legacy_json_import():
+    """测试旧版embedding_cache.json导入后不再使用"""
+    print("\n===== 测试旧版JSON缓存索引导入 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_cache_index_")
+    try:
+        legacy = {
+            "memory_metadata": {"abc": {"access_count": 5, "last_accessed": 1.0,
+                                        "weight": 8.0, "created_at": 1.0, "text_preview": "旧的记忆"}},
+            "keyword_cache": {"旧的": ["abc"]},
+            "stats": {}
+        }
+        with open(os.path.join(temp_dir, "embedding_cache.json"), "w", encoding="utf-8") as f:
+            json.dump(legacy, f, ensure_ascii=False)
+
+        cache = EnhancedMemoryCache(cache_dir=temp_dir)
+        assert not os.path.exists(os.path.join(temp_dir, "embedding_cache.json"))
+        assert cache.memory_metadata["abc"]["weight"] == 8.0
+        assert cache.keyword_cache["旧的"] == {"abc"}
+
+        # 过期元数据在维护时删除，对应关键词一并清理
+        cache._maintain_cache()
+        assert "abc" not in cache.memory_metadata
+        assert "旧的" not in cache.keyword_cache
+        cache.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_concurrent_access():
+    """测试多个线程同时读写缓存并触发维护"""
+    print("\n===== 测试缓存并发访问 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_cache_index_")
+    try:
+        cache = EnhancedMemoryCache(cache_dir=temp_dir, hot_capacity=10, warm_capacity=30)
+        cache.maintenance_interval = 0  # 每次写入都维护，放大竞争
+        vectors = np.random.default_rng(1).random((200, VECTOR_DIM)).astype(np.float32)
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(offset, 200, 4):
+                    text = f"并发记忆 编号{i} 天气"
+                    cache.put(text, vectors[i], memory_weight=float(i % 10))
+                    assert np.array_equal(cache.get(text), vectors[i])
+                    cache.search_by_content("天气", limit=3)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        print(f"并发错误: {errors}")
+        assert not errors
+        assert len(cache.memory_metadata) == 200
+        assert len(cache.hot_cache) <= 10 and len(cache.warm_cache) <= 30
+        cache.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_lazy_metadata_delete():
+    """测试删除和重新写入"""
+    store = CacheIndexStore(":memory:")
+    metadata = LazyMetadata(store)
+    metadata["k"] = {"access_count": 1, "last_accessed": 2.0, "weight": 1.0, "created_at": 2.0}
+    metadata.flush()
+    del metadata["k"]
+    assert "k" not in metadata
+    metadata.flush()
+    assert store.get_metadata("k") is None
+    metadata["k"] = {"access_count": 3, "last_accessed": 4.0, "weight": 1.0, "created_at": 4.0}
+    assert metadata.flush() == 1
+    assert store.get_metadata("k")["access_count"] == 3
+    store.close()
+
+
+if __name__ == "__main__":
+    test_incremental_save()
+    test_legacy_json_import()
+    test_concurrent_access()
+    test_lazy_metadata_delete()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试数据库连接池：WAL模式、读写分离、写事务进行中读取不被阻塞
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.connection_pool import is_read_query
+
+
+def _insert_memory(db_manager, memory_id, content):
+    now = time.time()
+    return db_manager.execute_query(
+        "INSERT INTO memories (id, content, type, role, timestamp, last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+        (memory_id, content, "user_input", "user", now, now)
+    )
+
+
+def test_wal_mode(db_manager):
+    """测试数据库使用WAL模式和调优后的PRAGMA"""
+    print("\n===== 测试WAL模式 =====")
+    assert db_manager.execute_query("PRAGMA journal_mode")[0][0] == "wal"
+    assert db_manager.execute_query("PRAGMA synchronous")[0][0] == 1  # NORMAL
+    assert db_manager.execute_query("PRAGMA temp_store")[0][0] == 2  # MEMORY
+
+    assert _insert_memory(db_manager, "m1", "今天天气很好") is not None
+    rows = db_manager.execute_query("SELECT content FROM memories WHERE id = ?", ("m1",))
+    assert rows[0]["content"] == "今天天气很好"
+
+    stats = db_manager.get_pool_stats()
+    print(f"连接池状态: {stats}")
+    assert stats["reads"] >= 1 and stats["writes"] >= 1
+    print("✅ WAL模式测试通过")
+
+
+def test_read_during_write(db_manager):
+    """测试写事务未提交时，其他线程的读取立即返回已提交的数据"""
+    print("\n===== 测试写入时并发读取 =====")
+    _insert_memory(db_manager, "m1", "已提交的记忆")
+
+    write_started = threading.Event()
+    release_write = threading.Event()
+
+    def long_write():
+        with db_manager.pool.writer() as conn:
+            now = time.time()
+            conn.execute(
+                "INSERT INTO memories (id, content, type, role, timestamp, last_accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                ("m2", "未提交的记忆", "user_input", "user", now, now)
+            )
+            write_started.set()
+            release_write.wait(5)
+            conn.commit()
+
+    writer = threading.Thread(target=long_write)
+    writer.start()
+    assert write_started.wait(5)
+
+    results = []
+
+    def read():
+        start = time.time()
+        rows = db_manager.execute_query("SELECT id FROM memories ORDER BY id")
+        results.append(([row["id"] for row in rows], time.time() - start))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for thread in readers:
+        thread.join(5)
+
+    release_write.set()
+    writer.join(5)
+
+    print(f"读取结果: {results}")
+    assert len(results) == 4
+    for ids, elapsed in results:
+        assert ids == ["m1"]  # 只看到已提交的数据
+        assert elapsed < 1.0  # 没有等待写事务
+
+    rows = db_manager.execute_query("SELECT COUNT(*) FROM memories")
+    assert rows[0][0] == 2
+    assert db_manager.get_pool_stats()["readers_open"] <= db_manager.max_readers
+    print("✅ 并发读取测试通过")
+
+
+def test_failed_write_rollback(db_manager):
+    """测试写入失败时回滚，写连接可继续使用"""
+    print("\n===== 测试写入失败回滚 =====")
+    _insert_memory(db_manager, "m1", "第一条")
+    assert _insert_memory(db_manager, "m1", "重复ID") is None
+
+    success = db_manager.execute_transaction([
+        ("UPDATE memories SET weight = ? WHERE id = ?", (5.0, "m1")),
+        ("INSERT INTO missing_table VALUES (1)", None)
+    ])
+    assert not success
+    rows = db_manager.execute_query("SELECT weight FROM memories WHERE id = ?", ("m1",))
+    assert rows[0]["weight"] == 1.0
+
+    assert _insert_memory(db_manager, "m2", "第二条") is not None
+    assert db_manager.get_table_info("memories")["record_count"] == 2
+    print("✅ 写入失败回滚测试通过")
+
+
+def test_with_statement_routing(db_manager):
+    """测试WITH开头的写语句走写连接"""
+    print("\n===== 测试WITH语句路由 =====")
+    assert is_read_query("WITH recent AS (SELECT id FROM memories) SELECT * FROM recent")
+    assert not is_read_query("WITH old AS (SELECT id FROM memories) DELETE FROM memories WHERE id IN old")
+    assert not is_read_query("with t(v) as (values (1)) insert into x select v from t")
+
+    _insert_memory(db_manager, "m1", "第一条")
+    _insert_memory(db_manager, "m2", "第二条")
+    assert db_manager.execute_query(
+        "WITH target AS (SELECT id FROM memories WHERE id = ?) "
+        "UPDATE memories SET weight = 9.0 WHERE id IN (SELECT id FROM target)", ("m2",)
+    ) is not None
+    rows = db_manager.execute_query(
+        "WITH heavy AS (SELECT id FROM memories WHERE weight > 5) SELECT id FROM heavy"
+    )
+    assert [row["id"] for row in rows] == ["m2"]
+    print("✅ WITH语句路由测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_wal_mode,
+        test_read_during_write,
+        test_failed_write_rollback,
+        test_with_statement_routing
+    )
+    print("\n🎉 所有测试通过")
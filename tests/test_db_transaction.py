@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试数据库工作单元：事务内批量写入只提交一次、异常回滚、嵌套事务
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _memory_row(memory_id, content):
+    now = time.time()
+    return (memory_id, content, "user_input", "user", "session_1", now, 5.0, None, None, now, "{}")
+
+
+def _count_commits(db_manager):
+    """记录写连接上执行的COMMIT语句"""
+    commits = []
+    db_manager.conn.set_trace_callback(
+        lambda statement: commits.append(statement) if statement.strip().upper() == "COMMIT" else None
+    )
+    return commits
+
+
+def test_single_commit_per_unit(db_manager):
+    """测试一个工作单元内的多次写入只提交一次"""
+    print("\n===== 测试工作单元单次提交 =====")
+    commits = _count_commits(db_manager)
+
+    with db_manager.transaction():
+        assert db_manager.bulk_insert("memories", [_memory_row(f"m{i}", f"记忆{i}") for i in range(10)]) == 10
+        db_manager.bulk_insert("memory_vectors", [
+            (f"vec_m{i}", f"m{i}", b"\x00" * 16, "f32", "test/model", time.time()) for i in range(10)
+        ])
+        db_manager.execute_query("UPDATE memories SET weight = ? WHERE id = ?", (8.0, "m1"))
+        db_manager.bulk_insert("memory_group", [("g1", "日常", "天气", 0.0, 1.0, "摘要", 5.0)])
+        db_manager.bulk_insert("memory_association", [
+            ("a1", "m0", "m1", "is_related_to", 0.8, time.time(), time.time())
+        ])
+        # 事务内的读取可以看到未提交的写入
+        assert db_manager.execute_query("SELECT COUNT(*) FROM memories")[0][0] == 10
+
+    print(f"提交次数: {len(commits)}")
+    assert len(commits) == 1
+    assert db_manager.execute_query("SELECT weight FROM memories WHERE id = ?", ("m1",))[0][0] == 8.0
+    assert db_manager.get_table_info("memory_vectors")["record_count"] == 10
+    print("✅ 工作单元单次提交测试通过")
+
+
+def test_rollback_and_nesting(db_manager):
+    """测试异常时整体回滚，嵌套事务只由最外层提交"""
+    print("\n===== 测试回滚与嵌套事务 =====")
+    try:
+        with db_manager.transaction():
+            db_manager.bulk_insert("memories", [_memory_row("m1", "会被回滚")])
+            with db_manager.transaction():
+                db_manager.bulk_insert("memories", [_memory_row("m2", "也会被回滚")])
+            db_manager.execute_query("INSERT INTO missing_table VALUES (1)")
+        assert False, "事务内的错误应该抛出"
+    except AssertionError:
+        raise
+    except Exception as e:
+        print(f"预期的错误: {e}")
+
+    assert db_manager.execute_query("SELECT COUNT(*) FROM memories")[0][0] == 0
+
+    # 事务外的批量写入失败返回None，不影响后续写入
+    assert db_manager.bulk_insert("memories", [_memory_row("m1", "第一条"), _memory_row("m1", "重复")]) is None
+    assert db_manager.bulk_insert("memories", [_memory_row("m3", "第三条")]) == 1
+    assert db_manager.execute_query("SELECT COUNT(*) FROM memories")[0][0] == 1
+    print("✅ 回滚与嵌套事务测试通过")
+
+
+def test_uncommitted_invisible_to_readers(db_manager):
+    """测试事务提交前其他线程读不到未提交的数据"""
+    print("\n===== 测试事务隔离 =====")
+    seen = []
+
+    def read_count():
+        seen.append(db_manager.execute_query("SELECT COUNT(*) FROM memories")[0][0])
+
+    with db_manager.transaction():
+        db_manager.bulk_insert("memories", [_memory_row("m1", "未提交")])
+        reader = threading.Thread(target=read_count)
+        reader.start()
+        reader.join(5)
+
+    read_count()
+    print(f"读取结果: {seen}")
+    assert seen == [0, 1]
+    print("✅ 事务隔离测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_single_commit_per_unit,
+        test_rollback_and_nesting,
+        test_uncommitted_invisible_to_readers
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试向量化微批调度器：并发请求合并、批内去重和异常传递
+"""
+
+import os
+import sys
+import time
+import threading
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.embedding.batcher import EmbeddingBatcher
+
+VECTOR_DIM = 8
+
+
+class RecordingEncoder:
+    """测试用编码回调：记录每批文本，向量第一维为文本长度"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, texts, weights):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        vectors = np.zeros((len(texts), VECTOR_DIM), dtype=np.float32)
+        vectors[:, 0] = [len(text) for text in texts]
+        return vectors
+
+
+def test_concurrent_requests_coalesce():
+    """测试多个线程的单条请求被合并成少数几批"""
+    print("\n===== 测试微批合并 =====")
+    encoder = RecordingEncoder(delay=0.005)
+    batcher = EmbeddingBatcher(encoder, max_batch_size=16, max_latency=0.02)
+    results = {}
+
+    def worker(i):
+        text = "x" * (i + 1)
+        results[i] = batcher.encode(text, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(40):
+        assert results[i][0] == i + 1
+    stats = batcher.get_stats()
+    print(f"批次大小: {[len(batch) for batch in encoder.batches]}")
+    print(f"调度统计: {stats}")
+    assert stats["requests"] == 40
+    assert stats["batches"] < 40
+    assert max(len(batch) for batch in encoder.batches) <= 16
+    assert stats["throughput_per_sec"] > 0
+    batcher.shutdown()
+
+
+def test_duplicates_and_errors():
+    """测试批内重复文本只编码一次，编码异常传给所有调用方"""
+    print("\n===== 测试去重与异常 =====")
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_latency=0.05)
+    futures = [batcher.submit("相同的文本") for _ in range(4)]
+    vectors = [future.result(timeout=5) for future in futures]
+    assert all(np.array_equal(vector, vectors[0]) for vector in vectors)
+    assert encoder.batches == [["相同的文本"]]
+    assert batcher.get_stats()["deduplicated"] == 3
+    batcher.shutdown()
+
+    def failing(texts, weights):
+        raise RuntimeError("模型错误")
+
+    batcher = EmbeddingBatcher(failing, max_latency=0.001)
+    try:
+        batcher.encode("文本", timeout=5)
+        assert False, "应当抛出异常"
+    except RuntimeError:
+        pass
+    assert batcher.get_stats()["failed"] == 1
+    batcher.shutdown()
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_coalesce()
+    test_duplicates_and_errors()
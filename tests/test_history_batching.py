@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试HistoryRetriever的批量聚合：会话窗口、会话总结、分组总结各只查询一次
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.context.history import HistoryRetriever
+
+
+def _seed(db_manager, sessions=6, turns=8):
+    """写入多个会话，每个会话有turns轮对话、一条总结和一个分组"""
+    base = time.time() - 3600
+    memories, groups = [], []
+    for s in range(sessions):
+        session_id = f"session_{s}"
+        group_id = f"group_{s}"
+        for t in range(turns):
+            # 用户输入和助手回复使用相同的时间戳
+            timestamp = base + s * 100 + t
+            memories.append((f"s{s}_u{t}", f"用户消息{s}-{t}", "user_input", "user", session_id,
+                             timestamp, 5.0, group_id, None, timestamp, "{}"))
+            memories.append((f"s{s}_a{t}", f"助手回复{s}-{t}", "assistant_reply", "assistant", session_id,
+                             timestamp, 5.0, group_id, None, timestamp, "{}"))
+        memories.append((f"s{s}_sum", f"会话{s}的总结", "summary", "system", session_id,
+                         base + s * 100 + 50, 7.0, None, None, base, "{}"))
+        groups.append((group_id, f"话题{s}", "日常", base, base + 10, f"分组{s}的总结", 6.0))
+
+    with db_manager.transaction():
+        db_manager.bulk_insert("memories", memories)
+        db_manager.bulk_insert("memory_group", groups)
+
+
+def test_batched_queries(db_manager):
+    """测试多个会话的聚合只发出固定数量的查询"""
+    print("\n===== 测试历史聚合批量查询 =====")
+    _seed(db_manager)
+    retriever = HistoryRetriever(db_manager)
+    memory_ids = [f"s{s}_u7" for s in range(6)]
+
+    db_manager.queries.reset_stats()
+    result = retriever.retrieve_memory_contents(memory_ids, max_recent_dialogues=4)
+    stats = db_manager.get_query_stats()
+    calls = {name: item["calls"] for name, item in stats.items()}
+    print(f"查询次数: {calls}")
+
+    assert calls == {
+        "history.memories_by_ids": 1,
+        "history.session_windows": 1,
+        "history.session_summaries": 1,
+        "history.group_summaries": 1,
+    }
+
+    assert len(result["session_dialogues"]) == 6
+    session = result["session_dialogues"]["session_1"]
+    assert session["count"] == 4
+    # 每个会话保留最近两轮，按时间正序，用户输入在助手回复之前
+    assert [m["memory_id"] for m in session["memories"]] == ["s1_u6", "s1_a6", "s1_u7", "s1_a7"]
+    assert [pair["assistant"]["memory_id"] for pair in session["dialogue_pairs"]] == ["s1_a6", "s1_a7"]
+
+    summaries = result["summaries"]
+    sources = [summary["source"] for summary in summaries["direct_summaries"]]
+    assert sources.count("session_session_3") == 1
+    assert sources.count("group_group_3") == 1
+    assert set(summaries["group_summaries"]) == {f"group_{s}" for s in range(6)}
+    assert summaries["group_summaries"]["group_2"][0]["content"] == "分组2的总结"
+
+    print("✅ 历史聚合批量查询测试通过")
+
+
+def test_total_row_cap(db_manager):
+    """测试总行数上限优先截掉每个会话中较旧的记录"""
+    print("\n===== 测试会话总行数上限 =====")
+    _seed(db_manager)
+    retriever = HistoryRetriever(db_manager, max_session_rows=12)
+    memory_ids = [f"s{s}_u0" for s in range(6)]
+
+    dialogues = retriever._get_session_dialogues(retriever._get_memories_by_ids(memory_ids), 10)
+    counts = {session_id: data["count"] for session_id, data in dialogues.items()}
+    print(f"每个会话的记录数: {counts}")
+
+    assert sum(counts.values()) == 12
+    assert set(counts.values()) == {2}
+    # 保留的是每个会话最新的一轮
+    assert [m["memory_id"] for m in dialogues["session_4"]["memories"]] == ["s4_u7", "s4_a7"]
+
+    print("✅ 会话总行数上限测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_batched_queries,
+        test_total_row_cap
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试混合检索：全文与向量候选的RRF融合、候选预算，以及中文相似度评分
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.retrieval.lexical_search import LexicalSearch
+from core.memory.retrieval.hybrid_search import HybridRetriever
+from core.memory.ranking.scorer import MemoryScorer
+
+MEMORIES = [
+    ("m1", "我最近在学习Python编程，感觉有点难"),
+    ("m2", "今天天气很好，适合出去散步"),
+    ("m3", "周末想去看一场电影"),
+    ("m4", "Python编程的装饰器我还是没搞懂"),
+    ("m5", "晚饭吃了火锅"),
+]
+
+
+class FakeFaissRetriever:
+    """按固定顺序返回向量检索结果"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def search_similar(self, query_vector, k=5, threshold=0.0):
+        self.calls.append(k)
+        return self.results[:k]
+
+
+def _seed(db_manager):
+    now = time.time()
+    db_manager.bulk_insert("memories", [
+        (memory_id, content, "user_input", "user", "s1", now, 5.0, None, None, now, "{}")
+        for memory_id, content in MEMORIES
+    ])
+
+
+def test_rrf_fusion(db_manager):
+    """测试两路都命中的候选排在前面，候选数受预算限制"""
+    print("\n===== 测试RRF融合 =====")
+    _seed(db_manager)
+    faiss = FakeFaissRetriever([
+        {"memory_id": "m2", "similarity": 0.82},
+        {"memory_id": "m4", "similarity": 0.80},
+        {"memory_id": "m3", "similarity": 0.40},
+        {"memory_id": "m5", "similarity": 0.30},
+    ])
+    retriever = HybridRetriever(LexicalSearch(db_manager), faiss, vector_k=4, candidate_budget=3)
+
+    lexical_future = retriever.submit_lexical("学习Python编程")
+    candidates = retriever.search("学习Python编程", np.zeros(8, dtype=np.float32), lexical_future)
+    print(f"融合结果: {[(c['memory_id'], round(c['score'], 4)) for c in candidates]}")
+
+    assert faiss.calls == [4]
+    assert len(candidates) == 3
+    # m4 两路都命中，排第一
+    assert candidates[0]["memory_id"] == "m4"
+    assert candidates[0]["vector_rank"] == 1 and candidates[0]["lexical_rank"] == 0
+    assert candidates[0]["similarity"] == 0.80
+    # m1 只有全文命中，使用全文相关度换算的相似度
+    m1 = [c for c in candidates if c["memory_id"] == "m1"]
+    assert m1 and m1[0]["vector_rank"] is None and 0.5 <= m1[0]["similarity"] <= 0.7
+
+    # 没有查询向量时只用全文检索
+    faiss.calls.clear()
+    lexical_only = retriever.search("学习Python编程")
+    assert faiss.calls == []
+    assert {c["memory_id"] for c in lexical_only} == {"m1", "m4"}
+
+    retriever.shutdown()
+    print("✅ RRF融合测试通过")
+
+
+def test_weighted_fusion():
+    """测试加权分数融合"""
+    print("\n===== 测试加权融合 =====")
+    retriever = HybridRetriever(LexicalSearch(None), None, fusion="weighted",
+                                vector_weight=0.7, lexical_weight=0.3)
+    candidates = retriever.fuse(
+        [{"memory_id": "a", "similarity": 0.9}, {"memory_id": "b", "similarity": 0.5}],
+        [{"id": "b", "relevance": 1.0}, {"id": "c", "relevance": 0.5}]
+    )
+    scores = {c["memory_id"]: round(c["score"], 3) for c in candidates}
+    print(f"加权分数: {scores}")
+    assert scores == {"a": 0.63, "b": 0.65, "c": 0.15}
+    assert [c["memory_id"] for c in candidates] == ["b", "a", "c"]
+    retriever.shutdown()
+    print("✅ 加权融合测试通过")
+
+
+def test_scorer_chinese_similarity():
+    """测试评分器的文本相似度不依赖空格分词"""
+    print("\n===== 测试中文相似度 =====")
+    scorer = MemoryScorer()
+    related = scorer._simple_similarity("你还记得我喜欢吃什么吗", "我喜欢吃火锅")
+    unrelated = scorer._simple_similarity("你还记得我喜欢吃什么吗", "今天天气很好")
+    print(f"相关: {related:.2f}, 无关: {unrelated:.2f}")
+    assert related > 0.2
+    assert unrelated == 0.0
+    print("✅ 中文相似度测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_rrf_fusion,
+        test_weighted_fusion,
+        test_scorer_chinese_similarity
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试向量索引的增量日志持久化和检查点策略
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.index_persistence import CheckpointPolicy
+
+VECTOR_DIM = 32
+
+
+def _random_vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, VECTOR_DIM)).astype(np.float32)
+
+
+def test_delta_log_replay():
+    """测试未检查点的修改在重新加载后通过增量日志恢复"""
+    print("\n===== 测试增量日志重放 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_index_")
+    index_path = os.path.join(temp_dir, "memory_index.bin")
+    try:
+        policy = CheckpointPolicy(max_pending_ops=1000, max_interval=3600)
+        manager = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert manager.create_index()
+
+        vectors = _random_vectors(20)
+        ids = [f"mem_{i}" for i in range(20)]
+        for i in range(20):
+            assert manager.add_vectors(vectors[i:i + 1], ids[i:i + 1])
+            assert not manager.maybe_checkpoint()  # 未达到阈值，不写完整索引
+
+        assert not os.path.exists(index_path)
+        assert os.path.getsize(index_path + ".delta") > 0
+        print(f"增量日志大小: {manager.delta_log.size} 字节, 未落盘操作: {manager._pending_ops}")
+
+        # 模拟进程退出后重新加载：没有快照，只有增量日志
+        manager.delta_log.close()
+        reloaded = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert reloaded.load_index()
+        assert reloaded.index.ntotal == 20
+        found, scores = reloaded.search(vectors[7], k=1)
+        assert found == ["mem_7"]
+
+        # 检查点后日志清空，快照加日志再次加载结果一致
+        assert reloaded.maybe_checkpoint(force=True)
+        assert not os.path.exists(index_path + ".delta")
+        more = _random_vectors(5, seed=1)
+        assert reloaded.add_vectors(more, [f"mem_{i}" for i in range(20, 25)])
+        reloaded.delta_log.close()
+
+        final = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert final.load_index()
+        assert final.index.ntotal == 25
+        assert final.next_id == 25
+        found, _ = final.search(more[2], k=1)
+        assert found == ["mem_22"]
+        final.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_checkpoint_policy():
+    """测试按数量阈值触发检查点，以及日志的截断容错"""
+    print("\n===== 测试检查点策略 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_index_")
+    index_path = os.path.join(temp_dir, "memory_index.bin")
+    try:
+        policy = CheckpointPolicy(max_pending_ops=10, max_interval=3600)
+        manager = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert manager.create_index()
+
+        vectors = _random_vectors(15)
+        saves = 0
+        for i in range(15):
+            manager.add_vectors(vectors[i:i + 1], [f"mem_{i}"])
+            if manager.maybe_checkpoint():
+                saves += 1
+        print(f"15次写入触发完整保存 {saves} 次")
+        assert saves == 1
+        assert manager._pending_ops == 5
+
+        # 模拟写入中断：日志末尾留下半条记录
+        manager.delta_log.close()
+        with open(index_path + ".delta", "ab") as f:
+            f.write(b"A\x00\x01")
+
+        reloaded = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert reloaded.load_index()
+        assert reloaded.index.ntotal == 15
+        assert reloaded.is_dirty
+        reloaded.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_interrupted_checkpoint():
+    """测试检查点在替换索引和.meta之间中断：用.meta.tmp补全，过时的增量日志不再重放"""
+    print("\n===== 测试检查点中断恢复 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_index_")
+    index_path = os.path.join(temp_dir, "memory_index.bin")
+    try:
+        policy = CheckpointPolicy(max_pending_ops=1000, max_interval=3600)
+        manager = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert manager.create_index()
+        vectors = _random_vectors(15)
+        assert manager.add_vectors(vectors[:10], [f"mem_{i}" for i in range(10)])
+        assert manager.save_index()
+        old_meta = _read(index_path + ".meta")
+
+        # 检查点之后的5条只在增量日志中
+        assert manager.add_vectors(vectors[10:], [f"mem_{i}" for i in range(10, 15)])
+        manager.delta_log.close()
+        old_delta = _read(index_path + ".delta")
+        assert manager.save_index()
+        manager.delta_log.close()
+
+        # 还原为新索引 + 旧.meta + .meta.tmp + 旧日志（两次替换之间中断时的文件）
+        os.replace(index_path + ".meta", index_path + ".meta.tmp")
+        _write(index_path + ".meta", old_meta)
+        _write(index_path + ".delta", old_delta)
+
+        reloaded = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert reloaded.load_index()
+        print(f"恢复后: {reloaded.index.ntotal} 个向量, next_id: {reloaded.next_id}")
+        assert reloaded.index.ntotal == 15 and reloaded.next_id == 15
+        assert len(reloaded.id_map) == 15 and not reloaded.is_dirty
+        assert not os.path.exists(index_path + ".meta.tmp")
+        assert not os.path.exists(index_path + ".delta")
+        found, _ = reloaded.search(vectors[12], k=1)
+        assert found == ["mem_12"]
+        reloaded.delta_log.close()
+
+        # 没有可以补全的.meta时拒绝加载不匹配的一对文件
+        _write(index_path + ".meta", old_meta)
+        rejected = VectorIndexManager(index_path, vector_dim=VECTOR_DIM, checkpoint_policy=policy)
+        assert not rejected.load_index()
+        rejected.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_delta_log_replay()
+    test_checkpoint_policy()
+    test_interrupted_checkpoint()
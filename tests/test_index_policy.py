@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试向量索引自动升级（Flat -> IVF-PQ / HNSW）和检索参数
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.index_policy import IndexPolicy, IndexPromoter
+
+VECTOR_DIM = 32
+
+
+def _make_manager(temp_dir, n, seed=0):
+    manager = VectorIndexManager(os.path.join(temp_dir, "memory_index.bin"), vector_dim=VECTOR_DIM)
+    manager.create_index()
+    vectors = np.random.default_rng(seed).random((n, VECTOR_DIM)).astype(np.float32) - 0.5
+    ids = [f"mem_{i}" for i in range(n)]
+    manager.add_vectors(vectors, ids)
+    return manager, vectors, ids
+
+
+def test_promote_to_ivfpq():
+    """测试达到阈值后升级为IVF-PQ，构建期间的写入不会丢失"""
+    print("\n===== 测试升级到IVF-PQ =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_policy_")
+    try:
+        manager, vectors, ids = _make_manager(temp_dir, 2000)
+        late = np.random.default_rng(9).random((3, VECTOR_DIM)).astype(np.float32) - 0.5
+
+        def loader():
+            # 模拟构建期间有新记忆写入、旧记忆被删除
+            manager.add_vectors(late, ["late_0", "late_1", "late_2"])
+            manager.delete_vectors(["mem_5"])
+            for start in range(0, len(ids), 500):
+                yield ids[start:start + 500], vectors[start:start + 500]
+
+        policy = IndexPolicy(promote_threshold=1000, target_type="ivfpq", nprobe=8, pq_m=8)
+        promoter = IndexPromoter(manager, loader, policy)
+        assert policy.target_for(manager.index_type, manager.index.ntotal) == "ivfpq"
+        assert promoter.promote("ivfpq")
+
+        print(f"索引信息: {manager.get_index_info()}")
+        assert manager.index_type == "ivfpq"
+        assert manager.index.ntotal == 2002
+        assert manager.nprobe == 8
+
+        found, _ = manager.search(late[1], k=5)
+        assert "late_1" in found
+        found, _ = manager.search(vectors[5], k=10)
+        assert "mem_5" not in found
+
+        # 重新加载后仍是IVF-PQ
+        manager.delta_log.close()
+        reloaded = VectorIndexManager(manager.index_path, vector_dim=VECTOR_DIM)
+        assert reloaded.load_index()
+        assert reloaded.index_type == "ivfpq"
+        assert reloaded.index.ntotal == 2002
+        reloaded.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_hnsw_tombstones():
+    """测试HNSW索引的墓碑删除和检索参数"""
+    print("\n===== 测试HNSW墓碑删除 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_policy_")
+    try:
+        manager, vectors, ids = _make_manager(temp_dir, 300)
+
+        def loader():
+            yield ids, vectors
+
+        policy = IndexPolicy(promote_threshold=100, target_type="hnsw", ef_search=32, tombstone_ratio=0.1)
+        promoter = IndexPromoter(manager, loader, policy)
+        assert promoter.promote("hnsw")
+        assert manager.index_type == "hnsw"
+
+        assert manager.delete_vectors(["mem_10"])
+        assert 10 in manager.tombstones
+        found, _ = manager.search(vectors[10], k=3)
+        print(f"删除后检索: {found}")
+        assert "mem_10" not in found and len(found) == 3
+
+        # 墓碑超过比例时触发重建
+        manager.delete_vectors([f"mem_{i}" for i in range(20, 60)])
+        assert policy.target_for(manager.index_type, manager.index.ntotal, len(manager.tombstones)) == "hnsw"
+        manager.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_promote_to_ivfpq()
+    test_hnsw_tombstones()
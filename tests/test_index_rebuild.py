@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试可恢复的向量索引重建：复用已存向量、只编码缺失的记忆、中断后继续
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.storage.memory_store import MemoryStore
+from core.memory.storage.index_rebuild import IndexRebuilder
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.vector_codec import decode_vector
+
+
+class FakeVectorizer:
+    """测试用向量化器：按文本生成确定的向量，记录编码的文本数"""
+    model_type = "test"
+    model_name = "fake"
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, texts, memory_weights=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        self.encoded += len(texts)
+        vectors = np.stack([
+            np.random.default_rng(sum(text.encode("utf-8"))).random(self.dim) for text in texts
+        ]).astype(np.float32)
+        return vectors[0] if single else vectors
+
+
+def _make_store(temp_dir):
+    store = MemoryStore(
+        db_path=os.path.join(temp_dir, "memory.db"),
+        index_path=os.path.join(temp_dir, "vectors", "rebuild_index.bin"),
+        cache_dir=os.path.join(temp_dir, "cache"),
+        vector_dim=16,
+        async_ingestion=False
+    )
+    store.vectorizer = FakeVectorizer(dim=16)
+    return store
+
+
+def _seed(store, count=20):
+    """写入记忆，然后删掉一部分向量、把一部分改成其他模型的向量"""
+    ids = [
+        store.add_interaction_memory(f"第{i}轮对话", "user_input", "user",
+                                     "sess_rebuild", time.time(), 5.0)
+        for i in range(count)
+    ]
+    assert all(ids)
+    store.db_manager.execute_query(
+        f"DELETE FROM memory_vectors WHERE memory_id IN ({','.join('?' * 6)})", tuple(ids[:6]))
+    store.db_manager.execute_query(
+        f"UPDATE memory_vectors SET model_name = 'old/model' WHERE memory_id IN ({','.join('?' * 4)})",
+        tuple(ids[6:10]))
+    store.vectorizer.encoded = 0
+    return ids
+
+
+def _leftover_files(rebuilder):
+    return [path for path in (rebuilder.temp_path, rebuilder.temp_path + ".delta", rebuilder.state_path)
+            if os.path.exists(path)]
+
+
+def test_rebuild_reuses_stored_vectors():
+    """测试同模型的已存向量直接复用，缺失和模型不一致的重新编码并写回"""
+    print("\n===== 测试索引重建复用向量 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_rebuild_")
+    try:
+        store = _make_store(temp_dir)
+        ids = _seed(store)
+
+        rebuilder = IndexRebuilder(store, chunk_size=7, encode_batch_size=4)
+        stats = rebuilder.rebuild()
+        print(f"复用: {stats['reused']}, 编码: {stats['encoded']}, 速度: {stats['vectors_per_sec']:.1f} 向量/秒")
+        assert stats["processed"] == 20 and stats["indexed"] == 20
+        assert stats["reused"] == 10 and stats["encoded"] == 10 and stats["skipped"] == 0
+        assert store.vectorizer.encoded == 10
+        assert stats["vectors_per_sec"] > 0
+
+        # 新编码的向量写回memory_vectors，并使用当前模型名
+        rows = store.db_manager.query(
+            "SELECT COUNT(*) FROM memory_vectors WHERE model_name = 'test/fake'")
+        assert rows[0][0] == 20
+
+        # 替换后的索引可以直接检索
+        assert store.vector_index.index.ntotal == 20
+        rows = store.db_manager.query(
+            "SELECT vector, vector_format FROM memory_vectors WHERE memory_id = ?", (ids[0],))
+        found, _ = store.vector_index.search(decode_vector(rows[0][0], rows[0][1]), k=1)
+        assert found == [ids[0]]
+        assert _leftover_files(rebuilder) == []
+
+        # 再次重建全部复用
+        stats = IndexRebuilder(store, chunk_size=7).rebuild()
+        assert stats["reused"] == 20 and stats["encoded"] == 0
+        assert store.vector_index.index.ntotal == 20
+
+        store.close()
+        print("✅ 索引重建复用向量测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_rebuild_resume():
+    """测试中断后从上次的进度继续，不重复编码也不重复添加"""
+    print("\n===== 测试索引重建中断继续 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_rebuild_")
+    try:
+        store = _make_store(temp_dir)
+        _seed(store)
+        original_total = store.vector_index.index.ntotal
+
+        def interrupt(stats):
+            if stats["processed"] >= 10:
+                raise KeyboardInterrupt()
+
+        rebuilder = IndexRebuilder(store, chunk_size=5)
+        try:
+            rebuilder.rebuild(progress_callback=interrupt)
+            assert False, "应该被中断"
+        except KeyboardInterrupt:
+            pass
+
+        # 中断时当前索引保持不变，进度已保存
+        assert store.vector_index.index.ntotal == original_total
+        assert os.path.exists(rebuilder.state_path)
+        encoded_before = store.vectorizer.encoded
+        print(f"中断前已编码: {encoded_before}")
+        assert encoded_before == 10
+
+        progress = []
+        stats = IndexRebuilder(store, chunk_size=5).rebuild(progress_callback=progress.append)
+        print(f"继续后: 处理 {stats['processed']}, 索引 {stats['indexed']}, 回调 {len(progress)} 次")
+        assert len(progress) == 2
+        assert stats["processed"] == 20 and stats["indexed"] == 20
+        assert stats["reused"] == 10 and stats["encoded"] == 10
+        assert store.vectorizer.encoded == encoded_before
+        assert store.vector_index.index.ntotal == 20
+        assert len(set(store.vector_index.reverse_map)) == 20
+        assert _leftover_files(rebuilder) == []
+
+        store.close()
+        print("✅ 索引重建中断继续测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_install_interrupted():
+    """测试替换索引和.meta之间中断后，重新加载得到完整的新索引，旧索引的增量日志被丢弃"""
+    print("\n===== 测试索引替换中断 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_rebuild_")
+    try:
+        store = _make_store(temp_dir)
+        _seed(store)
+        index_path = store.vector_index.index_path
+        store.vector_index.delta_log.close()
+        with open(index_path + ".delta", "rb") as f:
+            old_delta = f.read()
+
+        IndexRebuilder(store, chunk_size=7).rebuild()
+        store.close()
+
+        # 新索引已替换、.meta还在.meta.tmp、旧日志尚未清空
+        os.replace(index_path + ".meta", index_path + ".meta.tmp")
+        with open(index_path + ".delta", "wb") as f:
+            f.write(old_delta)
+
+        reloaded = VectorIndexManager(index_path=index_path, vector_dim=16)
+        assert reloaded.load_index()
+        print(f"恢复后: {reloaded.index.ntotal} 个向量")
+        assert reloaded.index.ntotal == 20 and len(reloaded.reverse_map) == 20
+        assert not reloaded.is_dirty
+        assert not os.path.exists(index_path + ".meta.tmp")
+        assert not os.path.exists(index_path + ".delta")
+        reloaded.delta_log.close()
+        print("✅ 索引替换中断测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_rebuild_reuses_stored_vectors()
+    test_rebuild_resume()
+    test_install_interrupted()
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试FTS5全文检索：中文切片、触发器同步、bm25排序和短词回退
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.db_manager import FTS_TABLE
+from core.memory.retrieval.lexical_search import LexicalSearch, extract_terms
+from core.memory.retrieval.smart_retriever import SmartRetriever
+
+MEMORIES = [
+    ("m1", "我最近在学习Python编程，感觉有点难"),
+    ("m2", "今天天气很好，适合出去散步"),
+    ("m3", "周末想去看一场电影"),
+    ("m4", "Python编程的装饰器我还是没搞懂，学习Python真不容易"),
+    ("m5", "晚饭吃了火锅"),
+]
+
+
+def _seed(db_manager):
+    now = time.time()
+    db_manager.bulk_insert("memories", [
+        (memory_id, content, "user_input", "user", "s1", now, 5.0, None, None, now, "{}")
+        for memory_id, content in MEMORIES
+    ])
+
+
+def test_extract_terms():
+    """测试中文按三字切片，短词单独返回"""
+    print("\n===== 测试查询切片 =====")
+    terms, short_terms = extract_terms("学习Python编程 天气")
+    print(f"片段: {terms}, 短片段: {short_terms}")
+    assert terms == ["python"]
+    assert short_terms == ["学习", "编程", "天气"]
+
+    terms, short_terms = extract_terms("我想学习编程")
+    assert terms == ["我想学", "想学习", "学习编", "习编程"]
+    assert short_terms == []
+    print("✅ 查询切片测试通过")
+
+
+def test_fts_search_and_sync(db_manager):
+    """测试索引检索的排序和触发器同步"""
+    print("\n===== 测试全文检索 =====")
+    _seed(db_manager)
+    search = LexicalSearch(db_manager)
+    assert search.available
+
+    # 走全文索引而不是扫描memories
+    plan = db_manager.query(
+        f"EXPLAIN QUERY PLAN SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?", ('"python"',)
+    )
+    assert any("VIRTUAL TABLE INDEX" in row[3] for row in plan)
+
+    results = search.search("学习Python编程")
+    ids = [result["id"] for result in results]
+    print(f"检索结果: {ids}")
+    assert set(ids) == {"m1", "m4"}
+    assert ids[0] == "m4"  # 命中次数更多
+    assert results[0]["relevance"] == 1.0
+
+    # 更新和删除通过触发器同步到索引
+    db_manager.execute_query("UPDATE memories SET content = ? WHERE id = ?", ("明天要去看电影", "m5"))
+    assert "m5" in [r["id"] for r in search.search("看电影")]
+    assert search.search("吃了火锅") == []
+    db_manager.execute_query("DELETE FROM memories WHERE id = ?", ("m4",))
+    assert [r["id"] for r in search.search("学习Python编程")] == ["m1"]
+
+    # 两个字的中文查询走LIKE回退
+    assert [r["id"] for r in search.search("天气")] == ["m2"]
+
+    assert search.rebuild()
+    assert [r["id"] for r in search.search("学习Python编程")] == ["m1"]
+    print("✅ 全文检索测试通过")
+
+
+def test_smart_retriever_keyword_search(db_manager):
+    """测试SmartRetriever关键词搜索使用全文索引"""
+    print("\n===== 测试关键词搜索 =====")
+    _seed(db_manager)
+    retriever = SmartRetriever(db_manager)
+    memories = retriever.keyword_search("你还记得周末想去看电影吗")
+    print(f"关键词搜索: {[(m['id'], round(m['similarity'], 2)) for m in memories]}")
+    assert memories[0]["id"] == "m3"
+    assert 0.5 <= memories[0]["similarity"] <= 0.7
+    print("✅ 关键词搜索测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_extract_terms,
+        test_fts_search_and_sync,
+        test_smart_retriever_keyword_search
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试冷记忆归档：按策略移动到月分区和冷索引，热层结果不足时查询归档
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import shutil
+import tempfile
+from contextlib import closing
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.storage.memory_store import MemoryStore
+from core.memory.storage.archive import ArchivePolicy, MemoryArchive, ARCHIVE_FTS_TABLE
+from core.memory.retrieval.lexical_search import LexicalSearch
+from core.memory.retrieval.hybrid_search import HybridRetriever
+from core.memory.init.vector_codec import decode_vector
+from core.memory.maintenance import MaintenanceScheduler, ArchiveMaintenanceJob
+
+DAY = 86400
+
+
+class FakeVectorizer:
+    """测试用向量化器：按文本生成确定的向量"""
+    model_type = "test"
+    model_name = "fake"
+
+    def __init__(self, dim=16):
+        self.dim = dim
+
+    def encode(self, texts, memory_weights=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = np.stack([
+            np.random.default_rng(sum(text.encode("utf-8"))).random(self.dim) for text in texts
+        ]).astype(np.float32)
+        return vectors[0] if single else vectors
+
+    def encode_text(self, text, memory_weight=1.0, **kwargs):
+        return self.encode(text)
+
+
+def _make_store(temp_dir):
+    store = MemoryStore(
+        db_path=os.path.join(temp_dir, "memory.db"),
+        index_path=os.path.join(temp_dir, "vectors", "archive_index.bin"),
+        cache_dir=os.path.join(temp_dir, "cache"),
+        vector_dim=16,
+        async_ingestion=False
+    )
+    store.vectorizer = FakeVectorizer(dim=16)
+    return store
+
+
+def _seed(store, now):
+    """旧的低权重记忆、旧的高权重记忆、近期的低权重记忆和旧摘要"""
+    old_low = [store.add_interaction_memory(f"很久以前聊过的猫咪话题{i}", "user_input", "user",
+                                            "sess_old", now - (200 + i * 40) * DAY, 2.0)
+               for i in range(4)]
+    old_high = store.add_interaction_memory("很久以前的重要约定", "user_input", "user",
+                                            "sess_old", now - 200 * DAY, 9.0)
+    recent_low = store.add_interaction_memory("昨天的闲聊", "user_input", "user",
+                                              "sess_new", now - DAY, 2.0)
+    summary = store.add_interaction_memory("旧会话的摘要", "summary", "system",
+                                           "sess_old", now - 200 * DAY, 2.0)
+    return old_low, [old_high, recent_low, summary]
+
+
+def test_archive_moves_cold_memories():
+    """测试满足策略的记忆移到分区库和冷索引，其余留在热层"""
+    print("\n===== 测试记忆归档 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_archive_")
+    try:
+        store = _make_store(temp_dir)
+        now = time.time()
+        old_low, kept = _seed(store, now)
+        vectors = {
+            row[0]: decode_vector(row[1], row[2])
+            for row in store.db_manager.query("SELECT memory_id, vector, vector_format FROM memory_vectors")
+        }
+        assert store.vector_index.index.ntotal == 7
+
+        stats = store.archive_memories(ArchivePolicy(max_weight=3.0, min_age_days=90, batch_size=3))
+        print(f"归档: {stats}")
+        assert stats["archived"] == 4 and stats["vectors"] == 4
+        assert len(stats["partitions"]) == 4
+
+        hot_ids = {row[0] for row in store.db_manager.query("SELECT id FROM memories")}
+        assert hot_ids == set(kept)
+        assert store.db_manager.query("SELECT COUNT(*) FROM memory_vectors")[0][0] == 3
+        assert store.vector_index.index.ntotal == 3
+        archive_stats = store.archive.get_stats()
+        assert archive_stats == {"partitions": 4, "memories": 4, "cold_vectors": 4}
+
+        # 再次归档没有新的候选
+        assert store.archive_memories(ArchivePolicy(max_weight=3.0, min_age_days=90))["archived"] == 0
+
+        # 按ID读取时透明地从归档补齐
+        memories = store.get_memories_by_ids([kept[0], old_low[2]])
+        assert [memory["memory_id"] for memory in memories] == [kept[0], old_low[2]]
+        assert memories[1]["content"] == "很久以前聊过的猫咪话题2"
+        assert memories[1]["tier"] == "cold" and memories[1]["session_id"] == "sess_old"
+
+        # 热层结果不足时向量检索补上冷记忆
+        results = store.search_similar("很久以前聊过的猫咪话题1", limit=5)
+        print(f"相似检索: {[(r['memory_id'], r.get('tier', 'hot')) for r in results]}")
+        assert len(results) == 5
+        assert [r["memory_id"] for r in results if r.get("tier") == "cold"][0] == old_low[1]
+
+        found = store.archive.search_vectors(vectors[old_low[3]], k=1)
+        assert found[0]["memory_id"] == old_low[3] and found[0]["similarity"] > 0.99
+
+        # 关闭后重新打开，冷索引从磁盘加载
+        store.close()
+        store = _make_store(temp_dir)
+        assert store.archive.get_stats()["cold_vectors"] == 4
+        store.close()
+        print("✅ 记忆归档测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_hybrid_archive_fallback():
+    """测试混合检索只在热层候选不足时查询归档"""
+    print("\n===== 测试混合检索归档回退 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_archive_")
+    try:
+        store = _make_store(temp_dir)
+        now = time.time()
+        old_low, _ = _seed(store, now)
+        store.archive_memories(ArchivePolicy(max_weight=3.0, min_age_days=90))
+
+        keywords = store.archive.search_keywords("猫咪话题", limit=10)
+        assert {memory["memory_id"] for memory in keywords} == set(old_low)
+        assert all(memory["relevance"] > 0 for memory in keywords)
+
+        retriever = HybridRetriever(LexicalSearch(store.db_manager), None, archive=store.archive,
+                                    min_hot_results=2)
+        candidates = retriever.search("猫咪话题")
+        print(f"归档候选: {[(c['memory_id'], c.get('tier', 'hot')) for c in candidates]}")
+        cold = [c for c in candidates if c.get("tier") == "cold"]
+        assert {c["memory_id"] for c in cold} == set(old_low)
+        assert cold[0]["memory"]["content"].startswith("很久以前聊过的猫咪话题")
+
+        # 热层候选足够时不查询归档
+        retriever.min_hot_results = 1
+        candidates = retriever.search("重要约定")
+        assert candidates and all(c.get("tier") != "cold" for c in candidates)
+
+        retriever.shutdown()
+        store.close()
+        print("✅ 混合检索归档回退测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_archive_keyword_index():
+    """测试分区全文索引：检索走索引、短片段匹配明文、旧分区回填、重新归档不重复"""
+    print("\n===== 测试归档全文索引 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_archive_")
+    try:
+        store = _make_store(temp_dir)
+        now = time.time()
+        old_low, _ = _seed(store, now)
+        store.archive_memories(ArchivePolicy(max_weight=3.0, min_age_days=90))
+        archive = store.archive
+
+        key = archive.list_partitions()[0]
+        with closing(archive._connect(key)) as conn:
+            assert conn.execute(f"SELECT COUNT(*) FROM {ARCHIVE_FTS_TABLE}").fetchone()[0] == 1
+            plan = [row[3] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT rowid FROM {ARCHIVE_FTS_TABLE} WHERE {ARCHIVE_FTS_TABLE} MATCH ?",
+                ('"猫咪话"',))]
+        print(f"执行计划: {plan}")
+        assert any("VIRTUAL TABLE INDEX" in detail for detail in plan)
+
+        # 短片段（不足三字）对明文匹配
+        short = archive.search_keywords("猫咪", limit=10)
+        assert {memory["memory_id"] for memory in short} == set(old_low)
+
+        # 重新归档同一条记忆：索引项被替换而不是重复
+        rows = [(old_low[0], "很久以前聊过的狗狗话题", "user_input", "user", "sess_old", now - 200 * DAY,
+                 2.0, None, None, now - 200 * DAY, "{}", None, None, None)]
+        archive._write_partitions(rows)
+        assert archive.search_keywords("狗狗话题")[0]["memory_id"] == old_low[0]
+        assert old_low[0] not in {memory["memory_id"] for memory in archive.search_keywords("猫咪话题")}
+
+        # 没有全文索引的旧分区在首次打开时回填
+        for key in archive.list_partitions():
+            with closing(sqlite3.connect(archive._partition_path(key))) as conn:
+                conn.execute(f"DROP TABLE {ARCHIVE_FTS_TABLE}")
+        legacy = MemoryArchive(archive.archive_dir, vector_dim=16)
+        found = legacy.search_keywords("猫咪话题", limit=10)
+        assert {memory["memory_id"] for memory in found} == set(old_low[1:])
+        store.close()
+        print("✅ 归档全文索引测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_archive_resumes():
+    """测试逐批归档中止后，下次归档从剩余的记忆继续"""
+    print("\n===== 测试分批归档 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_archive_")
+    try:
+        store = _make_store(temp_dir)
+        now = time.time()
+        old_low, kept = _seed(store, now)
+        policy = ArchivePolicy(max_weight=3.0, min_age_days=90, batch_size=1)
+
+        # 只执行第一批就停止：已移动的记忆保持一致
+        batches = store.archive.iter_archive(store.db_manager, store.vector_index, policy)
+        first = next(batches)
+        batches.close()
+        assert first["archived"] == 1
+        assert store.db_manager.query("SELECT COUNT(*) FROM memories")[0][0] == len(kept) + 3
+
+        stats = store.archive.archive(store.db_manager, store.vector_index, policy)
+        print(f"继续归档: {stats}")
+        assert stats["archived"] == 3
+        assert {row[0] for row in store.db_manager.query("SELECT id FROM memories")} == set(kept)
+        assert store.archive.get_stats()["memories"] == len(old_low)
+        store.close()
+        print("✅ 分批归档测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_archive_maintenance_job():
+    """测试归档作为后台维护任务分批执行，中止后下次运行继续"""
+    print("\n===== 测试归档维护任务 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_archive_")
+    try:
+        store = _make_store(temp_dir)
+        now = time.time()
+        old_low, kept = _seed(store, now)
+        job = ArchiveMaintenanceJob(store, ArchivePolicy(max_weight=3.0, min_age_days=90, batch_size=1))
+
+        # 只执行第一批就停止：已移动的记忆保持一致
+        steps = job.run()
+        first = dict(next(steps))
+        steps.close()
+        assert first["archived"] == 1
+        assert store.db_manager.query("SELECT COUNT(*) FROM memories")[0][0] == len(kept) + 3
+
+        scheduler = MaintenanceScheduler()
+        scheduler.register(job)
+        progress = scheduler.run_now("memory_archive")
+        stats = scheduler.get_stats()["memory_archive"]
+        print(f"进度: {progress}, 分块: {stats['chunks']}")
+        assert progress["phase"] == "done" and progress["archived"] == 3
+        assert stats["chunks"] >= 3 and stats["last_error"] is None
+        assert {row[0] for row in store.db_manager.query("SELECT id FROM memories")} == set(kept)
+        assert store.archive.get_stats()["memories"] == len(old_low)
+        store.close()
+        print("✅ 归档维护任务测试通过")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_archived_weight_zero():
+    """测试权重为0的归档记忆读回时仍为0，缺失权重才使用默认值"""
+    payload = zlib.compress(json.dumps({"content": "权重为零", "summary": None, "metadata": None}).encode("utf-8"))
+    row = ("m0", "user_input", "user", "s1", 1.0, 0.0, None, 1.0, payload)
+    assert MemoryArchive._row_to_memory(row)["weight"] == 0.0
+    assert MemoryArchive._row_to_memory(row[:5] + (None,) + row[6:])["weight"] == 5.0
+
+
+if __name__ == "__main__":
+    test_archive_moves_cold_memories()
+    test_hybrid_archive_fallback()
+    test_archive_keyword_index()
+    test_archive_resumes()
+    test_archive_maintenance_job()
+    test_archived_weight_zero()
+    print("\n🎉 所有测试通过")
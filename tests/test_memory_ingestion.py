@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试交互记忆的写后批量入库队列
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.storage.ingestion import IngestionQueue, IngestionItem
+from core.memory.init.vector_codec import decode_vector
+
+
+class FakeVectorizer:
+    """测试用向量化器：记录每次调用的批大小"""
+    model_type = "test"
+    model_name = "fake"
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.batch_sizes = []
+
+    def encode(self, texts, memory_weights=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        self.batch_sizes.append(len(texts))
+        rng = np.random.default_rng(len(texts))
+        vectors = rng.random((len(texts), self.dim)).astype(np.float32)
+        return vectors[0] if single else vectors
+
+    def encode_text(self, text, memory_weight=1.0, **kwargs):
+        return self.encode(text)
+
+
+def _make_item(i):
+    return IngestionItem(
+        memory_id=f"mem_test_{i}",
+        content=f"测试记忆 {i}",
+        memory_type="user_input",
+        role="user",
+        session_id="sess_test",
+        timestamp=time.time(),
+        weight=5.0,
+        metadata_json="{}"
+    )
+
+
+def test_ingestion_queue_batching():
+    """测试队列聚合批次、flush语义和统计"""
+    print("\n===== 测试写入队列批处理 =====")
+    batches = []
+    lock = threading.Lock()
+
+    def writer(items):
+        with lock:
+            batches.append(len(items))
+        time.sleep(0.01)
+        return True
+
+    ingestion = IngestionQueue(writer, max_queue_size=64, max_batch_size=8, max_wait=0.05)
+    ingestion.start()
+
+    for i in range(20):
+        assert ingestion.submit(_make_item(i))
+
+    assert ingestion.flush(timeout=5)
+    stats = ingestion.get_stats()
+    print(f"批次: {batches}, 统计: {stats}")
+
+    assert sum(batches) == 20
+    assert max(batches) <= 8
+    assert len(batches) < 20  # 确实发生了合批
+    assert stats["written"] == 20 and stats["pending"] == 0
+
+    assert ingestion.shutdown(drain=True)
+    assert not ingestion.submit(_make_item(99))  # 停止后拒绝入队
+
+
+def test_ingestion_backpressure():
+    """测试队列满时拒绝入队并计数"""
+    print("\n===== 测试写入队列背压 =====")
+    release = threading.Event()
+
+    def slow_writer(items):
+        release.wait(timeout=5)
+        return True
+
+    ingestion = IngestionQueue(slow_writer, max_queue_size=2, max_batch_size=1,
+                               max_wait=0.0, enqueue_timeout=0.05)
+    ingestion.start()
+
+    results = [ingestion.submit(_make_item(i)) for i in range(6)]
+    stats = ingestion.get_stats()
+    print(f"入队结果: {results}, 拒绝次数: {stats['rejected']}")
+    assert not all(results)
+    assert stats["rejected"] >= 1
+
+    release.set()
+    assert ingestion.shutdown(drain=True, timeout=5)
+
+
+def test_ingestion_failure_fallback():
+    """测试整批失败时重试、再逐条写入，只丢弃单独也写不进去的记忆"""
+    print("\n===== 测试写入失败回退 =====")
+    calls = []
+    written = []
+
+    def flaky_writer(items):
+        calls.append(len(items))
+        # 含有坏记忆的批次整体失败，单独写入时只有坏记忆失败
+        if any(item.memory_id == "mem_test_3" for item in items):
+            return False
+        written.extend(item.memory_id for item in items)
+        return True
+
+    ingestion = IngestionQueue(flaky_writer, max_batch_size=8, max_wait=0.05, retry_delay=0.0)
+    ingestion.start()
+    for i in range(6):
+        assert ingestion.submit(_make_item(i))
+    assert ingestion.flush(timeout=5)
+    stats = ingestion.get_stats()
+    print(f"调用: {calls}, 统计: {stats}")
+
+    assert sorted(written) == [f"mem_test_{i}" for i in range(6) if i != 3]
+    assert stats["written"] == 5 and stats["failed"] == 1
+    assert stats["retries"] >= 1 and stats["fallback_items"] >= 2
+    assert ingestion.shutdown(drain=True)
+
+
+def test_memory_store_write_behind():
+    """测试MemoryStore立即返回ID，并在关闭时排空队列"""
+    print("\n===== 测试MemoryStore写后入库 =====")
+    from core.memory.storage.memory_store import MemoryStore
+
+    temp_dir = tempfile.mkdtemp(prefix="estia_ingestion_")
+    try:
+        store = MemoryStore(
+            db_path=os.path.join(temp_dir, "memory.db"),
+            index_path=os.path.join(temp_dir, "vectors", "memory_index.bin"),
+            cache_dir=os.path.join(temp_dir, "cache"),
+            vector_dim=16
+        )
+        store.vectorizer = FakeVectorizer(dim=16)
+
+        ids = [
+            store.add_interaction_memory(f"第{i}轮对话", "user_input", "user",
+                                         "sess_test", time.time(), 5.0)
+            for i in range(10)
+        ]
+        assert all(ids)
+
+        assert store.flush_pending(timeout=5)
+        rows = store.db_manager.query("SELECT COUNT(*) FROM memories")
+        vec_rows = store.db_manager.query("SELECT COUNT(*) FROM memory_vectors")
+        print(f"记忆: {rows[0][0]}, 向量: {vec_rows[0][0]}, 批次: {store.vectorizer.batch_sizes}")
+        assert rows[0][0] == 10
+        assert vec_rows[0][0] == 10
+        assert store.vector_index.index.ntotal == 10
+
+        stats = store.get_ingestion_stats()
+        assert stats["enabled"] and stats["written"] == 10
+
+        store.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+
+def test_precomputed_vector_reuse():
+    """测试带有预先计算向量的记忆不再重复编码"""
+    print("\n===== 测试查询向量复用 =====")
+    from core.memory.storage.memory_store import MemoryStore
+
+    temp_dir = tempfile.mkdtemp(prefix="estia_ingestion_")
+    try:
+        store = MemoryStore(
+            db_path=os.path.join(temp_dir, "memory.db"),
+            index_path=os.path.join(temp_dir, "vectors", "memory_index.bin"),
+            cache_dir=os.path.join(temp_dir, "cache"),
+            vector_dim=16,
+            async_ingestion=False
+        )
+        store.vectorizer = FakeVectorizer(dim=16)
+
+        query_vector = np.full(16, 0.25, dtype=np.float32)
+        user_id = store.add_interaction_memory("用户的问题", "user_input", "user",
+                                               "sess_test", time.time(), 5.0, vector=query_vector)
+        assert user_id
+        assert store.vectorizer.batch_sizes == []  # 没有调用模型
+
+        reply_id = store.add_interaction_memory("助手的回答", "assistant_reply", "assistant",
+                                                "sess_test", time.time(), 5.0)
+        assert reply_id and store.vectorizer.batch_sizes == [1]
+
+        rows = store.db_manager.query(
+            "SELECT vector, vector_format FROM memory_vectors WHERE memory_id = ?", (user_id,))
+        assert rows[0][1] == store.vector_format
+        assert np.array_equal(decode_vector(rows[0][0], rows[0][1]), query_vector)
+        found, _ = store.vector_index.search(query_vector, k=1)
+        assert found == [user_id]
+        store.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_commit_listener():
+    """测试提交回调在记忆和向量入库之后、以批次向量调用"""
+    print("\n===== 测试写入提交回调 =====")
+    from core.memory.storage.memory_store import MemoryStore
+
+    temp_dir = tempfile.mkdtemp(prefix="estia_ingestion_")
+    try:
+        store = MemoryStore(
+            db_path=os.path.join(temp_dir, "memory.db"),
+            index_path=os.path.join(temp_dir, "vectors", "memory_index.bin"),
+            cache_dir=os.path.join(temp_dir, "cache"),
+            vector_dim=16
+        )
+        store.vectorizer = FakeVectorizer(dim=16)
+
+        seen = []
+
+        def listener(items, vectors):
+            # 回调时记忆已经提交，其他连接可以读到
+            ids = [item.memory_id for item in items]
+            placeholders = ",".join("?" * len(ids))
+            rows = store.db_manager.query(
+                f"SELECT COUNT(*) FROM memories WHERE id IN ({placeholders})", tuple(ids))
+            seen.append((ids, rows[0][0], vectors.shape))
+
+        store.add_commit_listener(listener)
+        ids = [
+            store.add_interaction_memory(f"第{i}轮对话", "user_input", "user",
+                                         "sess_test", time.time(), 5.0)
+            for i in range(5)
+        ]
+        assert store.flush_pending(timeout=5)
+        print(f"回调: {seen}")
+
+        assert sorted(i for batch, _, _ in seen for i in batch) == sorted(ids)
+        assert all(count == len(batch) for batch, count, _ in seen)
+        assert all(shape == (len(batch), 16) for batch, _, shape in seen)
+        store.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_ingestion_queue_batching()
+    test_ingestion_backpressure()
+    test_ingestion_failure_fallback()
+    test_memory_store_write_behind()
+    test_precomputed_vector_reuse()
+    test_commit_listener()
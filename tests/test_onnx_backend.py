@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试ONNX后端的池化逻辑（与sentence-transformers的Pooling/Normalize一致）
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.embedding.onnx_backend import pool_embeddings, default_onnx_dir
+
+
+def test_pooling_modes():
+    """测试lasttoken（左右填充）、mean、cls三种池化"""
+    print("\n===== 测试ONNX池化 =====")
+    hidden = np.arange(2 * 4 * 3, dtype=np.float32).reshape(2, 4, 3)
+    right_padded = np.array([[1, 1, 1, 0], [1, 1, 0, 0]])
+    left_padded = np.array([[0, 1, 1, 1], [0, 0, 1, 1]])
+
+    last = pool_embeddings(hidden, right_padded, "lasttoken", normalize=False)
+    assert np.array_equal(last, hidden[[0, 1], [2, 1]])
+    last = pool_embeddings(hidden, left_padded, "lasttoken", normalize=False)
+    assert np.array_equal(last, hidden[[0, 1], [3, 3]])
+
+    mean = pool_embeddings(hidden, right_padded, "mean", normalize=False)
+    assert np.allclose(mean[1], hidden[1, :2].mean(axis=0))
+
+    cls = pool_embeddings(hidden, right_padded, "cls", normalize=True)
+    assert np.allclose(np.linalg.norm(cls, axis=1), 1.0)
+    print(f"mean池化: {mean.tolist()}")
+
+    try:
+        pool_embeddings(hidden, right_padded, "max")
+        assert False, "应当拒绝不支持的池化方式"
+    except ValueError:
+        pass
+
+
+def test_default_onnx_dir():
+    """测试默认导出目录"""
+    path = default_onnx_dir("cache", "Qwen/Qwen3-Embedding-0.6B")
+    assert path == os.path.join("cache", "onnx", "Qwen__Qwen3-Embedding-0.6B")
+
+
+if __name__ == "__main__":
+    test_pooling_modes()
+    test_default_onnx_dir()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试Schema迁移和热点查询的执行计划：每条注册的命名语句都不能全表扫描
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.db_manager import DatabaseManager
+from core.memory.init.query_registry import QUERIES
+from core.memory.init import migrations
+
+# 热点语句期望使用的索引
+EXPECTED_INDEXES = {
+    "history.session_windows": "idx_memories_session_time",
+    "history.session_summaries": "idx_memories_type_session",
+    "retriever.important_excluding": "idx_memories_weight_time",
+    "retriever.recent_excluding": "idx_memories_timestamp",
+    "association.pairs_from": "idx_memory_association_",
+    "association.pairs_to": "idx_memory_association_",
+    "association.touch_source": "idx_memory_association_pair",
+    "association.touch_target": "idx_memory_association_reverse",
+    "maintenance.stale_associations": "idx_memory_association_activated",
+    "maintenance.weak_associations": "idx_memory_association_strength",
+    "cache.update_entry": "idx_memory_cache_memory",
+    "evaluator.ungrouped_session_memories": "idx_memories_session_time",
+    "evaluator.group_statistics": "COVERING INDEX idx_memories_group_role",
+}
+
+# 不带索引的全表扫描
+FULL_SCAN = re.compile(r"^SCAN (memories|memory_\w+|m|ma)$")
+
+
+def _query_plan(db_manager, name):
+    """用占位参数渲染语句并返回EXPLAIN QUERY PLAN的描述列"""
+    sql = QUERIES[name]
+    param_count = sql.replace("{ids}", "").count("?")
+    query, params = db_manager.queries.render(
+        name, ["x"] * param_count, ["a", "b", "c"] if "{ids}" in sql else None
+    )
+    return [row[3] for row in db_manager.conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+def test_hot_query_plans(db_manager):
+    """测试所有命名语句的执行计划"""
+    print("\n===== 测试热点查询执行计划 =====")
+    assert db_manager.get_schema_version() == migrations.LATEST_VERSION
+
+    for name in QUERIES:
+        plan = _query_plan(db_manager, name)
+        print(f"{name}: {plan}")
+        scans = [detail for detail in plan if FULL_SCAN.match(detail)]
+        assert not scans, f"{name} 全表扫描: {scans}"
+        if name in EXPECTED_INDEXES:
+            assert any(EXPECTED_INDEXES[name] in detail for detail in plan), \
+                f"{name} 没有使用 {EXPECTED_INDEXES[name]}"
+
+    print("✅ 热点查询执行计划测试通过")
+
+
+def test_migrations_idempotent(db_manager):
+    """测试迁移只执行一次，被组合索引取代的单列索引已删除"""
+    print("\n===== 测试Schema迁移 =====")
+    db_manager.close()
+
+    # 重新初始化不会重复执行迁移
+    reopened = DatabaseManager(db_manager.db_path)
+    assert reopened.initialize_database()
+    with reopened.pool.writer() as conn:
+        assert migrations.pending_migrations(conn) == []
+        assert migrations.run_migrations(conn) == []
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0] == 1
+    print(f"索引: {sorted(index for index in indexes if not index.startswith('sqlite_'))}")
+
+    assert "idx_memories_session_time" in indexes
+    assert "idx_memory_association_pair" in indexes
+    assert "idx_memories_session" not in indexes
+    assert "idx_memory_association_source" not in indexes
+    reopened.close()
+    print("✅ Schema迁移测试通过")
+
+
+def test_failed_migration_rollback():
+    """测试迁移失败时回滚且版本号不变"""
+    print("\n===== 测试迁移失败回滚 =====")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (a INTEGER)")
+
+    def broken(cursor):
+        cursor.execute("CREATE INDEX idx_t_a ON t(a)")
+        cursor.execute("CREATE INDEX idx_missing ON missing_table(a)")
+
+    steps = [
+        migrations.Migration(1, "ok", lambda cursor: cursor.execute("ALTER TABLE t ADD COLUMN b TEXT")),
+        migrations.Migration(2, "broken", broken),
+    ]
+    try:
+        migrations.run_migrations(conn, steps)
+        assert False, "失败的迁移应该抛出异常"
+    except sqlite3.OperationalError as e:
+        print(f"预期的错误: {e}")
+
+    assert migrations.get_schema_version(conn) == 1
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_t_a'").fetchone()[0] == 0
+    conn.close()
+    print("✅ 迁移失败回滚测试通过")
+
+
+def test_repair_legacy_memories(tmp_path):
+    """测试旧版memories表（INTEGER id、缺列）的修复"""
+    print("\n===== 测试旧版memories表修复 =====")
+    db_path = str(tmp_path / "memory.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE memories (
+            id INTEGER PRIMARY KEY, timestamp REAL, role TEXT, content TEXT, weight REAL
+        )
+    """)
+    conn.execute("INSERT INTO memories VALUES (7, ?, 'user', '旧记忆', 3.0)", (time.time(),))
+    conn.commit()
+    conn.close()
+
+    db_manager = DatabaseManager(db_path)
+    assert db_manager.initialize_database()
+    rows = [tuple(row) for row in
+            db_manager.query("SELECT id, typeof(id), content, type, session_id FROM memories")]
+    print(f"迁移后的记录: {rows}")
+    assert rows == [("7", "text", "旧记忆", "memory", "")]
+    db_manager.close()
+    print("✅ 旧版memories表修复测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_hot_query_plans,
+        test_migrations_idempotent,
+        test_failed_migration_rollback,
+        test_repair_legacy_memories
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试查询注册表：IN列表按档位补齐、命名语句执行和延迟统计
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.query_registry import QueryRegistry, bucket_size
+
+
+def test_in_list_buckets():
+    """测试IN列表长度按档位补齐，相同档位生成相同的SQL"""
+    print("\n===== 测试IN列表档位 =====")
+    assert [bucket_size(n) for n in (1, 2, 3, 5, 9, 512, 513, 1100)] == [1, 2, 4, 8, 16, 512, 1024, 1536]
+
+    registry = QueryRegistry({"by_ids": "SELECT id FROM memories WHERE group_id = ? AND id IN ({ids})"})
+    sql_a, params_a = registry.render("by_ids", ("g1",), ["a", "b", "c"])
+    sql_b, params_b = registry.render("by_ids", ("g2",), ["x", "y", "z", "w"])
+    assert sql_a == sql_b
+    assert sql_a.count("?") == 5
+    assert params_a == ["g1", "a", "b", "c", "c"]
+    assert params_b == ["g2", "x", "y", "z", "w"]
+
+    try:
+        registry.render("by_ids", ("g1",), [])
+        assert False, "空IN列表应该报错"
+    except ValueError:
+        pass
+    print("✅ IN列表档位测试通过")
+
+
+def test_named_query_stats(db_manager):
+    """测试命名语句执行结果正确，并记录调用次数和分位数延迟"""
+    print("\n===== 测试命名语句统计 =====")
+    now = time.time()
+    db_manager.bulk_insert("memories", [
+        (f"m{i}", f"记忆{i}", "user_input", "user", "s1", now + i, 5.0, None, None, now, "{}")
+        for i in range(20)
+    ])
+
+    for size in (1, 3, 5, 7):
+        ids = [f"m{i}" for i in range(size)]
+        rows = db_manager.execute_named("store.memories_by_ids", in_values=ids)
+        # 补齐的重复值不会产生重复行
+        assert sorted(row[0] for row in rows) == sorted(ids)
+
+    rows = db_manager.execute_named("retriever.recent_excluding", in_values=["m19", "m18", "m17"])
+    assert [row[0] for row in rows] == ["m16", "m15", "m14", "m13", "m12"]
+
+    db_manager.execute_named("evaluator.assign_group", ("g1",), in_values=["m1", "m2", "m3"])
+    assert db_manager.execute_named("evaluator.group_statistics", ("g1",))[0][0] == 3
+
+    stats = db_manager.get_query_stats()
+    print(f"语句统计: {stats}")
+    assert stats["store.memories_by_ids"]["calls"] == 4
+    assert stats["store.memories_by_ids"]["errors"] == 0
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        assert stats["store.memories_by_ids"][key] >= 0
+    assert stats["store.memories_by_ids"]["p50_ms"] <= stats["store.memories_by_ids"]["p99_ms"]
+    assert db_manager.queries.slow_queries(threshold_ms=10000) == {}
+    print("✅ 命名语句统计测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_in_list_buckets,
+        test_named_query_stats
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试进程内共享向量索引：写入/检索共用一份索引，以及旧格式索引的转换
+"""
+
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+
+import faiss
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.vector_index import get_shared_vector_index, VectorIndexManager
+from core.memory.retrieval.faiss_search import FAISSSearchEngine
+
+VECTOR_DIM = 32
+
+
+def test_shared_index_visibility():
+    """测试写入后检索立即可见，且两条路径拿到同一个实例"""
+    print("\n===== 测试共享索引 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_shared_")
+    index_path = os.path.join(temp_dir, "memory_index.bin")
+    try:
+        writer = get_shared_vector_index(index_path, vector_dim=VECTOR_DIM)
+        engine = FAISSSearchEngine(index_path=index_path, dimension=VECTOR_DIM)
+        assert engine.vector_index is writer
+
+        vectors = np.random.default_rng(0).random((10, VECTOR_DIM)).astype(np.float32)
+        assert writer.add_vectors(vectors, [f"mem_{i}" for i in range(10)])
+
+        results = engine.search_similar(vectors[3], k=3)
+        print(f"检索结果: {results}")
+        assert results[0]["memory_id"] == "mem_3"
+        assert abs(results[0]["similarity"] - 1.0) < 1e-4
+
+        # 删除后ID不会错位
+        assert writer.delete_vectors(["mem_1", "mem_2"])
+        found, _ = writer.search(vectors[9], k=1)
+        assert found == ["mem_9"]
+        assert engine.vector_count == 8
+        writer.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_legacy_index_upgrade():
+    """测试FAISSSearchEngine旧格式（memory_keys列表 + IndexFlatL2）自动转换"""
+    print("\n===== 测试旧格式索引转换 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_legacy_")
+    index_path = os.path.join(temp_dir, "memory_index.bin")
+    try:
+        vectors = np.random.default_rng(1).random((6, VECTOR_DIM)).astype(np.float32)
+        legacy = faiss.IndexFlatL2(VECTOR_DIM)
+        legacy.add(vectors)
+        faiss.write_index(legacy, index_path)
+        with open(index_path + ".meta", "wb") as f:
+            pickle.dump({"memory_keys": [f"old_{i}" for i in range(6)], "vector_count": 6}, f)
+
+        manager = VectorIndexManager(index_path, vector_dim=VECTOR_DIM)
+        assert manager.load_index()
+        assert type(manager.index).__name__ == "IndexIDMap2"
+        assert manager.index.ntotal == 6
+        assert manager.next_id == 6
+        found, scores = manager.search(vectors[4], k=1)
+        print(f"转换后检索: {found}, {scores}")
+        assert found == ["old_4"]
+
+        # 转换结果已经写回磁盘
+        with open(index_path + ".meta", "rb") as f:
+            assert "id_map" in pickle.load(f)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_shared_index_visibility()
+    test_legacy_index_upgrade()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试关联图上的扩散激活：多路径累加、与种子顺序无关、迭代预算，以及评分器使用激活值
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.association.graph import AssociationGraph
+from core.memory.association.activation import SpreadingActivation
+from core.memory.association.network import AssociationNetwork
+from core.memory.ranking.scorer import MemoryScorer
+
+# multi同时连着两个种子，single只连着s1，两者的直接关联强度相同
+EDGES = [
+    ("s1", "multi", 0.6),
+    ("s2", "multi", 0.6),
+    ("s1", "single", 0.6),
+    ("multi", "far", 0.8),
+    ("single", "far2", 0.8),
+    ("s2", "weak", 0.1),
+]
+
+
+def _seed(db_manager):
+    now = time.time()
+    db_manager.bulk_insert("memory_association", [
+        (f"assoc_{i}", source, target, "is_related_to", strength, now, now)
+        for i, (source, target, strength) in enumerate(EDGES)
+    ])
+
+
+def test_activation_accumulates_paths(db_manager):
+    """测试多条支持路径的记忆得分高于单路径记忆，结果与种子顺序无关"""
+    print("\n===== 测试扩散激活 =====")
+    _seed(db_manager)
+    graph = AssociationGraph()
+    assert graph.load(db_manager)
+    activation = SpreadingActivation(graph)
+
+    results = activation.activate({"s1": 0.8, "s2": 0.8})
+    print(f"激活: {[(memory_id, round(value, 3)) for memory_id, value in results]}")
+    scores = dict(results)
+    assert results[0][0] == "multi" and scores["multi"] == 1.0
+    assert scores["multi"] > scores["single"] > scores["weak"]
+    assert scores["far"] > scores["far2"]
+    assert "s1" not in scores and "s2" not in scores
+
+    # 与种子的顺序无关
+    reversed_results = activation.activate({"s2": 0.8, "s1": 0.8})
+    assert [memory_id for memory_id, _ in reversed_results] == [memory_id for memory_id, _ in results]
+    assert all(abs(scores[memory_id] - value) < 1e-9 for memory_id, value in reversed_results)
+
+    # 包含种子、限制数量、过滤弱关联、未知种子
+    with_seeds = dict(activation.activate({"s1": 0.8, "s2": 0.8}, include_seeds=True))
+    assert "s1" in with_seeds
+    assert len(activation.activate({"s1": 0.8, "s2": 0.8}, max_results=2)) == 2
+    filtered = SpreadingActivation(graph, min_strength=0.2).activate({"s2": 1.0})
+    assert "weak" not in dict(filtered)
+    assert activation.activate({"missing": 1.0}) == []
+
+    print("✅ 扩散激活测试通过")
+
+
+def test_activation_budget_and_pending(db_manager):
+    """测试迭代轮数和收敛阈值预算，以及尚未合并的增量关联参与扩散"""
+    print("\n===== 测试扩散激活预算 =====")
+    _seed(db_manager)
+    graph = AssociationGraph(compact_threshold=100)
+    graph.load(db_manager)
+
+    limited = SpreadingActivation(graph, max_iterations=3, epsilon=0.0)
+    limited.activate({"s1": 1.0})
+    assert limited.last_iterations == 3
+
+    converged = SpreadingActivation(graph, max_iterations=200, epsilon=1e-6)
+    converged.activate({"s1": 1.0})
+    print(f"收敛轮数: {converged.last_iterations}")
+    assert 3 < converged.last_iterations < 200
+
+    loose = SpreadingActivation(graph, max_iterations=200, epsilon=10.0)
+    loose.activate({"s1": 1.0})
+    assert loose.last_iterations == 1
+
+    # 增量关联和新节点
+    graph.upsert_edge("far2", "fresh", 0.9)
+    assert graph._pending
+    scores = dict(converged.activate({"s1": 1.0}))
+    assert "fresh" in scores
+
+    # AssociationNetwork的封装：返回激活记忆并更新种子的激活时间
+    network = AssociationNetwork(db_manager)
+    activated = network.activate_memories({"s1": 0.9, "s2": 0.7}, max_results=3)
+    assert [memory_id for memory_id, _ in activated][0] == "multi"
+    assert len(activated) == 3
+    assert network.activate_memories({}, max_results=3) == []
+
+    network.close()
+    print("✅ 扩散激活预算测试通过")
+
+
+def test_scorer_uses_activation():
+    """测试评分器把激活值计入综合分数，没有激活值的记忆分数不变"""
+    print("\n===== 测试评分器激活因子 =====")
+    now = time.time()
+    base = {"content": "内容", "weight": 5.0, "timestamp": now, "type": "user_input", "similarity": 0.5}
+    memories = [
+        dict(base, memory_id="plain", content="普通记忆"),
+        dict(base, memory_id="activated", content="关联记忆", activation=1.0),
+    ]
+    scorer = MemoryScorer()
+    ranked = scorer.score_memories(memories)
+    assert ranked[0]["memory_id"] == "activated"
+    scores = {memory["memory_id"]: memory["computed_score"] for memory in ranked}
+    assert abs(scores["activated"] - scores["plain"] - 10 * scorer.activation_factor) < 1e-6
+
+    ranked = MemoryScorer(activation_factor=0.0).score_memories(memories)
+    assert abs(ranked[0]["computed_score"] - ranked[1]["computed_score"]) < 1e-6
+    print("✅ 评分器激活因子测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_activation_accumulates_paths,
+        test_activation_budget_and_pending,
+        test_scorer_uses_activation
+    )
+    print("\n🎉 所有测试通过")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试持久化缓存的内存映射向量存储区
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.embedding.vector_arena import VectorArena
+from core.memory.embedding.cache import EnhancedMemoryCache
+
+VECTOR_DIM = 16
+
+
+def _key(i):
+    return hashlib.sha256(f"text_{i}".encode("utf-8")).hexdigest()
+
+
+def test_arena_roundtrip_and_compaction():
+    """测试写入、重新打开、LRU驱逐和压缩"""
+    print("\n===== 测试向量存储区 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_arena_")
+    prefix = os.path.join(temp_dir, "embedding_arena_16")
+    try:
+        vectors = np.random.default_rng(0).random((300, VECTOR_DIM)).astype(np.float32)
+        arena = VectorArena(prefix, VECTOR_DIM, max_entries=200, initial_capacity=64)
+        for i in range(300):
+            assert arena.put(_key(i), vectors[i])
+
+        stats = arena.get_stats()
+        print(f"写入后统计: {stats}")
+        assert len(arena) <= 200 and stats["evictions"] >= 100
+        assert arena.get(_key(0)) is None          # 最早写入的已被驱逐
+        view = arena.get(_key(299))
+        assert isinstance(view, np.memmap)        # 零拷贝视图
+        assert np.array_equal(view, vectors[299])
+
+        # 不flush直接重新打开：依靠追加的索引记录恢复
+        arena._close_index_file()
+        reopened = VectorArena(prefix, VECTOR_DIM, max_entries=200, initial_capacity=64)
+        assert len(reopened) == len(arena)
+        assert np.array_equal(reopened.get(_key(250)), vectors[250])
+
+        assert reopened.fragmentation > 0.3
+        held = reopened.get(_key(260))
+        assert reopened.compact()
+        assert reopened.fragmentation == 0.0
+        assert np.array_equal(reopened.get(_key(299)), vectors[299])
+        # 压缩写入下一代文件，不覆盖旧文件，压缩前的视图仍然有效
+        assert reopened.generation == 1 and os.path.exists(prefix + ".1.f32")
+        assert np.array_equal(held, vectors[260])
+        del held
+        reopened.close()
+
+        # 中断的压缩留下的下一代文件在打开时被清理
+        open(prefix + ".2.f32", "wb").close()
+        final = VectorArena(prefix, VECTOR_DIM, max_entries=200, initial_capacity=64)
+        assert final.generation == 1
+        assert np.array_equal(final.get(_key(280)), vectors[280])
+        assert sorted(name for name in os.listdir(temp_dir) if name.endswith(".f32")) == ["embedding_arena_16.1.f32"]
+        final.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_arena_concurrent_grow():
+    """测试写入线程扩展数据文件时并发读取"""
+    print("\n===== 测试向量存储区并发读写 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_arena_")
+    prefix = os.path.join(temp_dir, "embedding_arena_16")
+    try:
+        vectors = np.random.default_rng(2).random((2000, VECTOR_DIM)).astype(np.float32)
+        arena = VectorArena(prefix, VECTOR_DIM, max_entries=5000, initial_capacity=8)
+        arena.put(_key(0), vectors[0])
+        errors = []
+        done = threading.Event()
+
+        def reader():
+            try:
+                while not done.is_set():
+                    assert np.array_equal(arena.get(_key(0)), vectors[0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for i in range(1, 2000):
+            arena.put(_key(i), vectors[i])
+        done.set()
+        for thread in threads:
+            thread.join()
+
+        print(f"并发读取错误: {errors}, 统计: {arena.get_stats()}")
+        assert not errors
+        assert arena.get_stats()["capacity"] >= 2000
+        arena.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_cache_imports_legacy_npy():
+    """测试缓存启动时把旧版.npy文件导入存储区"""
+    print("\n===== 测试旧版.npy缓存导入 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_arena_")
+    try:
+        text = "旧缓存里的文本"
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        vector = np.random.default_rng(1).random(VECTOR_DIM).astype(np.float32)
+        np.save(os.path.join(temp_dir, f"{key}.npy"), vector)
+
+        cache = EnhancedMemoryCache(cache_dir=temp_dir)
+        assert not os.path.exists(os.path.join(temp_dir, f"{key}.npy"))
+        result = cache.get(text)
+        assert result is not None and np.array_equal(result, vector)
+        assert cache.stats["persistent_hits"] == 1
+
+        cache.put("新文本", vector * 2)
+        cache.flush()
+        assert os.path.exists(os.path.join(temp_dir, "embedding_arena_16.f32"))
+        assert not [name for name in os.listdir(temp_dir) if name.endswith(".npy")]
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_arena_roundtrip_and_compaction()
+    test_arena_concurrent_grow()
+    test_cache_imports_legacy_npy()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试memory_vectors的向量编码：f16/i8往返误差、批量解码和旧格式转换
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.vector_codec import (
+    encode_vectors, decode_vector, decode_rows, encoded_size,
+    load_all_vectors, iter_vector_chunks, convert_vector_format
+)
+
+
+def _normalized(n, dim, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_roundtrip_and_size():
+    """测试各格式的编码长度和往返误差"""
+    print("\n===== 测试向量编码往返 =====")
+    vectors = _normalized(50, 1024)
+
+    for vector_format, max_error in (("f32", 0.0), ("f16", 1e-3), ("i8", 0.01)):
+        blobs = encode_vectors(vectors, vector_format)
+        assert all(len(blob) == encoded_size(vector_format, 1024) for blob in blobs)
+
+        ids, decoded = decode_rows([(f"m{i}", blob, vector_format) for i, blob in enumerate(blobs)])
+        assert ids == [f"m{i}" for i in range(50)] and decoded.dtype == np.float32
+        error = np.abs(decoded - vectors).max()
+        cosine = np.sum(decoded * vectors, axis=1) / np.linalg.norm(decoded, axis=1)
+        print(f"{vector_format}: {len(blobs[0])} 字节, 最大误差 {error:.5f}, 最小余弦 {cosine.min():.5f}")
+        assert error <= max_error
+        assert cosine.min() > 0.999
+        assert np.array_equal(decode_vector(blobs[3], vector_format), decoded[3])
+
+    # 全零向量不会除零
+    assert not np.any(decode_vector(encode_vectors(np.zeros((1, 8)), "i8")[0], "i8"))
+    print("✅ 向量编码往返测试通过")
+
+
+def test_bulk_load_mixed_formats(db_manager):
+    """测试数据库中新旧格式混存时的分块读取、全量读取和格式转换"""
+    print("\n===== 测试向量批量读取 =====")
+    dim = 64
+    vectors = _normalized(30, dim, seed=1)
+    formats = ["f32", "f16", "i8"]
+    rows = []
+    for i, vector in enumerate(vectors):
+        vector_format = formats[i % 3]
+        rows.append((f"vec_m{i}", f"m{i}", encode_vectors(vector, vector_format)[0],
+                     vector_format, "test/model", time.time()))
+    assert db_manager.bulk_insert("memory_vectors", rows) == 30
+
+    # 旧代码写入的记录没有格式列，按f32读取；维度不同的记录被跳过
+    db_manager.execute_query(
+        "INSERT INTO memory_vectors (id, memory_id, vector, model_name, timestamp) VALUES (?, ?, ?, ?, ?)",
+        ("vec_legacy", "legacy", vectors[0].tobytes(), "old/model", time.time())
+    )
+    db_manager.execute_query(
+        "INSERT INTO memory_vectors (id, memory_id, vector, model_name, timestamp) VALUES (?, ?, ?, ?, ?)",
+        ("vec_other", "other_dim", np.ones(32, dtype=np.float32).tobytes(), "old/model", time.time())
+    )
+
+    ids, loaded = load_all_vectors(db_manager, dim, chunk_size=7)
+    print(f"全量读取: {len(ids)} 条, 形状 {loaded.shape}")
+    assert len(ids) == 31 and loaded.shape == (31, dim)
+    lookup = dict(zip(ids, loaded))
+    assert np.array_equal(lookup["legacy"], vectors[0])
+    assert np.allclose(lookup["m4"], vectors[4], atol=1e-3)
+    assert np.allclose(lookup["m5"], vectors[5], atol=0.01)
+    assert "other_dim" not in lookup
+
+    chunks = list(iter_vector_chunks(db_manager, dim, chunk_size=8))
+    assert sum(len(chunk_ids) for chunk_ids, _ in chunks) == 31
+
+    # 转换为i8后体积约为f32的四分之一
+    assert convert_vector_format(db_manager, "i8") == 22
+    sizes = db_manager.query(
+        "SELECT vector_format, COUNT(*), SUM(length(vector)) FROM memory_vectors GROUP BY vector_format")
+    print(f"转换后: {[tuple(row) for row in sizes]}")
+    assert [tuple(row)[:2] for row in sizes] == [("i8", 32)]
+    ids, converted = load_all_vectors(db_manager, dim)
+    assert len(ids) == 31
+    assert np.allclose(dict(zip(ids, converted))["m4"], vectors[4], atol=0.01)
+
+    print("✅ 向量批量读取测试通过")
+
+
+if __name__ == "__main__":
+    from conftest import run_tests
+    run_tests(
+        test_roundtrip_and_size,
+        test_bulk_load_mixed_formats
+    )
+    print("\n🎉 所有测试通过")
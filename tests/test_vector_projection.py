@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试降维索引：投影保存/加载、完整向量重排和重启后的投影恢复
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory.init.vector_index import VectorIndexManager
+from core.memory.init.vector_projection import VectorProjector
+
+FULL_DIM = 64
+INDEX_DIM = 16
+
+
+def test_pca_projection_roundtrip():
+    """测试PCA拟合、保存和加载"""
+    print("\n===== 测试PCA投影 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_proj_")
+    try:
+        vectors = np.random.default_rng(0).random((200, FULL_DIM)).astype(np.float32)
+        projector = VectorProjector.fit_pca(vectors, INDEX_DIM)
+        projected = projector.project(vectors[:5])
+        assert projected.shape == (5, INDEX_DIM)
+
+        path = os.path.join(temp_dir, "proj.npz")
+        projector.save(path)
+        loaded = VectorProjector.load(path)
+        assert loaded.method == "pca"
+        assert np.allclose(loaded.project(vectors[:5]), projected)
+        assert VectorProjector.load(os.path.join(temp_dir, "missing.npz")) is None
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_projected_index_rerank():
+    """测试投影索引检索时用完整向量重排，重启后投影仍然生效"""
+    print("\n===== 测试降维索引重排 =====")
+    temp_dir = tempfile.mkdtemp(prefix="estia_proj_")
+    index_path = os.path.join(temp_dir, "memory_index.bin")
+    try:
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((300, FULL_DIM)).astype(np.float32)
+        ids = [f"mem_{i}" for i in range(300)]
+        full = dict(zip(ids, vectors))
+
+        manager = VectorIndexManager(index_path, vector_dim=INDEX_DIM)
+        assert manager.create_index()
+        manager.set_projector(VectorProjector(FULL_DIM, INDEX_DIM, "truncate"))
+        manager.full_vector_loader = lambda memory_ids: {i: full[i] for i in memory_ids}
+        assert manager.add_vectors(vectors, ids)
+        assert manager.index.d == INDEX_DIM and manager.input_dim == FULL_DIM
+
+        # 查询与mem_7只在后几维上接近时，只有重排能找回它
+        query = vectors[7] + rng.standard_normal(FULL_DIM).astype(np.float32) * 0.05
+        found, scores = manager.search(query, k=3)
+        print(f"重排结果: {found}, {scores}")
+        assert found[0] == "mem_7"
+        assert scores[0] > 0.99
+
+        batch = manager.batch_search(np.vstack([vectors[3], vectors[9]]), k=1)
+        assert [result[0] for result in batch] == [["mem_3"], ["mem_9"]]
+        assert manager.save_index()
+        manager.delta_log.close()
+
+        reloaded = VectorIndexManager(index_path, vector_dim=FULL_DIM)
+        assert reloaded.load_index()
+        assert reloaded.projector is not None and reloaded.input_dim == FULL_DIM
+        found, _ = reloaded.search(vectors[42], k=1)
+        assert found == ["mem_42"]
+        assert reloaded.get_index_info()["projection"]["output_dim"] == INDEX_DIM
+        reloaded.delta_log.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_pca_projection_roundtrip()
+    test_projected_index_rerank()